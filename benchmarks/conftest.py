@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import datetime
+import pathlib
+
+import aiida.orm
+import pytest
+
+from aiida_icon.calculations import IconCalculation
+from aiida_icon.testing.inputs import make_master_nml, make_model_nml
+
+# pytest configuration
+
+pytest_plugins = ["aiida.tools.pytest_fixtures"]
+
+#: Sizes of the synthetic inputs, small enough to run in CI, large enough to show how the hot paths scale.
+NAMELIST_SIZES = [1, 10, 100]
+WORKDIR_SIZES = [10, 1_000, 100_000]
+
+
+def make_workdir(path: pathlib.Path, num_files: int) -> pathlib.Path:
+    """
+    A finished ICON work dir with 'num_files' (empty) files on the top level, about one in a hundred a restart.
+
+    ICON writes output without a directory in 'output_filename' to the top level, where the parser lists restarts.
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "finish.status").write_text("RESTART\n")
+    num_restarts = max(1, num_files // 100)
+    start = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+    for index in range(num_restarts):
+        (path / f"multifile_restart_m0_{start + datetime.timedelta(hours=index):%Y%m%dT%H%M%SZ}.mfr").mkdir()
+    (path / "multifile_restart_m0.mfr").symlink_to(f"multifile_restart_m0_{start:%Y%m%dT%H%M%SZ}.mfr")
+    for index in range(num_files - num_restarts - 2):
+        (path / f"out_{index:06d}.nc").touch()
+    return path
+
+
+@pytest.fixture
+def icon_builder(aiida_computer_local, aiida_code_installed):
+    """An IconCalculation builder with a code on the local computer."""
+    code = aiida_code_installed(default_calc_job_plugin="icon.icon", computer=aiida_computer_local())
+    return code.get_builder()
+
+
+@pytest.fixture
+def make_calculation(icon_builder):
+    """Create IconCalculations (ready for '.presubmit()') with a given number of models and output streams each."""
+
+    def make(num_models: int, num_streams: int) -> IconCalculation:
+        computer = icon_builder.code.computer
+        icon_builder.master_namelist = aiida.orm.SinglefileData.from_string(make_master_nml(num_models))
+        icon_builder.models = {
+            f"m{index}": aiida.orm.SinglefileData.from_string(
+                make_model_nml(num_streams, f"m{index}"), filename=f"m{index}.nml"
+            )
+            for index in range(num_models)
+        }
+        icon_builder.dynamics_grid_file = aiida.orm.RemoteData(
+            remote_path="/grids/icon_grid_0013_R02B04_R.nc", computer=computer
+        )
+        icon_builder.ecrad_data = aiida.orm.RemoteData(remote_path="/data/ecrad_data", computer=computer)
+        icon_builder.rrtmg_sw = aiida.orm.RemoteData(remote_path="/data/rrtmg_sw.nc", computer=computer)
+        icon_builder.cloud_opt_props = aiida.orm.RemoteData(
+            remote_path="/data/ECHAM6_CldOptProps.nc", computer=computer
+        )
+        icon_builder.dmin_wetgrowth_lookup = aiida.orm.RemoteData(
+            remote_path="/data/dmin_wetgrowth_lookup.nc", computer=computer
+        )
+        icon_builder.metadata.dry_run = True
+        return IconCalculation(dict(icon_builder))
+
+    return make
@@ -0,0 +1,68 @@
+import functools
+
+import aiida.common
+import aiida.orm
+import pytest
+from aiida.common import folders
+
+from aiida_icon import calculations
+
+from aiida_icon.testing.inputs import make_master_nml, make_model_nml
+
+from .conftest import NAMELIST_SIZES, WORKDIR_SIZES, make_workdir
+
+
+@pytest.mark.parametrize("num_streams", NAMELIST_SIZES)
+def test_prepare_for_submission(benchmark, make_calculation, tmp_path, num_streams):
+    """Preparing the upload folder of a (dry-run) calculation, with 'num_streams' output streams per model."""
+    benchmark.group = "prepare_for_submission"
+    calculation = make_calculation(num_models=2, num_streams=num_streams)
+    sandboxes = iter(range(1_000_000))
+
+    def prepare():
+        path = tmp_path / str(next(sandboxes))
+        path.mkdir()
+        return calculation.prepare_for_submission(folders.Folder(str(path)))
+
+    calcinfo = benchmark(prepare)
+
+    assert "m1.nml" in [name for _, _, name in calcinfo.local_copy_list]
+
+
+@pytest.fixture
+def finished_calculation(aiida_computer_local, tmp_path_factory):
+    """Create a finished calculation, which wrote 'num_files' files to its work dir, ready for parsing."""
+    computer = aiida_computer_local()
+
+    def make(num_files: int) -> aiida.orm.CalcJobNode:
+        node = aiida.orm.CalcJobNode(computer=computer, process_type="aiida.calculations:icon.icon")
+        add_input = functools.partial(node.base.links.add_incoming, link_type=aiida.common.LinkType.INPUT_CALC)
+        add_input(aiida.orm.SinglefileData.from_string(make_master_nml(1)), link_label="master_namelist")
+        add_input(aiida.orm.SinglefileData.from_string(make_model_nml(10), filename="m0.nml"), link_label="models__m0")
+        node.store_all()
+        work_dir = make_workdir(tmp_path_factory.mktemp("workdir"), num_files)
+        remote_folder = aiida.orm.RemoteData(remote_path=str(work_dir), computer=computer)
+        retrieved = aiida.orm.FolderData()
+        retrieved.put_object_from_file(str(work_dir / "finish.status"), "finish.status")
+        for output, label in ((remote_folder, "remote_folder"), (retrieved, "retrieved")):
+            output.base.links.add_incoming(node, link_type=aiida.common.LinkType.CREATE, link_label=label)
+            output.store()
+        return node
+
+    return make
+
+
+@pytest.mark.parametrize("num_files", WORKDIR_SIZES)
+def test_parse(benchmark, finished_calculation, num_files):
+    """Parsing a finished run, listing a work dir with 'num_files' files."""
+    benchmark.group = "parse"
+    node = finished_calculation(num_files)
+
+    def parse():
+        parser = calculations.IconParser(node)
+        return parser, parser.parse()
+
+    parser, exit_code = benchmark(parse)
+
+    assert exit_code.status == 0
+    assert len(parser.outputs.all_restart_files) == max(1, num_files // 100)
@@ -0,0 +1,45 @@
+import aiida.orm
+import f90nml
+import pytest
+
+from aiida_icon import calcutils
+from aiida_icon.iconutils import masternml, modelnml
+
+from aiida_icon.testing.inputs import make_master_nml, make_model_nml
+
+from .conftest import NAMELIST_SIZES
+
+
+@pytest.mark.parametrize("num_models", NAMELIST_SIZES)
+def test_collect_model_nml(benchmark, num_models):
+    benchmark.group = "collect_model_nml"
+    inputs = {
+        "models": {
+            f"m{index}": aiida.orm.SinglefileData.from_string(make_model_nml(10, f"m{index}")).store()
+            for index in range(num_models)
+        }
+    }
+
+    result = benchmark(calcutils.collect_model_nml, inputs)
+
+    assert len(result["output_nml"]) == 10 * num_models
+
+
+@pytest.mark.parametrize("num_models", NAMELIST_SIZES)
+def test_iter_model_name_filepath(benchmark, num_models):
+    benchmark.group = "iter_model_name_filepath"
+    master_nml = f90nml.reads(make_master_nml(num_models))
+
+    result = benchmark(lambda: list(masternml.iter_model_name_filepath(master_nml)))
+
+    assert len(result) == num_models
+
+
+@pytest.mark.parametrize("num_streams", NAMELIST_SIZES)
+def test_read_output_stream_infos(benchmark, num_streams):
+    benchmark.group = "read_output_stream_infos"
+    model_nml = f90nml.reads(make_model_nml(num_streams))
+
+    result = benchmark(modelnml.read_output_stream_infos, model_nml)
+
+    assert len(result) == num_streams
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import dataclasses
+import time
+import typing
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from aiida import orm
+
+__all__ = ["EXTRAS_KEY", "OperationStats", "RemoteOperations", "measure", "read_remote_operations", "recording"]
+
+#: Calculations store the remote operations of each stage in this extra, '{stage: {operation: {count, seconds}}}'.
+EXTRAS_KEY = "remote_operations"
+
+_current: contextvars.ContextVar[RemoteOperations | None] = contextvars.ContextVar("remote_operations", default=None)
+
+
+@dataclasses.dataclass
+class OperationStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+@dataclasses.dataclass
+class RemoteOperations:
+    """
+    Number of and time spent in remote operations (transport calls, authinfo lookups), by operation name.
+
+    Examples:
+        >>> operations = RemoteOperations()
+        >>> operations.record("listdir", 0.25)
+        >>> operations.record("listdir", 0.5)
+        >>> operations.to_dict()
+        {'listdir': {'count': 2, 'seconds': 0.75}}
+        >>> operations.total_count
+        2
+    """
+
+    operations: dict[str, OperationStats] = dataclasses.field(default_factory=dict)
+
+    def record(self, name: str, seconds: float) -> None:
+        stats = self.operations.setdefault(name, OperationStats())
+        stats.count += 1
+        stats.seconds += seconds
+
+    @property
+    def total_count(self) -> int:
+        return sum(stats.count for stats in self.operations.values())
+
+    def to_dict(self) -> dict[str, dict[str, float]]:
+        return {name: dataclasses.asdict(stats) for name, stats in self.operations.items()}
+
+    def store(self, node: orm.Node, stage: str) -> None:
+        """Add the operations of a stage ('prepare', 'parse', ...) to the extras of a calculation."""
+        recorded = dict(node.base.extras.get(EXTRAS_KEY, {}))
+        stage_operations = dict(recorded.get(stage, {}))
+        for name, stats in self.operations.items():
+            previous = stage_operations.get(name, {"count": 0, "seconds": 0.0})
+            stage_operations[name] = {
+                "count": previous["count"] + stats.count,
+                "seconds": previous["seconds"] + stats.seconds,
+            }
+        recorded[stage] = stage_operations
+        node.base.extras.set(EXTRAS_KEY, recorded)
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[RemoteOperations]:
+    """
+    Record the remote operations measured (see 'measure') within the block.
+
+    Examples:
+        >>> with recording() as operations:
+        ...     with measure("getfile"):
+        ...         pass
+        >>> operations.operations["getfile"].count
+        1
+    """
+    operations = RemoteOperations()
+    token = _current.set(operations)
+    try:
+        yield operations
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def measure(name: str) -> Iterator[None]:
+    """Count and time one remote operation, if operations are being recorded."""
+    operations = _current.get()
+    if operations is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        operations.record(name, time.perf_counter() - started)
+
+
+def read_remote_operations(node: orm.Node) -> dict[str, dict[str, dict[str, float]]]:
+    """Remote operations recorded for a calculation, by stage."""
+    return node.base.extras.get(EXTRAS_KEY, {})
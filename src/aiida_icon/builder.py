@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import typing
+from collections.abc import Mapping
 
 from aiida import orm
 from aiida.engine.processes import builder as process_builder
 
-from aiida_icon import tools
+from aiida_icon import calcutils, tools
+from aiida_icon.iconutils import modelnml, namelists
 
 if typing.TYPE_CHECKING:
     from collections.abc import Callable
@@ -79,6 +81,24 @@ def prepare_builder_for_wrapper_script(
     ]
 
 
+def set_uenv(
+    builder: process_builder.ProcessBuilder, uenv_name: str, *, view: str = "", overwrite: bool = False
+) -> None:
+    """Add the uenv to the scheduler commands, only once unless 'overwrite' (see `IconCalculationBuilder.set_uenv`)."""
+    if getattr(builder, "__is_uenv_set", False) and not overwrite:
+        return
+    current_custom_scheduler_commands: str = (
+        builder.metadata.options.custom_scheduler_commands  # type: ignore[attr-defined]
+    )
+    lines = current_custom_scheduler_commands.splitlines()
+    uenv_line = f"#SBATCH --uenv={uenv_name}"
+    if view:
+        uenv_line = f"{uenv_line} --view={view}"
+    lines.append(uenv_line)
+    builder.metadata.options.custom_scheduler_commands = "\n".join(lines)  # type: ignore[attr-defined]
+    setattr(builder, "__is_uenv_set", True)
+
+
 class IconCalculationBuilder(process_builder.ProcessBuilder):
     """
     Custom ProcessBuilder for IconCalculation.
@@ -93,6 +113,9 @@ class IconCalculationBuilder(process_builder.ProcessBuilder):
     Additionally, if the code is set to a code, which has a "uenv" set
     (via aiida_icon.tools.code_set_uenv), configure the UENV to be used automatically.
 
+    File inputs are used as they are set, call `deduplicate_inputs` to replace them by stored nodes with the
+    same content (see aiida_icon.tools.deduplicate).
+
     Examples:
 
         >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
@@ -129,6 +152,49 @@ class IconCalculationBuilder(process_builder.ProcessBuilder):
             self.set_uenv(uenv.name, view=uenv.view)
         super().__setattr__(attr, value)
 
+    def deduplicate_inputs(self) -> None:
+        """
+        Replace all file inputs, including those in namespaces, by stored nodes with the same content, if any.
+
+        Example:
+
+            >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+            >>> from aiida_icon.calculations import IconCalculation
+            >>> stored = orm.SinglefileData.from_string("&run_nml\\n/", filename="atm.nml").store()
+            >>> builder = IconCalculationBuilder(IconCalculation)
+            >>> builder.models["atm"] = orm.SinglefileData.from_string("&run_nml\\n/", filename="atm.nml")
+            >>> builder.deduplicate_inputs()
+            >>> builder.models["atm"].uuid == stored.uuid
+            True
+        """
+        tools.deduplicate_inputs(self)
+
+    def use_canonical_namelist_hashing(self) -> None:
+        """
+        Hash the namelist inputs by their parsed content, so that caching ignores formatting, comments, case and order.
+
+        Replaces the local master and model namelist inputs with equivalent NamelistData nodes
+        (see aiida_icon.iconutils.namelists.canonical_namelist), call it after setting them.
+
+        Example:
+
+            >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+            >>> from aiida_icon.calculations import IconCalculation
+            >>> builder = IconCalculationBuilder(IconCalculation)
+            >>> builder.master_namelist = orm.SinglefileData.from_string("&master_nml\\n/", filename="master.nml")
+            >>> builder.use_canonical_namelist_hashing()
+            >>> type(builder.master_namelist).__name__, builder.master_namelist.filename
+            ('NamelistData', 'master.nml')
+        """
+        for name in ("master_namelist", "model_namelist"):
+            if isinstance(value := self.get(name), orm.SinglefileData):
+                setattr(self, name, tools.deduplicate(namelists.NamelistData.from_singlefile(value)))
+        for model_name, model_nml in list(self.models.items()):  # type: ignore[attr-defined] # dynamic port namespace
+            if isinstance(model_nml, orm.SinglefileData):
+                self.models[model_name] = tools.deduplicate(  # type: ignore[attr-defined] # dynamic port namespace
+                    namelists.NamelistData.from_singlefile(model_nml)
+                )
+
     def set_uenv(self, uenv_name: str, *, view: str = "", overwrite: bool = False) -> None:
         """
         Conveniently configure to run using a UENV (useful for CSCS ALPS machines).
@@ -143,15 +209,228 @@ class IconCalculationBuilder(process_builder.ProcessBuilder):
             >>> builder.metadata.options.custom_scheduler_commands
             '#SBATCH --uenv=icon/25.2:v3 --view=default'
         """
-        if getattr(self, "__is_uenv_set", False) and not overwrite:
-            return
-        current_custom_scheduler_commands: str = (
-            self.metadata.options.custom_scheduler_commands  # type: ignore[attr-defined]
+        set_uenv(self, uenv_name, view=view, overwrite=overwrite)
+
+    def configure_async_io(
+        self,
+        *,
+        model_name: str = "atm",
+        io_procs_per_stream: int = 1,
+        num_restart_procs: int | None = None,
+        prefetch: bool = False,
+    ) -> None:
+        """
+        Configure asynchronous output, restart and prefetch processes consistently with the resources.
+
+        One output process is used per output stream of the model namelist ('io_procs_per_stream' > 1 partitions
+        each stream, see 'stream_partitions_ml'), the restart processes default to one per machine if the
+        restart write mode requires them. The settings are validated against the total number of MPI processes
+        and patched into the model namelist (`.models[model_name]` or `.model_namelist`) with provenance.
+
+        Call it after setting the resources and the model namelist.
+
+        Example:
+
+            >>> from aiida_icon.calculations import IconCalculation
+            >>> builder = IconCalculationBuilder(IconCalculation)
+            >>> builder.models["atm"] = orm.SinglefileData.from_string(
+            ...     "&parallel_nml\\nnproma=32\\n/\\n&output_nml\\n/\\n&output_nml\\n/"
+            ... )
+            >>> builder.metadata.options.resources = {"num_machines": 2, "num_mpiprocs_per_machine": 16}
+            >>> builder.configure_async_io()
+            >>> print(builder.models["atm"].get_content(mode="r"))
+            &parallel_nml
+                nproma = 32
+                num_io_procs = 2
+                num_restart_procs = 0
+                num_prefetch_proc = 0
+            /
+            <BLANKLINE>
+            &output_nml
+            /
+            <BLANKLINE>
+            &output_nml
+            /
+            <BLANKLINE>
+        """
+        resources = self.metadata.options.resources  # type: ignore[attr-defined]
+        if not all(key in resources for key in ("num_machines", "num_mpiprocs_per_machine")):
+            msg = "Set 'num_machines' and 'num_mpiprocs_per_machine' in the resources before configuring I/O."
+            raise ValueError(msg)
+        if model_name in self.models:  # type: ignore[attr-defined] # dynamic port namespace
+            model_nml = self.models[model_name]  # type: ignore[attr-defined] # dynamic port namespace
+        else:
+            model_nml = self.get("model_namelist")
+        if not isinstance(model_nml, orm.SinglefileData):
+            msg = f"Asynchronous I/O can only be configured for a local model namelist, found: {model_nml!r}."
+            raise ValueError(msg)  # noqa: TRY004 # a missing input is a value problem for the caller
+
+        parallel_options, output_options = modelnml.plan_async_io(
+            model_nml,
+            num_machines=resources["num_machines"],
+            io_procs_per_stream=io_procs_per_stream,
+            num_restart_procs=num_restart_procs,
+            prefetch=prefetch,
+        )
+        problems = modelnml.validate_async_io(
+            model_nml,
+            parallel_options,
+            output_options,
+            total_mpiprocs=resources["num_machines"] * resources["num_mpiprocs_per_machine"],
         )
-        lines = current_custom_scheduler_commands.splitlines()
-        uenv_line = f"#SBATCH --uenv={uenv_name}"
-        if view:
-            uenv_line = f"{uenv_line} --view={view}"
-        lines.append(uenv_line)
-        self.metadata.options.custom_scheduler_commands = "\n".join(lines)  # type: ignore[attr-defined]
-        setattr(self, "__is_uenv_set", True)
+        if problems:
+            raise ValueError("\n".join(["Inconsistent asynchronous I/O settings:", *problems]))
+
+        options = modelnml.options(parallel_options=parallel_options, output_options=output_options)
+        new_model_nml = modelnml.modify_model_nml(
+            model_nml, orm.Dict({section: values for section, values in options.items() if values})
+        )
+        if model_name in self.models:  # type: ignore[attr-defined] # dynamic port namespace
+            self.models[model_name] = new_model_nml  # type: ignore[attr-defined] # dynamic port namespace
+        else:
+            self.model_namelist = new_model_nml
+
+    def check_remote_inputs(self) -> None:
+        """
+        Check that all remote inputs exist (and restart directories are not empty) before submitting.
+
+        Runs one command per computer involved and raises a FileNotFoundError listing every problem.
+        To check from within the daemon instead, set the 'check_remote_inputs' option.
+        """
+        if problems := calcutils.find_remote_input_problems(self):
+            raise FileNotFoundError("\n".join(["Remote inputs are missing or incomplete:", *problems]))
+
+    def apply_preset(self, preset: orm.Dict | Mapping[str, typing.Any]) -> None:
+        """
+        Apply resources and model namelist options, for example the 'preset' output of an IconTuningWorkChain.
+
+        The model namelist options are applied to the model named in the preset (or to `.model_namelist`
+        if there is no such model), with provenance.
+
+        Example:
+
+            >>> from aiida_icon.calculations import IconCalculation
+            >>> builder = IconCalculationBuilder(IconCalculation)
+            >>> builder.apply_preset({"resources": {"num_machines": 2, "num_mpiprocs_per_machine": 4}})
+            >>> builder.metadata.options.resources
+            {'num_machines': 2, 'num_mpiprocs_per_machine': 4}
+        """
+        data = preset.get_dict() if isinstance(preset, orm.Dict) else dict(preset)
+        self.metadata.options.resources = dict(data["resources"])  # type: ignore[attr-defined]
+        if not (model_options := data.get("model_options")):
+            return
+        model_name = data.get("model_name", "atm")
+        if model_name in self.models:  # type: ignore[attr-defined] # dynamic port namespace
+            self.models[model_name] = modelnml.modify_model_nml(  # type: ignore[attr-defined] # dynamic port namespace
+                self.models[model_name],  # type: ignore[attr-defined] # dynamic port namespace
+                orm.Dict(model_options),
+            )
+        else:
+            self.model_namelist = modelnml.modify_model_nml(self.model_namelist, orm.Dict(model_options))
+
+
+def _member_inputs(inputs: Mapping[str, typing.Any]) -> dict[str, typing.Any]:
+    """Recursively turn (builder) input mappings into plain dicts, leaving out empty namespaces."""
+    result = {}
+    for key, value in inputs.items():
+        if isinstance(value, Mapping):
+            value = _member_inputs(value)  # noqa: PLW2901 # converting in place is clearer here
+            if not value:
+                continue
+        result[key] = value
+    return result
+
+
+class IconPackedCalculationBuilder(process_builder.ProcessBuilder):
+    """
+    Custom ProcessBuilder for IconPackedCalculation.
+
+    Members are added from the inputs of IconCalculations (builders or plain mappings),
+    `set_packing` then derives the job resources and the launch parameters for each member.
+
+    Examples:
+
+        >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+        >>> from aiida_icon.calculations import IconCalculation, IconPackedCalculation
+        >>> packed = IconPackedCalculationBuilder(IconPackedCalculation)
+        >>> for name in ["alpha", "beta", "gamma"]:
+        ...     member = IconCalculation.get_builder()
+        ...     member.master_namelist = orm.SinglefileData.from_string("&master_nml\\n/")
+        ...     packed.add_member(name, member)
+        >>> sorted(packed.members)
+        ['alpha', 'beta', 'gamma']
+        >>> packed.set_packing(mpiprocs_per_member=32, mpiprocs_per_machine=64)
+        >>> packed.metadata.options.resources
+        {'num_machines': 2, 'num_mpiprocs_per_machine': 64}
+        >>> packed.metadata.options.mpirun_extra_params
+        ['--nodes=1', '--ntasks=32', '--exact', './run_packed.sh']
+    """
+
+    #: Inputs which are shared by all members and can therefore not be set per member.
+    SHARED_INPUTS = ("code", "metadata", "monitors", "wrapper_script", "setup_env")
+
+    def __setattr__(self, attr: str, value: typing.Any) -> None:
+        if attr == "code" and isinstance(value, orm.Code) and (uenv := tools.code_get_uenv(value)):
+            self.set_uenv(uenv.name, view=uenv.view)
+        super().__setattr__(attr, value)
+
+    def set_uenv(self, uenv_name: str, *, view: str = "", overwrite: bool = False) -> None:
+        """Run all members using a UENV, like `IconCalculationBuilder.set_uenv`."""
+        set_uenv(self, uenv_name, view=view, overwrite=overwrite)
+
+    def add_member(self, name: str, member: Mapping[str, typing.Any]) -> None:
+        """
+        Add the inputs of an IconCalculation as a member, the member's run directory will be called 'name'.
+
+        File inputs with the same content as those of other members are replaced by the same node, without
+        querying the database. Use `aiida_icon.tools.deduplicate_inputs` to reuse stored nodes as well.
+        """
+        member_inputs = {key: value for key, value in _member_inputs(member).items() if key not in self.SHARED_INPUTS}
+        seen = getattr(self, "__deduplicated_inputs", {})
+        tools.deduplicate_inputs(member_inputs, seen, stored=False)
+        setattr(self, "__deduplicated_inputs", seen)
+        self.members[name] = member_inputs  # type: ignore[attr-defined] # dynamic port namespace
+
+    def set_packing(self, *, mpiprocs_per_member: int, mpiprocs_per_machine: int) -> None:
+        """
+        Set resources and launch parameters, such that each member runs with 'mpiprocs_per_member' processes.
+
+        Members either share machines (if they fit, several per machine) or occupy whole machines.
+        Assumes the target machine is using SLURM, every member is launched as a separate job step with its own
+        '--nodes' and '--ntasks'. The mpirun command of the computer must therefore not set the number of tasks
+        itself (a plain 'srun', not 'srun -n {tot_num_mpiprocs}'), which is checked when the job is created.
+        Calling it again replaces the previous packing.
+        """
+        num_members = len(self.members)  # type: ignore[attr-defined] # dynamic port namespace
+        if not num_members:
+            msg = "Add members before setting up the packing."
+            raise ValueError(msg)
+        if mpiprocs_per_member <= mpiprocs_per_machine:
+            members_per_machine = mpiprocs_per_machine // mpiprocs_per_member
+            machines_per_member = 1
+            num_machines = -(-num_members // members_per_machine)
+        elif mpiprocs_per_member % mpiprocs_per_machine == 0:
+            machines_per_member = mpiprocs_per_member // mpiprocs_per_machine
+            num_machines = num_members * machines_per_member
+        else:
+            msg = "Members spanning several machines must use a multiple of 'mpiprocs_per_machine' processes."
+            raise ValueError(msg)
+
+        self.metadata.options.resources = {  # type: ignore[attr-defined]
+            "num_machines": num_machines,
+            "num_mpiprocs_per_machine": mpiprocs_per_machine,
+        }
+        # repeated calls start over from the parameters before the first one
+        unpacked_mpirun_extra_params = getattr(self, "__unpacked_mpirun_extra_params", None)
+        if unpacked_mpirun_extra_params is None:
+            unpacked_mpirun_extra_params = ensure_list(
+                self.metadata.options.mpirun_extra_params  # type: ignore[attr-defined]
+            )
+            setattr(self, "__unpacked_mpirun_extra_params", unpacked_mpirun_extra_params)
+        self.metadata.options.mpirun_extra_params = [  # type: ignore[attr-defined]
+            *unpacked_mpirun_extra_params,
+            f"--nodes={machines_per_member}",
+            f"--ntasks={mpiprocs_per_member}",
+            "--exact",
+            "./run_packed.sh",
+        ]
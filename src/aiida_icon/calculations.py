@@ -4,6 +4,7 @@ import dataclasses
 import enum
 import functools
 import pathlib
+import posixpath
 import re
 import typing
 
@@ -15,8 +16,21 @@ from aiida.common.links import validate_link_label
 from aiida.engine.processes import ports
 from aiida.parsers import parser
 
-from aiida_icon import builder, calcutils, exceptions
-from aiida_icon.iconutils import masternml, modelnml
+from aiida_icon import (
+    accounting,
+    builder,
+    calcutils,
+    efficiency,
+    exceptions,
+    monitors,
+    performance,
+    search,
+    staging,
+    striping,
+    tools,
+    tracing,
+)
+from aiida_icon.iconutils import failures, masternml, modelnml, timers
 
 if typing.TYPE_CHECKING:
     from aiida.engine.processes import builder as process_builder
@@ -40,6 +54,13 @@ class IconCalculation(engine.CalcJob):
         # deprecated, use "models" namespace instead. Kept around for validity of existing nodes
         spec.input("model_namelist", valid_type=orm.SinglefileData, required=False)
         spec.input("restart_file", valid_type=orm.RemoteData, required=False)
+        spec.input_namespace(
+            "restart_files",
+            valid_type=orm.RemoteData,
+            required=False,
+            dynamic=True,
+            help="Restart files of additional models (keyed by model name), 'restart_file' is for the primary model.",
+        )
         spec.input("wrapper_script", valid_type=orm.SinglefileData, required=False)
         spec.input(
             "setup_env",
@@ -76,6 +97,11 @@ class IconCalculation(engine.CalcJob):
         )
         spec.output("latest_restart_file")
         spec.output_namespace("all_restart_files", dynamic=True)
+        spec.output_namespace(
+            "latest_restart_files",
+            dynamic=True,
+            help="Latest restart files of additional models (keyed by model name), to pass on as 'restart_files'.",
+        )
         spec.output_namespace(
             "output_streams",
             dynamic=True,
@@ -84,6 +110,58 @@ class IconCalculation(engine.CalcJob):
             help="Output streams of the ICON calculation",
         )
         spec.output("finish_status")
+        spec.output(
+            "timer_report",
+            valid_type=orm.Dict,
+            required=False,
+            help="Timings (in seconds) per timer, from the timer report at the end of the ICON log.",
+        )
+        spec.output(
+            "efficiency_report",
+            valid_type=orm.Dict,
+            required=False,
+            help="Use of the requested resources, from the scheduler accounting (see 'aiida_icon.efficiency').",
+        )
+        spec.input(
+            "metadata.options.striping",
+            valid_type=dict,
+            required=False,
+            validator=striping.validate_striping_option,
+            help=(
+                "Lustre striping of the output stream directories and the restart files, overrides the computer's "
+                "default (see 'aiida_icon.tools.computer_set_striping' and 'aiida_icon.striping.StripingPolicy')."
+            ),
+        )
+        spec.input(
+            "metadata.options.staging",
+            valid_type=dict,
+            required=False,
+            validator=staging.validate_staging_option,
+            help=(
+                "Stage read-only inputs and selected output stream directories to node-local storage, "
+                "see 'aiida_icon.staging.StagingPolicy' for the settings."
+            ),
+        )
+        spec.input(
+            "metadata.options.tracing",
+            valid_type=dict,
+            required=False,
+            validator=tracing.validate_tracing_option,
+            help=(
+                "Export the lifecycle of the calculation as an OpenTelemetry trace once it is parsed, "
+                "see 'aiida_icon.tracing.TracingConfig' for the settings."
+            ),
+        )
+        spec.input(
+            "metadata.options.check_remote_inputs",
+            valid_type=bool,
+            default=False,
+            help=(
+                "Check that all remote inputs exist (and restart directories are not empty) before uploading, "
+                "with one remote command per computer. Fails with ERROR_REMOTE_INPUTS_MISSING instead of queueing "
+                "a job which would crash at startup."
+            ),
+        )
         options = spec.inputs["metadata"]["options"]  # type: ignore[index] # guaranteed correct by aiida-core
         options["resources"].default = {  # type: ignore[index] # guaranteed correct by aiida-core
             "num_machines": 10,
@@ -92,6 +170,11 @@ class IconCalculation(engine.CalcJob):
         }
         options["withmpi"].default = True  # type: ignore[index] # guaranteed correct by aiida-core
         options["parser_name"].default = "icon.icon"  # type: ignore[index] # guaranteed correct by aiida-core
+        spec.exit_code(
+            200,
+            "ERROR_REMOTE_INPUTS_MISSING",
+            message="Remote inputs are missing or incomplete, the job was not submitted: {problems}",
+        )
         spec.exit_code(
             300,
             "ERROR_MISSING_OUTPUT_FILES",
@@ -125,151 +208,384 @@ class IconCalculation(engine.CalcJob):
             "ERROR_MISSING_RESTART_FILES",
             message="ICON was expected to produce a restart file but did not.",
         )
+        spec.exit_code(
+            320,
+            "ERROR_ICON_ABORTED",
+            message="ICON aborted: {message}",
+        )
+        spec.exit_code(
+            330,
+            "ERROR_ICON_DIVERGED",
+            message="ICON diverged, the job was stopped early: {message}",
+        )
+        spec.exit_code(
+            331,
+            "ERROR_ICON_STALLED",
+            message="ICON stalled, the job was stopped early: {message}",
+        )
+
+    def on_create(self) -> None:
+        super().on_create()
+        try:
+            search.record_experiment_metadata(self.node, self.inputs)
+        except (ValueError, KeyError, TypeError, StopIteration) as err:
+            self.logger.warning(f"Could not record the experiment metadata: {err}")
+
+    async def run(self) -> typing.Any:
+        if (
+            self.inputs.metadata.options.check_remote_inputs
+            and not self.inputs.metadata.dry_run
+            and "remote_folder" not in self.inputs
+            and self.node.exit_status is None
+        ):
+            with accounting.recording() as operations:
+                problems = await self.find_remote_input_problems()
+            operations.store(self.node, "check")
+            if problems:
+                self.report("\n".join(["Not submitting, remote inputs are missing or incomplete:", *problems]))
+                return self.exit_codes.ERROR_REMOTE_INPUTS_MISSING.format(problems="; ".join(problems))
+        return await super().run()
+
+    async def find_remote_input_problems(self) -> list[str]:
+        """Check the remote inputs with one command per computer, through the transport queue of the runner."""
+        problems = []
+        for remote_inputs in calcutils.group_by_computer(calcutils.collect_remote_inputs(self.inputs)).values():
+            computer = remote_inputs[0].computer
+            with accounting.measure("authinfo"):
+                authinfo = computer.get_authinfo(self.node.user)
+            with self.runner.transport.request_transport(authinfo) as request, accounting.measure("exec_command"):
+                remote = await request
+                retval, stdout, stderr = await remote.exec_command_wait_async(
+                    calcutils.make_check_remote_paths_command(remote_inputs)
+                )
+            if retval:
+                raise exceptions.RemoteInputsInaccessibleError(computer.label, stderr)
+            problems.extend(calcutils.read_remote_path_problems(stdout, remote_inputs))
+        return problems
 
     def prepare_for_submission(self, folder: folders.Folder) -> datastructures.CalcInfo:
-        model_namelist_data = calcutils.collect_model_nml(self.inputs)
-        master_namelist_data = f90nml.reads(self.inputs.master_namelist.get_content(mode="r"))
+        with tracing.recording() as spans:
+            with tracing.span("prepare_for_submission"):
+                calcinfo = self.prepare_steps(folder)
+        if self.inputs.metadata.options.get("tracing") is not None:
+            tracing.store_spans(self.node, spans)
+        return calcinfo
 
-        for stream_info in modelnml.read_output_stream_infos(model_namelist_data):
-            folder.get_subfolder(stream_info.path, create=True)
+    def prepare_steps(self, folder: folders.Folder) -> datastructures.CalcInfo:
+        with accounting.recording() as operations, tracing.span("prepare_icon_run"):
+            calcinfo = prepare_icon_run(self, self.inputs, folder)
+        operations.store(self.node, "prepare")
 
         codeinfo = datastructures.CodeInfo()
         codeinfo.code_uuid = self.inputs.code.uuid
-
-        calcinfo = datastructures.CalcInfo()
         calcinfo.codes_info = [codeinfo]
-        calcinfo.remote_symlink_list = []
-        make_remote_path_triplet_from_models = functools.partial(
-            calcutils.make_remote_path_triplet, nml_data=model_namelist_data
+
+        with tracing.span("add_job_scripts"):
+            add_job_scripts(self.inputs, calcinfo)
+        staging_option = self.inputs.metadata.options.get("staging")
+        striping_option = self.inputs.metadata.options.get("striping") or tools.computer_get_striping(
+            self.inputs.code.computer
         )
-        if "dynamics_grid_file" in self.inputs:
-            calcinfo.remote_symlink_list.append(
-                make_remote_path_triplet_from_models(
-                    self.inputs.dynamics_grid_file,
-                    lookup_path="grid_nml.dynamics_grid_filename",
+        if striping_option is not None:
+            staged_outputs = staging.StagingPolicy.from_option(staging_option).output_streams if staging_option else ()
+            with tracing.span("add_striping"):
+                add_striping(
+                    self.inputs, calcinfo, striping.StripingPolicy.from_option(striping_option), staged_outputs
                 )
+        if staging_option is not None:
+            with tracing.span("add_staging"):
+                add_staging(self.inputs, calcinfo, folder, staging.StagingPolicy.from_option(staging_option))
+        return calcinfo
+
+
+def in_run_dir(path: str | pathlib.PurePath, run_dir: str = "") -> str:
+    """
+    Make a path relative to the work dir from a path relative to the run dir of an ICON experiment.
+
+    Examples:
+        >>> in_run_dir("./ecrad_data")
+        './ecrad_data'
+        >>> in_run_dir("./ecrad_data", run_dir="member_a")
+        'member_a/ecrad_data'
+    """
+    if not run_dir:
+        return str(path)
+    return str(pathlib.PurePosixPath(run_dir) / path)
+
+
+def prepare_icon_run(
+    process: engine.CalcJob,
+    inputs: calcutils.ReadMapProtocol,
+    folder: folders.Folder,
+    *,
+    run_dir: str = "",
+) -> datastructures.CalcInfo:
+    """
+    Prepare everything needed to run one ICON experiment in 'run_dir' (relative to the work dir).
+
+    The codes info and job level scripts (see 'add_job_scripts') are left to the caller.
+    """
+    with tracing.span("collect_model_nml"):
+        model_namelist_data = calcutils.collect_model_nml(inputs)
+    master_namelist_data = f90nml.reads(inputs["master_namelist"].get_content(mode="r"))
+    computer_uuid = process.inputs.code.computer.uuid
+
+    def relocate(triplet: tuple[str, str, str]) -> tuple[str, str, str]:
+        return (triplet[0], triplet[1], in_run_dir(triplet[2], run_dir))
+
+    if run_dir:
+        folder.get_subfolder(run_dir, create=True)
+
+    for stream_info in modelnml.read_output_stream_infos(model_namelist_data):
+        folder.get_subfolder(in_run_dir(stream_info.path, run_dir), create=True)
+
+    calcinfo = datastructures.CalcInfo()
+    calcinfo.remote_symlink_list = []
+    make_remote_path_triplet_from_models = functools.partial(
+        calcutils.make_remote_path_triplet, nml_data=model_namelist_data
+    )
+    if "dynamics_grid_file" in inputs:
+        calcinfo.remote_symlink_list.append(
+            make_remote_path_triplet_from_models(
+                inputs["dynamics_grid_file"],
+                lookup_path="grid_nml.dynamics_grid_filename",
             )
-        if "ecrad_data" in self.inputs:
-            calcinfo.remote_symlink_list.append(
-                make_remote_path_triplet_from_models(
-                    self.inputs.ecrad_data,
-                    lookup_path="radiation_nml.ecrad_data_path",
-                )
+        )
+    if "ecrad_data" in inputs:
+        calcinfo.remote_symlink_list.append(
+            make_remote_path_triplet_from_models(
+                inputs["ecrad_data"],
+                lookup_path="radiation_nml.ecrad_data_path",
             )
-        if "rrtmg_sw" in self.inputs:
-            calcinfo.remote_symlink_list.append(
-                (
-                    self.inputs.code.computer.uuid,
-                    self.inputs.rrtmg_sw.get_remote_path(),
-                    "rrtmg_sw.nc",
-                )
+        )
+    if "rrtmg_sw" in inputs:
+        calcinfo.remote_symlink_list.append(
+            (
+                computer_uuid,
+                inputs["rrtmg_sw"].get_remote_path(),
+                "rrtmg_sw.nc",
             )
-        if "rrtmg_lw" in self.inputs:
-            calcinfo.remote_symlink_list.append(
-                (
-                    self.inputs.code.computer.uuid,
-                    self.inputs.rrtmg_lw.get_remote_path(),
-                    "rrtmg_lw.nc",
-                )
+        )
+    if "rrtmg_lw" in inputs:
+        calcinfo.remote_symlink_list.append(
+            (
+                computer_uuid,
+                inputs["rrtmg_lw"].get_remote_path(),
+                "rrtmg_lw.nc",
+            )
+        )
+    model_names = calcutils.read_model_names(master_namelist_data)
+    if "restart_file" in inputs:
+        calcinfo.remote_symlink_list.append(
+            (
+                computer_uuid,
+                inputs["restart_file"].get_remote_path(),
+                modelnml.read_latest_restart_file_link_name(
+                    calcutils.restart_model_nml(inputs, model_names[0]), model_names[0]
+                ),
+            )
+        )
+    for model_name, restart_file in inputs.get("restart_files", {}).items():
+        calcinfo.remote_symlink_list.append(
+            (
+                computer_uuid,
+                restart_file.get_remote_path(),
+                modelnml.read_latest_restart_file_link_name(
+                    calcutils.restart_model_nml(inputs, model_name), model_name
+                ),
             )
-        if "restart_file" in self.inputs:
+        )
+    if "link_paths" in inputs:
+        for remotedata in inputs["link_paths"].values():
             calcinfo.remote_symlink_list.append(
-                (
-                    self.inputs.code.computer.uuid,
-                    self.inputs.restart_file.get_remote_path(),
-                    modelnml.read_latest_restart_file_link_name(model_namelist_data),
-                )
+                calcutils.make_remote_path_triplet(remotedata),
             )
-        if "link_paths" in self.inputs:
-            for remotedata in self.inputs.link_paths.values():
+    if "link_dir_contents" in inputs:
+        for remotedata in inputs["link_dir_contents"].values():
+            with accounting.measure("listdir"), tracing.span("listdir", path=remotedata.get_remote_path()):
+                subpaths = remotedata.listdir()
+            for subpath in subpaths:
                 calcinfo.remote_symlink_list.append(
-                    calcutils.make_remote_path_triplet(remotedata),
-                )
-        if "link_dir_contents" in self.inputs:
-            for remotedata in self.inputs.link_dir_contents.values():
-                for subpath in remotedata.listdir():
-                    calcinfo.remote_symlink_list.append(
-                        (
-                            remotedata.computer.uuid,
-                            str(pathlib.Path(remotedata.get_remote_path()) / subpath),
-                            subpath,
-                        )
+                    (
+                        remotedata.computer.uuid,
+                        str(pathlib.Path(remotedata.get_remote_path()) / subpath),
+                        subpath,
                     )
-
-        calcinfo.remote_copy_list = []
-        if "cloud_opt_props" in self.inputs:
-            calcinfo.remote_copy_list.append(
-                (
-                    self.inputs.code.computer.uuid,
-                    self.inputs.cloud_opt_props.get_remote_path(),
-                    "ECHAM6_CldOptProps.nc",
                 )
+
+    calcinfo.remote_copy_list = []
+    if "cloud_opt_props" in inputs:
+        calcinfo.remote_copy_list.append(
+            (
+                computer_uuid,
+                inputs["cloud_opt_props"].get_remote_path(),
+                "ECHAM6_CldOptProps.nc",
             )
-        if "dmin_wetgrowth_lookup" in self.inputs:
-            calcinfo.remote_copy_list.append(
-                (
-                    self.inputs.code.computer.uuid,
-                    self.inputs.dmin_wetgrowth_lookup.get_remote_path(),
-                    "dmin_wetgrowth_lookup.nc",
-                )
+        )
+    if "dmin_wetgrowth_lookup" in inputs:
+        calcinfo.remote_copy_list.append(
+            (
+                computer_uuid,
+                inputs["dmin_wetgrowth_lookup"].get_remote_path(),
+                "dmin_wetgrowth_lookup.nc",
             )
+        )
 
-        calcinfo.local_copy_list = [
-            (
-                self.inputs.master_namelist.uuid,
-                self.inputs.master_namelist.filename,
-                "icon_master.namelist",
-            ),
-        ]
+    calcinfo.local_copy_list = [
+        (
+            inputs["master_namelist"].uuid,
+            inputs["master_namelist"].filename,
+            "icon_master.namelist",
+        ),
+    ]
 
-        if "model_namelist" in self.inputs:
-            self.logger.warning("The 'model_namelist' input is deprecated, use 'models.<model-name>' instead!")
-            calcinfo.local_copy_list.append(
-                (
-                    self.inputs.model_namelist.uuid,
-                    self.inputs.model_namelist.filename,
-                    master_namelist_data["master_model_nml"]["model_namelist_filename"].strip(),
-                )
+    if "model_namelist" in inputs:
+        process.logger.warning("The 'model_namelist' input is deprecated, use 'models.<model-name>' instead!")
+        calcinfo.local_copy_list.append(
+            (
+                inputs["model_namelist"].uuid,
+                inputs["model_namelist"].filename,
+                master_namelist_data["master_model_nml"]["model_namelist_filename"].strip(),
             )
+        )
 
-        if "wrapper_script" in self.inputs:
-            calcinfo.local_copy_list.append(
-                (
-                    self.inputs.wrapper_script.uuid,
-                    self.inputs.wrapper_script.filename,
-                    "run_icon.sh",
-                )
-            )
+    for model, nmlpath in masternml.iter_model_name_filepath(master_namelist_data):
+        actions = calcutils.make_model_actions(model, nmlpath, inputs.get("models", ports.PortNamespace()), process)
+        for path in actions.create_dirs:
+            folder.get_subfolder(in_run_dir(path, run_dir), create=True)
+        calcinfo.local_copy_list += actions.local_copy_list
+        calcinfo.remote_copy_list += actions.remote_copy_list
 
-        if "setup_env" in self.inputs:
-            calcinfo.local_copy_list.append(
-                (
-                    self.inputs.setup_env.uuid,
-                    self.inputs.setup_env.filename,
-                    "setup_env.sh",
-                )
-            )
-            calcinfo.prepend_text = "\n".join(
-                [
-                    *calcinfo.get("prepend_text", "").splitlines(),
-                    "source ./setup_env.sh",
-                ]
+    calcinfo.remote_symlink_list = [relocate(triplet) for triplet in calcinfo.remote_symlink_list]
+    calcinfo.remote_copy_list = [relocate(triplet) for triplet in calcinfo.remote_copy_list]
+    calcinfo.local_copy_list = [relocate(triplet) for triplet in calcinfo.local_copy_list]
+
+    retrieve_names = [
+        "finish.status",
+        "nml.atmo.log",
+        "output_schedule.txt",
+    ]
+    # aiida-core annotates the depth of a retrieve triplet as str, it is an int
+    retrieve_list: list[typing.Any] = list(retrieve_names)
+    if run_dir:
+        # keep the run dir in the retrieved folder, so that files of different runs do not clash
+        depth = len(pathlib.PurePosixPath(run_dir).parts) + 1
+        retrieve_list = [(in_run_dir(name, run_dir), ".", depth) for name in retrieve_names]
+    calcinfo.retrieve_list = retrieve_list
+    return calcinfo
+
+
+def add_job_scripts(inputs: calcutils.ReadMapProtocol, calcinfo: datastructures.CalcInfo) -> None:
+    """Add the job level 'wrapper_script' and 'setup_env' inputs to the calcinfo."""
+    local_copy_list: list[tuple[str, str, str]] = calcinfo.local_copy_list or []
+    if "wrapper_script" in inputs:
+        local_copy_list.append(
+            (
+                inputs["wrapper_script"].uuid,
+                inputs["wrapper_script"].filename,
+                "run_icon.sh",
             )
+        )
 
-        for model, nmlpath in masternml.iter_model_name_filepath(master_namelist_data):
-            actions = calcutils.make_model_actions(
-                model, nmlpath, self.inputs.get("models", ports.PortNamespace()), self
+    if "setup_env" in inputs:
+        local_copy_list.append(
+            (
+                inputs["setup_env"].uuid,
+                inputs["setup_env"].filename,
+                "setup_env.sh",
             )
-            for path in actions.create_dirs:
-                folder.get_subfolder(path, create=True)
-            calcinfo.local_copy_list += actions.local_copy_list
-            calcinfo.remote_copy_list += actions.remote_copy_list
-        calcinfo.retrieve_list = [
-            "finish.status",
-            "nml.atmo.log",
-            "output_schedule.txt",
+        )
+        calcinfo.prepend_text = "\n".join(
+            [
+                *calcinfo.get("prepend_text", "").splitlines(),
+                "source ./setup_env.sh",
+            ]
+        )
+    calcinfo.local_copy_list = local_copy_list
+
+
+def add_striping(
+    inputs: calcutils.ReadMapProtocol,
+    calcinfo: datastructures.CalcInfo,
+    policy: striping.StripingPolicy,
+    staged_outputs: typing.Iterable[str] = (),
+) -> None:
+    """
+    Stripe the output stream directories and the work dir (for the restart files) before ICON starts.
+
+    File sizes are estimated from the model namelists and the number of cells read from the grid file name,
+    output directories staged to node-local storage are left out.
+    """
+    model_nml = calcutils.collect_model_nml(inputs)
+    num_cells = (
+        modelnml.read_grid_num_cells(pathlib.PurePosixPath(inputs["dynamics_grid_file"].get_remote_path()).name)
+        if "dynamics_grid_file" in inputs
+        else None
+    )
+    skipped = {".", *(posixpath.normpath(path) for path in staged_outputs)}
+    expected_sizes: dict[str, int | None] = {
+        posixpath.normpath(str(info.path)): None for info in modelnml.read_output_stream_infos(model_nml)
+    }
+    if num_cells is not None:
+        expected_sizes.update(modelnml.estimate_output_file_sizes(model_nml, num_cells=num_cells))
+    expected_sizes = {path: size for path, size in expected_sizes.items() if posixpath.normpath(path) not in skipped}
+    expected_sizes[striping.RESTART_LOCATION] = (
+        modelnml.estimate_restart_file_size(model_nml, num_cells=num_cells) if num_cells is not None else None
+    )
+    calcinfo.prepend_text = "\n".join(
+        [*calcinfo.get("prepend_text", "").splitlines(), striping.striping_prepend_text(policy, expected_sizes)]
+    )
+
+
+def add_staging(
+    inputs: calcutils.ReadMapProtocol,
+    calcinfo: datastructures.CalcInfo,
+    folder: folders.Folder,
+    policy: staging.StagingPolicy,
+) -> None:
+    """
+    Stage inputs to node-local storage at job start and output streams back at job end.
+
+    The links in the work dir are pointed to the local copies (and output stream directories replaced by links
+    to local directories until the end of the job), so ICON and the parser see the usual layout.
+    Output streams staged to node-local storage are lost if the job does not reach its end (wall time, node failure).
+    """
+    sources: set[str] = set()
+    for name in policy.inputs:
+        if name not in inputs:
+            continue
+        nodes = inputs[name].values() if name == "restart_files" else [inputs[name]]
+        sources.update(node.get_remote_path() for node in nodes)
+    staged_inputs = [
+        (source, link_name) for _, source, link_name in calcinfo.remote_symlink_list or [] if source in sources
+    ]
+
+    stream_dirs = {
+        posixpath.normpath(str(info.path))
+        for info in modelnml.read_output_stream_infos(calcutils.collect_model_nml(inputs))
+    }
+    output_dirs = []
+    for path in policy.output_streams:
+        output_dir = posixpath.normpath(path)
+        if output_dir not in stream_dirs or output_dir == ".":
+            msg = f"Can not stage '{path}', it is not an output stream directory (available: {', '.join(sorted(stream_dirs - {'.'}))})."
+            raise aiidaxc.InputValidationError(msg)
+        output_dirs.append(output_dir)
+
+    with folder.open(staging.STAGE_SCRIPT_NAME, "w") as script:
+        script.write(staging.render_stage_script(staged_inputs=staged_inputs, output_dirs=output_dirs, policy=policy))
+    calcinfo.prepend_text = "\n".join(
+        [
+            *calcinfo.get("prepend_text", "").splitlines(),
+            staging.stage_prepend_text(staged_inputs=staged_inputs, output_dirs=output_dirs, policy=policy),
         ]
-        return calcinfo
+    )
+    calcinfo.append_text = "\n".join(
+        [
+            *calcinfo.get("append_text", "").splitlines(),
+            staging.stage_append_text(output_dirs=output_dirs, policy=policy),
+        ]
+    )
 
 
 class FinishStatus(enum.Enum):
@@ -297,53 +613,134 @@ class RestartResult:
     status: RestartStatus
     all_restarts: dict[str, orm.RemoteData] = dataclasses.field(default_factory=dict)
     latest_restart: orm.RemoteData | None = None
+    latest_model_restarts: dict[str, orm.RemoteData] = dataclasses.field(default_factory=dict)
 
 
 class IconParser(parser.Parser):
     """Parser for raw Icon calculations."""
 
     def parse(self, **kwargs):  # noqa: ARG002  # kwargs must be there for superclass compatibility
-        finish_status = self.parse_finish_status()
+        with tracing.recording() as spans:
+            with tracing.span("parse"):
+                exit_code = self.parse_steps()
+        if tracing_option := self.node.get_option("tracing"):
+            tracing.export_calculation_trace(
+                self.node, tracing.TracingConfig.from_option(tracing_option), parse_spans=spans
+            )
+        return exit_code
+
+    def parse_steps(self) -> engine.ExitCode:
+        stdout_name = self.node.get_option("scheduler_stdout") or "_scheduler-stdout.txt"
+        with accounting.recording() as operations:
+            outputs, exit_code = self.parse_run(self.node.get_builder_restart(), stdout_name=stdout_name)
+        operations.store(self.node, "parse")
+        for label, value in outputs.items():
+            self.out(label, value)
+        if "timer_report" in outputs:
+            performance.record_performance(self.node, outputs["timer_report"].get_dict())
+        with tracing.span("read_efficiency"):
+            efficiency_report = efficiency.read_efficiency(self.node)
+        if efficiency_report is not None:
+            self.out("efficiency_report", orm.Dict(efficiency_report.to_dict()))
+        if exit_code.status or monitors.STOPPED_EXTRAS_KEY in self.node.base.extras.keys():
+            with tracing.span("parse_failure"):
+                return self.parse_failure(stdout_name=stdout_name) or exit_code
+        return exit_code
+
+    def parse_failure(self, *, stdout_name: str) -> engine.ExitCode | None:
+        """
+        Find out why a run failed, from known failure signatures in the scheduler stderr and the ICON log.
+
+        A job stopped early by a monitor (see 'aiida_icon.monitors.monitor_early_kill') is reported as such,
+        otherwise a failure already detected by the scheduler plugin (from the job accounting) takes precedence.
+        """
+        if stopped := self.node.base.extras.get(monitors.STOPPED_EXTRAS_KEY, None):
+            return self.exit_codes[stopped["exit_code_label"]].format(message=stopped["message"])
+        if self.node.exit_status:
+            return engine.ExitCode(self.node.exit_status, self.node.exit_message)
+        stderr_name = self.node.get_option("scheduler_stderr") or "_scheduler-stderr.txt"
+        stderr = self.read_retrieved_lines(stderr_name)
+        stdout = self.read_retrieved_lines(stdout_name)
+        detected = failures.detect_failure(stderr=stderr, stdout=stdout)
+        if detected is None:
+            return None
+        self.logger.warning(f"Detected failure: {detected.line}")
+        if detected.signature.exit_code_label == "ERROR_ICON_ABORTED":
+            return self.exit_codes.ERROR_ICON_ABORTED.format(message=failures.read_abort_message([*stderr, *stdout]))
+        return self.exit_codes[detected.signature.exit_code_label]
+
+    def read_retrieved_lines(self, name: str) -> list[str]:
+        """Lines of a retrieved file (relative to the work dir), empty if it was not retrieved."""
+        file_dir, file_name = posixpath.split(name)
+        if file_name not in self.retrieved.list_object_names(file_dir or None):
+            return []
+        try:
+            with self.retrieved.open(name, "r") as retrieved_file:
+                return retrieved_file.readlines()
+        except OSError as err:
+            self.logger.warning(f"Could not read '{name}': {err}")
+            return []
+
+    def parse_run(
+        self, inputs: calcutils.ReadMapProtocol, *, run_dir: str = "", stdout_name: str = ""
+    ) -> tuple[dict[str, typing.Any], engine.ExitCode]:
+        """
+        Parse the outputs of one ICON experiment, which was run in 'run_dir' (relative to the work dir).
+
+        'stdout_name' is the retrieved file ICON's standard output was written to, relative to the work dir.
+        """
+        outputs: dict[str, typing.Any] = {}
+        with tracing.span("parse_finish_status", run_dir=run_dir):
+            finish_status = self.parse_finish_status(run_dir=run_dir)
         if finish_status.message:
-            self.out("finish_status", finish_status.message)
+            outputs["finish_status"] = finish_status.message
+
+        with tracing.span("parse_timer_report", run_dir=run_dir):
+            timer_report = self.parse_timer_report(stdout_name) if stdout_name else {}
+        if timer_report:
+            outputs["timer_report"] = orm.Dict(timer_report)
 
-        restart_indicated = finish_status is FinishStatus.RESTART or masternml.read_lrestart_write_last(
-            self.node.inputs.master_namelist
+        restart_indicated = finish_status.status is FinishStatus.RESTART or masternml.read_lrestart_write_last(
+            inputs["master_namelist"]
         )
-        restarts = self.parse_restart_files(restart_indicated=restart_indicated)
+        with tracing.span("parse_restart_files", run_dir=run_dir):
+            restarts = self.parse_restart_files(restart_indicated=restart_indicated, inputs=inputs, run_dir=run_dir)
         if restarts.all_restarts:
-            self.out("all_restart_files", restarts.all_restarts)
+            outputs["all_restart_files"] = restarts.all_restarts
         if restarts.latest_restart:
-            self.out("latest_restart_file", restarts.latest_restart)
+            outputs["latest_restart_file"] = restarts.latest_restart
+        if restarts.latest_model_restarts:
+            outputs["latest_restart_files"] = restarts.latest_model_restarts
 
         # Parse output streams
         try:
-            output_streams = self.parse_output_streams()
+            with tracing.span("parse_output_streams", run_dir=run_dir):
+                output_streams = self.parse_output_streams(inputs=inputs, run_dir=run_dir)
             if output_streams:
-                self.out("output_streams", output_streams)
+                outputs["output_streams"] = output_streams
         except OSError:
-            return self.exit_codes.PARTIALLY_PARSED
+            return outputs, self.exit_codes.PARTIALLY_PARSED
 
         match finish_status.status:
             case FinishStatus.OK:
                 pass
             case FinishStatus.RESTART:
                 if restarts.status is not RestartStatus.OK:
-                    return self.exit_codes.PARTIALLY_PARSED
+                    return outputs, self.exit_codes.PARTIALLY_PARSED
             case FinishStatus.UNEXPECTED:
-                return self.exit_codes.PARTIALLY_PARSED
+                return outputs, self.exit_codes.PARTIALLY_PARSED
             case FinishStatus.ERR_READING_STATUS:
-                return self.exit_codes.ERROR_READING_STATUS_FILE
+                return outputs, self.exit_codes.ERROR_READING_STATUS_FILE
             case FinishStatus.ERR_MISSING_STATUS:
-                return self.exit_codes.ERROR_MISSING_OUTPUT_FILES
+                return outputs, self.exit_codes.ERROR_MISSING_OUTPUT_FILES
 
-        return engine.ExitCode(0)
+        return outputs, engine.ExitCode(0)
 
-    def parse_finish_status(self) -> FinishStatusResult:
+    def parse_finish_status(self, *, run_dir: str = "") -> FinishStatusResult:
         result = FinishStatusResult(status=FinishStatus.ERR_MISSING_STATUS, message=None)
-        if "finish.status" in self.retrieved.list_object_names():
+        if "finish.status" in self.retrieved.list_object_names(run_dir or None):
             try:
-                with self.retrieved.open("finish.status", "r") as status_file:
+                with self.retrieved.open(in_run_dir("finish.status", run_dir), "r") as status_file:
                     out_status = status_file.read().strip()
                     result.message = orm.Str(out_status)
                     match out_status:
@@ -363,45 +760,70 @@ class IconParser(parser.Parser):
 
         return result
 
-    def parse_restart_files(self, *, restart_indicated: bool) -> RestartResult:
+    def parse_timer_report(self, stdout_name: str) -> dict[str, dict[str, float]]:
+        """Parse the timer report from the retrieved ICON log, empty if there is none."""
+        log_dir, log_name = posixpath.split(stdout_name)
+        if log_name not in self.retrieved.list_object_names(log_dir or None):
+            self.logger.info(f"The ICON log '{stdout_name}' was not retrieved, no timers parsed.")
+            return {}
+        try:
+            with self.retrieved.open(stdout_name, "r") as log_file:
+                return timers.parse_timer_report(log_file)
+        except OSError as err:
+            self.logger.warning(f"Could not read timers from the ICON log '{stdout_name}': {err}")
+            return {}
+
+    def parse_restart_files(
+        self,
+        *,
+        restart_indicated: bool,
+        inputs: calcutils.ReadMapProtocol | None = None,
+        run_dir: str = "",
+    ) -> RestartResult:
         remote_folder = self.node.outputs.remote_folder
-        remote_path = pathlib.Path(remote_folder.get_remote_path())
+        remote_path = pathlib.Path(remote_folder.get_remote_path()) / run_dir
 
         result = RestartResult(status=RestartStatus.MISSING)
         try:
-            _ = remote_folder.computer.get_authinfo(user=orm.User.collection.get_default())
+            with accounting.measure("authinfo"):
+                _ = remote_folder.computer.get_authinfo(user=orm.User.collection.get_default())
         except aiidaxc.NotExistent:
             self.logger.info("Can not parse restart file names: not possible to authenticate to the computer")
             return result
 
-        files = remote_folder.listdir()
-        all_restarts_pattern = ""
-        latest_restart_name = ""
-        try:
-            modelnml_data = calcutils.collect_model_nml(self.node.get_builder_restart())
-            all_restarts_pattern = modelnml.read_restart_file_pattern(modelnml_data)
-            latest_restart_name = modelnml.read_latest_restart_file_link_name(modelnml_data)
-        except exceptions.SinglefileRestartNotImplementedError:
-            self.logger.info("Can not parse restart file names, singlefile mode is not supported.")
-            if restart_indicated:
-                result.status = RestartStatus.ERROR
-        except exceptions.RemoteModelNamelistInaccessibleError:
-            self.logger.warning("Could not parse restart file names from remote model namelists.")
-
-        for file_name in files:
-            if restart_match := re.match(all_restarts_pattern, file_name):
-                result.all_restarts[f"restart_{restart_match['timestamp']}"] = orm.RemoteData(
-                    computer=self.node.computer,
-                    remote_path=str(remote_path / file_name),
-                )
-            if file_name == latest_restart_name:
-                result.latest_restart = orm.RemoteData(
-                    computer=self.node.computer,
-                    remote_path=str(remote_path / file_name),
-                )
+        with accounting.measure("listdir"):
+            files = remote_folder.listdir(run_dir or ".")
+        inputs = self.node.get_builder_restart() if inputs is None else inputs
+        model_names = calcutils.read_model_names(inputs["master_namelist"])
+        found_models = set()
+        for model_name in model_names:
+            model_nml = calcutils.restart_model_nml(inputs, model_name)
+            all_restarts_pattern = modelnml.read_restart_file_pattern(model_nml, model_name)
+            latest_restart_name = modelnml.read_latest_restart_file_link_name(model_nml, model_name)
+            # keys of the primary model are kept short for backwards compatibility
+            key_prefix = "restart" if model_name == model_names[0] else f"restart_{model_name}"
+            for file_name in sorted(files):
+                if (restart_match := re.fullmatch(all_restarts_pattern, file_name)) and (
+                    key := f"{key_prefix}_{restart_match['timestamp']}"
+                ) not in result.all_restarts:
+                    result.all_restarts[key] = orm.RemoteData(
+                        computer=self.node.computer,
+                        remote_path=str(remote_path / file_name),
+                    )
+                if file_name == latest_restart_name:
+                    found_models.add(model_name)
+                    latest = orm.RemoteData(computer=self.node.computer, remote_path=str(remote_path / file_name))
+                    if model_name == model_names[0]:
+                        result.latest_restart = latest
+                    else:
+                        result.latest_model_restarts[model_name] = latest
 
-        if result.all_restarts and result.latest_restart:
+        if result.all_restarts and found_models == set(model_names):
             result.status = RestartStatus.OK
+        elif restart_indicated:
+            self.logger.warning(
+                f"Could not find the latest restart files for models {sorted(set(model_names) - found_models)}."
+            )
         else:
             self.logger.info("Could not find a valid set of restart files.")
 
@@ -430,16 +852,18 @@ class IconParser(parser.Parser):
 
         return stream_key
 
-    def parse_output_streams(self) -> dict[str, orm.RemoteData]:
+    def parse_output_streams(
+        self, *, inputs: calcutils.ReadMapProtocol | None = None, run_dir: str = ""
+    ) -> dict[str, orm.RemoteData]:
         """Parse output streams from the model namelist and create RemoteData nodes."""
         output_streams = {}
 
         # Get the remote folder where outputs are stored
         remote_folder = typing.cast("orm.RemoteData", self.node.outputs.remote_folder)
-        remote_base_path = pathlib.Path(remote_folder.get_remote_path())
+        remote_base_path = pathlib.Path(remote_folder.get_remote_path()) / run_dir
 
         # Create RemoteData nodes for each output directory
-        modelnml_data = calcutils.collect_model_nml(self.node.get_builder_restart())
+        modelnml_data = calcutils.collect_model_nml(self.node.get_builder_restart() if inputs is None else inputs)
         for stream_info in modelnml.read_output_stream_infos(modelnml_data):
             stream_key = self._create_stream_key(stream_info)
             full_output_path = remote_base_path / stream_info.path
@@ -452,3 +876,187 @@ class IconParser(parser.Parser):
             self.logger.info("Registered output stream '%s' -> %s", stream_key, full_output_path)
 
         return output_streams
+
+
+PACKED_LAUNCHER_NAME = "run_packed.sh"
+MEMBER_STDOUT_NAME = "icon.log"
+
+PACKED_LAUNCHER = """\
+#!/bin/bash
+# Launch one member of a packed aiida-icon job from inside the member's run directory.
+# Usage: run_packed.sh <icon executable> <run directory>
+executable="$1"
+cd "$2" || exit 1
+if [ -f ../run_icon.sh ]; then
+    exec ../run_icon.sh "$executable"
+fi
+exec "$executable"
+"""
+
+
+def validate_packed_inputs(inputs: dict[str, typing.Any], _: typing.Any) -> str | None:
+    """Make sure every member can be run and that the job is set up to launch members separately."""
+    members = inputs.get("members", {})
+    if not members:
+        return "At least one member is required."
+    for name, member in members.items():
+        if not isinstance(member, dict) or not isinstance(member.get("master_namelist"), orm.SinglefileData):
+            return f"Member '{name}' needs at least a 'master_namelist' input."
+    mpirun_extra_params = inputs.get("metadata", {}).get("options", {}).get("mpirun_extra_params", [])
+    if f"./{PACKED_LAUNCHER_NAME}" not in mpirun_extra_params:
+        return (
+            f"The 'mpirun_extra_params' option must launch the members through './{PACKED_LAUNCHER_NAME}', "
+            "use 'IconPackedCalculationBuilder.set_packing' to set up the job."
+        )
+    code = inputs.get("code")
+    if code is not None and code.computer and "{tot_num_mpiprocs}" in " ".join(code.computer.get_mpirun_command()):
+        return (
+            f"The mpirun command of computer '{code.computer.label}' launches all processes of the job, "
+            "members set their own number of tasks: configure the computer with a plain 'srun' as mpirun command."
+        )
+    return None
+
+
+class IconPackedCalculation(engine.CalcJob):
+    """
+    AiiDA calculation to run several small ICON experiments ("members") within one job allocation.
+
+    Each member runs as a concurrent job step in its own run directory (named after the member), the outputs
+    are parsed per member into the 'members.<member-name>' output namespace.
+    """
+
+    @classmethod
+    def get_builder(cls) -> process_builder.ProcessBuilder:
+        return builder.IconPackedCalculationBuilder(cls)
+
+    @classmethod
+    def define(cls, spec: calcjob.CalcJobProcessSpec) -> None:  # type: ignore[override] # forced by aiida-core
+        super().define(spec)
+        spec.input_namespace(
+            "members",
+            valid_type=(orm.SinglefileData, orm.RemoteData),
+            dynamic=True,
+            help=(
+                "One namespace per member, containing the same inputs as an IconCalculation "
+                "(except for 'code', 'metadata', 'wrapper_script' and 'setup_env', which are shared)."
+            ),
+        )
+        spec.input("wrapper_script", valid_type=orm.SinglefileData, required=False)
+        spec.input(
+            "setup_env",
+            valid_type=orm.SinglefileData,
+            required=False,
+            help="A file that is sourced before the execution of ICON and after environment variables passed through the 'metadata' input are set.",
+        )
+        spec.inputs.validator = validate_packed_inputs  # type: ignore[assignment] # aiida-core types are too strict
+        spec.input(
+            "metadata.options.tracing",
+            valid_type=dict,
+            required=False,
+            validator=tracing.validate_tracing_option,
+            help=(
+                "Export the lifecycle of the calculation as an OpenTelemetry trace once it is parsed, "
+                "see 'aiida_icon.tracing.TracingConfig' for the settings."
+            ),
+        )
+        spec.output_namespace(
+            "members",
+            dynamic=True,
+            help="Outputs of each member, named like the outputs of an IconCalculation.",
+        )
+        options = spec.inputs["metadata"]["options"]  # type: ignore[index] # guaranteed correct by aiida-core
+        options["withmpi"].default = True  # type: ignore[index] # guaranteed correct by aiida-core
+        options["parser_name"].default = "icon.packed"  # type: ignore[index] # guaranteed correct by aiida-core
+        spec.exit_code(
+            300,
+            "ERROR_MISSING_OUTPUT_FILES",
+            message="ICON did not create a restart file or directory for at least one member.",
+        )
+        spec.exit_code(
+            301,
+            "ERROR_READING_STATUS_FILE",
+            message="Could not read the finish.status file of at least one member.",
+        )
+        spec.exit_code(
+            304,
+            "PARTIALLY_PARSED",
+            message="Some outputs might be missing, check the log for explanations.",
+        )
+
+    def prepare_for_submission(self, folder: folders.Folder) -> datastructures.CalcInfo:
+        with tracing.recording() as spans:
+            with tracing.span("prepare_for_submission"):
+                calcinfo = self.prepare_steps(folder)
+        if self.inputs.metadata.options.get("tracing") is not None:
+            tracing.store_spans(self.node, spans)
+        return calcinfo
+
+    def prepare_steps(self, folder: folders.Folder) -> datastructures.CalcInfo:
+        with accounting.recording() as operations:
+            member_calcinfos = {}
+            for name, member_inputs in self.inputs.members.items():
+                with tracing.span("prepare_icon_run", member=name):
+                    member_calcinfos[name] = prepare_icon_run(self, member_inputs, folder, run_dir=name)
+        operations.store(self.node, "prepare")
+
+        codes_info = []
+        local_copy_list: list[tuple[str, str, str]] = []
+        remote_copy_list: list[tuple[str, str, str]] = []
+        remote_symlink_list: list[tuple[str, str, str]] = []
+        # aiida-core annotates the depth of a retrieve triplet as str, it is an int
+        retrieve_list: list[typing.Any] = []
+        for name, member_calcinfo in member_calcinfos.items():
+            local_copy_list += member_calcinfo.local_copy_list or []
+            remote_copy_list += member_calcinfo.remote_copy_list or []
+            remote_symlink_list += member_calcinfo.remote_symlink_list or []
+            retrieve_list += member_calcinfo.retrieve_list or []
+
+            codeinfo = datastructures.CodeInfo()
+            codeinfo.code_uuid = self.inputs.code.uuid
+            codeinfo.cmdline_params = [name]
+            codeinfo.stdout_name = in_run_dir(MEMBER_STDOUT_NAME, name)
+            codes_info.append(codeinfo)
+            retrieve_list.append((codeinfo.stdout_name, ".", 2))
+
+        calcinfo = datastructures.CalcInfo()
+        calcinfo.codes_info = codes_info
+        calcinfo.codes_run_mode = datastructures.CodeRunMode.PARALLEL
+        calcinfo.local_copy_list = local_copy_list
+        calcinfo.remote_copy_list = remote_copy_list
+        calcinfo.remote_symlink_list = remote_symlink_list
+        calcinfo.retrieve_list = retrieve_list
+
+        with folder.open(PACKED_LAUNCHER_NAME, "w") as launcher:
+            launcher.write(PACKED_LAUNCHER)
+        executables = [PACKED_LAUNCHER_NAME]
+        if "wrapper_script" in self.inputs:
+            executables.append("run_icon.sh")
+        calcinfo.prepend_text = f"chmod 755 {' '.join(executables)}"
+
+        with tracing.span("add_job_scripts"):
+            add_job_scripts(self.inputs, calcinfo)
+        return calcinfo
+
+
+class IconPackedParser(IconParser):
+    """Parser for packed Icon calculations, parses each member like a raw Icon calculation."""
+
+    def parse_steps(self) -> engine.ExitCode:
+        exit_code = engine.ExitCode(0)
+        member_outputs = {}
+        members = self.node.get_builder_restart().members  # type: ignore[attr-defined] # dynamic port namespace
+        for name, member_inputs in members.items():
+            with accounting.recording() as operations, tracing.span("parse_member", member=name):
+                outputs, member_exit_code = self.parse_run(
+                    member_inputs, run_dir=name, stdout_name=in_run_dir(MEMBER_STDOUT_NAME, name)
+                )
+            operations.store(self.node, "parse")
+            if outputs:
+                member_outputs[name] = outputs
+            if member_exit_code.status:
+                self.logger.warning(f"Member '{name}' finished with exit code {member_exit_code.status}.")
+                if not exit_code.status:
+                    exit_code = member_exit_code
+        if member_outputs:
+            self.out("members", member_outputs)  # type: ignore[arg-type] # outputs of a namespace can be nested
+        return exit_code
@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import dataclasses
 import pathlib
+import shlex
 import tempfile
 import typing
+from collections.abc import Mapping
 
 import f90nml
 from aiida import orm
@@ -11,7 +13,11 @@ from aiida.common import exceptions as aiidaxc
 from aiida.common import log as aiidalog
 from aiida.transports import transport
 
-from aiida_icon import exceptions
+from aiida_icon import accounting, exceptions
+from aiida_icon.iconutils import masternml
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
 
 KeyT_contra = typing.TypeVar("KeyT_contra", contravariant=True)
 ValT = typing.TypeVar("ValT")
@@ -43,7 +49,8 @@ def collect_model_nml(namespace: ReadMapProtocol, *, download: bool = False) ->
             case orm.RemoteData() if download and nml.computer:
                 try:
                     with tempfile.NamedTemporaryFile() as tf:
-                        result = nml.computer.get_transport().getfile(nml.get_remote_path(), tf.name)
+                        with accounting.measure("getfile"), nml.computer.get_transport() as remote:
+                            remote.getfile(nml.get_remote_path(), tf.name)
                         result = f90nml.reads("\n".join([str(result), pathlib.Path(tf.name).read_text()]))
                 except (aiidaxc.TransportTaskException, transport.TransportInternalError) as err:
                     raise exceptions.RemoteModelNamelistInaccessibleError from err
@@ -55,6 +62,43 @@ def collect_model_nml(namespace: ReadMapProtocol, *, download: bool = False) ->
     return result
 
 
+def read_model_names(master_nml: orm.SinglefileData | f90nml.Namelist) -> list[str]:
+    """
+    Names of all models in the master namelist, in order, the first one being the primary model.
+
+    Examples:
+        >>> read_model_names(
+        ...     f90nml.reads("&master_model_nml\\nmodel_name='atm'\\n/\\n&master_model_nml\\nmodel_name='oce'\\n/")
+        ... )
+        ['atm', 'oce']
+        >>> read_model_names(f90nml.reads("&master_nml\\n/"))
+        ['atm']
+    """
+    names = [model["model_name"] for model in masternml.iter_model_namelists(master_nml) if "model_name" in model]
+    return names or ["atm"]
+
+
+#: Assumed for restart file names when a model namelist is not available locally.
+DEFAULT_RESTART_NML = f90nml.Namelist({"io_nml": f90nml.Namelist({"restart_write_mode": "joint procs multifile"})})
+
+
+def restart_model_nml(namespace: ReadMapProtocol, model_name: str) -> f90nml.Namelist:
+    """
+    Model namelist data to derive a model's restart file names from.
+
+    The legacy 'model_namelist' input stands for the primary model. If the namelist is only available remotely,
+    multifile restarts are assumed.
+    """
+    models = namespace.get("models", {})
+    match models.get(model_name):
+        case orm.SinglefileData() as model_nml:
+            return f90nml.reads(model_nml.get_content(mode="r"))
+        case None if "model_namelist" in namespace:
+            return f90nml.reads(typing.cast("orm.SinglefileData", namespace["model_namelist"]).get_content(mode="r"))
+        case _:
+            return DEFAULT_RESTART_NML
+
+
 def make_remote_path_triplet(
     remote_path: orm.RemoteData, *, lookup_path: str | None = None, nml_data: f90nml.Namelist | None = None
 ) -> tuple[str, str, str]:
@@ -158,3 +202,123 @@ def make_model_actions(
         msg = f"Missing input for model '{model_name}'."
         raise aiidaxc.InputValidationError(msg)
     return result
+
+
+#: Inputs of an IconCalculation, which point to restart files or multifile restart directories.
+RESTART_INPUTS = ("restart_file", "restart_files")
+
+
+@dataclasses.dataclass(frozen=True)
+class RemoteInput:
+    """A remote input, which ends up in the remote copy or symlink list, labelled by its (dot-separated) port."""
+
+    label: str
+    computer: orm.Computer
+    path: str
+
+    @property
+    def is_restart(self) -> bool:
+        return any(part in RESTART_INPUTS for part in self.label.split(".")[-2:])
+
+
+def collect_remote_inputs(namespace: Mapping[str, typing.Any], prefix: str = "") -> list[RemoteInput]:
+    """
+    Find all remote inputs (recursing into namespaces like 'link_paths' or the members of a packed calculation).
+
+    The 'remote_folder' of an imported calculation is not an input for the run and left out.
+    """
+    result = []
+    for name, value in namespace.items():
+        label = f"{prefix}{name}"
+        match value:
+            case orm.RemoteData() if label != "remote_folder" and value.computer:
+                result.append(RemoteInput(label, value.computer, value.get_remote_path()))
+            case Mapping():
+                result.extend(collect_remote_inputs(value, prefix=f"{label}."))
+    return result
+
+
+def make_check_remote_paths_command(remote_inputs: Sequence[RemoteInput]) -> str:
+    """
+    Shell command checking all given remote inputs at once (one round trip, instead of one per path).
+
+    Prints 'missing <path>' for every path that does not exist (including dangling links) and
+    'empty <path>' for every restart directory without any content, nothing if all is well.
+
+    Examples:
+        >>> computer = orm.Computer(label="example")
+        >>> print(
+        ...     make_check_remote_paths_command(
+        ...         [
+        ...             RemoteInput("dynamics_grid_file", computer, "/store/grid.nc"),
+        ...             RemoteInput("restart_file", computer, "/scratch/restart_atm_DOM01.mfr"),
+        ...         ]
+        ...     )
+        ... )
+        for p in /store/grid.nc /scratch/restart_atm_DOM01.mfr; do [ -e "$p" ] || printf 'missing %s\\n' "$p"; done; for p in /scratch/restart_atm_DOM01.mfr; do [ ! -d "$p" ] || [ -n "$(ls -A "$p")" ] || printf 'empty %s\\n' "$p"; done; true
+    """
+    paths = list(dict.fromkeys(remote_input.path for remote_input in remote_inputs))
+    restart_dirs = list(dict.fromkeys(remote_input.path for remote_input in remote_inputs if remote_input.is_restart))
+    commands = []
+    if paths:
+        commands.append(
+            f"for p in {' '.join(shlex.quote(path) for path in paths)}; "
+            """do [ -e "$p" ] || printf 'missing %s\\n' "$p"; done"""
+        )
+    if restart_dirs:
+        commands.append(
+            f"for p in {' '.join(shlex.quote(path) for path in restart_dirs)}; "
+            """do [ ! -d "$p" ] || [ -n "$(ls -A "$p")" ] || printf 'empty %s\\n' "$p"; done"""
+        )
+    return "; ".join([*commands, "true"])
+
+
+def read_remote_path_problems(stdout: str, remote_inputs: Sequence[RemoteInput]) -> list[str]:
+    """
+    Turn the output of the check command into one message per affected input.
+
+    Examples:
+        >>> computer = orm.Computer(label="example")
+        >>> read_remote_path_problems(
+        ...     "missing /store/grid.nc\\n",
+        ...     [RemoteInput("dynamics_grid_file", computer, "/store/grid.nc")],
+        ... )
+        ["dynamics_grid_file: '/store/grid.nc' does not exist on example"]
+    """
+    descriptions = {"missing": "does not exist", "empty": "is an empty restart directory"}
+    problems: list[str] = []
+    for line in stdout.splitlines():
+        kind, _, path = line.partition(" ")
+        if kind not in descriptions:
+            continue
+        problems.extend(
+            f"{remote_input.label}: '{path}' {descriptions[kind]} on {remote_input.computer.label}"
+            for remote_input in remote_inputs
+            if remote_input.path == path and (kind == "missing" or remote_input.is_restart)
+        )
+    return problems
+
+
+def group_by_computer(remote_inputs: Iterable[RemoteInput]) -> dict[str, list[RemoteInput]]:
+    """Group remote inputs by the UUID of their computer, to check each computer with a single command."""
+    result: dict[str, list[RemoteInput]] = {}
+    for remote_input in remote_inputs:
+        result.setdefault(remote_input.computer.uuid, []).append(remote_input)
+    return result
+
+
+def find_remote_input_problems(namespace: Mapping[str, typing.Any]) -> list[str]:
+    """
+    Check that all remote inputs exist (and restart directories are not empty), with one command per computer.
+
+    Opens a transport to each computer, from within a running process use the transport queue instead
+    (as 'IconCalculation' does with the 'check_remote_inputs' option).
+    """
+    problems = []
+    for remote_inputs in group_by_computer(collect_remote_inputs(namespace)).values():
+        with remote_inputs[0].computer.get_transport() as remote:
+            retval, stdout, stderr = remote.exec_command_wait(make_check_remote_paths_command(remote_inputs))
+        if retval:
+            raise exceptions.RemoteInputsInaccessibleError(remote_inputs[0].computer.label, stderr)
+        problems.extend(read_remote_path_problems(stdout, remote_inputs))
+    return problems
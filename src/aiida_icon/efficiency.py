@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import dataclasses
+import math
+import re
+import typing
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+    from aiida import orm
+    from aiida.engine.processes import builder as process_builder
+
+__all__ = [
+    "EfficiencyReport",
+    "ResourceProposal",
+    "parse_slurm_duration",
+    "padded_walltime",
+    "parse_slurm_memory",
+    "propose_resources",
+    "read_efficiency",
+    "read_sacct_rows",
+]
+
+_MEMORY_UNITS = {"K": 1, "M": 1 << 10, "G": 1 << 20, "T": 1 << 30}
+_MEMORY = re.compile(r"^(?P<value>\d+(?:\.\d+)?)(?P<unit>[KMGT]?)(?P<per>[cn]?)$")
+_DURATION = re.compile(r"^(?:(?P<days>\d+)-)?(?:(?P<hours>\d+):)?(?P<minutes>\d+):(?P<seconds>\d+(?:\.\d+)?)$")
+
+
+def read_sacct_rows(detailed_job_info: Mapping[str, typing.Any] | None) -> list[dict[str, str]]:
+    """
+    Rows of the Slurm accounting ('sacct --parsable') in the detailed job info of a calculation.
+
+    The first row is the job allocation, followed by its steps ('batch', 'extern', '0', ...).
+
+    Examples:
+        >>> rows = read_sacct_rows({"retval": 0, "stdout": "JobID|State|\\n123|COMPLETED|\\n123.batch|COMPLETED|\\n"})
+        >>> [row["JobID"] for row in rows]
+        ['123', '123.batch']
+        >>> read_sacct_rows({"retval": 1, "stdout": "", "stderr": "sacct: command not found"})
+        []
+    """
+    if not detailed_job_info or detailed_job_info.get("retval", 0) != 0:
+        return []
+    lines = [line for line in (detailed_job_info.get("stdout") or "").splitlines() if line.strip()]
+    if not lines:
+        return []
+    header = lines[0].split("|")
+    return [dict(zip(header, line.split("|"), strict=False)) for line in lines[1:]]
+
+
+def parse_slurm_duration(value: str) -> float | None:
+    """
+    Parse a duration as printed by Slurm ('[DD-][HH:]MM:SS[.mmm]').
+
+    Examples:
+        >>> parse_slurm_duration("1-02:00:30")
+        93630.0
+        >>> parse_slurm_duration("05:30.500")
+        330.5
+        >>> parse_slurm_duration("UNLIMITED") is None
+        True
+    """
+    match = _DURATION.match(value.strip())
+    if not match:
+        return None
+    parts = {name: float(part) for name, part in match.groupdict().items() if part}
+    return (
+        parts.get("days", 0.0) * 86400
+        + parts.get("hours", 0.0) * 3600
+        + parts.get("minutes", 0.0) * 60
+        + parts["seconds"]
+    )
+
+
+def parse_slurm_memory(value: str, *, cpus_per_node: float | None = None) -> int | None:
+    """
+    Parse an amount of memory as printed by Slurm (MaxRSS, ReqMem) in kB.
+
+    Memory requested per CPU ('c' suffix of older Slurm versions) is converted to memory per node.
+
+    Examples:
+        >>> parse_slurm_memory("2097152K")
+        2097152
+        >>> parse_slurm_memory("1.5G")
+        1572864
+        >>> parse_slurm_memory("4000Mc", cpus_per_node=2)
+        8192000
+        >>> parse_slurm_memory("") is None
+        True
+    """
+    match = _MEMORY.match(value.strip())
+    if not match:
+        return None
+    kilobytes = float(match["value"]) * _MEMORY_UNITS[match["unit"] or "K"]
+    if match["per"] == "c":
+        if cpus_per_node is None:
+            return None
+        kilobytes *= cpus_per_node
+    return math.ceil(kilobytes)
+
+
+def _as_int(value: str | None) -> int | None:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+@dataclasses.dataclass(frozen=True)
+class EfficiencyReport:
+    """How much of the requested resources a job used, from the Slurm accounting (memory in kB, times in seconds)."""
+
+    state: str
+    num_machines: int | None
+    elapsed_seconds: float
+    requested_walltime_seconds: float | None = None
+    cpu_efficiency: float | None = None
+    max_rss_kb: int | None = None
+    memory_per_machine_kb: int | None = None
+    requested_memory_kb: int | None = None
+
+    @property
+    def walltime_efficiency(self) -> float | None:
+        if not self.requested_walltime_seconds:
+            return None
+        return self.elapsed_seconds / self.requested_walltime_seconds
+
+    @property
+    def memory_efficiency(self) -> float | None:
+        if not self.requested_memory_kb or self.memory_per_machine_kb is None:
+            return None
+        return self.memory_per_machine_kb / self.requested_memory_kb
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return dataclasses.asdict(self) | {
+            "walltime_efficiency": self.walltime_efficiency,
+            "memory_efficiency": self.memory_efficiency,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, typing.Any]) -> EfficiencyReport:
+        fields = {field.name for field in dataclasses.fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in fields})
+
+
+def read_efficiency(node: orm.CalcJobNode) -> EfficiencyReport | None:
+    """
+    Efficiency of a finished calculation, None without Slurm accounting in its detailed job info.
+
+    The memory per machine is estimated from the largest memory use of a task ('MaxRSS') of each job step times the
+    number of tasks per machine of that step, so it is an upper bound of the actual peak.
+    """
+    rows = read_sacct_rows(node.get_detailed_job_info())
+    if not rows or (elapsed := _as_int(rows[0].get("ElapsedRaw"))) is None:
+        return None
+    allocation = rows[0]
+    num_machines = _as_int(allocation.get("NNodes"))
+    cpus_per_node = (_as_int(allocation.get("AllocCPUS")) or 0) / num_machines if num_machines else None
+
+    memory_per_machine = None
+    max_rss = None
+    for step in rows:
+        if (rss := parse_slurm_memory(step.get("MaxRSS", ""))) is None:
+            continue
+        max_rss = max(rss, max_rss or 0)
+        tasks = _as_int(step.get("NTasks")) or 1
+        nodes = _as_int(step.get("NNodes")) or 1
+        memory_per_machine = max(rss * math.ceil(tasks / nodes), memory_per_machine or 0)
+
+    total_cpu = parse_slurm_duration(allocation.get("TotalCPU", ""))
+    cpu_time = _as_int(allocation.get("CPUTimeRAW"))
+    timelimit_minutes = _as_int(allocation.get("TimelimitRaw"))
+    return EfficiencyReport(
+        state=allocation.get("State", "").split(" ")[0],
+        num_machines=num_machines,
+        elapsed_seconds=float(elapsed),
+        requested_walltime_seconds=(
+            node.get_option("max_wallclock_seconds") or (timelimit_minutes * 60 if timelimit_minutes else None)
+        ),
+        cpu_efficiency=total_cpu / cpu_time if total_cpu is not None and cpu_time else None,
+        max_rss_kb=max_rss,
+        memory_per_machine_kb=memory_per_machine,
+        requested_memory_kb=(
+            node.get_option("max_memory_kb")
+            or parse_slurm_memory(allocation.get("ReqMem", ""), cpus_per_node=cpus_per_node)
+        ),
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class ResourceProposal:
+    """Resources for the next submission of a configuration, None where there is nothing to go by."""
+
+    max_wallclock_seconds: int | None
+    max_memory_kb: int | None
+    num_machines: int | None
+
+    def apply(self, builder: process_builder.ProcessBuilder) -> None:
+        """Set the proposed resources on an IconCalculation builder."""
+        options = builder.metadata.options  # type: ignore[attr-defined]  # builder has a custom setattr
+        if self.max_wallclock_seconds is not None:
+            options.max_wallclock_seconds = self.max_wallclock_seconds
+        if self.max_memory_kb is not None:
+            options.max_memory_kb = self.max_memory_kb
+        if self.num_machines is not None:
+            options.resources = {**(options.resources or {}), "num_machines": self.num_machines}
+
+
+def padded_walltime(seconds: float, *, margin: float = 0.15, min_margin_seconds: float = 300) -> int:
+    """
+    A wall time to request for a run expected to take 'seconds': plus 'margin' (relative, at least
+    'min_margin_seconds'), rounded up to minutes.
+
+    Examples:
+        >>> padded_walltime(3000)
+        3480
+        >>> padded_walltime(600)
+        900
+    """
+    return math.ceil((seconds + max(seconds * margin, min_margin_seconds)) / 60) * 60
+
+
+def propose_resources(
+    reports: Sequence[EfficiencyReport],
+    *,
+    walltime_margin: float = 0.15,
+    min_walltime_margin_seconds: float = 300,
+    memory_margin: float = 0.2,
+    memory_per_machine_kb: int | None = None,
+    walltime_limit_seconds: float | None = None,
+) -> ResourceProposal:
+    """
+    Propose tighter resources for the next run of the same configuration, from the efficiency of previous runs.
+
+    The wall time is the longest elapsed time of the completed runs plus 'walltime_margin' (at least
+    'min_walltime_margin_seconds'), rounded up to minutes, and the memory the largest use per machine of all runs
+    plus 'memory_margin', rounded up to MB.
+
+    Given the memory of a machine ('memory_per_machine_kb'), fewer machines are proposed if the memory of the run
+    fits on them. The wall time is then scaled as if the run scaled perfectly, which overestimates the run time
+    on fewer machines, and machines are only taken away as long as that stays within 'walltime_limit_seconds'.
+
+    Examples:
+        >>> report = EfficiencyReport(
+        ...     state="COMPLETED",
+        ...     num_machines=4,
+        ...     elapsed_seconds=3000,
+        ...     requested_walltime_seconds=86400,
+        ...     memory_per_machine_kb=10 << 20,
+        ...     requested_memory_kb=64 << 20,
+        ... )
+        >>> propose_resources([report])
+        ResourceProposal(max_wallclock_seconds=3480, max_memory_kb=12582912, num_machines=None)
+        >>> propose_resources([report], memory_per_machine_kb=128 << 20)
+        ResourceProposal(max_wallclock_seconds=13800, max_memory_kb=50331648, num_machines=1)
+        >>> propose_resources([report], memory_per_machine_kb=128 << 20, walltime_limit_seconds=7200)
+        ResourceProposal(max_wallclock_seconds=6900, max_memory_kb=25165824, num_machines=2)
+    """
+    completed = [report for report in reports if report.state == "COMPLETED"]
+    longest = max(completed, key=lambda report: report.elapsed_seconds, default=None)
+
+    def walltime(elapsed: float) -> int:
+        return padded_walltime(elapsed, margin=walltime_margin, min_margin_seconds=min_walltime_margin_seconds)
+
+    walltime_seconds = walltime(longest.elapsed_seconds) if longest else None
+    memory_uses = [report for report in reports if report.memory_per_machine_kb is not None]
+    if not memory_uses:
+        return ResourceProposal(walltime_seconds, None, None)
+    peak = max(memory_uses, key=lambda report: report.memory_per_machine_kb or 0)
+    per_machine = (peak.memory_per_machine_kb or 0) * (1 + memory_margin)
+    proposal = ResourceProposal(walltime_seconds, math.ceil(per_machine / 1024) * 1024, None)
+    if not (memory_per_machine_kb and peak.num_machines and longest and longest.num_machines):
+        return proposal
+
+    total = per_machine * peak.num_machines
+    for machines in range(max(1, math.ceil(total / memory_per_machine_kb)), longest.num_machines):
+        scaled = walltime(longest.elapsed_seconds * longest.num_machines / machines)
+        if walltime_limit_seconds is None or scaled <= walltime_limit_seconds:
+            return ResourceProposal(scaled, math.ceil(total / machines / 1024) * 1024, machines)
+    return proposal
@@ -1,3 +1,4 @@
+# deprecated, all restart write modes are supported now, kept for backwards compatibility
 class SinglefileRestartNotImplementedError(Exception):
     def __init__(self):
         super().__init__("AiiDA-ICON currently only supports multifile restart files.")
@@ -6,3 +7,8 @@ class SinglefileRestartNotImplementedError(Exception):
 class RemoteModelNamelistInaccessibleError(Exception):
     def __init__(self):
         super().__init__("One or more model namelists were given as remote paths and could not be read.")
+
+
+class RemoteInputsInaccessibleError(Exception):
+    def __init__(self, computer_label: str, stderr: str):
+        super().__init__(f"Could not check the remote inputs on {computer_label}: {stderr.strip()}")
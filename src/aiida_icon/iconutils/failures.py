@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import dataclasses
+import re
+import typing
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+@dataclasses.dataclass(frozen=True)
+class FailureSignature:
+    """A known failure, recognized by a pattern in the scheduler stderr and / or the ICON log (stdout)."""
+
+    exit_code_label: str
+    pattern: re.Pattern[str]
+    sources: tuple[typing.Literal["stderr", "stdout"], ...] = ("stderr",)
+
+
+#: Known failures, in order of precedence (an out of memory kill often causes ICON to abort as well).
+SIGNATURES = (
+    FailureSignature(
+        "ERROR_SCHEDULER_OUT_OF_MEMORY",
+        re.compile(r"oom[-_ ]kill|out of memory|exceeded .*memory limit|std::bad_alloc", re.IGNORECASE),
+    ),
+    FailureSignature(
+        "ERROR_SCHEDULER_NODE_FAILURE",
+        re.compile(r"due to node failure|node_fail|node failure", re.IGNORECASE),
+    ),
+    FailureSignature(
+        "ERROR_SCHEDULER_OUT_OF_WALLTIME",
+        re.compile(r"due to time limit|time limit exceeded", re.IGNORECASE),
+    ),
+    FailureSignature(
+        "ERROR_ICON_ABORTED",
+        re.compile(r"FINISH called from PE"),
+        ("stderr", "stdout"),  # ICON writes errors to stderr, which is often redirected to stdout
+    ),
+)
+
+
+#: Signs of a diverging run in the ICON log, worth stopping the job for before it runs into the wall time.
+DIVERGENCE_SIGNATURES = (
+    FailureSignature(
+        "ERROR_ICON_DIVERGED",
+        # only in diagnostic messages ('<routine>: ...' and the 'MAXABS VN, W' winds), not in echoed namelists
+        re.compile(r"^\s*(?:[\w.:]+:\s|.*\bMAXABS\b).*(?<![\w.])nan(?![\w.])", re.IGNORECASE),
+        ("stdout",),
+    ),
+    FailureSignature(
+        "ERROR_ICON_DIVERGED",
+        re.compile(r"CFL.*(violat|exceed)|(violat|exceed).*CFL", re.IGNORECASE),
+        ("stdout",),
+    ),
+    FailureSignature(
+        "ERROR_ICON_ABORTED",
+        re.compile(r"FINISH called from PE|\bABORT\b"),
+        ("stdout",),
+    ),
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class DetectedFailure:
+    signature: FailureSignature
+    line: str
+
+
+def detect_failure(
+    *,
+    stderr: Iterable[str],
+    stdout: Iterable[str],
+    signatures: Iterable[FailureSignature] = SIGNATURES,
+) -> DetectedFailure | None:
+    """
+    Find the first known failure signature (in order of 'signatures') in the scheduler stderr or the ICON log.
+
+    Examples:
+        >>> failure = detect_failure(
+        ...     stderr=["slurmstepd: error: Detected 1 oom_kill event in StepId=1234.0.", " FINISH called from PE: 3"],
+        ...     stdout=[],
+        ... )
+        >>> failure.signature.exit_code_label
+        'ERROR_SCHEDULER_OUT_OF_MEMORY'
+        >>> detect_failure(stderr=[], stdout=["Time step: 1"]) is None
+        True
+    """
+    lines = {"stderr": list(stderr), "stdout": list(stdout)}
+    for signature in signatures:
+        for source in signature.sources:
+            for line in lines[source]:
+                if signature.pattern.search(line):
+                    return DetectedFailure(signature=signature, line=line.strip())
+    return None
+
+
+def read_abort_message(lines: Iterable[str]) -> str:
+    """
+    Read the message ICON prints after 'FINISH called from PE' when it aborts.
+
+    Examples:
+        >>> read_abort_message([" FINISH called from PE: 3", " mo_nh_stepping: negative density", " ====="])
+        'mo_nh_stepping: negative density'
+        >>> read_abort_message(["Time step: 1"])
+        ''
+    """
+    remaining = iter(lines)
+    for line in remaining:
+        if "FINISH called from PE" in line:
+            return next((following.strip() for following in remaining if following.strip().strip("=")), "")
+    return ""
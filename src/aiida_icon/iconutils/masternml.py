@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import dataclasses
+import datetime
 import io
 import pathlib
+import re
 import typing
 from typing import Any
 
@@ -143,3 +145,186 @@ def iter_model_name_filepath(master_nml: f90nml.namelist.Namelist) -> typing.Ite
     for model in iter_model_namelists(master_nml):
         filename = model["model_namelist_filename"].replace(r"<path>", base_path)
         yield model["model_name"], pathlib.Path(filename)
+
+
+_ISO_DURATION = re.compile(
+    r"^P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$"
+)
+
+
+def parse_iso_duration(duration: str) -> datetime.timedelta:
+    """
+    Parse an ISO 8601 duration as used in the master namelist (without years and months, which depend on the calendar).
+
+    Examples:
+        >>> parse_iso_duration("PT30S")
+        datetime.timedelta(seconds=30)
+        >>> parse_iso_duration("P1DT6H")
+        datetime.timedelta(days=1, seconds=21600)
+        >>> parse_iso_duration("P1M")
+        Traceback (most recent call last):
+        ValueError: Unsupported ISO 8601 duration: 'P1M'.
+    """
+    match = _ISO_DURATION.match(duration.strip().upper())
+    if not match or duration.strip().upper() in ("P", "PT"):
+        msg = f"Unsupported ISO 8601 duration: '{duration}'."
+        raise ValueError(msg)
+    return datetime.timedelta(**{part: float(value) for part, value in match.groupdict().items() if value})
+
+
+def format_iso_duration(duration: datetime.timedelta) -> str:
+    """
+    Format a duration for the master namelist.
+
+    Examples:
+        >>> format_iso_duration(datetime.timedelta(days=1, hours=6))
+        'P1DT6H'
+        >>> format_iso_duration(datetime.timedelta(minutes=90, seconds=30))
+        'PT1H30M30S'
+    """
+    seconds = int(duration.total_seconds())
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    date_part = f"{days}D" if days else ""
+    time_part = "".join(f"{value}{unit}" for value, unit in ((hours, "H"), (minutes, "M"), (seconds, "S")) if value)
+    return f"P{date_part}T{time_part}" if time_part else f"P{date_part or '0D'}"
+
+
+def parse_iso_datetime(value: str) -> datetime.datetime:
+    """
+    Parse an ISO 8601 date as used in the master namelist.
+
+    Examples:
+        >>> parse_iso_datetime("2000-01-01T00:00:30Z")
+        datetime.datetime(2000, 1, 1, 0, 0, 30, tzinfo=datetime.timezone.utc)
+    """
+    result = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if result.tzinfo is None:
+        result = result.replace(tzinfo=datetime.timezone.utc)
+    return result
+
+
+def time_control_key(master_nml: namelists.NMLInput, name: str) -> str:
+    """
+    Find out how a time control option is spelled in a master namelist.
+
+    ICON accepts both camel case ('experimentStopDate') and snake case ('experiment_stop_date'),
+    changes should be made to the spelling already in use to not end up with conflicting entries.
+
+    Examples:
+        >>> time_control_key(
+        ...     f90nml.reads("&master_time_control_nml\\nexperimentStopDate='2000-01-01'\\n/"),
+        ...     "experiment_stop_date",
+        ... )
+        'experimentstopdate'
+        >>> time_control_key(f90nml.reads("&master_nml\\n/"), "experiment_stop_date")
+        'experiment_stop_date'
+    """
+    time_control = namelists.namelists_data(master_nml).get("master_time_control_nml", {})
+    camel_case = name.replace("_", "")
+    if camel_case in time_control:
+        return camel_case
+    return name
+
+
+def read_time_control_option(master_nml: namelists.NMLInput, name: str) -> str | None:
+    """Read a time control option (given in snake case) from a master namelist, regardless of its spelling."""
+    data = namelists.namelists_data(master_nml)
+    return data.get("master_time_control_nml", {}).get(time_control_key(data, name))
+
+
+def read_experiment_period(
+    master_nml: namelists.NMLInput,
+) -> tuple[datetime.datetime | None, datetime.datetime | None]:
+    """
+    Read experiment start and stop dates from a master namelist.
+
+    Examples:
+        >>> start, stop = read_experiment_period(
+        ...     f90nml.reads(
+        ...         "&master_time_control_nml\\n"
+        ...         "experimentStartDate='2000-01-01T00:00:00Z'\\n"
+        ...         "experimentStopDate='2000-01-01T00:00:30Z'\\n/"
+        ...     )
+        ... )
+        >>> (stop - start).total_seconds()
+        30.0
+    """
+    data = namelists.namelists_data(master_nml)
+    start = read_time_control_option(data, "experiment_start_date")
+    stop = read_time_control_option(data, "experiment_stop_date")
+    return (
+        parse_iso_datetime(start) if start else None,
+        parse_iso_datetime(stop) if stop else None,
+    )
+
+
+def read_simulated_seconds(master_nml: namelists.NMLInput) -> float | None:
+    """Length of the simulated period in seconds, if both start and stop date are given."""
+    start, stop = read_experiment_period(master_nml)
+    if start is None or stop is None:
+        return None
+    return (stop - start).total_seconds()
+
+
+def read_segment_seconds(master_nml: namelists.NMLInput) -> float | None:
+    """
+    Longest simulated period of one run in seconds: the experiment period, cut at the restart interval.
+
+    Examples:
+        >>> read_segment_seconds(
+        ...     f90nml.reads(
+        ...         "&master_time_control_nml\\n"
+        ...         "experimentStartDate='2000-01-01T00:00:00Z'\\n"
+        ...         "experimentStopDate='2000-01-03T00:00:00Z'\\n"
+        ...         "restartTimeIntval='P1D'\\n/"
+        ...     )
+        ... )
+        86400.0
+    """
+    seconds = read_simulated_seconds(master_nml)
+    interval = read_time_control_option(master_nml, "restart_time_int_val")
+    try:
+        restart_seconds = parse_iso_duration(interval).total_seconds() if interval else None
+    except ValueError:  # calendar dependent intervals (months, years) are not cut at
+        restart_seconds = None
+    if seconds is None or restart_seconds is None:
+        return seconds
+    return min(seconds, restart_seconds)
+
+
+def read_model_time_step(master_nml: namelists.NMLInput, model_nml: namelists.NMLInput) -> float | None:
+    """
+    Model time step in seconds, 'modelTimeStep' of the master namelist or else 'dtime' of the (primary) model.
+
+    Examples:
+        >>> read_model_time_step(f90nml.reads("&master_nml\\n/"), f90nml.reads("&run_nml\\ndtime=600\\n/"))
+        600.0
+        >>> read_model_time_step(
+        ...     f90nml.reads("&master_time_control_nml\\nmodelTimeStep='PT2M'\\n/"), f90nml.reads("&run_nml\\n/")
+        ... )
+        120.0
+    """
+    if model_time_step := read_time_control_option(master_nml, "model_time_step"):
+        try:
+            return parse_iso_duration(model_time_step).total_seconds()
+        except ValueError:
+            return None
+    run_nml = namelists.namelists_data(model_nml).get("run_nml", {})
+    dtime = (run_nml[0] if isinstance(run_nml, list) else run_nml).get("dtime")
+    if isinstance(dtime, list):
+        dtime = dtime[0] if dtime else None
+    return float(dtime) if dtime else None
+
+
+def format_iso_datetime(value: datetime.datetime) -> str:
+    """
+    Format a date for the master namelist.
+
+    Examples:
+        >>> format_iso_datetime(parse_iso_datetime("2000-01-01T06:00:00Z"))
+        '2000-01-01T06:00:00Z'
+    """
+    return value.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -1,10 +1,46 @@
+import dataclasses
+import io
+import math
 import pathlib
+import re
+import typing
 from typing import NamedTuple
 
+import aiida.engine
+import aiida.orm
 import f90nml
 
-from aiida_icon import exceptions
-from aiida_icon.iconutils import namelists
+from aiida_icon.iconutils import masternml, namelists
+
+#: Restart write modes in which restart files are written by dedicated restart processes.
+ASYNC_RESTART_WRITE_MODES = ("async", "dedicated procs multifile")
+
+
+@dataclasses.dataclass
+class ParallelOptions(masternml.OptionsMixin):
+    num_io_procs: int | None = None
+    num_restart_procs: int | None = None
+    num_prefetch_proc: int | None = None
+    nproma: int | None = None
+
+
+@dataclasses.dataclass
+class OutputOptions(masternml.OptionsMixin):
+    stream_partitions_ml: int | None = None
+
+
+def options(parallel_options: ParallelOptions, output_options: OutputOptions) -> dict[str, dict[str, typing.Any]]:
+    """
+    Modifiable model namelist options (output options are applied to every output stream).
+
+    Examples:
+        >>> options(parallel_options=ParallelOptions(num_io_procs=2), output_options=OutputOptions())
+        {'parallel_nml': {'num_io_procs': 2}, 'output_nml': {}}
+    """
+    return {
+        "parallel_nml": parallel_options.as_dict(),
+        "output_nml": output_options.as_dict(),
+    }
 
 
 class OutputStreamInfo(NamedTuple):
@@ -16,24 +52,84 @@ class OutputStreamInfo(NamedTuple):
     stream_index: int
 
 
-def read_restart_file_pattern(model_nml: namelists.NMLInput) -> str:
+def _first_group(data: f90nml.namelist.Namelist, name: str) -> f90nml.namelist.Namelist:
+    """Get a namelist group, the first one if it is repeated (for example when several models are collected)."""
+    group = data.get(name, {})
+    return group[0] if isinstance(group, list) else group
+
+
+def read_restart_write_mode(model_nml: namelists.NMLInput) -> str:
+    """
+    Read the restart write mode, resolving the empty default the way ICON does.
+
+    Examples:
+        >>> read_restart_write_mode(f90nml.reads("&io_nml\\nrestart_write_mode='dedicated procs multifile'\\n/"))
+        'dedicated procs multifile'
+        >>> read_restart_write_mode(f90nml.reads("&parallel_nml\\nnum_restart_procs=0\\n/"))
+        'sync'
+        >>> read_restart_write_mode(f90nml.reads("&parallel_nml\\nnum_restart_procs=2\\n/"))
+        'async'
+    """
     data = namelists.namelists_data(model_nml)
+    restart_write_mode = (_first_group(data, "io_nml").get("restart_write_mode") or "").strip()
+    if restart_write_mode:
+        return restart_write_mode
+    return "async" if _first_group(data, "parallel_nml").get("num_restart_procs", 0) else "sync"
+
+
+def is_multifile_restart(restart_write_mode: str) -> bool:
+    return "multifile" in restart_write_mode
+
 
-    restart_write_mode = data.get("io_nml", {}).get("restart_write_mode", "joint procs multifile")
-    if "multifile" not in restart_write_mode:
-        raise exceptions.SinglefileRestartNotImplementedError
+def _read_grid_basename(data: f90nml.namelist.Namelist) -> str:
+    """Base name of the (first domain's) dynamics grid file, singlefile restarts are named after it."""
+    grid_filename = _first_group(data, "grid_nml").get("dynamics_grid_filename", "")
+    if isinstance(grid_filename, list):
+        grid_filename = grid_filename[0] if grid_filename else ""
+    return pathlib.PurePosixPath(grid_filename.strip()).stem if grid_filename else ""
 
-    return r"multifile_restart_atm_(?P<timestamp>\d{8}T\d{6}Z).mfr"
 
+def read_restart_file_pattern(model_nml: namelists.NMLInput, model_name: str = "atm") -> str:
+    """
+    Regular expression matching the restart files written by a model, with the restart date as group 'timestamp'.
 
-def read_latest_restart_file_link_name(model_nml: namelists.NMLInput) -> str:
+    Multifile restarts (joint or dedicated procs) are directories, singlefile restarts (sync or async)
+    are NetCDF files named after the grid.
+
+    Examples:
+        >>> multifile = f90nml.reads("&io_nml\\nrestart_write_mode='joint procs multifile'\\n/")
+        >>> re.match(read_restart_file_pattern(multifile), "multifile_restart_atm_20000101T030000Z.mfr")["timestamp"]
+        '20000101T030000Z'
+        >>> singlefile = f90nml.reads(
+        ...     "&io_nml\\nrestart_write_mode='async'\\n/\\n&grid_nml\\ndynamics_grid_filename='grid.nc'\\n/"
+        ... )
+        >>> re.match(read_restart_file_pattern(singlefile, "oce"), "grid_restart_oce_20000101T030000Z.nc")["timestamp"]
+        '20000101T030000Z'
+    """
     data = namelists.namelists_data(model_nml)
+    timestamp = r"(?P<timestamp>\d{8}T\d{6}Z)"
+    if is_multifile_restart(read_restart_write_mode(data)):
+        return rf"multifile_restart_{re.escape(model_name)}_{timestamp}\.mfr"
+    grid_basename = re.escape(_read_grid_basename(data)) or ".+"
+    return rf"{grid_basename}_restart_{re.escape(model_name)}_{timestamp}\.nc"
+
 
-    restart_write_mode = data.get("io_nml", {}).get("restart_write_mode", "joint procs multifile")
-    if "multifile" not in restart_write_mode:
-        raise exceptions.SinglefileRestartNotImplementedError
+def read_latest_restart_file_link_name(model_nml: namelists.NMLInput, model_name: str = "atm") -> str:
+    """
+    Name of the link ICON creates to the latest restart of a model and reads from when restarting.
 
-    return "multifile_restart_atm.mfr"
+    For singlefile restarts this is the link for the first domain.
+
+    Examples:
+        >>> dedicated = f90nml.reads("&io_nml\\nrestart_write_mode='dedicated procs multifile'\\n/")
+        >>> read_latest_restart_file_link_name(dedicated)
+        'multifile_restart_atm.mfr'
+        >>> read_latest_restart_file_link_name(f90nml.reads("&io_nml\\nrestart_write_mode='sync'\\n/"), "oce")
+        'restart_oce_DOM01.nc'
+    """
+    if is_multifile_restart(read_restart_write_mode(model_nml)):
+        return f"multifile_restart_{model_name}.mfr"
+    return f"restart_{model_name}_DOM01.nc"
 
 
 def read_output_stream_infos(
@@ -66,3 +162,281 @@ def read_output_stream_infos(
         )
 
     return output_streams
+
+
+@aiida.engine.calcfunction
+def modify_model_nml(model_nml: aiida.orm.SinglefileData, options: aiida.orm.Dict) -> aiida.orm.SinglefileData:
+    """
+    Provenance preserving model namelist modifications.
+
+    'options' maps namelist group names to the values to set, missing groups are added.
+    Values for repeated groups (like 'output_nml') are set in every occurrence of the group.
+
+    Examples:
+        >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+        >>> old_model = aiida.orm.SinglefileData.from_string(
+        ...     content="&parallel_nml\\nnproma=48\\nnum_io_procs=0\\n/\\n&output_nml\\n/\\n&output_nml\\n/"
+        ... )
+        >>> new_model = modify_model_nml(
+        ...     model_nml=old_model,
+        ...     options={
+        ...         "parallel_nml": {"nproma": 32},
+        ...         "output_nml": {"stream_partitions_ml": 2},
+        ...         "run_nml": {"ltimer": True},
+        ...     },
+        ... )
+        >>> new_data = f90nml.reads(new_model.get_content(mode="r"))
+        >>> dict(new_data["parallel_nml"])
+        {'nproma': 32, 'num_io_procs': 0}
+        >>> [dict(group) for group in new_data["output_nml"]]
+        [{'stream_partitions_ml': 2}, {'stream_partitions_ml': 2}]
+        >>> dict(new_data["run_nml"])
+        {'ltimer': True}
+    """
+    data = f90nml.reads(model_nml.get_content(mode="r"))
+    for section, values in options.items():
+        if section not in data:
+            data[section] = {}
+        groups = data[section] if isinstance(data[section], list) else [data[section]]
+        for group in groups:
+            for key, value in values.items():
+                group[key] = value
+    string_buffer = io.StringIO()
+    f90nml.write(data, string_buffer)
+    return aiida.orm.SinglefileData(io.BytesIO(bytes(string_buffer.getvalue(), "utf8")))
+
+
+def plan_async_io(
+    model_nml: namelists.NMLInput,
+    *,
+    num_machines: int,
+    io_procs_per_stream: int = 1,
+    num_restart_procs: int | None = None,
+    prefetch: bool = False,
+) -> tuple[ParallelOptions, OutputOptions]:
+    """
+    Derive asynchronous output, restart and prefetch process counts from the model namelist.
+
+    Every output stream gets 'io_procs_per_stream' output processes (more than one partitions the stream
+    over time, see 'stream_partitions_ml'). Unless given, one restart process per machine is used
+    if the restart write mode requires dedicated restart processes, none otherwise.
+
+    Examples:
+        >>> nml = f90nml.reads(
+        ...     "&io_nml\\nrestart_write_mode='dedicated procs multifile'\\n/\\n&output_nml\\n/\\n&output_nml\\n/"
+        ... )
+        >>> parallel, output = plan_async_io(nml, num_machines=4, io_procs_per_stream=2)
+        >>> parallel
+        ParallelOptions(num_io_procs=4, num_restart_procs=4, num_prefetch_proc=0, nproma=None)
+        >>> output
+        OutputOptions(stream_partitions_ml=2)
+    """
+    num_streams = len(read_output_stream_infos(model_nml))
+    if num_restart_procs is None:
+        num_restart_procs = num_machines if read_restart_write_mode(model_nml) in ASYNC_RESTART_WRITE_MODES else 0
+    return (
+        ParallelOptions(
+            num_io_procs=num_streams * io_procs_per_stream,
+            num_restart_procs=num_restart_procs,
+            num_prefetch_proc=1 if prefetch else 0,
+        ),
+        OutputOptions(stream_partitions_ml=io_procs_per_stream if num_streams and io_procs_per_stream > 1 else None),
+    )
+
+
+def validate_async_io(
+    model_nml: namelists.NMLInput,
+    parallel_options: ParallelOptions,
+    output_options: OutputOptions,
+    *,
+    total_mpiprocs: int,
+    max_async_fraction: float = 0.5,
+) -> list[str]:
+    """
+    Check asynchronous I/O settings against the model namelist and the total number of MPI processes.
+
+    Returns a list of problems, which is empty if the settings are consistent. Less than 'max_async_fraction' of
+    the processes may be reserved for asynchronous I/O, the rest is needed for computation.
+
+    Examples:
+        >>> nml = f90nml.reads("&io_nml\\nrestart_write_mode='async'\\n/\\n&output_nml\\n/")
+        >>> parallel = ParallelOptions(num_io_procs=1, num_restart_procs=1)
+        >>> validate_async_io(nml, parallel, OutputOptions(), total_mpiprocs=8)
+        []
+        >>> parallel = ParallelOptions(num_io_procs=1, num_restart_procs=0)
+        >>> for problem in validate_async_io(nml, parallel, OutputOptions(stream_partitions_ml=2), total_mpiprocs=2):
+        ...     print(problem)
+        Restart write mode 'async' requires at least one restart process.
+        'stream_partitions_ml' (2) can not exceed 'num_io_procs' (1).
+        1 of 2 MPI processes would be used for asynchronous I/O, it must be less than 50%.
+    """
+    problems = []
+    num_io_procs = parallel_options.num_io_procs or 0
+    num_restart_procs = parallel_options.num_restart_procs or 0
+    num_prefetch_proc = parallel_options.num_prefetch_proc or 0
+    restart_write_mode = read_restart_write_mode(model_nml)
+    if restart_write_mode in ASYNC_RESTART_WRITE_MODES and not num_restart_procs:
+        problems.append(f"Restart write mode '{restart_write_mode}' requires at least one restart process.")
+    if any(count < 0 for count in (num_io_procs, num_restart_procs, num_prefetch_proc)):
+        problems.append("Process counts can not be negative.")
+    if num_prefetch_proc > 1:
+        problems.append("ICON supports at most one prefetch process.")
+    if (partitions := output_options.stream_partitions_ml or 1) > max(num_io_procs, 1):
+        problems.append(f"'stream_partitions_ml' ({partitions}) can not exceed 'num_io_procs' ({num_io_procs}).")
+    num_async = num_io_procs + num_restart_procs + num_prefetch_proc
+    if num_async and num_async >= total_mpiprocs * max_async_fraction:
+        problems.append(
+            f"{num_async} of {total_mpiprocs} MPI processes would be used for asynchronous I/O, "
+            f"it must be less than {max_async_fraction:.0%}."
+        )
+    return problems
+
+
+def icosahedral_num_cells(root: int, bisections: int) -> int:
+    """
+    Number of cells of a global ICON grid R<root>B<bisections>.
+
+    Examples:
+        >>> icosahedral_num_cells(2, 4)
+        20480
+    """
+    return 20 * root**2 * 4**bisections
+
+
+def read_grid_num_cells(grid_filename: str) -> int | None:
+    """
+    Number of cells of a global grid with the resolution in the file name (an upper bound for regional grids).
+
+    Examples:
+        >>> read_grid_num_cells("icon_grid_0013_R02B04_R.nc")
+        20480
+        >>> read_grid_num_cells("my_grid.nc") is None
+        True
+    """
+    match = re.search(r"R(\d+)B(\d+)", grid_filename)
+    return icosahedral_num_cells(int(match.group(1)), int(match.group(2))) if match else None
+
+
+def read_grid_resolution(grid_filename: str) -> str | None:
+    """
+    Resolution of an ICON grid from its file name.
+
+    Examples:
+        >>> read_grid_resolution("icon_grid_0013_R02B04_R.nc")
+        'R02B04'
+        >>> read_grid_resolution("my_grid.nc") is None
+        True
+    """
+    match = re.search(r"R\d+B\d+", grid_filename)
+    return match.group(0) if match else None
+
+
+def read_dynamics_grid_filename(model_nml: namelists.NMLInput) -> str | None:
+    """
+    File name of the (first domain's) dynamics grid in a model namelist.
+
+    Examples:
+        >>> read_dynamics_grid_filename(f90nml.reads("&grid_nml\\ndynamics_grid_filename='grid.nc'\\n/"))
+        'grid.nc'
+    """
+    grid_filename = _first_group(namelists.namelists_data(model_nml), "grid_nml").get("dynamics_grid_filename")
+    if isinstance(grid_filename, list):
+        grid_filename = grid_filename[0] if grid_filename else None
+    return grid_filename.strip() if grid_filename else None
+
+
+def read_num_async_procs(model_nml: namelists.NMLInput) -> int:
+    """
+    Count the MPI processes reserved for asynchronous output, restart and prefetching.
+
+    Examples:
+        >>> read_num_async_procs(f90nml.reads("&parallel_nml\\nnum_io_procs=2\\nnum_restart_procs=1\\n/"))
+        3
+    """
+    parallel_nml = _first_group(namelists.namelists_data(model_nml), "parallel_nml")
+    return sum(parallel_nml.get(name, 0) or 0 for name in ("num_io_procs", "num_restart_procs", "num_prefetch_proc"))
+
+
+def gpu_nproma(model_nml: namelists.NMLInput, *, num_cells: int, total_mpiprocs: int, multiple: int = 32) -> int:
+    """
+    Choose 'nproma' for GPU runs: one block holding all cells of a compute process (plus halo headroom).
+
+    GPUs need long vectors to be saturated, so instead of cache sized blocks, each compute process
+    (those not reserved for asynchronous I/O) works on its whole domain in one block. The result is
+    rounded up to a multiple of 'multiple' (the warp size by default).
+
+    Examples:
+        >>> gpu_nproma(f90nml.reads("&parallel_nml\\nnum_io_procs=0\\n/"), num_cells=20480, total_mpiprocs=4)
+        5632
+    """
+    num_compute_procs = total_mpiprocs - read_num_async_procs(model_nml)
+    if num_compute_procs < 1:
+        msg = f"No compute processes left out of {total_mpiprocs} after reserving the asynchronous I/O processes."
+        raise ValueError(msg)
+    # halo cells are part of the blocks too, allow 10% on top of the evenly distributed cells
+    cells_per_proc = math.ceil(num_cells / num_compute_procs * 1.1)
+    return math.ceil(cells_per_proc / multiple) * multiple
+
+
+#: Rough number of variables in a variable group ('group:...') and in a restart file, for size estimates.
+VARIABLES_PER_GROUP_ESTIMATE = 20
+RESTART_VARIABLES_ESTIMATE = 60
+
+
+def _read_num_levels(data: f90nml.namelist.Namelist) -> int:
+    num_lev = _first_group(data, "run_nml").get("num_lev", 1)
+    return max(num_lev) if isinstance(num_lev, list) else num_lev
+
+
+def _count_variables(varlist: str | list[str] | None) -> int:
+    if not varlist:
+        return 0
+    names = [varlist] if isinstance(varlist, str) else varlist
+    return sum(
+        VARIABLES_PER_GROUP_ESTIMATE if name.strip().lower().startswith("group:") else 1 for name in names if name
+    )
+
+
+def estimate_output_file_sizes(model_nml: namelists.NMLInput, *, num_cells: int) -> dict[str, int]:
+    """
+    Estimate the size (in bytes, single precision) of the largest file per output stream directory.
+
+    Every variable in 'ml_varlist' is assumed to be three dimensional, variable groups count as
+    'VARIABLES_PER_GROUP_ESTIMATE' variables and files without 'steps_per_file' are assumed to hold one step.
+
+    Examples:
+        >>> nml = f90nml.reads(
+        ...     "&run_nml\\nnum_lev=60\\n/\\n"
+        ...     "&output_nml\\noutput_filename='out/atm_3d'\\nml_varlist='temp','u','v'\\nsteps_per_file=4\\n/\\n"
+        ...     "&output_nml\\noutput_filename='out/atm_pl'\\npl_varlist='temp'\\np_levels=50000,85000\\n/"
+        ... )
+        >>> estimate_output_file_sizes(nml, num_cells=20480)
+        {'out': 58982400}
+    """
+    data = namelists.namelists_data(model_nml)
+    num_levels = _read_num_levels(data)
+    output_data = data.get("output_nml", [])
+    stream_specs = [output_data] if isinstance(output_data, f90nml.namelist.Namelist) else output_data
+    sizes: dict[str, int] = {}
+    for info, spec in zip(read_output_stream_infos(data), stream_specs, strict=True):
+        values_per_cell = _count_variables(spec.get("ml_varlist")) * num_levels + sum(
+            _count_variables(spec.get(f"{kind}_varlist")) * len(levels if isinstance(levels, list) else [levels])
+            for kind, levels_key in (("pl", "p_levels"), ("hl", "h_levels"), ("il", "i_levels"))
+            if (levels := spec.get(levels_key)) is not None
+        )
+        steps = spec.get("steps_per_file", 1)
+        size = num_cells * max(values_per_cell, 1) * 4 * (steps if steps > 0 else 1)
+        directory = str(info.path)
+        sizes[directory] = max(sizes.get(directory, 0), size)
+    return sizes
+
+
+def estimate_restart_file_size(model_nml: namelists.NMLInput, *, num_cells: int) -> int:
+    """
+    Estimate the size (in bytes, double precision) of a restart file, see 'RESTART_VARIABLES_ESTIMATE'.
+
+    Examples:
+        >>> estimate_restart_file_size(f90nml.reads("&run_nml\\nnum_lev=90\\n/"), num_cells=20480)
+        884736000
+    """
+    return num_cells * _read_num_levels(namelists.namelists_data(model_nml)) * RESTART_VARIABLES_ESTIMATE * 8
@@ -1,7 +1,9 @@
+import json
 import typing
 
 import aiida.orm
 import f90nml
+from aiida.orm.nodes import caching
 
 NMLInput: typing.TypeAlias = aiida.orm.SinglefileData | f90nml.namelist.Namelist
 
@@ -16,3 +18,62 @@ def namelists_data(
             return f90nml.reads(namelist.get_content(mode="r"))
         case _:
             raise ValueError
+
+
+def _plain(value: typing.Any) -> typing.Any:
+    match value:
+        case dict():
+            # repeated groups are listed once per occurrence, but looked up together as a list
+            return {str(key).lower(): _plain(value[key]) for key in dict.fromkeys(value.keys())}
+        case list() | tuple():
+            return [_plain(item) for item in value]
+        case complex():
+            return [value.real, value.imag]
+        case _:
+            return value
+
+
+def canonical_namelist(namelist: NMLInput) -> str:
+    """
+    Canonical representation of the namelist content, which does not depend on the formatting, comments,
+    the case of group and variable names, the order of variables or the order of different groups.
+
+    Repeated groups (like 'output_nml') keep their relative order, which is meaningful to ICON.
+
+    Examples:
+        >>> canonical_namelist(f90nml.reads("&run_nml\\n  nsteps = 10 ! comment\\n  dtime = 60.\\n/"))
+        '{"run_nml": {"dtime": 60.0, "nsteps": 10}}'
+        >>> canonical_namelist(f90nml.reads("&RUN_NML DTIME=6.0D1, NSTEPS=10 /"))
+        '{"run_nml": {"dtime": 60.0, "nsteps": 10}}'
+    """
+    return json.dumps(_plain(namelists_data(namelist)), sort_keys=True)
+
+
+class NamelistCaching(caching.NodeCaching):
+    def get_objects_to_hash(self) -> dict[str, typing.Any]:
+        objects = super().get_objects_to_hash()
+        try:
+            objects["repository_hash"] = canonical_namelist(typing.cast("NamelistData", self._node))
+        except (ValueError, StopIteration):
+            pass  # not a valid namelist, fall back to the file content
+        return objects
+
+
+class NamelistData(aiida.orm.SinglefileData):
+    """
+    A namelist file, which is hashed by its canonical content (see 'canonical_namelist') instead of its bytes.
+
+    Using it for namelist inputs lets AiiDA caching recognize semantically identical runs, even if the namelist
+    files differ in formatting, comments, case or ordering. The file name does not enter the hash either.
+    """
+
+    _CLS_NODE_CACHING = NamelistCaching
+    _hash_ignored_attributes = (*aiida.orm.SinglefileData._hash_ignored_attributes, "filename")  # noqa: SLF001 # extending the parent class setting
+
+    @classmethod
+    def from_singlefile(cls, node: aiida.orm.SinglefileData) -> "NamelistData":
+        """New (unstored) namelist node with the content and file name of 'node'."""
+        if isinstance(node, cls):
+            return node
+        with node.open(mode="rb") as handle:
+            return cls(handle, filename=node.filename)
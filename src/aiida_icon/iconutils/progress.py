@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import re
+import typing
+
+from aiida_icon.iconutils import masternml
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Iterable
+
+#: ICON reports every time step in its log, for example
+#: 'mo_nh_stepping:perform_nh_timeloop: Time step:      1 model time: 2000-01-01T00:00:02.000'.
+TIME_STEP_PATTERN = re.compile(r"Time step:\s*(?P<step>\d+),?\s*model time:\s*(?P<date>\S+)")
+
+
+@dataclasses.dataclass(frozen=True)
+class TimeStep:
+    step: int
+    model_date: datetime.datetime
+
+
+def read_latest_time_step(lines: Iterable[str]) -> TimeStep | None:
+    """
+    Find the latest time step reported in (a part of) the ICON log.
+
+    Examples:
+        >>> read_latest_time_step([
+        ...     "mo_nh_stepping:perform_nh_timeloop: Time step:      1 model time: 2000-01-01T00:00:02.000",
+        ...     "mo_nh_stepping:perform_nh_timeloop: Time step:      2 model time: 2000-01-01T00:00:04.000",
+        ...     " Writing output for step 2",
+        ... ])
+        TimeStep(step=2, model_date=datetime.datetime(2000, 1, 1, 0, 0, 4, tzinfo=datetime.timezone.utc))
+        >>> read_latest_time_step(["Time step: 1"]) is None
+        True
+    """
+    latest = None
+    for line in lines:
+        if match := TIME_STEP_PATTERN.search(line):
+            latest = match
+    if latest is None:
+        return None
+    try:
+        model_date = masternml.parse_iso_datetime(latest["date"])
+    except ValueError:
+        return None
+    return TimeStep(step=int(latest["step"]), model_date=model_date)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import re
+import typing
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Iterable
+
+SECONDS_PER_DAY = 86400
+DAYS_PER_YEAR = 365
+
+_TIMER_LINE = re.compile(r"^\s*(?P<name>\S.*?)\s+(?P<calls>\d+)\s+(?P<values>\S.*)$")
+_DURATION = re.compile(
+    r"^(?:(?P<hours>\d+)h)?(?:(?P<minutes>\d+)m)?(?P<seconds>\d+(?:\.\d*)?)?s?$",
+)
+
+
+def parse_duration(token: str) -> float | None:
+    """
+    Parse a duration as printed in ICON timer reports into seconds.
+
+    Examples:
+        >>> parse_duration("19.1244s")
+        19.1244
+        >>> parse_duration("1m02s")
+        62.0
+        >>> parse_duration("2h03m")
+        7380.0
+        >>> parse_duration("19.125")
+        19.125
+        >>> parse_duration("[3]") is None
+        True
+    """
+    if not re.search(r"\.|\d[hms]", token):
+        # plain integers are rank numbers or process counts, not durations
+        return None
+    match = _DURATION.match(token)
+    if not match or not any(match.groupdict().values()):
+        return None
+    hours, minutes, seconds = (float(match[part] or 0) for part in ("hours", "minutes", "seconds"))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _column_key(title: str) -> str:
+    """
+    Turn a timer report column title into a key.
+
+    Examples:
+        >>> _column_key("total max (s)")
+        'total_max'
+        >>> _column_key("t_avg")
+        't_avg'
+    """
+    return title.replace("(s)", "").strip().replace(" ", "_")
+
+
+def timer_key(name: str) -> str:
+    """
+    Make a timer name usable as a key in an AiiDA Dict (which does not allow dots in keys).
+
+    Examples:
+        >>> timer_key("  L nh_solve.veltend")
+        'nh_solve_veltend'
+    """
+    return re.sub(r"^(L\s+)", "", name.strip()).replace(".", "_")
+
+
+def parse_timer_report(lines: Iterable[str]) -> dict[str, dict[str, float]]:
+    """
+    Parse the (last) timer report ICON prints at the end of a run.
+
+    Returns a mapping of timer names to their number of calls and their timings in seconds,
+    using the column titles of the report as keys ('t_min', 'total_max', etc).
+    Only the first entry is kept for timers which appear in several places of the call tree.
+
+    Examples:
+        >>> report = parse_timer_report(
+        ...     [
+        ...         " name            # calls  t_min   min rank  t_max  max rank  total min (s)  total max (s)  # PEs",
+        ...         " --------------  -------  ------  --------  -----  --------  -------------  -------------  -----",
+        ...         " total           1        19.12s  [2]       19.13s [0]       19.124         19.125         4",
+        ...         " L integrate_nh  15       0.98s   [1]       1m02s  [0]       18.119         18.120         4",
+        ...         "",
+        ...     ]
+        ... )
+        >>> report["total"]["total_max"]
+        19.125
+        >>> report["integrate_nh"]["calls"], report["integrate_nh"]["t_max"]
+        (15, 62.0)
+    """
+    report: dict[str, dict[str, float]] = {}
+    columns: list[str] = []
+    for line in lines:
+        if "total max (s)" in line:
+            # a new report starts, only the last one is of interest
+            columns = [
+                _column_key(title)
+                for title in re.split(r"\s{2,}", line.strip())
+                if title.startswith("t_") or title.endswith("(s)")
+            ]
+            report = {}
+            continue
+        if not columns:
+            continue
+        match = _TIMER_LINE.match(line)
+        if not match:
+            if report and not line.strip().startswith("-"):
+                columns = []
+            continue
+        durations = [duration for token in match["values"].split() if (duration := parse_duration(token)) is not None]
+        if len(durations) != len(columns):
+            continue
+        name = timer_key(match["name"])
+        if name not in report:
+            report[name] = {"calls": int(match["calls"]), **dict(zip(columns, durations, strict=True))}
+    return report
+
+
+def report_total_seconds(report: typing.Mapping[str, typing.Mapping[str, float]]) -> float | None:
+    """
+    Wall clock time of the whole run according to the timer report (slowest rank).
+
+    Examples:
+        >>> report_total_seconds({"total": {"calls": 1, "total_max": 19.125}})
+        19.125
+        >>> report_total_seconds({}) is None
+        True
+    """
+    total = report.get("total", {})
+    return total.get("total_max", total.get("t_max"))
+
+
+def simulated_years_per_day(simulated_seconds: float, wall_seconds: float) -> float:
+    """
+    Throughput in simulated years per (wall clock) day (SYPD).
+
+    Examples:
+        >>> simulated_years_per_day(simulated_seconds=365 * 86400, wall_seconds=86400)
+        1.0
+        >>> round(simulated_years_per_day(simulated_seconds=86400, wall_seconds=60), 2)
+        3.95
+    """
+    simulated_years = simulated_seconds / (SECONDS_PER_DAY * DAYS_PER_YEAR)
+    return simulated_years / (wall_seconds / SECONDS_PER_DAY)
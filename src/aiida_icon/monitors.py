@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import posixpath
+import shlex
+import typing
+
+from aiida.engine.processes.calcjobs import monitors as calcjob_monitors
+from aiida.schedulers import datastructures
+
+from aiida_icon import accounting
+from aiida_icon.iconutils import failures, masternml, progress, timers
+
+if typing.TYPE_CHECKING:
+    from aiida import orm
+    from aiida.transports import Transport
+
+__all__ = [
+    "PROGRESS_EXTRAS_KEY",
+    "STOPPED_EXTRAS_KEY",
+    "Observation",
+    "estimate_progress",
+    "monitor_early_kill",
+    "monitor_progress",
+    "read_log_increment",
+]
+
+#: The progress of a running calculation, as estimated by 'monitor_progress'.
+PROGRESS_EXTRAS_KEY = "progress"
+#: State of 'monitor_early_kill' between polls.
+WATCH_EXTRAS_KEY = "log_watch"
+#: Why 'monitor_early_kill' stopped a job ('exit_code_label' and 'message'), read by the parser.
+STOPPED_EXTRAS_KEY = "stopped_early"
+#: Upper limit of log bytes transferred per poll, the rest is read in the following polls.
+DEFAULT_MAX_BYTES = 1 << 20
+
+
+def read_log_increment(transport: Transport, path: str, offset: int, *, max_bytes: int) -> tuple[list[str], int]:
+    """
+    Complete lines written to a remote file after 'offset' (in bytes), and the offset after these lines.
+
+    Monitors keep the offset in the extras of the calculation, so that only the bytes written since the last
+    poll are transferred and the cost of a poll does not grow with the log. At most 'max_bytes' are transferred,
+    a missing file reads as empty.
+    """
+    command = f"tail -c +{offset + 1} {shlex.quote(path)} 2>/dev/null | head -c {max_bytes}"
+    with accounting.measure("exec_command"):
+        _, stdout, _ = transport.exec_command_wait_bytes(command)
+    end = stdout.rfind(b"\n") + 1
+    if not end and len(stdout) >= max_bytes:  # a line longer than 'max_bytes', skip it in parts
+        end = len(stdout)
+    return stdout[:end].decode(errors="replace").splitlines(), offset + end
+
+
+def log_path(node: orm.CalcJobNode, log_name: str | None) -> str | None:
+    """Remote path of the ICON log (by default the scheduler stdout), None before the job was uploaded."""
+    workdir = node.get_remote_workdir()
+    if workdir is None:
+        return None
+    return posixpath.join(workdir, log_name or node.get_option("scheduler_stdout") or "_scheduler-stdout.txt")
+
+
+@dataclasses.dataclass(frozen=True)
+class Observation:
+    """A time step seen in the log at 'wall_time' (the time of the poll)."""
+
+    wall_time: datetime.datetime
+    step: int
+    model_date: datetime.datetime
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return {
+            "wall_time": self.wall_time.isoformat(),
+            "step": self.step,
+            "model_date": masternml.format_iso_datetime(self.model_date),
+        }
+
+    @classmethod
+    def from_dict(cls, data: typing.Mapping[str, typing.Any]) -> Observation:
+        return cls(
+            wall_time=datetime.datetime.fromisoformat(data["wall_time"]),
+            step=data["step"],
+            model_date=masternml.parse_iso_datetime(data["model_date"]),
+        )
+
+
+def estimate_progress(
+    first: Observation,
+    latest: Observation,
+    *,
+    start_date: datetime.datetime | None = None,
+    stop_date: datetime.datetime | None = None,
+) -> dict[str, typing.Any]:
+    """
+    Estimate the progress of an experiment, with rates measured between the first and the latest observation.
+
+    Examples:
+        >>> utc = datetime.timezone.utc
+        >>> first = Observation(datetime.datetime(2025, 1, 1, 12, tzinfo=utc), 10, datetime.datetime(2000, 1, 1, tzinfo=utc))
+        >>> latest = Observation(datetime.datetime(2025, 1, 1, 13, tzinfo=utc), 130, datetime.datetime(2000, 1, 2, tzinfo=utc))
+        >>> estimate = estimate_progress(
+        ...     first, latest, start_date=first.model_date, stop_date=datetime.datetime(2000, 1, 5, tzinfo=utc)
+        ... )
+        >>> estimate["fraction"], round(estimate["steps_per_second"], 4), round(estimate["sypd"], 3)
+        (0.25, 0.0333, 0.066)
+        >>> estimate["eta"]
+        '2025-01-01T16:00:00+00:00'
+    """
+    estimate: dict[str, typing.Any] = {
+        "step": latest.step,
+        "model_date": masternml.format_iso_datetime(latest.model_date),
+        "updated": latest.wall_time.isoformat(),
+    }
+    if start_date is not None and stop_date is not None and stop_date > start_date:
+        estimate["fraction"] = min(1.0, (latest.model_date - start_date) / (stop_date - start_date))
+    wall_seconds = (latest.wall_time - first.wall_time).total_seconds()
+    simulated_seconds = (latest.model_date - first.model_date).total_seconds()
+    if wall_seconds <= 0 or simulated_seconds <= 0:
+        return estimate
+    estimate["steps_per_second"] = (latest.step - first.step) / wall_seconds
+    estimate["sypd"] = timers.simulated_years_per_day(simulated_seconds, wall_seconds)
+    if stop_date is not None:
+        remaining = max(0.0, (stop_date - latest.model_date).total_seconds()) * wall_seconds / simulated_seconds
+        estimate["remaining_seconds"] = remaining
+        estimate["eta"] = (latest.wall_time + datetime.timedelta(seconds=remaining)).isoformat()
+    return estimate
+
+
+def monitor_progress(
+    node: orm.CalcJobNode,
+    transport: Transport,
+    *,
+    log_name: str | None = None,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> None:
+    """
+    Track the simulated date of a running calculation in the 'progress' extra.
+
+    Besides the latest time step and model date, the extra holds the fraction of the experiment done,
+    the time step rate and simulated years per day since the monitor first saw a time step,
+    and the estimated time of arrival at the experiment stop date.
+    """
+    path = log_path(node, log_name)
+    if path is None:
+        return None
+    state = dict(node.base.extras.get(PROGRESS_EXTRAS_KEY, {}))
+    lines, state["log_offset"] = read_log_increment(transport, path, state.get("log_offset", 0), max_bytes=max_bytes)
+    time_step = progress.read_latest_time_step(lines)
+    if time_step is not None:
+        latest = Observation(datetime.datetime.now(datetime.timezone.utc), time_step.step, time_step.model_date)
+        first = Observation.from_dict(state["first"]) if "first" in state else latest
+        start_date, stop_date = (
+            masternml.read_experiment_period(node.inputs.master_namelist)
+            if "master_namelist" in node.inputs
+            else (None, None)
+        )
+        state |= estimate_progress(first, latest, start_date=start_date, stop_date=stop_date)
+        state["first"] = first.to_dict()
+    node.base.extras.set(PROGRESS_EXTRAS_KEY, state)
+    return None
+
+
+def monitor_early_kill(
+    node: orm.CalcJobNode,
+    transport: Transport,
+    *,
+    stall_timeout: int | None = 3600,
+    log_name: str | None = None,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> calcjob_monitors.CalcJobMonitorResult | None:
+    """
+    Stop a job which diverged (NaNs, CFL violations), aborted or stalled, instead of letting it run into the wall time.
+
+    Divergence is detected from the signatures in 'aiida_icon.iconutils.failures.DIVERGENCE_SIGNATURES' in the
+    new lines of the ICON log, a stall from no new time step for 'stall_timeout' seconds while the job is running
+    (None to not detect stalls). The job is retrieved and parsed as usual, so restart files written before are
+    attached, and the parser reports why the job was stopped with a dedicated exit code.
+    """
+    path = log_path(node, log_name)
+    if path is None:
+        return None
+    state = dict(node.base.extras.get(WATCH_EXTRAS_KEY, {}))
+    lines, state["log_offset"] = read_log_increment(transport, path, state.get("log_offset", 0), max_bytes=max_bytes)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    time_step = progress.read_latest_time_step(lines)
+    if node.get_scheduler_state() is not datastructures.JobState.RUNNING or "last_progress" not in state:
+        state["last_progress"] = now.isoformat()
+    elif time_step is not None and time_step.step != state.get("step"):
+        state["last_progress"] = now.isoformat()
+    if time_step is not None:
+        state["step"] = time_step.step
+    node.base.extras.set(WATCH_EXTRAS_KEY, state)
+
+    stopped = None
+    if detected := failures.detect_failure(stderr=[], stdout=lines, signatures=failures.DIVERGENCE_SIGNATURES):
+        stopped = {"exit_code_label": detected.signature.exit_code_label, "message": detected.line}
+    elif stall_timeout is not None:
+        stalled_seconds = (now - datetime.datetime.fromisoformat(state["last_progress"])).total_seconds()
+        if stalled_seconds > stall_timeout:
+            stopped = {
+                "exit_code_label": "ERROR_ICON_STALLED",
+                "message": f"no new time step for {stalled_seconds:.0f} seconds after step {state.get('step')}",
+            }
+    if stopped is None:
+        return None
+    node.base.extras.set(STOPPED_EXTRAS_KEY, stopped)
+    return calcjob_monitors.CalcJobMonitorResult(message=stopped["message"], override_exit_code=False)
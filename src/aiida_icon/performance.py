@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import datetime
+import json
+import re
+import statistics
+import sys
+import typing
+
+import click
+from aiida import orm
+
+from aiida_icon import search
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping, Sequence
+
+__all__ = [
+    "DEFAULT_GROUP_BY",
+    "EXTRAS_KEY",
+    "FINGERPRINT_FIELDS",
+    "Fingerprint",
+    "PerformanceHistory",
+    "Regression",
+    "RunRecord",
+    "detect_regressions",
+    "format_report",
+    "load_history",
+    "record_performance",
+]
+
+FINGERPRINT_FIELDS = ("grid", "resources", "computer", "code", "uenv")
+#: Runs are compared within groups of the same configuration, across changes of the software stack (code, uenv).
+DEFAULT_GROUP_BY = ("grid", "resources", "computer")
+
+#: The timer of the time loop, its number of calls is the number of time steps of a run (of the primary domain).
+STEP_TIMER = "integrate_nh"
+#: Extras key of the compact performance record of a finished run: its fingerprint and timers per time step.
+EXTRAS_KEY = "icon_performance"
+
+_UENV = re.compile(r"--uenv=(?P<name>\S+)(?:\s+--view=(?P<view>\S+))?")
+
+
+@dataclasses.dataclass(frozen=True)
+class Fingerprint:
+    """The configuration of a run: grid, resources (machines, ranks per machine, cores per rank), computer, code, uenv."""
+
+    grid: str | None
+    resources: tuple[int | None, int | None, int | None]
+    computer: str | None
+    code: str | None
+    uenv: str | None
+
+    def group_key(self, group_by: Sequence[str] = DEFAULT_GROUP_BY) -> tuple[typing.Any, ...]:
+        return tuple(getattr(self, field) for field in group_by)
+
+    def describe(self, fields: Sequence[str] = FINGERPRINT_FIELDS) -> str:
+        """
+        The fingerprint fields as text.
+
+        Examples:
+            >>> Fingerprint("R02B04", (4, 32, 2), "santis", "icon@santis", None).describe(DEFAULT_GROUP_BY)
+            'grid=R02B04 resources=4x32x2 computer=santis'
+        """
+        values = {
+            field: "x".join(str(value or "-") for value in self.resources)
+            if field == "resources"
+            else getattr(self, field)
+            for field in fields
+        }
+        return " ".join(f"{field}={value or '-'}" for field, value in values.items())
+
+
+def read_uenv(custom_scheduler_commands: str | None) -> str | None:
+    """
+    The uenv a job ran in, from the scheduler commands set by 'IconCalculationBuilder.set_uenv'.
+
+    Examples:
+        >>> read_uenv("#SBATCH --uenv=icon/25.2:v3 --view=default")
+        'icon/25.2:v3:default'
+        >>> read_uenv("#SBATCH --account=abc") is None
+        True
+    """
+    match = _UENV.search(custom_scheduler_commands or "")
+    if not match:
+        return None
+    return f"{match['name']}:{match['view']}" if match["view"] else match["name"]
+
+
+def timer_seconds(timer: Mapping[str, float]) -> float | None:
+    """Time spent in a timer (slowest rank), from an entry of the 'timer_report' output."""
+    return timer.get("total_max", timer.get("t_max"))
+
+
+def timers_per_step(report: Mapping[str, Mapping[str, float]]) -> dict[str, float] | None:
+    """
+    The timers of a 'timer_report' output in seconds per time step, None without the time loop timer.
+
+    Examples:
+        >>> timers_per_step({"total": {"total_max": 12.0}, "integrate_nh": {"calls": 4, "total_max": 10.0}})
+        {'total': 3.0, 'integrate_nh': 2.5}
+    """
+    steps = report.get(STEP_TIMER, {}).get("calls")
+    if not steps:
+        return None
+    return {name: seconds / steps for name, timer in report.items() if (seconds := timer_seconds(timer)) is not None}
+
+
+def read_fingerprint(
+    metadata: Mapping[str, typing.Any], *, computer: str | None, code: str | None, scheduler_commands: str | None
+) -> Fingerprint:
+    """The fingerprint of a run, from its experiment metadata (see 'aiida_icon.search') and what it ran on."""
+    return Fingerprint(
+        grid=metadata.get("grid"),
+        resources=(
+            metadata.get("num_machines"),
+            metadata.get("num_mpiprocs_per_machine"),
+            metadata.get("num_cores_per_mpiproc"),
+        ),
+        computer=computer,
+        code=f"{code}@{computer}" if code else None,
+        uenv=read_uenv(scheduler_commands),
+    )
+
+
+def record_performance(node: orm.CalcJobNode, report: Mapping[str, Mapping[str, float]]) -> None:
+    """
+    Store the fingerprint and the timers per time step of a run in its extras, for 'load_history'.
+
+    Called by the parser with the 'timer_report' output, nothing is stored without the time loop timer.
+    """
+    timers = timers_per_step(report)
+    if timers is None:
+        return
+    code = node.base.links.get_incoming(link_label_filter="code").first()
+    fingerprint = read_fingerprint(
+        node.base.extras.get(search.EXTRAS_KEY, None) or {},
+        computer=node.computer.label if node.computer else None,
+        code=code.node.label if code else None,
+        scheduler_commands=node.get_option("custom_scheduler_commands"),
+    )
+    node.base.extras.set(EXTRAS_KEY, {"fingerprint": dataclasses.asdict(fingerprint), "timers": timers})
+
+
+@dataclasses.dataclass(frozen=True)
+class RunRecord:
+    """The timers of a finished run, in seconds per time step."""
+
+    pk: int
+    ctime: datetime.datetime
+    fingerprint: Fingerprint
+    timers: Mapping[str, float]
+
+
+@dataclasses.dataclass
+class PerformanceHistory:
+    """Finished runs grouped by (a part of) their fingerprint, each group in chronological order."""
+
+    group_by: tuple[str, ...]
+    groups: dict[tuple[typing.Any, ...], list[RunRecord]] = dataclasses.field(default_factory=dict)
+
+    @classmethod
+    def from_records(
+        cls, records: Iterable[RunRecord], group_by: Sequence[str] = DEFAULT_GROUP_BY
+    ) -> PerformanceHistory:
+        groups: dict[tuple[typing.Any, ...], list[RunRecord]] = collections.defaultdict(list)
+        for record in sorted(records, key=lambda record: (record.ctime, record.pk)):
+            groups[record.fingerprint.group_key(group_by)].append(record)
+        return cls(group_by=tuple(group_by), groups=dict(groups))
+
+    def series(self, key: tuple[typing.Any, ...], timer: str) -> list[tuple[int, float]]:
+        """Time series ('(pk, seconds per time step)') of a timer in a group."""
+        return [(record.pk, record.timers[timer]) for record in self.groups[key] if timer in record.timers]
+
+
+def load_history(
+    *,
+    group_by: Sequence[str] = DEFAULT_GROUP_BY,
+    filters: Mapping[str, typing.Any] | None = None,
+) -> PerformanceHistory:
+    """
+    Collect the timers of all successfully finished IconCalculations.
+
+    Timers are normalized to seconds per time step (see 'STEP_TIMER'), so that runs of different length, like the
+    segments of a restarted experiment, compare. Runs without the time loop timer are left out. 'filters' are
+    additional filters on the experiment metadata, as for 'aiida_icon.search.query_experiments'.
+
+    The compact records stored by the parser (see 'record_performance') are read in a single query on the
+    calculations, the timer reports are only joined in for runs parsed without them. The records are kept per run
+    rather than as one series per fingerprint, because the parsers of concurrent runs would overwrite each other's
+    updates of a shared series.
+    """
+    if unknown := sorted(set(group_by) - set(FINGERPRINT_FIELDS)):
+        msg = f"Can not group by {', '.join(unknown)}, choose from {', '.join(FINGERPRINT_FIELDS)}."
+        raise ValueError(msg)
+    calc_filters = {
+        "process_type": search.PROCESS_TYPE,
+        "attributes.exit_status": 0,
+        **{f"extras.{search.EXTRAS_KEY}.{field}": condition for field, condition in (filters or {}).items()},
+    }
+    records = []
+    recorded = orm.QueryBuilder().append(
+        orm.CalcJobNode,
+        filters={**calc_filters, "extras": {"has_key": EXTRAS_KEY}},
+        project=["id", "ctime", f"extras.{EXTRAS_KEY}"],
+    )
+    for pk, ctime, record in recorded.iterall():
+        fingerprint = Fingerprint(**{**record["fingerprint"], "resources": tuple(record["fingerprint"]["resources"])})
+        records.append(RunRecord(pk=pk, ctime=ctime, fingerprint=fingerprint, timers=record["timers"]))
+
+    query = orm.QueryBuilder()
+    query.append(
+        orm.CalcJobNode,
+        tag="calc",
+        filters={**calc_filters, "extras": {"!has_key": EXTRAS_KEY}},
+        project=["id", "ctime", f"extras.{search.EXTRAS_KEY}", "attributes.custom_scheduler_commands"],
+    )
+    query.append(orm.Computer, with_node="calc", project=["label"])
+    query.append(orm.AbstractCode, with_outgoing="calc", edge_filters={"label": "code"}, project=["label"])
+    query.append(orm.Dict, with_incoming="calc", edge_filters={"label": "timer_report"}, project=["attributes"])
+    for pk, ctime, metadata, scheduler_commands, computer, code, report in query.iterall():
+        timers = timers_per_step(report)
+        if timers is None:
+            continue
+        fingerprint = read_fingerprint(
+            metadata or {}, computer=computer, code=code, scheduler_commands=scheduler_commands
+        )
+        records.append(RunRecord(pk=pk, ctime=ctime, fingerprint=fingerprint, timers=timers))
+    return PerformanceHistory.from_records(records, group_by)
+
+
+@dataclasses.dataclass(frozen=True)
+class Regression:
+    """A timer of a run which was significantly slower than in the runs of its group before."""
+
+    group: tuple[typing.Any, ...]
+    record: RunRecord
+    timer: str
+    value: float
+    baseline: float
+
+    @property
+    def ratio(self) -> float:
+        return self.value / self.baseline
+
+
+def detect_regressions(
+    history: PerformanceHistory,
+    *,
+    timers: Sequence[str] | None = None,
+    threshold: float = 0.1,
+    mad_factor: float = 3.0,
+    window: int = 10,
+    min_baseline: int = 3,
+    min_seconds: float = 1e-3,
+    since: datetime.datetime | None = None,
+) -> list[Regression]:
+    """
+    Flag timers of runs which are slower than the historical baseline of their group.
+
+    The baseline is the median of the timer over the previous 'window' runs of the group (at least 'min_baseline').
+    A timer is flagged if it is more than 'threshold' (relative) slower than the baseline and more than 'mad_factor'
+    median absolute deviations (scaled to a standard deviation), so that noisy timers need a larger slowdown.
+    Timers below 'min_seconds' per time step are ignored, 'since' only checks runs created from then on.
+
+    Examples:
+        >>> def run(pk, total):
+        ...     fingerprint = Fingerprint("R02B04", (1, 4, 1), "localhost", "icon@localhost", None)
+        ...     ctime = datetime.datetime(2025, 1, pk, tzinfo=datetime.timezone.utc)
+        ...     return RunRecord(pk, ctime, fingerprint, {"total": total})
+        >>> history = PerformanceHistory.from_records([run(1, 100), run(2, 102), run(3, 98), run(4, 101), run(5, 130)])
+        >>> [(regression.record.pk, round(regression.ratio, 2)) for regression in detect_regressions(history)]
+        [(5, 1.29)]
+    """
+    regressions = []
+    for key, records in history.groups.items():
+        for index, record in enumerate(records):
+            if since is not None and record.ctime < since:
+                continue
+            previous = records[max(0, index - window) : index]
+            for timer, value in record.timers.items():
+                if (timers is not None and timer not in timers) or value < min_seconds:
+                    continue
+                baseline_values = [run.timers[timer] for run in previous if timer in run.timers]
+                if len(baseline_values) < min_baseline:
+                    continue
+                baseline = statistics.median(baseline_values)
+                spread = 1.4826 * statistics.median(abs(past - baseline) for past in baseline_values)
+                if value > baseline * (1 + threshold) and value - baseline > mad_factor * spread:
+                    regressions.append(
+                        Regression(group=key, record=record, timer=timer, value=value, baseline=baseline)
+                    )
+    return regressions
+
+
+def format_report(history: PerformanceHistory, regressions: Sequence[Regression]) -> str:
+    """A text report of the regressions, by group and run, with the software stack of each run."""
+    if not regressions:
+        return f"No regressions in {sum(len(records) for records in history.groups.values())} runs."
+    by_run: dict[tuple[typing.Any, ...], dict[int, list[Regression]]] = collections.defaultdict(dict)
+    for regression in regressions:
+        by_run[regression.group].setdefault(regression.record.pk, []).append(regression)
+    lines = []
+    for key, runs in by_run.items():
+        records = history.groups[key]
+        lines.append(f"{records[0].fingerprint.describe(history.group_by)} ({len(records)} runs)")
+        for run_regressions in runs.values():
+            record = run_regressions[0].record
+            lines.append(
+                f"  pk {record.pk}  {record.ctime:%Y-%m-%d %H:%M}  "
+                f"code={record.fingerprint.code or '-'}  uenv={record.fingerprint.uenv or '-'}"
+            )
+            for regression in sorted(run_regressions, key=lambda regression: -regression.ratio):
+                lines.append(
+                    f"    {regression.timer:<32} {regression.ratio:5.2f}x  {regression.value:10.4f} s/step"
+                    f"  (baseline {regression.baseline:.4f})"
+                )
+    return "\n".join(lines)
+
+
+@click.command()
+@click.option("--profile", default=None, help="AiiDA profile, the default profile if not given.")
+@click.option(
+    "--group-by",
+    type=click.Choice(FINGERPRINT_FIELDS),
+    multiple=True,
+    default=DEFAULT_GROUP_BY,
+    show_default=True,
+    help="Fingerprint fields defining the groups of comparable runs.",
+)
+@click.option("--timer", "timers", multiple=True, help="Only check these timers (default: all).")
+@click.option("--threshold", type=float, default=0.1, show_default=True, help="Relative slowdown to flag.")
+@click.option("--window", type=int, default=10, show_default=True, help="Number of previous runs in the baseline.")
+@click.option("--min-seconds", type=float, default=1e-3, show_default=True, help="Ignore faster timers (per step).")
+@click.option("--since", type=click.DateTime(), default=None, help="Only check runs created from then on.")
+@click.option("--json", "as_json", is_flag=True, help="Print the regressions as JSON.")
+def main(
+    profile: str | None,
+    group_by: tuple[str, ...],
+    timers: tuple[str, ...],
+    threshold: float,
+    window: int,
+    min_seconds: float,
+    since: datetime.datetime | None,
+    as_json: bool,  # noqa: FBT001  # click flag
+) -> None:
+    """Report IconCalculations (or their timers) which are slower than earlier runs of the same configuration."""
+    import aiida
+
+    aiida.load_profile(profile)
+    history = load_history(group_by=group_by)
+    regressions = detect_regressions(
+        history,
+        timers=timers or None,
+        threshold=threshold,
+        window=window,
+        min_seconds=min_seconds,
+        since=since.astimezone() if since else None,
+    )
+    if as_json:
+        json.dump(
+            [
+                {
+                    "pk": regression.record.pk,
+                    "group": regression.record.fingerprint.describe(group_by),
+                    "code": regression.record.fingerprint.code,
+                    "uenv": regression.record.fingerprint.uenv,
+                    "timer": regression.timer,
+                    "seconds_per_step": regression.value,
+                    "baseline": regression.baseline,
+                    "ratio": regression.ratio,
+                }
+                for regression in regressions
+            ],
+            sys.stdout,
+            indent=2,
+        )
+        click.echo()
+    else:
+        click.echo(format_report(history, regressions))
+    if regressions:
+        sys.exit(1)
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import datetime
+import pathlib
+import typing
+
+from aiida import orm
+
+from aiida_icon import calcutils
+from aiida_icon.iconutils import masternml, modelnml, namelists
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Mapping
+
+__all__ = [
+    "EXTRAS_KEY",
+    "GROUP_FIELDS",
+    "PROCESS_TYPE",
+    "ExperimentGroup",
+    "experiment_group_label",
+    "experiment_metadata",
+    "index_experiments",
+    "query_experiments",
+    "record_experiment_metadata",
+]
+
+#: IconCalculations store their experiment metadata in this extra (a dict, see 'experiment_metadata').
+EXTRAS_KEY = "icon"
+PROCESS_TYPE = "aiida.calculations:icon.icon"
+#: Metadata fields which IconCalculations are also grouped by (one 'ExperimentGroup' per value), so that exact
+#: matches on them are indexed lookups. 'model_name' groups by every entry of 'model_names'.
+GROUP_FIELDS = ("grid", "grid_filename", "restart", "model_name")
+
+
+class ExperimentGroup(orm.Group):
+    """All IconCalculations with the same value of one metadata field, labelled by 'experiment_group_label'."""
+
+
+def experiment_group_label(field: str, value: typing.Any) -> str:
+    """
+    Label of the 'ExperimentGroup' of the IconCalculations with the given value of a metadata field.
+
+    Examples:
+        >>> experiment_group_label("grid", "R02B04")
+        'icon/grid/R02B04'
+        >>> experiment_group_label("restart", True)
+        'icon/restart/true'
+    """
+    if isinstance(value, bool):
+        value = str(value).lower()
+    return f"icon/{field}/{value}"
+
+
+def _format_date(value: datetime.datetime | str) -> str:
+    """Dates are stored as 'YYYY-MM-DDThh:mm:ssZ' (UTC), so that comparing them as strings compares them as dates."""
+    if isinstance(value, str):
+        value = masternml.parse_iso_datetime(value)
+    return masternml.format_iso_datetime(value)
+
+
+def experiment_metadata(inputs: calcutils.ReadMapProtocol) -> dict[str, typing.Any]:
+    """
+    Key facts about the experiment of an IconCalculation, read from its inputs.
+
+    Namelist-derived fields are None where they can not be read (for example from model namelists given as
+    remote paths).
+
+    Examples:
+        >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+        >>> inputs = {
+        ...     "master_namelist": orm.SinglefileData.from_string(
+        ...         "&master_nml\\nlrestart=.true.\\n/\\n"
+        ...         "&master_time_control_nml\\nexperimentStartDate='2000-01-01T00:00:00Z'\\n/\\n"
+        ...         "&master_model_nml\\nmodel_name='atm'\\n/"
+        ...     ),
+        ...     "models": {"atm": orm.SinglefileData.from_string("&grid_nml\\ndynamics_grid_filename='grid_R02B04.nc'\\n/")},
+        ...     "metadata": {"options": {"resources": {"num_machines": 2, "num_mpiprocs_per_machine": 4}}},
+        ... }
+        >>> metadata = experiment_metadata(inputs)
+        >>> metadata["grid"], metadata["start_date"], metadata["restart"], metadata["total_mpiprocs"]
+        ('R02B04', '2000-01-01T00:00:00Z', True, 8)
+    """
+    master_nml = inputs["master_namelist"]
+    model_nml = calcutils.collect_model_nml(inputs)
+    models_are_local = not any(isinstance(model, orm.RemoteData) for model in inputs.get("models", {}).values())
+    if "dynamics_grid_file" in inputs:
+        grid_filename: str | None = pathlib.PurePosixPath(inputs["dynamics_grid_file"].get_remote_path()).name
+    else:
+        grid_filename = modelnml.read_dynamics_grid_filename(model_nml)
+    start, stop = masternml.read_experiment_period(master_nml)
+    master_data = namelists.namelists_data(master_nml)
+    resources = dict(inputs.get("metadata", {}).get("options", {}).get("resources", {}))
+    num_machines = resources.get("num_machines")
+    num_mpiprocs_per_machine = resources.get("num_mpiprocs_per_machine")
+    return {
+        "grid_filename": grid_filename,
+        "grid": modelnml.read_grid_resolution(grid_filename) if grid_filename else None,
+        "start_date": _format_date(start) if start else None,
+        "stop_date": _format_date(stop) if stop else None,
+        "time_step": masternml.read_model_time_step(master_nml, model_nml),
+        "restart": bool(master_data.get("master_nml", {}).get("lrestart", False)),
+        "model_names": calcutils.read_model_names(master_data),
+        "num_output_streams": len(modelnml.read_output_stream_infos(model_nml)) if models_are_local else None,
+        "num_machines": num_machines,
+        "num_mpiprocs_per_machine": num_mpiprocs_per_machine,
+        "num_cores_per_mpiproc": resources.get("num_cores_per_mpiproc"),
+        "total_mpiprocs": num_machines * num_mpiprocs_per_machine
+        if num_machines and num_mpiprocs_per_machine
+        else None,
+    }
+
+
+def _group_labels(metadata: Mapping[str, typing.Any]) -> list[str]:
+    values = {field: [metadata.get(field)] for field in GROUP_FIELDS if field != "model_name"}
+    values["model_name"] = list(metadata.get("model_names") or [])
+    return [
+        experiment_group_label(field, value)
+        for field, field_values in values.items()
+        for value in field_values
+        if value is not None
+    ]
+
+
+def _add_to_experiment_groups(node: orm.Node, metadata: Mapping[str, typing.Any]) -> None:
+    for label in _group_labels(metadata):
+        group, _ = ExperimentGroup.collection.get_or_create(label)
+        group.add_nodes(node)
+
+
+def record_experiment_metadata(node: orm.Node, inputs: calcutils.ReadMapProtocol) -> None:
+    """
+    Store the experiment metadata of a calculation in its extras, to make it searchable.
+
+    A stored node is also added to the 'ExperimentGroup's of its metadata (see 'GROUP_FIELDS').
+    """
+    metadata = experiment_metadata(inputs)
+    node.base.extras.set(EXTRAS_KEY, metadata)
+    if node.is_stored:
+        _add_to_experiment_groups(node, metadata)
+
+
+def index_experiments() -> int:
+    """
+    Add the IconCalculations recorded before 'ExperimentGroup's existed to their groups.
+
+    Returns the number of calculations that were looked at. Running it again is harmless.
+    """
+    query = orm.QueryBuilder().append(
+        orm.CalcJobNode,
+        filters={"process_type": PROCESS_TYPE, "extras": {"has_key": EXTRAS_KEY}},
+        project=["*", f"extras.{EXTRAS_KEY}"],
+    )
+    count = 0
+    for node, metadata in query.iterall():
+        _add_to_experiment_groups(node, metadata)
+        count += 1
+    return count
+
+
+def query_experiments(
+    *,
+    grid: str | None = None,
+    grid_filename: str | None = None,
+    start_from: datetime.datetime | str | None = None,
+    start_until: datetime.datetime | str | None = None,
+    restart: bool | None = None,
+    model_name: str | None = None,
+    filters: Mapping[str, typing.Any] | None = None,
+) -> orm.QueryBuilder:
+    """
+    Query IconCalculations by their experiment metadata, in a single database query.
+
+    'start_from' / 'start_until' bound the experiment start date (inclusive), 'filters' are additional filters
+    on the metadata fields (see 'experiment_metadata'), for example '{"total_mpiprocs": {">": 128}}'.
+
+    'grid', 'grid_filename', 'restart' and 'model_name' are looked up through the 'ExperimentGroup's (indexed
+    labels and group memberships). The start date bounds and 'filters' compare the extras, which no index can
+    serve (aiida-core compares JSON values through expressions), but only for the calculations the groups let
+    through. Calculations recorded before the groups existed are found only after 'index_experiments'.
+
+    Examples:
+        >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+        >>> query = query_experiments(grid="R02B04", start_from="2000-01-01T00:00:00Z", restart=True)
+        >>> restarted_r2b4_runs = query.all(flat=True)
+    """
+    group_values = {"grid": grid, "grid_filename": grid_filename, "restart": restart, "model_name": model_name}
+    conditions: dict[str, typing.Any] = {}
+    start_bounds = []
+    if start_from is not None:
+        start_bounds.append({">=": _format_date(start_from)})
+    if start_until is not None:
+        start_bounds.append({"<=": _format_date(start_until)})
+    if start_bounds:
+        conditions["start_date"] = {"and": start_bounds}
+    conditions.update(filters or {})
+    query = orm.QueryBuilder().append(
+        orm.CalcJobNode,
+        tag="calc",
+        filters={
+            "process_type": PROCESS_TYPE,
+            **{f"extras.{EXTRAS_KEY}.{field}": condition for field, condition in conditions.items()},
+        },
+        project="*",
+    )
+    for field, value in group_values.items():
+        if value is not None:
+            query.append(
+                ExperimentGroup,
+                with_node="calc",
+                filters={"label": experiment_group_label(field, value)},
+                tag=f"group_{field}",
+            )
+    return query
@@ -1,19 +1,49 @@
 import pathlib
+import typing
+import warnings
 
+from aiida import orm
 from aiida.engine import processes
 
 from aiida_icon import builder, tools
+from aiida_icon.iconutils import modelnml
+from aiida_icon.site_support import openmp, profiles, topology
 
-__all__ = ["SCRIPT_DIR", "common_alps_setup"]
+__all__ = [
+    "GH200_CPU_PROFILE_FILE",
+    "GH200_GPU_PROFILE_FILE",
+    "GH200_GPU_RESOURCES",
+    "GH200_PROFILE_FILE",
+    "GH200_TOPOLOGY",
+    "PROFILE_DIR",
+    "common_alps_gpu_setup",
+    "common_alps_setup",
+]
 
 
-SCRIPT_DIR = pathlib.Path(__file__).parent.absolute() / "wrapper_scripts"
+PROFILE_DIR = pathlib.Path(__file__).parent.absolute() / "profiles"
+_SCRIPT_DIR = pathlib.Path(__file__).parent.absolute() / "wrapper_scripts"
+
+#: Site profiles (registered as 'cscs.alps-gh200', 'cscs.alps-gh200-cpu' and 'cscs.alps-gh200-gpu').
+GH200_PROFILE_FILE = PROFILE_DIR / "alps-gh200.yaml"
+GH200_CPU_PROFILE_FILE = PROFILE_DIR / "alps-gh200-cpu.yaml"
+GH200_GPU_PROFILE_FILE = PROFILE_DIR / "alps-gh200-gpu.yaml"
+
+#: Grace-Hopper nodes: four GH200 modules with one NUMA domain of 72 Neoverse V2 cores and one GPU each (no SMT).
+GH200_TOPOLOGY = topology.MachineTopology(sockets=4, numa_per_socket=1, cores_per_numa=72, gpus_per_numa=1)
+
+#: One rank per GPU, the host side of the GPU build of ICON does not need more than one core.
+GH200_GPU_RESOURCES = {"num_mpiprocs_per_machine": 4, "num_cores_per_mpiproc": 1}
 
 
 def common_alps_setup(icon_builder: processes.ProcessBuilder, *, uenv: tools.Uenv | None = None) -> None:
     """
     Set AiiDA process options for running an aiida_icon.icon calcjob on ALPS.
 
+    The environment variables and the uenv come from the 'cscs.alps-gh200' site profile, which can be overridden
+    (see `profiles.get_profile`).
+
+    OpenMP threading is derived from the resources (see `openmp.setup_openmp`), set them beforehand.
     Works with both IconCalculationBuilder as well as vanilla ProcessBuilder.
 
     Examples:
@@ -31,6 +61,8 @@ def common_alps_setup(icon_builder: processes.ProcessBuilder, *, uenv: tools.Uen
         '0.001'
         >>> vanilla_builder.metadata.options.environment_variables["foo"]
         'bar'
+        >>> vanilla_builder.metadata.options.environment_variables["OMP_NUM_THREADS"]  # IconCalculation default
+        '2'
         >>> vanilla_builder.metadata.options.custom_scheduler_commands
         '#SBATCH --custom-option=5\\n#SBATCH --uenv=icon/25.2:v3 --view=default'
 
@@ -54,30 +86,78 @@ def common_alps_setup(icon_builder: processes.ProcessBuilder, *, uenv: tools.Uen
         '#SBATCH --custom-option=5\\n#SBATCH --uenv=icon/25.2:v3 --view=default'
 
     """
-    uenv = uenv or tools.Uenv(name="icon/25.2:v3", view="default")
+    profile = profiles.get_profile("cscs.alps-gh200")
     options = icon_builder.metadata.options  # type: ignore[attr-defined]  # builder has a custom setattr
+    options.environment_variables = builder.ensure_dict(options.environment_variables) | profile.environment_variables  # type: ignore[attr-defined]
+    profiles.set_uenv(icon_builder, uenv or profile.uenv or tools.Uenv(name="icon/25.2:v3", view="default"))
+    openmp.setup_openmp(icon_builder)
+
+
+def common_alps_gpu_setup(
+    icon_builder: processes.ProcessBuilder,
+    *,
+    num_machines: int = 1,
+    num_cells: int | None = None,
+    model_name: str = "atm",
+    uenv: tools.Uenv | None = None,
+) -> None:
+    """
+    Set up an aiida_icon.icon calcjob for the GPU build of ICON on the GH200 nodes of ALPS.
+
+    Uses one rank per GPU (see 'GH200_GPU_RESOURCES'), a wrapper script binding each rank to its GPU and the
+    NUMA domain it is attached to and sets a GPU friendly 'nproma' (see 'modelnml.gpu_nproma') in the model
+    namelist (`.models[model_name]` or `.model_namelist`), which therefore has to be set before.
+    The number of grid cells is read from the name of the dynamics grid file unless given.
+
+    Works with both IconCalculationBuilder as well as vanilla ProcessBuilder.
 
-    alps_environment_variables = {
-        "CUDA_BUFFER_PAGE_IN_THRESHOLD": "0.001",
-        "FI_CXI_SAFE_DEVMEM_COPY_THRESHOLD": "0",
-        "FI_CXI_RX_MATCH_NODE": "software",
-        "FI_MR_CACHE_MONITOR": "disabled",
-        "MPICH_GPU_SUPPORT_ENABLED": "1",
-        "NVCOMPILER_ACC_DEFER_UPLOADS": "1",
-        "NVCOMPILER_TERM": "trace",
-        "OMP_NUM_THREADS": "1",
-        "ICON_THREADS": "1",
-        "OMP_SCHEDULE": "static,1",
-        "OMP_DYNAMIC": "false",
-        "OMP_STACKSIZE": "200M",
-    }
-    options.environment_variables = builder.ensure_dict(options.environment_variables) | alps_environment_variables  # type: ignore[attr-defined]
-    if isinstance(icon_builder, builder.IconCalculationBuilder):
-        icon_builder.set_uenv(uenv.name, view=uenv.view, overwrite=False)
+    Examples:
+
+        >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+        >>> from aiida_icon import calculations
+        >>> icon_builder = calculations.IconCalculation.get_builder()
+        >>> icon_builder.models["atm"] = orm.SinglefileData.from_string("&parallel_nml\\nnproma=32\\n/")
+        >>> common_alps_gpu_setup(icon_builder, num_machines=2, num_cells=20480)
+        >>> icon_builder.metadata.options.resources
+        {'num_machines': 2, 'num_mpiprocs_per_machine': 4, 'num_cores_per_mpiproc': 1}
+        >>> print(icon_builder.models["atm"].get_content(mode="r").strip())
+        &parallel_nml
+            nproma = 2816
+        /
+    """
+    options = icon_builder.metadata.options  # type: ignore[attr-defined]  # builder has a custom setattr
+    options.resources = {"num_machines": num_machines, **GH200_GPU_RESOURCES}
+    common_alps_setup(icon_builder, uenv=uenv)
+    topology.setup_topology_wrapper_script(icon_builder, GH200_TOPOLOGY, bind_gpus=True)
+
+    models = icon_builder.models  # type: ignore[attr-defined]  # dynamic port namespace
+    model_nml = models[model_name] if model_name in models else icon_builder.get("model_namelist")
+    if model_nml is None:
+        msg = f"Set the model namelist ('models.{model_name}' or 'model_namelist') before the GPU setup."
+        raise ValueError(msg)
+    if num_cells is None and (grid_file := icon_builder.get("dynamics_grid_file")) is not None:
+        num_cells = modelnml.read_grid_num_cells(pathlib.Path(grid_file.get_remote_path()).name)
+    if num_cells is None:
+        msg = "Could not read the number of grid cells from the dynamics grid file name, pass 'num_cells'."
+        raise ValueError(msg)
+    nproma = modelnml.gpu_nproma(
+        model_nml, num_cells=num_cells, total_mpiprocs=num_machines * GH200_GPU_RESOURCES["num_mpiprocs_per_machine"]
+    )
+    patched = modelnml.modify_model_nml(model_nml, orm.Dict({"parallel_nml": {"nproma": nproma}}))
+    if model_name in models:
+        models[model_name] = patched
     else:
-        options.custom_scheduler_commands = "\n".join(
-            [
-                *options.custom_scheduler_commands.splitlines(),
-                f"#SBATCH --uenv={uenv.name} --view={uenv.view}",
-            ]
+        icon_builder.model_namelist = patched  # type: ignore[attr-defined]  # builder has a custom setattr
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name == "SCRIPT_DIR":
+        warnings.warn(
+            "alps.SCRIPT_DIR and its static wrapper scripts are deprecated, the wrapper script is generated from "
+            "the resources (see 'aiida_icon.site_support.topology.setup_topology_wrapper_script').",
+            DeprecationWarning,
+            stacklevel=2,
         )
+        return _SCRIPT_DIR
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
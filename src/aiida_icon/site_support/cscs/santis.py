@@ -1,15 +1,36 @@
-import aiida
 from aiida.engine import processes
 
-from aiida_icon import builder, tools
+from aiida_icon import tools
+from aiida_icon.site_support import topology
 from aiida_icon.site_support.cscs import alps
 
-__all__ = ["setup_for_santis_cpu"]
+__all__ = ["setup_for_santis_cpu", "setup_for_santis_gpu"]
 
 
 def setup_for_santis_cpu(icon_builder: processes.ProcessBuilder, *, uenv: tools.Uenv | None = None) -> None:
-    """Set up the wrapper script for running on todi."""
+    """
+    Set up the wrapper script for running on santis.
+
+    The wrapper script binds the ranks to cores and NUMA domains and is generated from the resources, set them
+    beforehand. Otherwise the IconCalculation default resources are used and set.
+    """
     alps.common_alps_setup(icon_builder, uenv=uenv)
-    if not isinstance(icon_builder, builder.IconCalculationBuilder):
-        builder.prepare_builder_for_wrapper_script(icon_builder)
-    icon_builder.wrapper_script = aiida.orm.SinglefileData(file=alps.SCRIPT_DIR / "gh200_cpu.sh")
+    topology.setup_topology_wrapper_script(icon_builder, alps.GH200_TOPOLOGY)
+
+
+def setup_for_santis_gpu(
+    icon_builder: processes.ProcessBuilder,
+    *,
+    num_machines: int = 1,
+    num_cells: int | None = None,
+    model_name: str = "atm",
+    uenv: tools.Uenv | None = None,
+) -> None:
+    """
+    Set up resources, wrapper script and 'nproma' for running the GPU build of ICON on santis.
+
+    See `alps.common_alps_gpu_setup`, the model namelist must be set on the builder beforehand.
+    """
+    alps.common_alps_gpu_setup(
+        icon_builder, num_machines=num_machines, num_cells=num_cells, model_name=model_name, uenv=uenv
+    )
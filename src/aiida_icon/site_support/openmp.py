@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+import warnings
+
+from aiida_icon import builder
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+    from aiida.engine import processes
+
+__all__ = ["OpenMPSettings", "check_openmp", "openmp_settings", "setup_openmp"]
+
+
+@dataclasses.dataclass(frozen=True)
+class OpenMPSettings:
+    num_threads: int
+    places: str = "cores"
+    proc_bind: str = "close"
+    stacksize: str = "200M"
+
+    def environment_variables(self) -> dict[str, str]:
+        """
+        Environment variables for ICON (which reads 'ICON_THREADS' in addition to the OpenMP variables).
+
+        Examples:
+            >>> OpenMPSettings(num_threads=4).environment_variables()["ICON_THREADS"]
+            '4'
+        """
+        return {
+            "OMP_NUM_THREADS": str(self.num_threads),
+            "ICON_THREADS": str(self.num_threads),
+            "OMP_PLACES": self.places,
+            "OMP_PROC_BIND": self.proc_bind,
+            "OMP_STACKSIZE": self.stacksize,
+        }
+
+    @property
+    def launcher_param(self) -> str:
+        """srun does not inherit '--cpus-per-task' from the job allocation (since SLURM 22.05), it has to be repeated."""
+        return f"--cpus-per-task={self.num_threads}"
+
+
+def openmp_settings(resources: Mapping[str, int], *, stacksize: str = "200M") -> OpenMPSettings:
+    """
+    One OpenMP thread per core of each MPI process, each thread pinned to its own core.
+
+    Examples:
+        >>> openmp_settings({"num_machines": 1, "num_mpiprocs_per_machine": 64, "num_cores_per_mpiproc": 4})
+        OpenMPSettings(num_threads=4, places='cores', proc_bind='close', stacksize='200M')
+    """
+    return OpenMPSettings(num_threads=resources.get("num_cores_per_mpiproc", 1), stacksize=stacksize)
+
+
+def check_openmp(
+    settings: OpenMPSettings, *, environment_variables: Mapping[str, str], mpirun_extra_params: Sequence[str]
+) -> list[str]:
+    """
+    Find environment variables and launcher parameters which contradict the OpenMP settings.
+
+    Returns a list of problems, which is empty if everything is consistent.
+
+    Examples:
+        >>> settings = OpenMPSettings(num_threads=2)
+        >>> check_openmp(settings, environment_variables={"OMP_NUM_THREADS": "2"}, mpirun_extra_params=[])
+        []
+        >>> for problem in check_openmp(
+        ...     settings,
+        ...     environment_variables={"OMP_NUM_THREADS": "1", "ICON_THREADS": "1"},
+        ...     mpirun_extra_params=["--cpus-per-task=4"],
+        ... ):
+        ...     print(problem)
+        OMP_NUM_THREADS=1 contradicts 2 core(s) per MPI process.
+        ICON_THREADS=1 contradicts 2 core(s) per MPI process.
+        --cpus-per-task=4 contradicts 2 core(s) per MPI process.
+    """
+    problems = [
+        f"{name}={environment_variables[name]} contradicts {settings.num_threads} core(s) per MPI process."
+        for name in ("OMP_NUM_THREADS", "ICON_THREADS")
+        if name in environment_variables and str(environment_variables[name]) != str(settings.num_threads)
+    ]
+    problems.extend(
+        f"{param} contradicts {settings.num_threads} core(s) per MPI process."
+        for param in mpirun_extra_params
+        if param.startswith("--cpus-per-task=") and param != settings.launcher_param
+    )
+    return problems
+
+
+def setup_openmp(
+    icon_builder: processes.ProcessBuilder, *, stacksize: str = "200M", wrapper_script_name: str = "run_icon.sh"
+) -> None:
+    """
+    Configure OpenMP threading consistently with the resources, which should be set on the builder beforehand.
+
+    Sets the OpenMP environment variables and the matching '--cpus-per-task' launcher parameter (in front of the
+    wrapper script, if there is one). Settings contradicting the resources are replaced with a warning.
+    Works with both IconCalculationBuilder as well as vanilla ProcessBuilder.
+
+    Examples:
+        >>> from aiida_icon.calculations import IconCalculation
+        >>> icon_builder = IconCalculation.get_builder()
+        >>> icon_builder.metadata.options.resources = {
+        ...     "num_machines": 1,
+        ...     "num_mpiprocs_per_machine": 72,
+        ...     "num_cores_per_mpiproc": 4,
+        ... }
+        >>> setup_openmp(icon_builder)
+        >>> icon_builder.metadata.options.environment_variables["OMP_NUM_THREADS"]
+        '4'
+        >>> icon_builder.metadata.options.mpirun_extra_params
+        ['--cpus-per-task=4']
+    """
+    options = icon_builder.metadata.options  # type: ignore[attr-defined]  # builder has a custom setattr
+    settings = openmp_settings(options.resources, stacksize=stacksize)
+    environment_variables = builder.ensure_dict(options.environment_variables)
+    mpirun_extra_params = builder.ensure_list(options.mpirun_extra_params)
+    for problem in check_openmp(
+        settings, environment_variables=environment_variables, mpirun_extra_params=mpirun_extra_params
+    ):
+        warnings.warn(f"{problem} Replacing it.", stacklevel=2)
+
+    options.environment_variables = environment_variables | settings.environment_variables()
+    if any(param.startswith("--cpus-per-task=") for param in mpirun_extra_params):
+        options.mpirun_extra_params = [
+            settings.launcher_param if param.startswith("--cpus-per-task=") else param for param in mpirun_extra_params
+        ]
+        return
+    wrapper_param = f"./{wrapper_script_name}"
+    position = (
+        mpirun_extra_params.index(wrapper_param) if wrapper_param in mpirun_extra_params else len(mpirun_extra_params)
+    )
+    options.mpirun_extra_params = [
+        *mpirun_extra_params[:position],
+        settings.launcher_param,
+        *mpirun_extra_params[position:],
+    ]
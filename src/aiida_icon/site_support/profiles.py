@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import dataclasses
+import functools
+import importlib.metadata
+import os
+import pathlib
+import string
+import typing
+from collections.abc import Mapping
+
+import aiida.orm
+import yaml
+
+from aiida_icon import builder, tools
+from aiida_icon.site_support import openmp, topology
+
+if typing.TYPE_CHECKING:
+    from aiida.engine import processes
+
+__all__ = [
+    "ENTRY_POINT_GROUP",
+    "PROFILE_PATH_VARIABLE",
+    "SiteProfile",
+    "apply_profile",
+    "available_profiles",
+    "get_profile",
+    "load_profile_file",
+    "set_uenv",
+]
+
+ENTRY_POINT_GROUP = "aiida_icon.site_profiles"
+PROFILE_PATH_VARIABLE = "AIIDA_ICON_SITE_PROFILE_PATH"
+
+
+@dataclasses.dataclass(frozen=True)
+class SiteProfile:
+    """
+    Declarative description of how to run ICON on a machine, usually loaded from a YAML file:
+
+    .. code-block:: yaml
+
+        description: My cluster, CPU partition
+        extends: other.profile  # optional, mappings are merged, everything else is replaced
+        uenv: {name: icon/25.2:v3, view: default}
+        environment_variables: {FI_MR_CACHE_MONITOR: disabled}
+        scheduler_commands: ["#SBATCH --constraint=mc"]
+        topology: {sockets: 2, numa_per_socket: 4, cores_per_numa: 16, threads_per_core: 2}
+        resources: {num_mpiprocs_per_machine: 128, num_cores_per_mpiproc: 1}
+        mpirun_extra_params: ["--distribution=block:block"]
+        openmp: true  # derive OpenMP threading from the resources
+        bind_gpus: false
+        wrapper_template: null  # string.Template for the wrapper script, generated from the topology if null
+
+    Profiles are registered under the 'aiida_icon.site_profiles' entry point group (pointing to the path of the
+    file, a SiteProfile or a callable returning either) or found as '<name>.yaml' in the directories listed in
+    the 'AIIDA_ICON_SITE_PROFILE_PATH' environment variable. They are only loaded when requested.
+    """
+
+    name: str
+    description: str = ""
+    uenv: tools.Uenv | None = None
+    environment_variables: dict[str, str] = dataclasses.field(default_factory=dict)
+    scheduler_commands: list[str] = dataclasses.field(default_factory=list)
+    topology: topology.MachineTopology | None = None
+    resources: dict[str, int] = dataclasses.field(default_factory=dict)
+    mpirun_extra_params: list[str] = dataclasses.field(default_factory=list)
+    openmp: bool = True
+    bind_gpus: bool = False
+    wrapper_template: str | None = None
+
+    @classmethod
+    def from_dict(cls, name: str, data: Mapping[str, typing.Any]) -> SiteProfile:
+        """
+        Create a profile from its (YAML) representation, resolving 'extends' through the registry.
+
+        Examples:
+            >>> profile = SiteProfile.from_dict(
+            ...     "example",
+            ...     {"uenv": {"name": "icon/25.2:v3"}, "environment_variables": {"OMP_SCHEDULE": "static,1"}},
+            ... )
+            >>> profile.uenv
+            Uenv(name='icon/25.2:v3', view='')
+            >>> SiteProfile.from_dict("example", {"nodes": 3})
+            Traceback (most recent call last):
+            ValueError: Unknown keys in site profile 'example': nodes.
+        """
+        data = dict(data)
+        if base_name := data.pop("extends", None):
+            data = _merge(_as_dict(get_profile(base_name)), data)
+        fields = {field.name for field in dataclasses.fields(cls)} - {"name"}
+        if unknown := sorted(set(data) - fields):
+            msg = f"Unknown keys in site profile '{name}': {', '.join(unknown)}."
+            raise ValueError(msg)
+        if (uenv := data.get("uenv")) is not None:
+            data["uenv"] = tools.Uenv(**uenv)
+        if (machine := data.get("topology")) is not None:
+            data["topology"] = topology.MachineTopology(**machine)
+        data["environment_variables"] = {
+            key: str(value) for key, value in data.get("environment_variables", {}).items()
+        }
+        return cls(name=name, **data)
+
+
+def _as_dict(profile: SiteProfile) -> dict[str, typing.Any]:
+    data = dataclasses.asdict(profile)
+    del data["name"]
+    return data
+
+
+def _merge(base: Mapping[str, typing.Any], override: Mapping[str, typing.Any]) -> dict[str, typing.Any]:
+    """
+    Merge mappings recursively, anything else in 'override' replaces the value in 'base'.
+
+    Examples:
+        >>> _merge({"env": {"A": "1", "B": "2"}, "params": ["-x"]}, {"env": {"B": "3"}, "params": ["-y"]})
+        {'env': {'A': '1', 'B': '3'}, 'params': ['-y']}
+    """
+    result = dict(base)
+    for key, value in override.items():
+        if isinstance(value, Mapping) and isinstance(result.get(key), Mapping):
+            result[key] = _merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def load_profile_file(path: pathlib.Path, name: str | None = None) -> SiteProfile:
+    """Load a profile from a YAML file, named after the file unless 'name' is given."""
+    data = yaml.safe_load(path.read_text()) or {}
+    return SiteProfile.from_dict(name or path.stem, data)
+
+
+def _profile_directories() -> list[pathlib.Path]:
+    return [pathlib.Path(entry) for entry in os.environ.get(PROFILE_PATH_VARIABLE, "").split(os.pathsep) if entry]
+
+
+def available_profiles() -> list[str]:
+    """Names of all registered profiles and profile files on the search path, without loading them."""
+    names = {entry_point.name for entry_point in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP)}
+    for directory in _profile_directories():
+        names.update(path.stem for path in directory.glob("*.yaml"))
+    return sorted(names)
+
+
+def _resolve(name: str, obj: typing.Any) -> SiteProfile:
+    match obj:
+        case SiteProfile():
+            return obj
+        case str() | pathlib.Path():
+            return load_profile_file(pathlib.Path(obj), name)
+        case Mapping():
+            return SiteProfile.from_dict(name, obj)
+        case _ if callable(obj):
+            return _resolve(name, obj())
+        case _:
+            msg = f"Site profile entry point '{name}' does not point to a profile, a path or a callable."
+            raise TypeError(msg)
+
+
+@functools.cache
+def get_profile(name: str) -> SiteProfile:
+    """
+    Load a profile by name, files on the search path take precedence over entry points.
+
+    Examples:
+        >>> get_profile("cscs.alps-gh200-cpu").resources
+        {'num_mpiprocs_per_machine': 288, 'num_cores_per_mpiproc': 1}
+    """
+    for directory in _profile_directories():
+        if (path := directory / f"{name}.yaml").is_file():
+            return load_profile_file(path, name)
+    entry_points = importlib.metadata.entry_points(group=ENTRY_POINT_GROUP, name=name)
+    if not entry_points:
+        msg = f"Unknown site profile '{name}', available: {', '.join(available_profiles())}."
+        raise KeyError(msg)
+    return _resolve(name, next(iter(entry_points)).load())
+
+
+def set_uenv(icon_builder: processes.ProcessBuilder, uenv: tools.Uenv) -> None:
+    """Run in a UENV, works with both IconCalculationBuilder (idempotent) as well as vanilla ProcessBuilder."""
+    options = icon_builder.metadata.options  # type: ignore[attr-defined]  # builder has a custom setattr
+    if isinstance(icon_builder, (builder.IconCalculationBuilder, builder.IconPackedCalculationBuilder)):
+        icon_builder.set_uenv(uenv.name, view=uenv.view, overwrite=False)
+    else:
+        options.custom_scheduler_commands = "\n".join(
+            [
+                *options.custom_scheduler_commands.splitlines(),
+                f"#SBATCH --uenv={uenv.name} --view={uenv.view}",
+            ]
+        )
+
+
+def apply_profile(
+    icon_builder: processes.ProcessBuilder,
+    profile: SiteProfile | str,
+    *,
+    resources: Mapping[str, int] | None = None,
+) -> None:
+    """
+    Configure a builder for running on the machine described by a profile.
+
+    'resources' override the profile's default resources. The wrapper script is rendered from the profile's
+    template (with the resources and 'num_threads' as placeholders) or generated from its topology.
+    Works with both IconCalculationBuilder as well as vanilla ProcessBuilder.
+
+    Examples:
+        >>> from aiida_icon.calculations import IconCalculation
+        >>> icon_builder = IconCalculation.get_builder()
+        >>> apply_profile(icon_builder, "cscs.alps-gh200-cpu", resources={"num_machines": 2})
+        >>> icon_builder.metadata.options.resources
+        {'num_machines': 2, 'num_mpiprocs_per_machine': 288, 'num_cores_per_mpiproc': 1}
+        >>> icon_builder.metadata.options.mpirun_extra_params
+        ['--threads-per-core=1', '--distribution=block:block:block', '--cpus-per-task=1', '--cpu-bind=none', './run_icon.sh']
+    """
+    if isinstance(profile, str):
+        profile = get_profile(profile)
+    options = icon_builder.metadata.options  # type: ignore[attr-defined]  # builder has a custom setattr
+    options.resources = {"num_machines": 1} | profile.resources | dict(resources or {})
+    options.environment_variables = builder.ensure_dict(options.environment_variables) | profile.environment_variables
+    if profile.uenv is not None:
+        set_uenv(icon_builder, profile.uenv)
+    if profile.scheduler_commands:
+        lines = options.custom_scheduler_commands.splitlines()
+        options.custom_scheduler_commands = "\n".join(
+            [*lines, *(line for line in profile.scheduler_commands if line not in lines)]
+        )
+    mpirun_extra_params = builder.ensure_list(options.mpirun_extra_params)
+    options.mpirun_extra_params = [
+        *(param for param in profile.mpirun_extra_params if param not in mpirun_extra_params),
+        *mpirun_extra_params,
+    ]
+    if profile.openmp:
+        openmp.setup_openmp(icon_builder)
+
+    if profile.wrapper_template is not None:
+        placeholders = {
+            **{key: str(value) for key, value in options.resources.items()},
+            "num_threads": options.environment_variables.get("OMP_NUM_THREADS", "1"),
+        }
+        script = string.Template(profile.wrapper_template).substitute(placeholders)
+        if not isinstance(icon_builder, builder.IconCalculationBuilder):
+            builder.prepare_builder_for_wrapper_script(icon_builder)
+        icon_builder.wrapper_script = tools.deduplicate(  # type: ignore[attr-defined]  # builder has a custom setattr
+            aiida.orm.SinglefileData.from_string(script, filename="run_icon.sh")
+        )
+    elif profile.topology is not None:
+        topology.setup_topology_wrapper_script(icon_builder, profile.topology, bind_gpus=profile.bind_gpus)
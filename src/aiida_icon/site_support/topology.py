@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import dataclasses
+import textwrap
+import typing
+
+import aiida.orm
+
+from aiida_icon import builder, tools
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+    from aiida.engine import processes
+
+__all__ = ["MachineTopology", "RankBinding", "make_wrapper_script", "plan_binding", "setup_topology_wrapper_script"]
+
+
+@dataclasses.dataclass(frozen=True)
+class MachineTopology:
+    """
+    Layout of a compute node.
+
+    CPUs are assumed to be numbered the way Linux does on most machines: first all cores
+    (NUMA domain by NUMA domain), then the additional hardware threads of each core in the same order.
+    GPUs are numbered in the order of the NUMA domains they are attached to.
+    """
+
+    sockets: int
+    numa_per_socket: int
+    cores_per_numa: int
+    threads_per_core: int = 1
+    gpus_per_numa: int = 0
+
+    @property
+    def numa_domains(self) -> int:
+        return self.sockets * self.numa_per_socket
+
+    @property
+    def cores_per_machine(self) -> int:
+        return self.numa_domains * self.cores_per_numa
+
+    def cpu_list(self, first_core: int, num_cores: int) -> str:
+        """
+        CPUs (including all hardware threads) of consecutive cores, in numactl / taskset list format.
+
+        Examples:
+            >>> MachineTopology(sockets=2, numa_per_socket=2, cores_per_numa=16, threads_per_core=2).cpu_list(4, 4)
+            '4-7,68-71'
+            >>> MachineTopology(sockets=4, numa_per_socket=1, cores_per_numa=72).cpu_list(72, 1)
+            '72'
+        """
+        ranges = []
+        for thread in range(self.threads_per_core):
+            first = thread * self.cores_per_machine + first_core
+            last = first + num_cores - 1
+            ranges.append(str(first) if first == last else f"{first}-{last}")
+        return ",".join(ranges)
+
+
+@dataclasses.dataclass(frozen=True)
+class RankBinding:
+    local_rank: int
+    numa_domain: int
+    cpus: str
+    gpu: int | None = None
+
+
+def plan_binding(
+    topology: MachineTopology, *, mpiprocs_per_machine: int, cores_per_mpiproc: int = 1
+) -> list[RankBinding]:
+    """
+    Bind the MPI ranks of one machine to cores and memory.
+
+    Ranks are spread evenly over the NUMA domains in blocks of consecutive ranks (matching SLURM's block
+    distribution), each rank gets 'cores_per_mpiproc' consecutive cores in its domain and allocates memory there.
+    If the machine has GPUs, each rank is also assigned one of the GPUs attached to its domain (round robin).
+
+    Examples:
+        >>> grace_hopper = MachineTopology(sockets=4, numa_per_socket=1, cores_per_numa=72)
+        >>> bindings = plan_binding(grace_hopper, mpiprocs_per_machine=8, cores_per_mpiproc=16)
+        >>> [(binding.numa_domain, binding.cpus) for binding in bindings[:3]]
+        [(0, '0-15'), (0, '16-31'), (1, '72-87')]
+        >>> grace_hopper = MachineTopology(sockets=4, numa_per_socket=1, cores_per_numa=72, gpus_per_numa=1)
+        >>> [binding.gpu for binding in plan_binding(grace_hopper, mpiprocs_per_machine=4)]
+        [0, 1, 2, 3]
+        >>> plan_binding(grace_hopper, mpiprocs_per_machine=3, cores_per_mpiproc=80)
+        Traceback (most recent call last):
+        ValueError: 1 rank(s) with 80 cores each do not fit into a NUMA domain with 72 cores.
+    """
+    if mpiprocs_per_machine < 1 or cores_per_mpiproc < 1:
+        msg = "Need at least one MPI process per machine and one core per MPI process."
+        raise ValueError(msg)
+    if mpiprocs_per_machine * cores_per_mpiproc > topology.cores_per_machine:
+        msg = (
+            f"{mpiprocs_per_machine} ranks with {cores_per_mpiproc} cores each "
+            f"do not fit on a machine with {topology.cores_per_machine} cores."
+        )
+        raise ValueError(msg)
+    # fewer ranks than domains are still spread out, to give each rank the memory bandwidth of a full domain
+    ranks_per_numa = [
+        len(range(domain, mpiprocs_per_machine, topology.numa_domains)) for domain in range(topology.numa_domains)
+    ]
+    bindings = []
+    local_rank = 0
+    for domain, num_ranks in enumerate(ranks_per_numa):
+        if num_ranks * cores_per_mpiproc > topology.cores_per_numa:
+            msg = (
+                f"{num_ranks} rank(s) with {cores_per_mpiproc} cores each do not fit into a NUMA domain "
+                f"with {topology.cores_per_numa} cores."
+            )
+            raise ValueError(msg)
+        for index in range(num_ranks):
+            first_core = domain * topology.cores_per_numa + index * cores_per_mpiproc
+            gpu = domain * topology.gpus_per_numa + index % topology.gpus_per_numa if topology.gpus_per_numa else None
+            bindings.append(RankBinding(local_rank, domain, topology.cpu_list(first_core, cores_per_mpiproc), gpu))
+            local_rank += 1
+    return bindings
+
+
+def _bash_array(values: Sequence[object]) -> str:
+    return "(" + " ".join(f'"{value}"' for value in values) + ")"
+
+
+def make_wrapper_script(
+    topology: MachineTopology, resources: Mapping[str, int], *, bind_gpus: bool = False
+) -> aiida.orm.SinglefileData:
+    """
+    Generate a wrapper script, which binds every rank to its cores and NUMA domain (see 'plan_binding').
+
+    With 'bind_gpus', every rank also only sees its own GPU (through CUDA_VISIBLE_DEVICES).
+    A stored script with the same content is reused.
+
+    Examples:
+        >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+        >>> script = make_wrapper_script(
+        ...     MachineTopology(sockets=4, numa_per_socket=1, cores_per_numa=72),
+        ...     {"num_machines": 1, "num_mpiprocs_per_machine": 4, "num_cores_per_mpiproc": 72},
+        ... )
+        >>> print(script.get_content(mode="r").splitlines()[-1])
+        exec numactl --physcpubind="${CPUS[$LOCAL_RANK]}" --membind="${NUMA_NODES[$LOCAL_RANK]}" "$@"
+    """
+    if bind_gpus and not topology.gpus_per_numa:
+        msg = "Can not bind GPUs on a machine without GPUs."
+        raise ValueError(msg)
+    mpiprocs_per_machine = resources["num_mpiprocs_per_machine"]
+    cores_per_mpiproc = resources.get("num_cores_per_mpiproc", 1)
+    bindings = plan_binding(topology, mpiprocs_per_machine=mpiprocs_per_machine, cores_per_mpiproc=cores_per_mpiproc)
+    content = textwrap.dedent(
+        f"""\
+        #!/bin/bash -l
+
+        # Generated by aiida-icon for {mpiprocs_per_machine} rank(s) per machine with {cores_per_mpiproc} core(s) each,
+        # on machines with {topology.sockets} socket(s), {topology.numa_per_socket} NUMA domain(s) per socket,
+        # {topology.cores_per_numa} cores per NUMA domain and {topology.threads_per_core} thread(s) per core.
+
+        NUMA_NODES={_bash_array([binding.numa_domain for binding in bindings])}
+        CPUS={_bash_array([binding.cpus for binding in bindings])}
+        LOCAL_RANK=${{SLURM_LOCALID:-${{OMPI_COMM_WORLD_LOCAL_RANK:-${{PMI_LOCAL_RANK:-0}}}}}}
+
+        if [ "$LOCAL_RANK" -ge {len(bindings)} ]; then
+            echo "run_icon.sh: local rank $LOCAL_RANK is not part of the generated binding" >&2
+            exit 1
+        fi
+
+        ulimit -s unlimited
+        exec numactl --physcpubind="${{CPUS[$LOCAL_RANK]}}" --membind="${{NUMA_NODES[$LOCAL_RANK]}}" "$@"
+        """
+    )
+    if bind_gpus:
+        gpu_binding = (
+            f"GPUS={_bash_array([binding.gpu for binding in bindings])}\n"
+            'export CUDA_VISIBLE_DEVICES="${GPUS[$LOCAL_RANK]}"\n'
+        )
+        content = content.replace("ulimit -s unlimited\n", f"{gpu_binding}ulimit -s unlimited\n")
+    return tools.deduplicate(aiida.orm.SinglefileData.from_string(content, filename="run_icon.sh"))
+
+
+def setup_topology_wrapper_script(
+    icon_builder: processes.ProcessBuilder,
+    topology: MachineTopology,
+    *,
+    launcher_params: Sequence[str] = ("--cpu-bind=none",),
+    bind_gpus: bool = False,
+) -> None:
+    """
+    Generate the wrapper script from the resources already set on the builder and use it.
+
+    Without resources on the builder, the default resources of the calculation are used and set explicitly,
+    so that the binding matches what is run. Changing the resources afterwards requires repeating the setup.
+
+    'launcher_params' are added to the mpirun extra params (in front of the wrapper script), by default
+    to keep SLURM from binding the ranks itself, which would conflict with the binding of the wrapper script.
+    With 'bind_gpus', every rank is also restricted to its own GPU.
+    Works with both IconCalculationBuilder as well as vanilla ProcessBuilder.
+
+    Examples:
+        >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+        >>> from aiida_icon.calculations import IconCalculation
+        >>> icon_builder = IconCalculation.get_builder()
+        >>> icon_builder.metadata.options.resources = {"num_machines": 2, "num_mpiprocs_per_machine": 288}
+        >>> setup_topology_wrapper_script(icon_builder, MachineTopology(4, 1, 72))
+        >>> icon_builder.metadata.options.mpirun_extra_params
+        ['--cpu-bind=none', './run_icon.sh']
+    """
+    options = icon_builder.metadata.options  # type: ignore[attr-defined]  # builder has a custom setattr
+    options.resources = resources = dict(options.resources)
+    script = make_wrapper_script(topology, resources, bind_gpus=bind_gpus)
+    if not isinstance(icon_builder, builder.IconCalculationBuilder):
+        builder.prepare_builder_for_wrapper_script(icon_builder)
+    icon_builder.wrapper_script = script  # type: ignore[attr-defined]  # builder has a custom setattr
+    mpirun_extra_params = builder.ensure_list(options.mpirun_extra_params)
+    options.mpirun_extra_params = [
+        *mpirun_extra_params[:-1],
+        *(param for param in launcher_params if param not in mpirun_extra_params),
+        mpirun_extra_params[-1],
+    ]
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import dataclasses
+import posixpath
+import shlex
+import typing
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+__all__ = [
+    "STAGEABLE_INPUTS",
+    "STAGE_SCRIPT_NAME",
+    "StagingPolicy",
+    "render_stage_script",
+    "stage_append_text",
+    "stage_prepend_text",
+    "validate_staging_option",
+]
+
+#: Read-only inputs, which are linked into the work dir and can be staged to node-local storage.
+STAGEABLE_INPUTS = ("dynamics_grid_file", "ecrad_data", "rrtmg_sw", "rrtmg_lw", "restart_file", "restart_files")
+STAGE_SCRIPT_NAME = "aiida_icon_stage.sh"
+STAGING_DIR_VARIABLE = "AIIDA_ICON_STAGING_DIR"
+
+
+@dataclasses.dataclass(frozen=True)
+class StagingPolicy:
+    """
+    What to stage to node-local storage ('directory', for example '/dev/shm' or a local SSD) and how.
+
+    The stage script runs once per node through 'node_launcher', copies run 'parallel_copies' at a time.
+    """
+
+    directory: str = "/dev/shm"
+    inputs: tuple[str, ...] = STAGEABLE_INPUTS
+    output_streams: tuple[str, ...] = ()
+    parallel_copies: int = 8
+    node_launcher: str = "srun --nodes=${SLURM_JOB_NUM_NODES:-1} --ntasks-per-node=1"
+
+    @classmethod
+    def from_option(cls, option: Mapping[str, typing.Any]) -> StagingPolicy:
+        """
+        Read the 'staging' option of an IconCalculation.
+
+        Examples:
+            >>> StagingPolicy.from_option({"inputs": ["dynamics_grid_file"], "output_streams": ["atm_3d"]}).inputs
+            ('dynamics_grid_file',)
+            >>> StagingPolicy.from_option({"inputs": ["master_namelist"]})
+            Traceback (most recent call last):
+            ValueError: Can not stage 'master_namelist', stageable inputs are: dynamics_grid_file, ecrad_data, rrtmg_sw, rrtmg_lw, restart_file, restart_files.
+        """
+        fields = {field.name for field in dataclasses.fields(cls)}
+        if unknown := sorted(set(option) - fields):
+            msg = f"Unknown staging settings: {', '.join(unknown)}."
+            raise ValueError(msg)
+        values = dict(option)
+        for key in ("inputs", "output_streams"):
+            if key in values:
+                values[key] = tuple(values[key])
+        policy = cls(**values)
+        for name in policy.inputs:
+            if name not in STAGEABLE_INPUTS:
+                msg = f"Can not stage '{name}', stageable inputs are: {', '.join(STAGEABLE_INPUTS)}."
+                raise ValueError(msg)
+        if policy.parallel_copies < 1:
+            msg = "'parallel_copies' must be at least 1."
+            raise ValueError(msg)
+        return policy
+
+
+def validate_staging_option(value: Mapping[str, typing.Any] | None, _: typing.Any) -> str | None:
+    """Port validator for the 'staging' option."""
+    if value is None:
+        return None
+    try:
+        StagingPolicy.from_option(value)
+    except (TypeError, ValueError) as err:
+        return str(err)
+    return None
+
+
+def _local_input_path(index: int, link_name: str) -> str:
+    return f"inputs/{index}/{posixpath.basename(posixpath.normpath(link_name))}"
+
+
+def _staged_path(relative: str) -> str:
+    return f'"${STAGING_DIR_VARIABLE}"/{shlex.quote(relative)}'
+
+
+def render_stage_script(
+    *, staged_inputs: Sequence[tuple[str, str]], output_dirs: Sequence[str], policy: StagingPolicy
+) -> str:
+    """
+    Render the script copying inputs ('(remote path, link name)' pairs) to node-local storage and outputs back.
+
+    Examples:
+        >>> script = render_stage_script(
+        ...     staged_inputs=[("/store/grid.nc", "icon_grid.nc")], output_dirs=["atm_3d"], policy=StagingPolicy()
+        ... )
+        >>> print(script.splitlines()[9])
+                printf '%s\\0' /store/grid.nc "$AIIDA_ICON_STAGING_DIR"/inputs/0/icon_grid.nc | xargs -0 -r -n 2 -P 8 cp -rL
+    """
+    copies = " ".join(
+        f"{shlex.quote(source)} {_staged_path(_local_input_path(index, link_name))}"
+        for index, (source, link_name) in enumerate(staged_inputs)
+    )
+    local_dirs = [
+        *(posixpath.dirname(_local_input_path(index, link_name)) for index, (_, link_name) in enumerate(staged_inputs)),
+        *output_dirs,
+    ]
+    lines = [
+        "#!/bin/bash",
+        "# Stage inputs to node-local storage and outputs back to the work dir, run once per node by aiida-icon.",
+        f"# Usage: {STAGE_SCRIPT_NAME} in|out|clean",
+        "set -eu",
+        'WORK_DIR="$PWD"',
+        f'mkdir -p "${STAGING_DIR_VARIABLE}"',
+        'case "$1" in',
+        "    in)",
+        f"        mkdir -p {' '.join(_staged_path(path) for path in local_dirs)}" if local_dirs else "        true",
+    ]
+    if staged_inputs:
+        lines.append(f"        printf '%s\\0' {copies} | xargs -0 -r -n 2 -P {policy.parallel_copies} cp -rL")
+    lines += ["        ;;", "    out)"]
+    lines += [
+        f"        (cd {_staged_path(path)} && find . -type f -print0 | xargs -0 -r -P {policy.parallel_copies} "
+        f'-I{{}} cp --parents {{}} "$WORK_DIR"/{shlex.quote(path)}/)'
+        for path in output_dirs
+    ] or ["        true"]
+    lines += [
+        "        ;;",
+        "    clean)",
+        f'        rm -rf "${STAGING_DIR_VARIABLE}"',
+        "        ;;",
+        "esac",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def stage_prepend_text(
+    *, staged_inputs: Sequence[tuple[str, str]], output_dirs: Sequence[str], policy: StagingPolicy
+) -> str:
+    """
+    Job script lines staging in and pointing the work dir links / output directories to the local copies.
+
+    Examples:
+        >>> staged_inputs = [("/store/grid.nc", "icon_grid.nc")]
+        >>> print(stage_prepend_text(staged_inputs=staged_inputs, output_dirs=[], policy=StagingPolicy()))
+        export AIIDA_ICON_STAGING_DIR=/dev/shm/"aiida-icon-${SLURM_JOB_ID:-$$}"
+        chmod 755 aiida_icon_stage.sh
+        srun --nodes=${SLURM_JOB_NUM_NODES:-1} --ntasks-per-node=1 ./aiida_icon_stage.sh in
+        ln -sfn "$AIIDA_ICON_STAGING_DIR"/inputs/0/icon_grid.nc icon_grid.nc
+    """
+    lines = [
+        f'export {STAGING_DIR_VARIABLE}={shlex.quote(policy.directory)}/"aiida-icon-${{SLURM_JOB_ID:-$$}}"',
+        f"chmod 755 {STAGE_SCRIPT_NAME}",
+        f"{policy.node_launcher} ./{STAGE_SCRIPT_NAME} in",
+    ]
+    lines += [
+        f"ln -sfn {_staged_path(_local_input_path(index, link_name))} {shlex.quote(link_name)}"
+        for index, (_, link_name) in enumerate(staged_inputs)
+    ]
+    lines += [f"rmdir {shlex.quote(path)} && ln -s {_staged_path(path)} {shlex.quote(path)}" for path in output_dirs]
+    return "\n".join(lines)
+
+
+def stage_append_text(*, output_dirs: Sequence[str], policy: StagingPolicy) -> str:
+    """
+    Job script lines staging the outputs back to the usual place in the work dir and cleaning up.
+
+    Examples:
+        >>> print(stage_append_text(output_dirs=["atm_3d"], policy=StagingPolicy(node_launcher="srun")))
+        rm atm_3d && mkdir atm_3d
+        srun ./aiida_icon_stage.sh out
+        srun ./aiida_icon_stage.sh clean
+    """
+    lines = [f"rm {shlex.quote(path)} && mkdir {shlex.quote(path)}" for path in output_dirs]
+    if output_dirs:
+        lines.append(f"{policy.node_launcher} ./{STAGE_SCRIPT_NAME} out")
+    lines.append(f"{policy.node_launcher} ./{STAGE_SCRIPT_NAME} clean")
+    return "\n".join(lines)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import dataclasses
+import math
+import shlex
+import typing
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Mapping
+
+__all__ = [
+    "RESTART_LOCATION",
+    "StripingPolicy",
+    "striping_prepend_text",
+    "validate_striping_option",
+]
+
+#: Key for the restart files (written to the root of the work dir) in 'expected_file_sizes'.
+RESTART_LOCATION = "restart"
+
+
+@dataclasses.dataclass(frozen=True)
+class StripingPolicy:
+    """
+    How to stripe the output stream directories and the work dir (where the restart files are written) on Lustre.
+
+    The stripe count is the expected file size divided by 'bytes_per_stripe', clamped to
+    [1, 'max_stripe_count']. Sizes can be given per output directory (and for 'restart') in 'expected_file_sizes',
+    otherwise they are estimated from the namelist and the grid, if neither is possible 'default_stripe_count' is used.
+    """
+
+    stripe_size: str = "16M"
+    bytes_per_stripe: int = 1 << 30
+    max_stripe_count: int = 32
+    default_stripe_count: int = 1
+    expected_file_sizes: dict[str, int] = dataclasses.field(default_factory=dict)
+    command: str = "lfs setstripe"
+
+    @classmethod
+    def from_option(cls, option: Mapping[str, typing.Any]) -> StripingPolicy:
+        """
+        Read the 'striping' option of an IconCalculation (or the striping extra of a computer).
+
+        Examples:
+            >>> StripingPolicy.from_option({"max_stripe_count": 8}).max_stripe_count
+            8
+            >>> StripingPolicy.from_option({"stripes": 8})
+            Traceback (most recent call last):
+            ValueError: Unknown striping settings: stripes.
+        """
+        fields = {field.name for field in dataclasses.fields(cls)}
+        if unknown := sorted(set(option) - fields):
+            msg = f"Unknown striping settings: {', '.join(unknown)}."
+            raise ValueError(msg)
+        policy = cls(**option)
+        if min(policy.bytes_per_stripe, policy.max_stripe_count, policy.default_stripe_count) < 1:
+            msg = "'bytes_per_stripe', 'max_stripe_count' and 'default_stripe_count' must be at least 1."
+            raise ValueError(msg)
+        return policy
+
+    def stripe_count(self, expected_size: int | None) -> int:
+        """
+        Stripe count for files of the expected size (in bytes).
+
+        Examples:
+            >>> policy = StripingPolicy(bytes_per_stripe=1000, max_stripe_count=4)
+            >>> [policy.stripe_count(size) for size in (None, 10, 2500, 10**6)]
+            [1, 1, 3, 4]
+        """
+        if expected_size is None:
+            return min(self.default_stripe_count, self.max_stripe_count)
+        return max(1, min(math.ceil(expected_size / self.bytes_per_stripe), self.max_stripe_count))
+
+
+def validate_striping_option(value: Mapping[str, typing.Any] | None, _: typing.Any) -> str | None:
+    """Port validator for the 'striping' option."""
+    if value is None:
+        return None
+    try:
+        StripingPolicy.from_option(value)
+    except (TypeError, ValueError) as err:
+        return str(err)
+    return None
+
+
+def striping_prepend_text(policy: StripingPolicy, expected_sizes: Mapping[str, int | None]) -> str:
+    """
+    Job script lines setting the striping of each directory ('restart' meaning the work dir) before ICON starts.
+
+    Sizes in the policy take precedence over 'expected_sizes' (estimates). Does nothing if the command
+    is not available (not a Lustre file system).
+
+    Examples:
+        >>> print(striping_prepend_text(StripingPolicy(), {"atm_3d": 5 << 30, "restart": None}))
+        if command -v lfs > /dev/null 2>&1; then
+            lfs setstripe --stripe-count 5 --stripe-size 16M atm_3d || echo 'Could not stripe atm_3d' >&2
+            lfs setstripe --stripe-count 1 --stripe-size 16M . || echo 'Could not stripe .' >&2
+        fi
+    """
+    executable = shlex.split(policy.command)[0]
+    lines = [f"if command -v {shlex.quote(executable)} > /dev/null 2>&1; then"]
+    for location, estimate in expected_sizes.items():
+        directory = "." if location == RESTART_LOCATION else location
+        count = policy.stripe_count(policy.expected_file_sizes.get(location, estimate))
+        quoted = shlex.quote(directory)
+        lines.append(
+            f"    {policy.command} --stripe-count {count} --stripe-size {policy.stripe_size} {quoted}"
+            f" || echo {shlex.quote(f'Could not stripe {directory}')} >&2"
+        )
+    lines.append("fi")
+    return "\n".join(lines)
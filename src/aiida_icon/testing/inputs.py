@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import datetime
+
+from aiida_icon.iconutils import masternml
+
+__all__ = ["make_master_nml", "make_model_nml"]
+
+START_DATE = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_master_nml(
+    num_models: int = 1,
+    *,
+    period: datetime.timedelta = datetime.timedelta(hours=2),
+    restart_interval: datetime.timedelta | None = None,
+) -> str:
+    """
+    A synthetic master namelist for models 'm0', 'm1', ..., with their namelists 'm0.nml', ... in the work dir.
+
+    Examples:
+        >>> import f90nml
+        >>> master_nml = f90nml.reads(make_master_nml(2, period=datetime.timedelta(hours=6)))
+        >>> [name for name, _ in masternml.iter_model_name_filepath(master_nml)]
+        ['m0', 'm1']
+        >>> masternml.read_simulated_seconds(master_nml)
+        21600.0
+    """
+    models = "".join(
+        f"&master_model_nml\n model_name='m{index}'\n model_namelist_filename='<path>/m{index}.nml'\n"
+        f" model_type=1\n model_min_rank=0\n model_max_rank=65535\n model_inc_rank=1\n/\n"
+        for index in range(num_models)
+    )
+    interval = masternml.format_iso_duration(restart_interval or period)
+    return (
+        "&master_nml\n lrestart=.false.\n model_base_dir='.'\n/\n"
+        "&master_time_control_nml\n"
+        f" experimentStartDate='{masternml.format_iso_datetime(START_DATE)}'\n"
+        f" experimentStopDate='{masternml.format_iso_datetime(START_DATE + period)}'\n"
+        f" restartTimeIntval='{interval}'\n checkpointTimeIntval='{interval}'\n/\n"
+        f"{models}"
+    )
+
+
+def make_model_nml(
+    num_streams: int = 2,
+    name: str = "m0",
+    *,
+    output_interval: datetime.timedelta = datetime.timedelta(hours=1),
+    dtime: float = 60.0,
+) -> str:
+    """
+    A synthetic model namelist writing 'num_streams' output streams, each to its own directory.
+
+    Only the primary model ('m0') sets the time step, grid and restart mode, so that several of them can be collected.
+
+    Examples:
+        >>> import f90nml
+        >>> from aiida_icon.iconutils import modelnml
+        >>> [str(info.path) for info in modelnml.read_output_stream_infos(f90nml.reads(make_model_nml(2)))]
+        ['m0_stream_0', 'm0_stream_1']
+    """
+    streams = "".join(
+        f"&output_nml\n output_filename='./{name}_stream_{index}/out'\n filename_format='<output_filename>_<jfile>'\n"
+        f" output_interval='{masternml.format_iso_duration(output_interval)}'\n steps_per_file=1\n"
+        f" ml_varlist='u', 'v', 'temp'\n/\n"
+        for index in range(num_streams)
+    )
+    if name != "m0":
+        return streams
+    return (
+        f"&run_nml\n dtime={dtime}\n/\n"
+        "&grid_nml\n dynamics_grid_filename='icon_grid_0013_R02B04_R.nc'\n/\n"
+        "&io_nml\n restart_write_mode='joint procs multifile'\n/\n"
+        f"{streams}"
+    )
@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import itertools
+import math
+import os
+import pathlib
+import sys
+import time
+import typing
+
+import click
+import f90nml
+
+from aiida_icon.iconutils import masternml, modelnml
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Iterator
+
+__all__ = ["MockSettings", "OutputFile", "RunPlan", "main", "plan_run", "run"]
+
+MASTER_NAMELIST = "icon_master.namelist"
+DEFAULT_FILENAME_FORMAT = "<output_filename>_DOM<physdom>_<levtype>_<jfile>"
+#: Written into every mock restart (instead of NetCDF attributes), to find the restart date when restarting.
+RESTART_DATE_FILE = "attributes.nc"
+MAX_LOG_STEPS = 10_000
+
+
+@dataclasses.dataclass(frozen=True)
+class MockSettings:
+    """
+    How much the mock writes and how long it takes.
+
+    'files_per_stream' overrides the number of files per output stream derived from the namelist
+    ('steps_per_file', at most one file per output date), 'runtime' (in seconds) is spread evenly over the time steps of the run.
+    """
+
+    output_file_size: int = 1024
+    files_per_stream: int | None = None
+    restart_file_size: int = 1024
+    restart_patches: int = 1
+    runtime: float = 0.0
+
+
+@dataclasses.dataclass(frozen=True)
+class OutputFile:
+    stream_index: int
+    path: pathlib.PurePosixPath
+    first_date: datetime.datetime
+    num_steps: int
+
+
+@dataclasses.dataclass
+class RunPlan:
+    """What one run (a chunk of the experiment, up to the next restart) writes, derived from the namelists."""
+
+    start: datetime.datetime
+    stop: datetime.datetime
+    experiment_stop: datetime.datetime
+    dtime: datetime.timedelta
+    restart_dates: list[datetime.datetime]
+    model_nmls: dict[str, f90nml.Namelist]
+    output_files: list[OutputFile] = dataclasses.field(default_factory=list)
+
+    @property
+    def finish_status(self) -> str:
+        return "OK" if self.stop >= self.experiment_stop else "RESTART"
+
+    @property
+    def num_steps(self) -> int:
+        return max(1, math.ceil((self.stop - self.start) / self.dtime))
+
+
+def _first(value: typing.Any, default: typing.Any = None) -> typing.Any:
+    if isinstance(value, list):
+        return value[0] if value else default
+    return default if value is None else value
+
+
+def _timestamp(date: datetime.datetime) -> str:
+    return date.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _iter_dates(
+    start: datetime.datetime, stop: datetime.datetime, interval: datetime.timedelta | None
+) -> Iterator[datetime.datetime]:
+    date = start
+    while date <= stop:
+        yield date
+        if interval is None or interval <= datetime.timedelta(0):
+            return
+        date += interval
+
+
+def _read_restart_date(model_name: str, model_nml: f90nml.Namelist, work_dir: pathlib.Path) -> datetime.datetime:
+    link = work_dir / modelnml.read_latest_restart_file_link_name(model_nml, model_name)
+    date_file = link / RESTART_DATE_FILE if link.is_dir() else link
+    try:
+        return masternml.parse_iso_datetime(date_file.read_text().strip().split("\n")[0])
+    except (OSError, ValueError) as err:
+        msg = f"Can not restart model '{model_name}', no valid restart file at '{link.name}'."
+        raise click.ClickException(msg) from err
+
+
+def _format_filename(
+    filename_format: str, output_filename: str, *, jfile: int, date: datetime.datetime, start: datetime.datetime
+) -> str:
+    elapsed = date - start
+    days, seconds = elapsed.days, elapsed.seconds
+    replacements = {
+        "<output_filename>": output_filename,
+        "<physdom>": "01",
+        "<levtype>": "ML",
+        "<levtype_l>": "ml",
+        "<jfile>": f"{jfile:04d}",
+        "<datetime>": masternml.format_iso_datetime(date),
+        "<datetime2>": _timestamp(date),
+        "<ddhhmmss>": f"{days:02d}{seconds // 3600:02d}{seconds % 3600 // 60:02d}{seconds % 60:02d}",
+    }
+    name = filename_format
+    for token, value in replacements.items():
+        name = name.replace(token, value)
+    return f"{name}.nc"
+
+
+def plan_output(
+    model_nml: f90nml.Namelist,
+    *,
+    start: datetime.datetime,
+    stop: datetime.datetime,
+    experiment_start: datetime.datetime,
+    first_stream_index: int = 0,
+    files_per_stream: int | None = None,
+) -> list[OutputFile]:
+    """
+    Output files of all streams of a model within [start, stop], following 'output_start', 'output_end',
+    'output_interval', 'steps_per_file' and 'filename_format' of each 'output_nml'.
+
+    Examples:
+        >>> model_nml = f90nml.reads(
+        ...     "&output_nml\\n output_filename='atm_2d/out'\\n output_interval='PT1H'\\n steps_per_file=2\\n/"
+        ... )
+        >>> start = masternml.parse_iso_datetime("2000-01-01T00:00:00Z")
+        >>> files = plan_output(model_nml, start=start, stop=start + datetime.timedelta(hours=3), experiment_start=start)
+        >>> [(str(file.path), file.num_steps) for file in files]
+        [('atm_2d/out_DOM01_ML_0001.nc', 2), ('atm_2d/out_DOM01_ML_0002.nc', 2)]
+    """
+    streams = model_nml.get("output_nml", [])
+    if not isinstance(streams, list):
+        streams = [streams]
+    files = []
+    for index, stream in enumerate(streams, start=first_stream_index):
+        output_start = _first(stream.get("output_start"))
+        output_end = _first(stream.get("output_end"))
+        output_interval = _first(stream.get("output_interval"))
+        stream_start = max(start, masternml.parse_iso_datetime(output_start) if output_start else experiment_start)
+        stream_stop = min(stop, masternml.parse_iso_datetime(output_end) if output_end else stop)
+        interval = masternml.parse_iso_duration(output_interval) if output_interval else None
+        dates = list(_iter_dates(stream_start, stream_stop, interval))
+        if not dates:
+            continue
+        steps_per_file = stream.get("steps_per_file", -1)
+        if steps_per_file <= 0:
+            steps_per_file = len(dates)
+        firsts = list(range(0, len(dates), steps_per_file))
+        if files_per_stream:
+            num_files = min(files_per_stream, len(dates))
+            firsts = [round(index * len(dates) / num_files) for index in range(num_files)]
+        filename_format = stream.get("filename_format", DEFAULT_FILENAME_FORMAT)
+        output_filename = stream.get("output_filename", "").strip()
+        for jfile, (first, end) in enumerate(itertools.pairwise([*firsts, len(dates)]), start=1):
+            name = _format_filename(filename_format, output_filename, jfile=jfile, date=dates[first], start=start)
+            files.append(
+                OutputFile(
+                    stream_index=index,
+                    path=pathlib.PurePosixPath(name),
+                    first_date=dates[first],
+                    num_steps=end - first,
+                )
+            )
+    return files
+
+
+def plan_run(work_dir: pathlib.Path, settings: MockSettings | None = None) -> RunPlan:
+    """Read the namelists in 'work_dir' and derive what a run of ICON would write."""
+    settings = settings or MockSettings()
+    master_path = work_dir / MASTER_NAMELIST
+    if not master_path.is_file():
+        msg = f"Could not open the master namelist '{MASTER_NAMELIST}'."
+        raise click.ClickException(msg)
+    master_nml = f90nml.read(master_path)
+    model_nmls = {
+        name: f90nml.read(path if path.is_absolute() else work_dir / path)
+        for name, path in masternml.iter_model_name_filepath(master_nml)
+    }
+    experiment_start, experiment_stop = masternml.read_experiment_period(master_nml)
+    if experiment_start is None or experiment_stop is None:
+        msg = "The master namelist must set the experiment start and stop dates."
+        raise click.ClickException(msg)
+
+    start = experiment_start
+    if master_nml.get("master_nml", {}).get("lrestart", False):
+        start = max(_read_restart_date(name, nml, work_dir) for name, nml in model_nmls.items())
+    restart_interval = masternml.read_time_control_option(master_nml, "restart_time_int_val")
+    checkpoint_interval = masternml.read_time_control_option(master_nml, "checkpoint_time_int_val")
+    stop = experiment_stop
+    if restart_interval:
+        stop = min(stop, start + masternml.parse_iso_duration(restart_interval))
+
+    restart_dates = []
+    if checkpoint_interval:
+        interval = masternml.parse_iso_duration(checkpoint_interval)
+        restart_dates = [date for date in _iter_dates(start + interval, stop, interval)]
+    if stop < experiment_stop or masternml.read_lrestart_write_last(master_nml):
+        restart_dates.append(stop)
+    primary_nml = next(iter(model_nmls.values()), f90nml.Namelist())
+    dtime = float(primary_nml.get("run_nml", {}).get("dtime", 60.0))
+
+    plan = RunPlan(
+        start=start,
+        stop=stop,
+        experiment_stop=experiment_stop,
+        dtime=datetime.timedelta(seconds=dtime),
+        restart_dates=sorted(set(restart_dates)),
+        model_nmls=model_nmls,
+    )
+    for model_nml in model_nmls.values():
+        plan.output_files += plan_output(
+            model_nml,
+            start=start,
+            stop=stop,
+            experiment_start=experiment_start,
+            first_stream_index=len({file.stream_index for file in plan.output_files}),
+            files_per_stream=settings.files_per_stream,
+        )
+    return plan
+
+
+def _write_file(path: pathlib.Path, size: int, header: str = "") -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    content = header.encode()
+    with path.open("wb") as handle:
+        handle.write(content)
+        if size > len(content):
+            handle.truncate(size)
+
+
+def _replace_link(link: pathlib.Path, target: str) -> None:
+    if link.is_symlink() or link.exists():
+        link.unlink()
+    link.symlink_to(target)
+
+
+def write_restart(
+    work_dir: pathlib.Path, model_name: str, model_nml: f90nml.Namelist, date: datetime.datetime, settings: MockSettings
+) -> pathlib.Path:
+    """Write a (multifile or singlefile) restart of a model like ICON would, and point the latest restart link to it."""
+    header = f"{masternml.format_iso_datetime(date)}\n"
+    if modelnml.is_multifile_restart(modelnml.read_restart_write_mode(model_nml)):
+        restart = work_dir / f"multifile_restart_{model_name}_{_timestamp(date)}.mfr"
+        _write_file(restart / RESTART_DATE_FILE, 0, header)
+        for patch in range(1, settings.restart_patches + 1):
+            _write_file(restart / f"patch1_{patch}.nc", settings.restart_file_size)
+    else:
+        grid = pathlib.PurePosixPath(modelnml.read_dynamics_grid_filename(model_nml) or "grid.nc").stem
+        restart = work_dir / f"{grid}_restart_{model_name}_{_timestamp(date)}.nc"
+        _write_file(restart, settings.restart_file_size, header)
+    _replace_link(work_dir / modelnml.read_latest_restart_file_link_name(model_nml, model_name), restart.name)
+    return restart
+
+
+def _format_seconds(seconds: float) -> str:
+    return f"{seconds:.4f}s"
+
+
+def timer_report(timings: dict[str, tuple[int, float]]) -> str:
+    """
+    A timer report in the format ICON prints at the end of a run (one process, see 'iconutils.timers').
+
+    Examples:
+        >>> from aiida_icon.iconutils import timers
+        >>> timers.parse_timer_report(timer_report({"total": (1, 2.5)}).splitlines())["total"]["total_max"]
+        2.5
+    """
+    lines = [
+        " name                 # calls   t_min        min rank   t_max        max rank   total min (s)   "
+        "total max (s)   # PEs",
+        " -------------------  -------   ----------   --------   ----------   --------   -------------   "
+        "-------------   -----",
+    ]
+    for name, (calls, seconds) in timings.items():
+        per_call = seconds / max(calls, 1)
+        lines.append(
+            f" {name:<19}  {calls:>7}   {_format_seconds(per_call):>10}   [0]        {_format_seconds(per_call):>10}   "
+            f"[0]        {seconds:>13.3f}   {seconds:>13.3f}   1"
+        )
+    return "\n".join([*lines, ""])
+
+
+def run(work_dir: pathlib.Path, settings: MockSettings | None = None, *, log: typing.TextIO = sys.stdout) -> RunPlan:
+    """Run the mock in 'work_dir': write output streams, restarts, 'output_schedule.txt', 'finish.status' and a log."""
+    settings = settings or MockSettings()
+    started = time.perf_counter()
+    plan = plan_run(work_dir, settings)
+    for name, model_nml in plan.model_nmls.items():
+        log_name = "nml.atmo.log" if name == "atm" else f"nml.{name}.log"
+        (work_dir / log_name).write_text(str(model_nml))
+
+    with (work_dir / "output_schedule.txt").open("w") as schedule:
+        schedule.write("# stream  first date            steps  file\n")
+        schedule.writelines(
+            f"{file.stream_index:>8}  {masternml.format_iso_datetime(file.first_date)}  {file.num_steps:>5}  {file.path}\n"
+            for file in plan.output_files
+        )
+
+    pending_output = sorted(plan.output_files, key=lambda output_file: output_file.first_date)
+    restarts = list(plan.restart_dates)
+    log_every = max(1, math.ceil(plan.num_steps / MAX_LOG_STEPS))
+    sleep = settings.runtime / plan.num_steps
+    output_seconds = restart_seconds = 0.0
+    for step in range(1, plan.num_steps + 1):
+        date = min(plan.start + step * plan.dtime, plan.stop)
+        if sleep:
+            time.sleep(sleep)
+        if step % log_every == 0 or step == plan.num_steps:
+            log.write(f" Time step: {step:>8}, model time: {masternml.format_iso_datetime(date)}\n")
+        io_started = time.perf_counter()
+        written = 0
+        for output_file in pending_output:
+            if output_file.first_date > date:
+                break
+            _write_file(work_dir / output_file.path, settings.output_file_size)
+            written += 1
+        del pending_output[:written]
+        output_seconds += time.perf_counter() - io_started
+        io_started = time.perf_counter()
+        while restarts and restarts[0] <= date:
+            restart_date = restarts.pop(0)
+            for name, model_nml in plan.model_nmls.items():
+                write_restart(work_dir, name, model_nml, restart_date, settings)
+        restart_seconds += time.perf_counter() - io_started
+    log.flush()
+
+    (work_dir / "finish.status").write_text(f"{plan.finish_status}\n")
+    total = time.perf_counter() - started
+    log.write(
+        timer_report(
+            {
+                "total": (1, total),
+                "L integrate_nh": (plan.num_steps, max(total - output_seconds - restart_seconds, 0.0)),
+                "L wrt_output": (len(plan.output_files), output_seconds),
+                "L write_restart": (len(plan.restart_dates), restart_seconds),
+            }
+        )
+    )
+    log.flush()
+    return plan
+
+
+@click.command(context_settings={"ignore_unknown_options": True, "allow_extra_args": True})
+@click.option("--output-file-size", type=int, default=1024, envvar="MOCK_ICON_OUTPUT_FILE_SIZE", show_default=True)
+@click.option(
+    "--files-per-stream",
+    type=int,
+    default=None,
+    envvar="MOCK_ICON_FILES_PER_STREAM",
+    help="Override the number of files per output stream.",
+)
+@click.option("--restart-file-size", type=int, default=1024, envvar="MOCK_ICON_RESTART_FILE_SIZE", show_default=True)
+@click.option("--restart-patches", type=int, default=1, envvar="MOCK_ICON_RESTART_PATCHES", show_default=True)
+@click.option("--runtime", type=float, default=0.0, envvar="MOCK_ICON_RUNTIME", help="Wall time to take, in seconds.")
+def main(
+    output_file_size: int, files_per_stream: int | None, restart_file_size: int, restart_patches: int, runtime: float
+) -> None:
+    """
+    Mock ICON executable: reads the namelists in the current directory and writes what ICON would.
+
+    Output files and restarts are placeholders of the configured size. Extra arguments are ignored,
+    so it can stand in for ICON in any launcher setup. All options can also be set through environment variables.
+    """
+    settings = MockSettings(
+        output_file_size=output_file_size,
+        files_per_stream=files_per_stream,
+        restart_file_size=restart_file_size,
+        restart_patches=restart_patches,
+        runtime=runtime,
+    )
+    run(pathlib.Path(os.getcwd()), settings)
+
+
+if __name__ == "__main__":
+    main()
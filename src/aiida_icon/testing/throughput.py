@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import json
+import pathlib
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import typing
+
+import aiida
+import click
+from aiida import engine, orm
+from aiida.common import exceptions as aiidaxc
+
+from aiida_icon.testing import inputs, mock_icon
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Mapping, Sequence
+
+__all__ = [
+    "STAGES",
+    "CalculationTimeline",
+    "ThroughputReport",
+    "make_builder",
+    "measure_throughput",
+    "setup_computer",
+    "setup_mock_code",
+    "summarize",
+]
+
+#: Calculation job states in the order they are passed, with the stage each of them starts.
+STATE_STAGES = {
+    "uploading": "upload",
+    "submitting": "submit",
+    "withscheduler": "scheduler",
+    "retrieving": "retrieve",
+    "parsing": "parse",
+}
+#: Stages of a calculation: waiting for a daemon worker, then one per job state.
+STAGES = ("wait", *STATE_STAGES.values())
+MOCK_EXECUTABLE = "aiida-icon-mock"
+
+
+@dataclasses.dataclass
+class CalculationTimeline:
+    """When a calculation was submitted, first seen in each job state and seen terminated (seconds since the epoch)."""
+
+    pk: int
+    submitted: float
+    states: dict[str, float] = dataclasses.field(default_factory=dict)
+    terminated: float | None = None
+    exit_status: int | None = None
+
+    def stage_durations(self) -> dict[str, float]:
+        """
+        Time spent in each stage, states missed between two polls count as starting when the next one was seen.
+
+        Examples:
+            >>> timeline = CalculationTimeline(pk=1, submitted=0.0, states={"uploading": 1.0, "withscheduler": 2.0})
+            >>> timeline.terminated = 5.0
+            >>> timeline.stage_durations()
+            {'wait': 1.0, 'upload': 1.0, 'submit': 0.0, 'scheduler': 3.0, 'retrieve': 0.0, 'parse': 0.0}
+        """
+        if self.terminated is None:
+            return {}
+        starts: dict[str, float] = {}
+        seen = self.terminated
+        for state in reversed(STATE_STAGES):
+            seen = starts[state] = self.states.get(state, seen)
+        boundaries = [self.submitted, *(starts[state] for state in STATE_STAGES), self.terminated]
+        return {
+            stage: max(end - start, 0.0)
+            for stage, start, end in zip(STAGES, boundaries[:-1], boundaries[1:], strict=True)
+        }
+
+
+def _statistics(values: Sequence[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "mean": statistics.fmean(ordered),
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "max": ordered[-1],
+    }
+
+
+@dataclasses.dataclass
+class ThroughputReport:
+    """Machine-readable result of a throughput measurement, see 'to_dict'."""
+
+    config: dict[str, typing.Any]
+    timelines: list[CalculationTimeline]
+
+    @property
+    def finished(self) -> list[CalculationTimeline]:
+        return [timeline for timeline in self.timelines if timeline.terminated is not None]
+
+    @property
+    def wall_seconds(self) -> float:
+        if not self.finished:
+            return 0.0
+        return max(t.terminated or 0.0 for t in self.finished) - min(t.submitted for t in self.timelines)
+
+    @property
+    def calculations_per_minute(self) -> float:
+        return 60 * len(self.finished) / self.wall_seconds if self.wall_seconds else 0.0
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        durations = [timeline.stage_durations() for timeline in self.finished]
+        return {
+            "config": self.config,
+            "submitted": len(self.timelines),
+            "finished": len(self.finished),
+            "failed": sum(1 for timeline in self.finished if timeline.exit_status != 0),
+            "wall_seconds": self.wall_seconds,
+            "calculations_per_minute": self.calculations_per_minute,
+            "stages": {stage: _statistics([duration[stage] for duration in durations]) for stage in STAGES},
+            "turnaround": _statistics([(t.terminated or 0.0) - t.submitted for t in self.finished]),
+            "calculations": [dataclasses.asdict(timeline) for timeline in self.timelines],
+        }
+
+
+def summarize(report: ThroughputReport) -> str:
+    """
+    Human-readable summary of a report.
+
+    Examples:
+        >>> timeline = CalculationTimeline(pk=1, submitted=0.0, states={"uploading": 1.0}, terminated=31.0, exit_status=0)
+        >>> print(summarize(ThroughputReport(config={}, timelines=[timeline])))
+        1/1 calculations finished (0 failed) in 31.0 s: 1.94 per minute
+        stage      median   p95 [s]
+        wait          1.0       1.0
+        upload       30.0      30.0
+        submit        0.0       0.0
+        scheduler     0.0       0.0
+        retrieve      0.0       0.0
+        parse         0.0       0.0
+    """
+    data = report.to_dict()
+    lines = [
+        f"{data['finished']}/{data['submitted']} calculations finished ({data['failed']} failed) "
+        f"in {data['wall_seconds']:.1f} s: {data['calculations_per_minute']:.2f} per minute",
+        f"{'stage':<9}  {'median':>6}  {'p95 [s]':>8}",
+    ]
+    lines += [
+        f"{stage:<9}  {values['median']:>6.1f}  {values['p95']:>8.1f}"
+        for stage, values in data["stages"].items()
+        if values
+    ]
+    return "\n".join(lines)
+
+
+def setup_computer(label: str, work_dir: pathlib.Path, *, poll_interval: float = 1.0) -> orm.Computer:
+    """Load or create and configure a computer running jobs on this machine (local transport, direct scheduler)."""
+    try:
+        computer = orm.load_computer(label)
+    except aiidaxc.NotExistent:
+        computer = orm.Computer(
+            label=label,
+            hostname="localhost",
+            description="aiida-icon throughput measurements",
+            transport_type="core.local",
+            scheduler_type="core.direct",
+            workdir=str(work_dir),
+        ).store()
+        computer.set_default_mpiprocs_per_machine(1)
+    if not computer.is_configured:
+        computer.configure(safe_interval=0)
+    computer.set_minimum_job_poll_interval(poll_interval)
+    return computer
+
+
+def setup_mock_code(computer: orm.Computer, label: str = "mock-icon") -> orm.InstalledCode:
+    """Load or create the mock ICON code ('aiida-icon-mock') on a computer."""
+    try:
+        existing = orm.load_code(f"{label}@{computer.label}")
+    except aiidaxc.NotExistent:
+        pass
+    else:
+        if not isinstance(existing, orm.InstalledCode):
+            msg = f"The code '{existing.full_label}' exists, but is not an installed code."
+            raise ValueError(msg)
+        return existing
+    executable = shutil.which(MOCK_EXECUTABLE) or str(pathlib.Path(sys.executable).parent / MOCK_EXECUTABLE)
+    code = orm.InstalledCode(
+        label=label, computer=computer, filepath_executable=executable, default_calc_job_plugin="icon.icon"
+    )
+    code.store()
+    return code
+
+
+def make_builder(
+    code: orm.AbstractCode, settings: mock_icon.MockSettings, *, num_streams: int = 2
+) -> engine.ProcessBuilder:
+    """
+    Builder for one mock IconCalculation, writing 'settings.files_per_stream' files to each of 'num_streams' streams.
+
+    The mock runs serially (without MPI) and gets its settings through environment variables.
+    """
+    files_per_stream = settings.files_per_stream or 1
+    # one output date (and time step) per file
+    output_interval = datetime.timedelta(minutes=1)
+    period = output_interval * files_per_stream
+    builder = code.get_builder()
+    builder.master_namelist = orm.SinglefileData.from_string(
+        inputs.make_master_nml(period=period), filename="icon_master.namelist"
+    )
+    builder.models = {
+        "m0": orm.SinglefileData.from_string(
+            inputs.make_model_nml(num_streams, output_interval=output_interval, dtime=output_interval.total_seconds()),
+            filename="m0.nml",
+        )
+    }
+    options = builder.metadata.options  # type: ignore[attr-defined]  # builder has a custom setattr
+    options.withmpi = False
+    options.resources = {"num_machines": 1, "num_mpiprocs_per_machine": 1}
+    options.environment_variables = {
+        "MOCK_ICON_OUTPUT_FILE_SIZE": str(settings.output_file_size),
+        "MOCK_ICON_FILES_PER_STREAM": str(files_per_stream),
+        "MOCK_ICON_RESTART_FILE_SIZE": str(settings.restart_file_size),
+        "MOCK_ICON_RESTART_PATCHES": str(settings.restart_patches),
+        "MOCK_ICON_RUNTIME": str(settings.runtime),
+    }
+    return builder
+
+
+def _poll(timelines: Mapping[int, CalculationTimeline]) -> None:
+    """Record job states and terminations of all unfinished calculations, with one query."""
+    pending = [pk for pk, timeline in timelines.items() if timeline.terminated is None]
+    if not pending:
+        return
+    now = time.time()
+    query = orm.QueryBuilder().append(
+        orm.CalcJobNode,
+        filters={"id": {"in": pending}},
+        project=["id", "attributes.state", "attributes.process_state", "attributes.exit_status"],
+    )
+    for pk, state, process_state, exit_status in query.iterall():
+        timeline = timelines[pk]
+        if state in STATE_STAGES:
+            timeline.states.setdefault(state, now)
+        if process_state in ("finished", "excepted", "killed"):
+            timeline.terminated = now
+            timeline.exit_status = exit_status
+
+
+def measure_throughput(
+    builders: Iterable[engine.ProcessBuilder],
+    *,
+    poll_interval: float = 0.5,
+    timeout: float | None = None,
+    submit: Callable[[engine.ProcessBuilder], orm.ProcessNode] = engine.submit,
+    config: Mapping[str, typing.Any] | None = None,
+) -> ThroughputReport:
+    """
+    Submit all builders (to the daemon) and follow the calculations until they terminated or 'timeout' seconds passed.
+
+    Job states are polled every 'poll_interval' seconds, which is the resolution of the stage timings.
+    """
+    timelines: dict[int, CalculationTimeline] = {}
+    for process_builder in builders:
+        node = submit(process_builder)
+        pk = typing.cast("int", node.pk)  # submitted nodes are stored
+        timelines[pk] = CalculationTimeline(pk=pk, submitted=node.ctime.timestamp())
+        _poll(timelines)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while any(timeline.terminated is None for timeline in timelines.values()):
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        time.sleep(poll_interval)
+        _poll(timelines)
+    return ThroughputReport(config=dict(config or {}), timelines=list(timelines.values()))
+
+
+@click.command()
+@click.option("--profile", default=None, help="AiiDA profile, the default profile if not given.")
+@click.option("-n", "--count", type=int, default=10, show_default=True, help="Number of calculations to submit.")
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help=(
+        "Start the daemon with this many workers (and stop it afterwards), uses the running daemon if not given. "
+        "Fails if the daemon is already running with a different number of workers."
+    ),
+)
+@click.option("--streams", type=int, default=2, show_default=True, help="Output streams per calculation.")
+@click.option("--files-per-stream", type=int, default=1, show_default=True)
+@click.option("--output-file-size", type=int, default=1024, show_default=True)
+@click.option("--restart-patches", type=int, default=1, show_default=True)
+@click.option("--runtime", type=float, default=0.0, show_default=True, help="Run time of each mock ICON, in seconds.")
+@click.option("--poll-interval", type=float, default=0.5, show_default=True, help="Resolution of the stage timings.")
+@click.option(
+    "--job-poll-interval",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Minimum interval between two scheduler polls of the daemon (set on the computer).",
+)
+@click.option("--timeout", type=float, default=None, help="Give up waiting after this many seconds.")
+@click.option("--computer", "computer_label", default="aiida-icon-throughput", show_default=True)
+@click.option(
+    "--work-dir",
+    type=click.Path(file_okay=False, path_type=pathlib.Path),
+    default=None,
+    help="Work dir of a newly created computer, a temporary directory if not given.",
+)
+@click.option(
+    "-o", "--output", type=click.File("w"), default="-", help="Write the JSON report here (default: standard output)."
+)
+def main(
+    profile: str | None,
+    count: int,
+    workers: int | None,
+    streams: int,
+    files_per_stream: int,
+    output_file_size: int,
+    restart_patches: int,
+    runtime: float,
+    poll_interval: float,
+    job_poll_interval: float,
+    timeout: float | None,
+    computer_label: str,
+    work_dir: pathlib.Path | None,
+    output: typing.TextIO,
+) -> None:
+    """
+    Measure how many mock IconCalculations per minute the daemon pushes through, and how long each stage takes.
+
+    Runs the calculations on this machine (local transport, direct scheduler) with 'aiida-icon-mock' as ICON.
+    Prints a summary to standard error and the full report as JSON.
+    """
+    aiida.load_profile(profile)
+    from aiida.engine.daemon.client import get_daemon_client
+
+    computer = setup_computer(
+        computer_label,
+        work_dir or pathlib.Path(tempfile.mkdtemp(prefix="aiida-icon-throughput-")),
+        poll_interval=job_poll_interval,
+    )
+    code = setup_mock_code(computer)
+    settings = mock_icon.MockSettings(
+        output_file_size=output_file_size,
+        files_per_stream=files_per_stream,
+        restart_patches=restart_patches,
+        runtime=runtime,
+    )
+    try:
+        daemon = get_daemon_client()
+    except aiidaxc.ConfigurationError as err:
+        raise click.ClickException(str(err)) from err
+    started_daemon = False
+    if daemon.is_daemon_running:
+        if workers is not None and (running_workers := daemon.get_number_of_workers()) != workers:
+            msg = (
+                f"The daemon is already running with {running_workers} worker(s), "
+                f"stop it or leave out '--workers' to measure with those."
+            )
+            raise click.ClickException(msg)
+    elif workers is not None:
+        daemon.start_daemon(number_workers=workers)
+        started_daemon = True
+    else:
+        msg = "The daemon is not running, start it or pass '--workers'."
+        raise click.ClickException(msg)
+    config = {
+        "count": count,
+        "workers": daemon.get_number_of_workers(),
+        "streams": streams,
+        "poll_interval": poll_interval,
+        "job_poll_interval": job_poll_interval,
+        "computer": computer.label,
+        "settings": dataclasses.asdict(settings),
+    }
+    try:
+        report = measure_throughput(
+            (make_builder(code, settings, num_streams=streams) for _ in range(count)),
+            poll_interval=poll_interval,
+            timeout=timeout,
+            config=config,
+        )
+    finally:
+        if started_daemon:
+            daemon.stop_daemon(wait=True)
+    click.echo(summarize(report), err=True)
+    json.dump(report.to_dict(), output, indent=2)
+    output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
+import contextlib
 import dataclasses
+import typing
+from collections.abc import MutableMapping
 
-from aiida import orm
+from aiida import manage, orm
+from aiida.common import hashing
 from aiida.orm import extras
 
+NodeT = typing.TypeVar("NodeT", bound=orm.Node)
+
 
 @dataclasses.dataclass(frozen=True)
 class Uenv:
@@ -21,3 +27,83 @@ def code_get_uenv(code: orm.Code) -> Uenv | None:
     if uenv_extra:
         return Uenv(**uenv_extra)
     return None
+
+
+def computer_set_striping(computer: orm.Computer, *, striping: dict) -> None:
+    """Set the default striping policy for calculations on 'computer' (see 'aiida_icon.striping.StripingPolicy')."""
+    computer.set_property("aiida_icon_striping", striping)
+
+
+def computer_get_striping(computer: orm.Computer) -> dict | None:
+    return computer.get_property("aiida_icon_striping", None)
+
+
+def _no_autoflush() -> contextlib.AbstractContextManager:
+    """Keep the storage session from flushing unstored nodes (which already reference a computer or user)."""
+    storage = manage.get_manager().get_profile_storage()
+    if session_getter := getattr(storage, "get_session", None):
+        return session_getter().no_autoflush
+    return contextlib.nullcontext()
+
+
+def content_hash(node: orm.Node) -> str:
+    """Hash of the content of a node (class, attributes and files), as stored for caching once the node is stored."""
+    if node.is_stored and (stored_hash := node.base.caching.get_hash()):
+        return stored_hash
+    return hashing.make_hash(node.base.caching.get_objects_to_hash())
+
+
+def deduplicate(node: NodeT, seen: dict[str, orm.Node] | None = None, *, stored: bool = True) -> NodeT:
+    """
+    Reuse a node with the same content, if there is one, instead of the unstored 'node'.
+
+    Looks up the nodes in 'seen' (keyed by hash, updated with 'node' if no duplicate is found) first, which
+    allows reusing unstored nodes between several inputs, then, with 'stored', stored nodes of the same class
+    by their hash. The hash is not indexed in the database, so every lookup of a stored node is a query on
+    the extras of all nodes of that class.
+
+    Examples:
+        >>> pytest_plugins = ["aiida.tools.pytest_fixtures"]
+        >>> stored = orm.SinglefileData.from_string("&master_nml\\n/", filename="master.nml").store()
+        >>> deduplicate(orm.SinglefileData.from_string("&master_nml\\n/", filename="master.nml")).uuid == stored.uuid
+        True
+        >>> deduplicate(orm.SinglefileData.from_string("&master_nml\\n/", filename="other.nml")).is_stored
+        False
+    """
+    if node.is_stored:
+        return node
+    node_hash = content_hash(node)
+    if seen is not None and node_hash in seen:
+        return typing.cast("NodeT", seen[node_hash])
+    if stored:
+        query = orm.QueryBuilder().append(
+            type(node), subclassing=False, filters={"extras._aiida_hash": node_hash}, project="*"
+        )
+        with _no_autoflush():
+            duplicate = query.first(flat=True)
+        if duplicate:
+            if seen is not None:
+                seen[node_hash] = duplicate
+            return typing.cast("NodeT", duplicate)
+    if seen is None:
+        return node
+    return typing.cast("NodeT", seen.setdefault(node_hash, node))
+
+
+def deduplicate_inputs(
+    inputs: MutableMapping[str, typing.Any], seen: dict[str, orm.Node] | None = None, *, stored: bool = True
+) -> None:
+    """
+    Replace all unstored file inputs (recursing into namespaces) with nodes of the same content, in place.
+
+    Identical unstored inputs are replaced by the same node, such that it is only stored once.
+    With 'stored', they are also replaced by stored nodes of the same content (see 'deduplicate').
+    """
+    seen = {} if seen is None else seen
+    for key, value in list(inputs.items()):
+        match value:
+            case orm.SinglefileData():
+                if (duplicate := deduplicate(value, seen, stored=stored)) is not value:
+                    inputs[key] = duplicate
+            case MutableMapping():
+                deduplicate_inputs(value, seen, stored=stored)
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import concurrent.futures
+import contextlib
+import contextvars
+import dataclasses
+import datetime
+import json
+import logging
+import pathlib
+import secrets
+import time
+import typing
+import urllib.error
+import urllib.request
+
+from aiida_icon import efficiency
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Mapping, Sequence
+
+    from aiida import orm
+
+__all__ = [
+    "EXTRAS_KEY",
+    "Span",
+    "TracingConfig",
+    "calculation_spans",
+    "export_calculation_trace",
+    "flush",
+    "recording",
+    "scheduler_times",
+    "span",
+    "store_spans",
+    "to_otlp_json",
+    "validate_tracing_option",
+]
+
+LOGGER = logging.getLogger(__name__)
+
+#: Spans recorded while preparing the submission (in another process than the parser, possibly) are kept here.
+EXTRAS_KEY = "trace_spans"
+SCOPE_NAME = "aiida_icon"
+
+_spans: contextvars.ContextVar[list[Span] | None] = contextvars.ContextVar("trace_spans", default=None)
+_parent: contextvars.ContextVar[str | None] = contextvars.ContextVar("trace_parent", default=None)
+#: Sends traces to collectors, one at a time, so that the parser does not wait for the collector.
+_sender = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="aiida_icon_tracing")
+
+
+@dataclasses.dataclass
+class Span:
+    """A timed step (times in seconds since the epoch), 'parent_id' None for top level steps."""
+
+    name: str
+    start: float
+    end: float
+    span_id: str = dataclasses.field(default_factory=lambda: secrets.token_hex(8))
+    parent_id: str | None = None
+    attributes: dict[str, typing.Any] = dataclasses.field(default_factory=dict)
+    error: str | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class TracingConfig:
+    """
+    Where to export the traces of calculations: appended as JSON lines to 'file' and / or sent to an
+    OpenTelemetry collector at 'endpoint' (OTLP over HTTP, for example 'http://localhost:4318').
+    """
+
+    file: str | None = None
+    endpoint: str | None = None
+    service_name: str = "aiida-icon"
+    timeout: float = 5.0
+
+    @classmethod
+    def from_option(cls, option: Mapping[str, typing.Any]) -> TracingConfig:
+        """
+        Read the 'tracing' option of an IconCalculation.
+
+        Examples:
+            >>> TracingConfig.from_option({"file": "/tmp/traces.jsonl"}).service_name
+            'aiida-icon'
+            >>> TracingConfig.from_option({"service_name": "icon"})
+            Traceback (most recent call last):
+            ValueError: Tracing needs a 'file' or an 'endpoint' to export to.
+        """
+        fields = {field.name for field in dataclasses.fields(cls)}
+        if unknown := sorted(set(option) - fields):
+            msg = f"Unknown tracing settings: {', '.join(unknown)}."
+            raise ValueError(msg)
+        config = cls(**option)
+        if not (config.file or config.endpoint):
+            msg = "Tracing needs a 'file' or an 'endpoint' to export to."
+            raise ValueError(msg)
+        return config
+
+
+def validate_tracing_option(value: Mapping[str, typing.Any] | None, _: typing.Any) -> str | None:
+    """Port validator for the 'tracing' option."""
+    if value is None:
+        return None
+    try:
+        TracingConfig.from_option(value)
+    except (TypeError, ValueError) as err:
+        return str(err)
+    return None
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[list[Span]]:
+    """Record the spans (see 'span') within the block."""
+    spans: list[Span] = []
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: typing.Any) -> Iterator[Span | None]:
+    """
+    Time a step, nested in the enclosing span, if spans are being recorded.
+
+    Examples:
+        >>> with recording() as spans:
+        ...     with span("prepare"):
+        ...         with span("collect_model_nml", models=2):
+        ...             pass
+        >>> [(s.name, s.parent_id == spans[1].span_id) for s in spans]
+        [('collect_model_nml', True), ('prepare', False)]
+    """
+    spans = _spans.get()
+    if spans is None:
+        yield None
+        return
+    current = Span(name=name, start=time.time(), end=0.0, parent_id=_parent.get(), attributes=attributes)
+    token = _parent.set(current.span_id)
+    try:
+        yield current
+    except Exception as err:
+        current.error = f"{type(err).__name__}: {err}"
+        raise
+    finally:
+        _parent.reset(token)
+        current.end = time.time()
+        spans.append(current)
+
+
+def store_spans(node: orm.Node, spans: Iterable[Span]) -> None:
+    node.base.extras.set(EXTRAS_KEY, [dataclasses.asdict(recorded) for recorded in spans])
+
+
+def _parse_sacct_time(value: str) -> float | None:
+    """Slurm prints times in the local time of the cluster, assumed to be the local time here as well."""
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def scheduler_times(node: orm.CalcJobNode) -> dict[str, float]:
+    """
+    Submission, start and end of the job (seconds since the epoch), as far as the scheduler reported them.
+
+    The detailed job info (Slurm's accounting) is preferred over the job info of the last scheduler poll.
+    """
+    times: dict[str, float] = {}
+    job_info = node.get_last_job_info()
+    if job_info is not None:
+        for key, value in (
+            ("submit", job_info.submission_time),
+            ("start", job_info.dispatch_time),
+            ("end", job_info.finish_time),
+        ):
+            if value is not None:
+                times[key] = value.timestamp()
+        if "start" in times and "end" not in times and job_info.wallclock_time_seconds is not None:
+            times["end"] = times["start"] + job_info.wallclock_time_seconds
+    if rows := efficiency.read_sacct_rows(node.get_detailed_job_info()):
+        for key, field in (("submit", "Submit"), ("start", "Start"), ("end", "End")):
+            if (seconds := _parse_sacct_time(rows[0].get(field, ""))) is not None:
+                times[key] = seconds
+    return times
+
+
+def calculation_spans(node: orm.CalcJobNode, *, parse_spans: Sequence[Span] = ()) -> list[Span]:
+    """
+    All spans of a calculation's lifecycle, below a root span for the calculation.
+
+    Spans recorded while preparing the submission are read from the extras, 'upload', 'scheduler.queue',
+    'scheduler.run' and 'retrieve' are derived from the creation times of the outputs and the scheduler's job info.
+    """
+    prepared = [Span(**data) for data in node.base.extras.get(EXTRAS_KEY, [])]
+    spans = [*prepared]
+    prepare_end = max((recorded.end for recorded in prepared if recorded.parent_id is None), default=None)
+    outputs = node.base.links.get_outgoing().all_link_labels()
+    upload_end = node.outputs.remote_folder.ctime.timestamp() if "remote_folder" in outputs else None
+    if prepare_end is not None and upload_end is not None:
+        spans.append(Span(name="upload", start=prepare_end, end=upload_end))
+    job = scheduler_times(node)
+    if "submit" in job and "start" in job:
+        spans.append(Span(name="scheduler.queue", start=job["submit"], end=job["start"]))
+    if "start" in job and "end" in job:
+        spans.append(
+            Span(name="scheduler.run", start=job["start"], end=job["end"], attributes={"job_id": node.get_job_id()})
+        )
+    if "retrieved" in outputs:
+        retrieve_start = job.get("end", upload_end)
+        if retrieve_start is not None:
+            spans.append(Span(name="retrieve", start=retrieve_start, end=node.outputs.retrieved.ctime.timestamp()))
+    spans += parse_spans
+
+    root = Span(
+        name=node.process_label or "IconCalculation",
+        start=node.ctime.timestamp(),
+        end=max((recorded.end for recorded in spans), default=node.ctime.timestamp()),
+        span_id=node.uuid.replace("-", "")[:16],
+        attributes={
+            "aiida.pk": node.pk,
+            "aiida.uuid": node.uuid,
+            "aiida.computer": node.computer.label if node.computer else "",
+        },
+    )
+    for recorded in spans:
+        if recorded.parent_id is None:
+            recorded.parent_id = root.span_id
+    return [root, *spans]
+
+
+def _attribute_value(value: typing.Any) -> dict[str, typing.Any]:
+    match value:
+        case bool():
+            return {"boolValue": value}
+        case int():
+            return {"intValue": str(value)}
+        case float():
+            return {"doubleValue": value}
+        case _:
+            return {"stringValue": str(value)}
+
+
+def _attributes(attributes: Mapping[str, typing.Any]) -> list[dict[str, typing.Any]]:
+    return [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items()]
+
+
+def to_otlp_json(spans: Sequence[Span], *, trace_id: str, service_name: str = "aiida-icon") -> dict[str, typing.Any]:
+    """
+    An OTLP/JSON export request ('ExportTraceServiceRequest') with the spans of one trace.
+
+    Examples:
+        >>> request = to_otlp_json([Span("parse", 1.0, 1.5, span_id="00f067aa0ba902b7")], trace_id="4bf92f3577b34da6a3ce929d0e0e4736")
+        >>> otlp_span = request["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        >>> otlp_span["name"], otlp_span["startTimeUnixNano"], otlp_span["endTimeUnixNano"]
+        ('parse', '1000000000', '1500000000')
+    """
+    otlp_spans = []
+    for recorded in spans:
+        otlp_span: dict[str, typing.Any] = {
+            "traceId": trace_id,
+            "spanId": recorded.span_id,
+            "name": recorded.name,
+            "kind": 1,  # internal
+            "startTimeUnixNano": str(round(recorded.start * 1e9)),
+            "endTimeUnixNano": str(round(recorded.end * 1e9)),
+            "attributes": _attributes(recorded.attributes),
+            "status": {"code": 2, "message": recorded.error} if recorded.error else {"code": 1},
+        }
+        if recorded.parent_id:
+            otlp_span["parentSpanId"] = recorded.parent_id
+        otlp_spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _attributes({"service.name": service_name})},
+                "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": otlp_spans}],
+            }
+        ]
+    }
+
+
+def _send(url: str, data: bytes, timeout: float, description: str) -> None:
+    http_request = urllib.request.Request(  # noqa: S310  # the endpoint is configured by the user
+        url, data=data, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout):  # noqa: S310
+            pass
+    except (OSError, urllib.error.URLError) as err:
+        LOGGER.warning(f"Could not export {description} to {url}: {err}")
+
+
+def export(
+    request: Mapping[str, typing.Any], config: TracingConfig, *, description: str = "the trace"
+) -> concurrent.futures.Future[None] | None:
+    """
+    Append the request to the trace file (one line per trace) and / or send it to the collector.
+
+    The request is sent in a background thread, the returned future is done once it was sent (or failed to,
+    which is logged). Pending requests are sent before the interpreter exits, see also 'flush'.
+    """
+    data = json.dumps(request, separators=(",", ":"))
+    if config.file:
+        path = pathlib.Path(config.file).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # a single write of a line, so that concurrent daemon workers do not interleave their traces
+        with path.open("a") as trace_file:
+            trace_file.write(f"{data}\n")
+    if not config.endpoint:
+        return None
+    url = f"{config.endpoint.rstrip('/')}/v1/traces"
+    return _sender.submit(_send, url, data.encode(), config.timeout, description)
+
+
+def flush(timeout: float | None = None) -> None:
+    """Wait until the traces passed to 'export' so far have been sent to their collectors."""
+    _sender.submit(lambda: None).result(timeout=timeout)
+
+
+def export_calculation_trace(
+    node: orm.CalcJobNode, config: TracingConfig, *, parse_spans: Sequence[Span] = ()
+) -> list[Span]:
+    """
+    Export the trace of a calculation (with the node's UUID as trace id), errors are only logged.
+
+    Sending to a collector happens in the background (see 'export'), so this does not wait for the collector.
+    Can also be used on finished calculations, to export their traces after the fact (without parse stages).
+    """
+    spans = calculation_spans(node, parse_spans=parse_spans)
+    request = to_otlp_json(spans, trace_id=node.uuid.replace("-", ""), service_name=config.service_name)
+    try:
+        export(request, config, description=f"the trace of calculation {node.pk}")
+    except OSError as err:
+        LOGGER.warning(f"Could not export the trace of calculation {node.pk}: {err}")
+    return spans
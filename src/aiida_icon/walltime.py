@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import math
+import typing
+
+from aiida import orm
+
+from aiida_icon import efficiency, performance, search
+from aiida_icon.iconutils import masternml, modelnml
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+    from aiida.engine.processes import builder as process_builder
+
+__all__ = [
+    "OUTPUT_TIMER",
+    "Experiment",
+    "RunCost",
+    "WalltimePrediction",
+    "WalltimePredictor",
+    "load_run_costs",
+    "read_experiment",
+]
+
+#: The timer of writing output, its share of a run scales with the output volume rather than the time steps.
+OUTPUT_TIMER = "write_output"
+
+
+@dataclasses.dataclass(frozen=True)
+class Experiment:
+    """What the run time of a run depends on: where it runs, the grid, the parallelism and the simulated period."""
+
+    computer: str | None
+    code: str | None
+    grid: str | None
+    num_cells: int | None
+    total_mpiprocs: int | None
+    num_output_streams: int | None
+    simulated_seconds: float
+    time_step: float
+
+    @property
+    def steps(self) -> int:
+        return math.ceil(self.simulated_seconds / self.time_step)
+
+
+@dataclasses.dataclass(frozen=True)
+class RunCost:
+    """
+    The run time of a finished run, split into parts which scale differently (in seconds).
+
+    'compute_seconds' is the time of the model ('total' timer) without writing output, 'overhead_seconds' the
+    elapsed time of the job outside the model (start up, job scripts), if the Slurm accounting is known.
+    """
+
+    pk: int
+    ctime: datetime.datetime
+    experiment: Experiment
+    compute_seconds: float
+    output_seconds: float
+    overhead_seconds: float = 0.0
+
+    def scale_to(self, experiment: Experiment) -> float | None:
+        """
+        Run time of another experiment, scaled from this run.
+
+        The model time scales with the number of time steps and cells per MPI process (as if it scaled perfectly),
+        the output time with the simulated period, the number of cells and the number of output streams.
+        None if the grids can not be compared.
+
+        Examples:
+            >>> run = RunCost(
+            ...     pk=1,
+            ...     ctime=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc),
+            ...     experiment=Experiment("santis", "icon@santis", "R02B04", 20480, 128, 2, 86400, 600),
+            ...     compute_seconds=1000,
+            ...     output_seconds=100,
+            ...     overhead_seconds=60,
+            ... )
+            >>> run.scale_to(Experiment("santis", "icon@santis", "R02B04", 20480, 256, 4, 10 * 86400, 300))
+            12060.0
+        """
+        mine = self.experiment
+        if mine.num_cells and experiment.num_cells:
+            cells = experiment.num_cells / mine.num_cells
+        elif mine.grid == experiment.grid:
+            cells = 1.0
+        else:
+            return None
+        procs = (
+            mine.total_mpiprocs / experiment.total_mpiprocs
+            if mine.total_mpiprocs and experiment.total_mpiprocs
+            else 1.0
+        )
+        streams = (
+            experiment.num_output_streams / mine.num_output_streams
+            if mine.num_output_streams and experiment.num_output_streams is not None
+            else 1.0
+        )
+        compute = self.compute_seconds / mine.steps * experiment.steps * cells * procs
+        output = self.output_seconds * experiment.simulated_seconds / mine.simulated_seconds * cells * streams
+        return self.overhead_seconds + compute + output
+
+
+def _metadata_experiment(
+    metadata: Mapping[str, typing.Any], *, computer: str | None, code: str | None, simulated_seconds: float
+) -> Experiment | None:
+    time_step = metadata.get("time_step")
+    if not time_step:
+        return None
+    grid_filename = metadata.get("grid_filename")
+    return Experiment(
+        computer=computer,
+        code=code,
+        grid=metadata.get("grid"),
+        num_cells=modelnml.read_grid_num_cells(grid_filename) if grid_filename else None,
+        total_mpiprocs=metadata.get("total_mpiprocs"),
+        num_output_streams=metadata.get("num_output_streams"),
+        simulated_seconds=simulated_seconds,
+        time_step=time_step,
+    )
+
+
+def load_run_costs(*, filters: Mapping[str, typing.Any] | None = None) -> list[RunCost]:
+    """
+    The run costs of all successfully finished IconCalculations, in two database queries.
+
+    The simulated period of a run is its number of time steps (from the timer report) times its time step (from
+    the experiment metadata), so restart segments count with what they actually simulated. Runs without either
+    are left out. 'filters' are additional filters on the experiment metadata, as for
+    'aiida_icon.search.query_experiments'.
+    """
+    calc_filters = {
+        "process_type": search.PROCESS_TYPE,
+        "attributes.exit_status": 0,
+        **{f"extras.{search.EXTRAS_KEY}.{field}": condition for field, condition in (filters or {}).items()},
+    }
+    query = orm.QueryBuilder()
+    query.append(
+        orm.CalcJobNode, tag="calc", filters=calc_filters, project=["id", "ctime", f"extras.{search.EXTRAS_KEY}"]
+    )
+    query.append(orm.Computer, with_node="calc", project=["label"])
+    query.append(orm.AbstractCode, with_outgoing="calc", edge_filters={"label": "code"}, project=["label"])
+    query.append(orm.Dict, with_incoming="calc", edge_filters={"label": "timer_report"}, project=["attributes"])
+    # not every run has an efficiency report (only on Slurm), an outer join would drop those filtering the link label
+    elapsed_query = orm.QueryBuilder()
+    elapsed_query.append(orm.CalcJobNode, tag="calc", filters=calc_filters, project=["id"])
+    elapsed_query.append(
+        orm.Dict,
+        with_incoming="calc",
+        edge_filters={"label": "efficiency_report"},
+        project=["attributes.elapsed_seconds"],
+    )
+    elapsed_seconds = dict(elapsed_query.iterall())
+
+    runs = []
+    for pk, ctime, metadata, computer, code, report in query.iterall():
+        steps = report.get(performance.STEP_TIMER, {}).get("calls")
+        total = performance.timer_seconds(report.get("total", {}))
+        if not steps or total is None:
+            continue
+        experiment = _metadata_experiment(
+            metadata or {},
+            computer=computer,
+            code=f"{code}@{computer}",
+            simulated_seconds=steps * (metadata or {}).get("time_step", 0),
+        )
+        if experiment is None:
+            continue
+        output = min(performance.timer_seconds(report.get(OUTPUT_TIMER, {})) or 0.0, total)
+        runs.append(
+            RunCost(
+                pk=pk,
+                ctime=ctime,
+                experiment=experiment,
+                compute_seconds=total - output,
+                output_seconds=output,
+                overhead_seconds=max(elapsed - total, 0.0) if (elapsed := elapsed_seconds.get(pk)) is not None else 0.0,
+            )
+        )
+    return runs
+
+
+def read_experiment(builder: process_builder.ProcessBuilder) -> Experiment | None:
+    """
+    The experiment of an IconCalculation builder, None if its period or time step can not be read.
+
+    The simulated period is the experiment period, cut at the restart interval, which is an upper bound for
+    restarted runs.
+    """
+    metadata = search.experiment_metadata(builder)
+    simulated_seconds = masternml.read_segment_seconds(builder["master_namelist"])
+    if not simulated_seconds:
+        return None
+    code = builder.get("code")
+    computer = builder.get("metadata", {}).get("computer") or (code.computer if code else None)
+    return _metadata_experiment(
+        metadata,
+        computer=computer.label if computer else None,
+        code=code.full_label if code else None,
+        simulated_seconds=simulated_seconds,
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class WalltimePrediction:
+    """The expected run time of an experiment, the wall time to request for it and the runs it is based on."""
+
+    seconds: float
+    max_wallclock_seconds: int
+    basis: tuple[int, ...]
+
+    def apply(self, builder: process_builder.ProcessBuilder) -> None:
+        """Set the wall time on an IconCalculation builder."""
+        builder.metadata.options.max_wallclock_seconds = self.max_wallclock_seconds  # type: ignore[attr-defined]  # builder has a custom setattr
+
+
+class WalltimePredictor:
+    """
+    Predict the run time of new IconCalculations from similar finished runs.
+
+    Only runs on the same computer are considered. Of those, the most similar ones (the same grid, the same number
+    of MPI processes and the same code, in that order of importance) are scaled to the new experiment (see
+    'RunCost.scale_to') and the longest of the latest 'window' of them is taken. The requested wall time adds
+    'margin' (relative, at least 'min_margin_seconds') on top, see 'aiida_icon.efficiency.padded_walltime'.
+
+    The history is loaded once and experiments read from identical inputs are reused, so that predicting for
+    hundreds of ensemble members takes no further database queries.
+    """
+
+    def __init__(
+        self,
+        runs: Sequence[RunCost],
+        *,
+        margin: float = 0.15,
+        min_margin_seconds: float = 300,
+        window: int = 5,
+    ) -> None:
+        self.margin = margin
+        self.min_margin_seconds = min_margin_seconds
+        self.window = window
+        self._runs: dict[str | None, list[RunCost]] = {}
+        for run in sorted(runs, key=lambda run: (run.ctime, run.pk), reverse=True):
+            self._runs.setdefault(run.experiment.computer, []).append(run)
+        self._experiments: dict[tuple[typing.Any, ...], Experiment | None] = {}
+
+    @classmethod
+    def load(
+        cls,
+        *,
+        filters: Mapping[str, typing.Any] | None = None,
+        margin: float = 0.15,
+        min_margin_seconds: float = 300,
+        window: int = 5,
+    ) -> WalltimePredictor:
+        """A predictor based on the finished runs in the database (see 'load_run_costs' for 'filters')."""
+        return cls(load_run_costs(filters=filters), margin=margin, min_margin_seconds=min_margin_seconds, window=window)
+
+    def _experiment(self, builder: process_builder.ProcessBuilder) -> Experiment | None:
+        options = builder.get("metadata", {}).get("options", {})
+        key = (
+            *(
+                node.uuid if (node := builder.get(name)) is not None else None
+                for name in ("master_namelist", "dynamics_grid_file", "code")
+            ),
+            tuple(sorted((name, node.uuid) for name, node in builder.get("models", {}).items())),
+            tuple(sorted(dict(options.get("resources") or {}).items())),
+            builder.get("metadata", {}).get("computer"),
+        )
+        if key not in self._experiments:
+            self._experiments[key] = read_experiment(builder)
+        return self._experiments[key]
+
+    def predict_experiment(self, experiment: Experiment) -> WalltimePrediction | None:
+        """
+        Predict the run time of an experiment, None without comparable runs.
+
+        Examples:
+            >>> def run(pk, procs, compute):
+            ...     experiment = Experiment("santis", "icon@santis", "R02B04", 20480, procs, 2, 86400, 600)
+            ...     ctime = datetime.datetime(2025, 1, pk, tzinfo=datetime.timezone.utc)
+            ...     return RunCost(pk, ctime, experiment, compute_seconds=compute, output_seconds=0)
+            >>> predictor = WalltimePredictor([run(1, 128, 1000), run(2, 128, 1200), run(3, 256, 400)])
+            >>> predictor.predict_experiment(Experiment("santis", "icon@santis", "R02B04", 20480, 128, 2, 172800, 600))
+            WalltimePrediction(seconds=2400.0, max_wallclock_seconds=2760, basis=(2, 1))
+            >>> predictor.predict_experiment(Experiment("balfrin", None, "R02B04", 20480, 128, 2, 86400, 600)) is None
+            True
+        """
+        candidates = [
+            (self._distance(run.experiment, experiment), run, seconds)
+            for run in self._runs.get(experiment.computer, [])
+            if (seconds := run.scale_to(experiment)) is not None
+        ]
+        if not candidates:
+            return None
+        nearest = min(distance for distance, _, _ in candidates)
+        basis = [(run, seconds) for distance, run, seconds in candidates if distance == nearest][: self.window]
+        seconds = max(seconds for _, seconds in basis)
+        return WalltimePrediction(
+            seconds=seconds,
+            max_wallclock_seconds=efficiency.padded_walltime(
+                seconds, margin=self.margin, min_margin_seconds=self.min_margin_seconds
+            ),
+            basis=tuple(run.pk for run, _ in basis),
+        )
+
+    @staticmethod
+    def _distance(past: Experiment, new: Experiment) -> tuple[bool, bool, bool]:
+        return (past.grid != new.grid, past.total_mpiprocs != new.total_mpiprocs, past.code != new.code)
+
+    def predict(self, builder: process_builder.ProcessBuilder) -> WalltimePrediction | None:
+        """Predict the run time of an IconCalculation builder, None if there is nothing to go by."""
+        experiment = self._experiment(builder)
+        return self.predict_experiment(experiment) if experiment else None
+
+    def apply(self, builder: process_builder.ProcessBuilder) -> WalltimePrediction | None:
+        """Predict the run time of an IconCalculation builder and set its wall time, if there is a prediction."""
+        prediction = self.predict(builder)
+        if prediction is not None:
+            prediction.apply(builder)
+        return prediction
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import datetime
+import math
+import typing
+from collections.abc import Mapping
+
+from aiida import engine, orm
+from aiida.common import extendeddicts
+
+from aiida_icon.calculations import IconCalculation
+from aiida_icon.iconutils import masternml, namelists
+
+
+def _thaw(inputs: Mapping[str, typing.Any]) -> dict[str, typing.Any]:
+    """Recursively turn (frozen) input mappings into plain dicts, so they can be modified between iterations."""
+    return {key: _thaw(value) if isinstance(value, Mapping) else value for key, value in inputs.items()}
+
+
+def escalate_resources(
+    options: Mapping[str, typing.Any],
+    *,
+    factor: float,
+    max_num_machines: int | None = None,
+    max_memory_kb: int | None = None,
+) -> tuple[dict[str, typing.Any], str] | None:
+    """
+    Increase the memory (if it is requested explicitly) or else the number of machines after running out of memory.
+
+    Returns the new options and a description of the change, or None if the limits are reached.
+
+    Examples:
+        >>> escalate_resources({"max_memory_kb": 1000, "resources": {"num_machines": 2}}, factor=1.5)
+        ({'max_memory_kb': 1500, 'resources': {'num_machines': 2}}, "raised 'max_memory_kb' to 1500")
+        >>> options = {"max_memory_kb": 1000, "resources": {"num_machines": 2}}
+        >>> escalate_resources(options, factor=1.5, max_memory_kb=1200)
+        ({'max_memory_kb': 1000, 'resources': {'num_machines': 3}}, "raised 'num_machines' to 3")
+        >>> escalate_resources({"resources": {"num_machines": 4}}, factor=1.5, max_num_machines=4) is None
+        True
+    """
+    new_options = _thaw(options)
+    if memory := new_options.get("max_memory_kb"):
+        new_memory = math.ceil(memory * factor)
+        if max_memory_kb is None or new_memory <= max_memory_kb:
+            new_options["max_memory_kb"] = new_memory
+            return new_options, f"raised 'max_memory_kb' to {new_memory}"
+    resources = new_options.setdefault("resources", {})
+    num_machines = resources.get("num_machines", 1)
+    new_num_machines = max(math.ceil(num_machines * factor), num_machines + 1)
+    if max_num_machines is not None and new_num_machines > max_num_machines:
+        return None
+    resources["num_machines"] = new_num_machines
+    return new_options, f"raised 'num_machines' to {new_num_machines}"
+
+
+def shortened_restart_interval(master_nml: namelists.NMLInput, *, factor: float = 0.5) -> str | None:
+    """
+    Shorten the interval after which ICON writes a restart file and stops, so segments fit into the wall time.
+
+    Falls back to the experiment period if no restart interval is set. Returns None if it can not be shortened.
+
+    Examples:
+        >>> import f90nml
+        >>> shortened_restart_interval(f90nml.reads("&master_time_control_nml\\nrestartTimeIntval='P1D'\\n/"))
+        'PT12H'
+        >>> shortened_restart_interval(
+        ...     f90nml.reads(
+        ...         "&master_time_control_nml\\n"
+        ...         "experimentStartDate='2000-01-01T00:00:00Z'\\n"
+        ...         "experimentStopDate='2000-01-01T06:00:00Z'\\n/"
+        ...     )
+        ... )
+        'PT3H'
+        >>> shortened_restart_interval(f90nml.reads("&master_time_control_nml\\nrestartTimeIntval='P1M'\\n/")) is None
+        True
+    """
+    interval = masternml.read_time_control_option(master_nml, "restart_time_int_val")
+    try:
+        current = masternml.parse_iso_duration(interval) if interval else None
+    except ValueError:
+        return None
+    if current is None:
+        start, stop = masternml.read_experiment_period(master_nml)
+        if start is None or stop is None:
+            return None
+        current = stop - start
+    shortened = datetime.timedelta(seconds=int(current.total_seconds() * factor))
+    if shortened.total_seconds() < 1:
+        return None
+    return masternml.format_iso_duration(shortened)
+
+
+class IconBaseWorkChain(engine.BaseRestartWorkChain):
+    """
+    Run an IconCalculation and recover from known failures.
+
+    The parser recognizes failures from the scheduler accounting and from known signatures in the scheduler
+    stderr and the ICON log (see `aiida_icon.iconutils.failures`), each is handled by a process handler:
+
+    * out of memory: raise 'max_memory_kb' (if set) or the number of machines,
+    * out of wall time: resume from the latest restart, or shorten the restart interval if there is none,
+    * node failure: resubmit, resuming from the latest restart if there is one,
+    * finished with status 'RESTART': continue with the next segment until the experiment is done.
+
+    Handlers can be switched off or reordered through the 'handler_overrides' input. 'max_iterations' limits the
+    runs after failures only, continued segments are limited separately by 'max_segments'.
+    """
+
+    _process_class = IconCalculation
+
+    @classmethod
+    def define(cls, spec: engine.ProcessSpec) -> None:  # type: ignore[override] # forced by aiida-core
+        super().define(spec)
+        spec.expose_inputs(IconCalculation, namespace="icon")
+        spec.input(
+            "escalation_factor",
+            valid_type=orm.Float,
+            default=lambda: orm.Float(1.5),
+            help="Factor by which memory or the number of machines is increased after running out of memory.",
+        )
+        spec.input(
+            "max_num_machines",
+            valid_type=orm.Int,
+            required=False,
+            help="Upper limit for the number of machines when increasing resources.",
+        )
+        spec.input(
+            "max_memory_kb",
+            valid_type=orm.Int,
+            required=False,
+            help="Upper limit for the 'max_memory_kb' option when increasing resources, usually the memory per node.",
+        )
+        spec.input(
+            "max_segments",
+            valid_type=orm.Int,
+            required=False,
+            help="Upper limit for the number of segments continued after a 'RESTART' finish status (unlimited if not set).",
+        )
+        spec.outline(  # type: ignore[attr-defined] # forced by aiida-core
+            cls.setup,
+            engine.while_(cls.should_run_process)(  # type: ignore[arg-type] # forced by aiida-core
+                cls.run_process,  # type: ignore[arg-type] # forced by aiida-core
+                cls.inspect_process,  # type: ignore[arg-type] # forced by aiida-core
+            ),
+            cls.results,
+        )
+        spec.expose_outputs(IconCalculation)
+        spec.exit_code(
+            410,
+            "ERROR_RESOURCE_LIMIT_REACHED",
+            message="The calculation ran out of memory and the resources can not be increased any further.",
+        )
+        spec.exit_code(
+            411,
+            "ERROR_SEGMENT_NOT_SHORTENABLE",
+            message="Ran out of wall time before writing a restart and the segment can not be shortened.",
+        )
+        spec.exit_code(
+            412,
+            "ERROR_MAXIMUM_SEGMENTS_EXCEEDED",
+            message="The experiment is not done after the maximum number of segments.",
+        )
+
+    def setup(self) -> None:
+        super().setup()
+        self.ctx.inputs = extendeddicts.AttributeDict(_thaw(self.exposed_inputs(IconCalculation, namespace="icon")))
+        self.ctx.segments = 0
+
+    def should_run_process(self) -> bool:
+        """Continue until the experiment is done, 'max_iterations' does not count runs continuing a segment."""
+        return not self.ctx.is_finished and self.ctx.iteration - self.ctx.segments < self.inputs.max_iterations.value
+
+    def results(self) -> engine.ExitCode | None:
+        if not self.ctx.is_finished:
+            node = self.ctx.children[self.ctx.iteration - 1]
+            self.report(
+                f"reached the maximum number of iterations {self.inputs.max_iterations.value}: "
+                f"last ran {self.ctx.process_name}<{node.pk}>"
+            )
+            return self.exit_codes.ERROR_MAXIMUM_ITERATIONS_EXCEEDED
+        return super().results()
+
+    def resume_from_restart(self, node: orm.CalcJobNode) -> bool:
+        """Continue from the latest restart files of 'node', if there are any."""
+        if "latest_restart_file" not in node.outputs:
+            return False
+        self.ctx.inputs["restart_file"] = node.outputs.latest_restart_file
+        if "latest_restart_files" in node.outputs:
+            self.ctx.inputs["restart_files"] = dict(node.outputs.latest_restart_files)
+        master_nml = self.ctx.inputs["master_namelist"]
+        if not namelists.namelists_data(master_nml).get("master_nml", {}).get("lrestart", False):
+            self.ctx.inputs["master_namelist"] = masternml.modify_master_nml(
+                master_nml,
+                orm.Dict(
+                    masternml.options(
+                        master_options=masternml.MasterOptions(lrestart=True),
+                        time_control_options=masternml.TimeControlOptions(),
+                    )
+                ),
+            )
+        return True
+
+    @engine.process_handler(priority=600, exit_codes=[IconCalculation.exit_codes.ERROR_SCHEDULER_OUT_OF_MEMORY])
+    def handle_out_of_memory(self, node: orm.CalcJobNode) -> engine.ProcessHandlerReport:
+        escalated = escalate_resources(
+            self.ctx.inputs.setdefault("metadata", {}).get("options", {}),
+            factor=self.inputs.escalation_factor.value,
+            max_num_machines=self.inputs.max_num_machines.value if "max_num_machines" in self.inputs else None,
+            max_memory_kb=self.inputs.max_memory_kb.value if "max_memory_kb" in self.inputs else None,
+        )
+        if escalated is None:
+            self.report(f"{node.process_label}<{node.pk}> ran out of memory, resource limits reached.")
+            return engine.ProcessHandlerReport(do_break=True, exit_code=self.exit_codes.ERROR_RESOURCE_LIMIT_REACHED)
+        self.ctx.inputs["metadata"]["options"], description = escalated
+        resumed = self.resume_from_restart(node)
+        self.report(
+            f"{node.process_label}<{node.pk}> ran out of memory, {description}"
+            + (", resuming from the latest restart." if resumed else ".")
+        )
+        return engine.ProcessHandlerReport(do_break=True)
+
+    @engine.process_handler(priority=500, exit_codes=[IconCalculation.exit_codes.ERROR_SCHEDULER_OUT_OF_WALLTIME])
+    def handle_out_of_walltime(self, node: orm.CalcJobNode) -> engine.ProcessHandlerReport:
+        if self.resume_from_restart(node):
+            self.report(f"{node.process_label}<{node.pk}> ran out of wall time, resuming from the latest restart.")
+            return engine.ProcessHandlerReport(do_break=True)
+        master_nml = self.ctx.inputs["master_namelist"]
+        interval = shortened_restart_interval(master_nml)
+        if interval is None:
+            self.report(f"{node.process_label}<{node.pk}> ran out of wall time, can not shorten the segment.")
+            return engine.ProcessHandlerReport(do_break=True, exit_code=self.exit_codes.ERROR_SEGMENT_NOT_SHORTENABLE)
+        self.ctx.inputs["master_namelist"] = masternml.modify_master_nml(
+            master_nml,
+            orm.Dict(
+                {"master_time_control_nml": {masternml.time_control_key(master_nml, "restart_time_int_val"): interval}}
+            ),
+        )
+        self.report(
+            f"{node.process_label}<{node.pk}> ran out of wall time, shortened the restart interval to {interval}."
+        )
+        return engine.ProcessHandlerReport(do_break=True)
+
+    @engine.process_handler(priority=400, exit_codes=[IconCalculation.exit_codes.ERROR_SCHEDULER_NODE_FAILURE])
+    def handle_node_failure(self, node: orm.CalcJobNode) -> engine.ProcessHandlerReport:
+        resumed = self.resume_from_restart(node)
+        self.report(
+            f"{node.process_label}<{node.pk}> failed due to a node failure, resubmitting"
+            + (" from the latest restart." if resumed else ".")
+        )
+        return engine.ProcessHandlerReport(do_break=True)
+
+    @engine.process_handler(priority=100)
+    def handle_restart_segment(self, node: orm.CalcJobNode) -> engine.ProcessHandlerReport | None:
+        if not node.is_finished_ok or "finish_status" not in node.outputs:
+            return None
+        if node.outputs.finish_status.value != "RESTART":
+            return None
+        if "max_segments" in self.inputs and self.ctx.segments >= self.inputs.max_segments.value:
+            self.report(
+                f"{node.process_label}<{node.pk}> finished a segment, the maximum number of segments is reached."
+            )
+            return engine.ProcessHandlerReport(do_break=True, exit_code=self.exit_codes.ERROR_MAXIMUM_SEGMENTS_EXCEEDED)
+        if not self.resume_from_restart(node):
+            return None
+        self.ctx.segments += 1
+        self.report(f"{node.process_label}<{node.pk}> finished a segment, continuing from the latest restart.")
+        return engine.ProcessHandlerReport(do_break=True)
@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+import dataclasses
+import itertools
+import typing
+
+from aiida import engine, orm
+from aiida.common import extendeddicts
+
+from aiida_icon.calculations import IconCalculation
+from aiida_icon.iconutils import masternml, modelnml, timers
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping
+
+RESOURCE_KEYS = ("num_machines", "num_mpiprocs_per_machine", "num_cores_per_mpiproc")
+SEARCH_KEYS = (*RESOURCE_KEYS, "nproma")
+OBJECTIVES = ("sypd", "sypd_per_node")
+
+
+@dataclasses.dataclass(frozen=True)
+class Candidate:
+    """One point of the search space: job resources and (optionally) 'nproma'."""
+
+    resources: dict[str, int]
+    nproma: int | None = None
+
+
+def iter_candidates(search_space: Mapping[str, list[int]], base_resources: Mapping[str, int]) -> Iterator[Candidate]:
+    """
+    Iterate over all combinations of the search space.
+
+    Resources which are not part of the search space are taken from 'base_resources'.
+
+    Examples:
+        >>> candidates = iter_candidates(
+        ...     {"num_machines": [1, 2], "nproma": [16, 32]},
+        ...     base_resources={"num_machines": 10, "num_mpiprocs_per_machine": 4},
+        ... )
+        >>> [(c.resources["num_machines"], c.resources["num_mpiprocs_per_machine"], c.nproma) for c in candidates]
+        [(1, 4, 16), (1, 4, 32), (2, 4, 16), (2, 4, 32)]
+    """
+    keys = [key for key in SEARCH_KEYS if key in search_space]
+    for values in itertools.product(*(search_space[key] for key in keys)):
+        point = dict(zip(keys, values, strict=True))
+        nproma = point.pop("nproma", None)
+        yield Candidate(resources={**base_resources, **point}, nproma=nproma)
+
+
+def validate_search_space(value: orm.Dict | None, _: typing.Any) -> str | None:
+    if value is None:
+        return None
+    unknown = sorted(set(value.keys()) - set(SEARCH_KEYS))
+    if unknown:
+        return f"Unknown search space dimensions {unknown}, allowed are {list(SEARCH_KEYS)}."
+    for key, options in value.items():
+        if not isinstance(options, list) or not options:
+            return f"Search space dimension '{key}' must be a non-empty list."
+        if not all(isinstance(option, int) and option > 0 for option in options):
+            return f"Search space dimension '{key}' must only contain positive integers."
+    return None
+
+
+def validate_objective(value: orm.Str | None, _: typing.Any) -> str | None:
+    if value is not None and value.value not in OBJECTIVES:
+        return f"Unknown objective '{value.value}', choose one of {list(OBJECTIVES)}."
+    return None
+
+
+def score(*, simulated_seconds: float, wall_seconds: float, num_machines: int, objective: str) -> float:
+    """
+    Score a benchmark, higher is better.
+
+    Examples:
+        >>> score(simulated_seconds=86400, wall_seconds=86400 / 365, num_machines=2, objective="sypd")
+        1.0
+        >>> score(simulated_seconds=86400, wall_seconds=86400 / 365, num_machines=2, objective="sypd_per_node")
+        0.5
+    """
+    sypd = timers.simulated_years_per_day(simulated_seconds, wall_seconds)
+    if objective == "sypd_per_node":
+        return sypd / num_machines
+    return sypd
+
+
+def walltime_limit(
+    *, best_score: float, simulated_seconds: float, num_machines: int, objective: str, factor: float
+) -> float:
+    """
+    Wall time (in seconds) after which a benchmark can no longer score within 'factor' of the best score.
+
+    Examples:
+        >>> round(walltime_limit(best_score=1, simulated_seconds=86400, num_machines=2, objective="sypd", factor=2))
+        473
+        >>> round(
+        ...     walltime_limit(
+        ...         best_score=1, simulated_seconds=86400, num_machines=2, objective="sypd_per_node", factor=2
+        ...     )
+        ... )
+        237
+    """
+    worst_acceptable_sypd = best_score / factor
+    if objective == "sypd_per_node":
+        worst_acceptable_sypd *= num_machines
+    simulated_years = simulated_seconds / (timers.SECONDS_PER_DAY * timers.DAYS_PER_YEAR)
+    return simulated_years / worst_acceptable_sypd * timers.SECONDS_PER_DAY
+
+
+@engine.calcfunction
+def rank_benchmarks(
+    candidates: orm.Dict,
+    objective: orm.Str,
+    simulated_seconds: orm.Float,
+    model_name: orm.Str,
+    **timer_reports: orm.Dict,
+) -> dict[str, orm.Dict]:
+    """
+    Score the benchmarks and turn the best one into a preset (see 'IconCalculationBuilder.apply_preset').
+
+    'candidates' maps benchmark labels to their resources and 'nproma', 'timer_reports' maps the labels of the
+    benchmarks which ran to completion to their timer reports.
+    """
+    benchmarks = {}
+    for label, candidate in candidates.items():
+        benchmark = {**candidate}
+        if label in timer_reports and (wall_seconds := timers.report_total_seconds(timer_reports[label].get_dict())):
+            benchmark["wall_seconds"] = wall_seconds
+            benchmark["score"] = score(
+                simulated_seconds=simulated_seconds.value,
+                wall_seconds=wall_seconds,
+                num_machines=candidate["resources"].get("num_machines", 1),
+                objective=objective.value,
+            )
+        benchmarks[label] = benchmark
+    scored = {label: benchmark for label, benchmark in benchmarks.items() if "score" in benchmark}
+    best_label = max(scored, key=lambda label: scored[label]["score"], default=None)
+    results = {"scores": orm.Dict({"objective": objective.value, "best": best_label, "benchmarks": benchmarks})}
+    if best_label:
+        best = benchmarks[best_label]
+        preset: dict[str, typing.Any] = {"resources": best["resources"]}
+        if best.get("nproma"):
+            preset["model_name"] = model_name.value
+            preset["model_options"] = {"parallel_nml": {"nproma": best["nproma"]}}
+        results["preset"] = orm.Dict(preset)
+    return results
+
+
+class IconTuningWorkChain(engine.WorkChain):
+    """
+    Find the fastest resources and 'nproma' for an ICON experiment.
+
+    Runs a short benchmark of the same experiment for every point of the search space and scores it by the
+    throughput computed from the total time in the ICON timer report. Once a benchmark has been scored,
+    the following ones get a wall time limit after which they can no longer come within 'early_stop_factor'
+    of the best score, so clearly worse points are stopped by the scheduler instead of running to the end.
+
+    The winner is returned as a preset, which can be applied to a builder with `IconCalculationBuilder.apply_preset`.
+    """
+
+    @classmethod
+    def define(cls, spec: engine.ProcessSpec) -> None:  # type: ignore[override] # forced by aiida-core
+        super().define(spec)
+        spec.expose_inputs(IconCalculation, namespace="icon")
+        spec.input(
+            "search_space",
+            valid_type=orm.Dict,
+            validator=validate_search_space,
+            help=(
+                "Lists of values to try for any of 'num_machines', 'num_mpiprocs_per_machine', "
+                "'num_cores_per_mpiproc' and 'nproma', every combination is benchmarked."
+            ),
+        )
+        spec.input(
+            "model_name",
+            valid_type=orm.Str,
+            default=lambda: orm.Str("atm"),
+            help="Name of the model (in 'icon.models') whose 'nproma' is tuned.",
+        )
+        spec.input(
+            "benchmark_period",
+            valid_type=orm.Str,
+            required=False,
+            help="Simulated period of each benchmark as ISO 8601 duration (e.g. 'PT6H'), default: whole experiment.",
+        )
+        spec.input(
+            "objective",
+            valid_type=orm.Str,
+            default=lambda: orm.Str("sypd"),
+            validator=validate_objective,
+            help="'sypd' (simulated years per day) or 'sypd_per_node' to take the cost of the resources into account.",
+        )
+        spec.input(
+            "early_stop_factor",
+            valid_type=orm.Float,
+            default=lambda: orm.Float(1.5),
+            help="Stop benchmarks taking longer than this factor times the wall time needed to match the best score.",
+        )
+        spec.input(
+            "walltime_overhead",
+            valid_type=orm.Int,
+            default=lambda: orm.Int(300),
+            help="Seconds added to the early stop wall time limit for start up and I/O not covered by the timers.",
+        )
+        spec.input(
+            "max_concurrent",
+            valid_type=orm.Int,
+            default=lambda: orm.Int(1),
+            help="Number of benchmarks submitted at the same time (early stopping only applies between batches).",
+        )
+        spec.outline(  # type: ignore[attr-defined] # forced by aiida-core
+            cls.setup,
+            engine.while_(cls.has_pending_candidates)(  # type: ignore[arg-type] # forced by aiida-core
+                cls.run_benchmarks,  # type: ignore[arg-type] # forced by aiida-core
+                cls.inspect_benchmarks,  # type: ignore[arg-type] # forced by aiida-core
+            ),
+            cls.results,
+        )
+        spec.output(
+            "preset",
+            valid_type=orm.Dict,
+            help="Resources and model options of the best benchmark, see 'IconCalculationBuilder.apply_preset'.",
+        )
+        spec.output("scores", valid_type=orm.Dict, help="Resources, 'nproma', wall time and score of every benchmark.")
+        spec.exit_code(
+            400,
+            "ERROR_NO_SUCCESSFUL_BENCHMARK",
+            message="None of the benchmarks could be scored.",
+        )
+        spec.exit_code(
+            401,
+            "ERROR_UNKNOWN_SIMULATED_PERIOD",
+            message="The master namelist must contain experiment start and stop dates to compute the throughput.",
+        )
+        spec.exit_code(
+            402,
+            "ERROR_MODEL_NAMELIST_NOT_MODIFIABLE",
+            message="Tuning 'nproma' requires the model namelist to be given as a local file ('SinglefileData').",
+        )
+
+    def setup(self) -> engine.ExitCode | None:
+        inputs = extendeddicts.AttributeDict(self.exposed_inputs(IconCalculation, namespace="icon"))
+        if "benchmark_period" in self.inputs:
+            start, _ = masternml.read_experiment_period(inputs.master_namelist)
+            if start is None:
+                return self.exit_codes.ERROR_UNKNOWN_SIMULATED_PERIOD
+            stop = start + masternml.parse_iso_duration(self.inputs.benchmark_period.value)
+            stop_key = masternml.time_control_key(inputs.master_namelist, "experiment_stop_date")
+            inputs.master_namelist = masternml.modify_master_nml(
+                inputs.master_namelist,
+                orm.Dict({"master_time_control_nml": {stop_key: masternml.format_iso_datetime(stop)}}),
+            )
+        simulated_seconds = masternml.read_simulated_seconds(inputs.master_namelist)
+        if not simulated_seconds:
+            return self.exit_codes.ERROR_UNKNOWN_SIMULATED_PERIOD
+
+        search_space = self.inputs.search_space.get_dict()
+        if "nproma" in search_space and not isinstance(self._model_namelist(inputs), orm.SinglefileData):
+            return self.exit_codes.ERROR_MODEL_NAMELIST_NOT_MODIFIABLE
+
+        base_resources = inputs.get("metadata", {}).get("options", {}).get("resources", {})
+        self.ctx.inputs = inputs
+        self.ctx.simulated_seconds = simulated_seconds
+        self.ctx.pending = [
+            dataclasses.asdict(candidate) for candidate in iter_candidates(search_space, base_resources)
+        ]
+        self.ctx.candidates = {}
+        self.ctx.num_inspected = 0
+        self.ctx.best_score = None
+        self.report(f"Benchmarking {len(self.ctx.pending)} candidates over {simulated_seconds} simulated seconds.")
+        return None
+
+    def _model_namelist(self, inputs: Mapping[str, typing.Any]) -> orm.Data | None:
+        models = inputs.get("models", {})
+        if self.inputs.model_name.value in models:
+            return models[self.inputs.model_name.value]
+        return inputs.get("model_namelist")
+
+    def has_pending_candidates(self) -> bool:
+        return bool(self.ctx.pending)
+
+    def run_benchmarks(self) -> None:
+        for _ in range(min(self.inputs.max_concurrent.value, len(self.ctx.pending))):
+            candidate = self.ctx.pending.pop(0)
+            label = f"benchmark_{len(self.ctx.candidates):03d}"
+            inputs = extendeddicts.AttributeDict(self.ctx.inputs)
+            metadata = dict(inputs.get("metadata", {}))
+            options = dict(metadata.get("options", {}))
+            options["resources"] = candidate["resources"]
+            if self.ctx.best_score is not None:
+                limit = self.inputs.walltime_overhead.value + walltime_limit(
+                    best_score=self.ctx.best_score,
+                    simulated_seconds=self.ctx.simulated_seconds,
+                    num_machines=candidate["resources"].get("num_machines", 1),
+                    objective=self.inputs.objective.value,
+                    factor=self.inputs.early_stop_factor.value,
+                )
+                candidate["walltime_limit"] = int(min(options.get("max_wallclock_seconds") or limit, limit))
+                options["max_wallclock_seconds"] = candidate["walltime_limit"]
+            metadata["options"] = options
+            metadata["call_link_label"] = label
+            inputs.metadata = metadata
+            if candidate["nproma"]:
+                model_options = orm.Dict({"parallel_nml": {"nproma": candidate["nproma"]}})
+                model_name = self.inputs.model_name.value
+                if model_name in inputs.get("models", {}):
+                    inputs.models = {
+                        **inputs.models,
+                        model_name: modelnml.modify_model_nml(inputs.models[model_name], model_options),
+                    }
+                else:
+                    inputs.model_namelist = modelnml.modify_model_nml(inputs.model_namelist, model_options)
+            node = self.submit(IconCalculation, **inputs)
+            self.report(f"Submitted {label} <{node.pk}>: {candidate}")
+            self.ctx.candidates[label] = candidate
+            self.to_context(benchmarks=engine.append_(node))
+
+    def inspect_benchmarks(self) -> None:
+        for label, node in zip(
+            list(self.ctx.candidates)[self.ctx.num_inspected :],
+            self.ctx.benchmarks[self.ctx.num_inspected :],
+            strict=True,
+        ):
+            candidate = self.ctx.candidates[label]
+            candidate["pk"] = node.pk
+            report = node.outputs.timer_report.get_dict() if "timer_report" in node.outputs else {}
+            wall_seconds = timers.report_total_seconds(report)
+            if wall_seconds:
+                current = score(
+                    simulated_seconds=self.ctx.simulated_seconds,
+                    wall_seconds=wall_seconds,
+                    num_machines=candidate["resources"].get("num_machines", 1),
+                    objective=self.inputs.objective.value,
+                )
+                self.report(f"{label} <{node.pk}> scored {current:.3f} {self.inputs.objective.value}.")
+                if self.ctx.best_score is None or current > self.ctx.best_score:
+                    self.ctx.best_score = current
+            elif (
+                candidate.get("walltime_limit")
+                and node.exit_status == IconCalculation.exit_codes.ERROR_SCHEDULER_OUT_OF_WALLTIME.status
+            ):
+                candidate["stopped_early"] = True
+                self.report(f"{label} <{node.pk}> was stopped early, it can not compete with the best score.")
+            else:
+                candidate["failed"] = True
+                self.report(f"{label} <{node.pk}> failed with exit status {node.exit_status}, not scored.")
+        self.ctx.num_inspected = len(self.ctx.benchmarks)
+
+    def results(self) -> engine.ExitCode | None:
+        timer_reports = {
+            label: node.outputs.timer_report
+            for label, node in zip(self.ctx.candidates, self.ctx.benchmarks, strict=True)
+            if "timer_report" in node.outputs
+        }
+        ranked = rank_benchmarks(
+            candidates=orm.Dict(self.ctx.candidates),
+            objective=self.inputs.objective,
+            simulated_seconds=orm.Float(self.ctx.simulated_seconds),
+            model_name=self.inputs.model_name,
+            **timer_reports,
+        )
+        self.out("scores", ranked["scores"])
+        if "preset" not in ranked:
+            return self.exit_codes.ERROR_NO_SUCCESSFUL_BENCHMARK
+        self.out("preset", ranked["preset"])
+        self.report(f"Best benchmark: {ranked['scores']['best']}.")
+        return None
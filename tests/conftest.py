@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import collections
 import dataclasses
 import functools
 import pathlib
@@ -9,6 +10,7 @@ import aiida
 import aiida.common
 import aiida.orm
 import pytest
+from aiida.transports.plugins.local import LocalTransport
 from typing_extensions import Self
 
 if typing.TYPE_CHECKING:
@@ -49,10 +51,20 @@ PARSER_CASES = {
         ["latest_restart_file", "all_restart_files"],
         "RESTART",
     ),
+    "singlefile_restarts": (
+        "singlefile_restarts",
+        0,
+        ["finish_status", "latest_restart_file", "all_restart_files"],
+        [],
+        "RESTART",
+    ),
+    # failed runs, without finish.status
+    "out_of_memory": ("out_of_memory", 110, [], ["finish_status"], ""),
+    "icon_aborted": ("icon_aborted", 320, [], ["finish_status"], ""),
 }
 
 
-@pytest.fixture(params=["simple_icon_run", "restarts_present", "restarts_missing"])
+@pytest.fixture(params=["simple_icon_run", "restarts_present", "restarts_missing", "singlefile_restarts"])
 def case_name(request):
     return request.param
 
@@ -124,8 +136,8 @@ class BuildOutputs:
 class FakeIconBuilder:
     node: aiida.orm.CalcJobNode
 
-    def __init__(self, computer: aiida.orm.Computer):
-        self.node = aiida.orm.CalcJobNode(computer=computer, process_type="aiida.calculations:icon.icon")
+    def __init__(self, computer: aiida.orm.Computer, process_type: str = "aiida.calculations:icon.icon"):
+        self.node = aiida.orm.CalcJobNode(computer=computer, process_type=process_type)
 
     @property
     def inputs(self) -> BuildInputs:
@@ -171,6 +183,30 @@ def icon_result(parser_case, aiida_computer_local):
         "finish.status",
     ]
     for filename in retrieved_files:
+        if (datapath / "outputs" / filename).exists():
+            retrieved.put_object_from_file(str(datapath.absolute() / "outputs" / filename), filename)
+    builder.outputs.retrieved = retrieved.store()
+
+    return node
+
+
+@pytest.fixture
+def packed_icon_result(datapath, aiida_computer_local):
+    """Mockup a finished packed calculation with a successful ("alpha") and a failed ("beta") member."""
+    datapath = datapath / "packed_run"
+    computer = aiida_computer_local()
+    builder = FakeIconBuilder(computer=computer, process_type="aiida.calculations:icon.packed")
+    for member in ["alpha", "beta"]:
+        member_inputs = getattr(builder.inputs.members, member)
+        member_inputs.master_namelist = aiida.orm.SinglefileData(datapath / "inputs" / "icon_master.namelist")
+        member_inputs.models.atm = aiida.orm.SinglefileData(datapath / "inputs" / "model.namelist")
+    node = builder.build()
+    builder.outputs.remote_folder = aiida.orm.RemoteData(
+        remote_path=str(datapath.absolute() / "outputs"), computer=computer
+    ).store()
+
+    retrieved = aiida.orm.FolderData()
+    for filename in ["_scheduler-stderr.txt", "_scheduler-stdout.txt", "alpha/finish.status", "beta/finish.status"]:
         retrieved.put_object_from_file(str(datapath.absolute() / "outputs" / filename), filename)
     builder.outputs.retrieved = retrieved.store()
 
@@ -232,3 +268,45 @@ def icon_parser(aiida_computer_local):
     calc_node = aiida.orm.CalcJobNode(computer=computer)
 
     return IconParser(calc_node)
+
+
+#: Transport methods which are remote operations (round trips) on a real remote, counted by 'transport_calls'.
+COUNTED_TRANSPORT_METHODS = (
+    "open",
+    "listdir",
+    "getfile",
+    "putfile",
+    "gettree",
+    "puttree",
+    "copy",
+    "copyfile",
+    "copytree",
+    "symlink",
+    "exec_command_wait_bytes",
+    "path_exists",
+    "isdir",
+    "isfile",
+    "mkdir",
+    "makedirs",
+    "remove",
+    "rmtree",
+)
+
+
+@pytest.fixture
+def transport_calls(monkeypatch) -> collections.Counter[str]:
+    """Count the remote operations made through the local transport (and the authinfo lookups) during a test."""
+    calls: collections.Counter[str] = collections.Counter()
+
+    def counting(name: str, method: typing.Callable[..., typing.Any]) -> typing.Callable[..., typing.Any]:
+        @functools.wraps(method)
+        def counted(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            calls[name] += 1
+            return method(*args, **kwargs)
+
+        return counted
+
+    for name in COUNTED_TRANSPORT_METHODS:
+        monkeypatch.setattr(LocalTransport, name, counting(name, getattr(LocalTransport, name)))
+    monkeypatch.setattr(aiida.orm.Computer, "get_authinfo", counting("authinfo", aiida.orm.Computer.get_authinfo))
+    return calls
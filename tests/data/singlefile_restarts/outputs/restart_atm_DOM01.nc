@@ -0,0 +1 @@
+icon_grid_simple_restart_atm_20000101T000030Z.nc
\ No newline at end of file
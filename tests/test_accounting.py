@@ -0,0 +1,72 @@
+import pytest
+from aiida import orm
+from aiida.common import folders
+
+from aiida_icon import accounting, calculations, calcutils
+
+# Remote operations per job, changes increasing them must be deliberate (and these budgets updated).
+LINK_DIR_CONTENTS_BUDGET = {"open": 1, "isdir": 1, "listdir": 1}
+PARSE_BUDGET = {"authinfo": 1, "open": 1, "isdir": 1, "listdir": 1}
+
+
+def test_prepare_operations(icon_builder, datapath, add_input_files, tmp_path, transport_calls):
+    add_input_files(datapath.absolute() / "simple_icon_run" / "inputs", icon_builder)
+    for name in ("dir", "dir_contents"):
+        icon_builder.link_dir_contents[name] = orm.RemoteData(
+            str(datapath.absolute() / "arbitrary_links" / name), computer=icon_builder.code.computer
+        )
+    calc = calculations.IconCalculation(dict(icon_builder))
+    transport_calls.clear()
+
+    calc.presubmit(folders.SandboxFolder(tmp_path))
+
+    assert dict(transport_calls) == {name: 2 * count for name, count in LINK_DIR_CONTENTS_BUDGET.items()}
+    recorded = accounting.read_remote_operations(calc.node)
+    assert list(recorded) == ["prepare"]
+    assert recorded["prepare"]["listdir"]["count"] == 2
+    assert recorded["prepare"]["listdir"]["seconds"] > 0
+
+
+def test_prepare_without_remote_operations(mock_icon_calc, tmp_path, transport_calls):
+    mock_icon_calc.presubmit(folders.SandboxFolder(tmp_path))
+
+    assert not transport_calls
+    assert accounting.read_remote_operations(mock_icon_calc.node) == {"prepare": {}}
+
+
+@pytest.mark.parametrize("case_name", ["restarts_present"])
+def test_parse_operations(case_name, parser_case, icon_result, transport_calls):
+    parser = calculations.IconParser(icon_result)
+    transport_calls.clear()
+
+    parser.parse()
+
+    assert dict(transport_calls) == PARSE_BUDGET
+    recorded = accounting.read_remote_operations(icon_result)["parse"]
+    assert {name: stats["count"] for name, stats in recorded.items()} == {"authinfo": 1, "listdir": 1}
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_parse_output_streams_is_local(case_name, parser_case, icon_result, transport_calls):
+    parser = calculations.IconParser(icon_result)
+    transport_calls.clear()
+
+    output_streams = parser.parse_output_streams()
+
+    assert len(output_streams) == 2
+    assert not transport_calls
+
+
+def test_collect_model_nml_download(aiida_computer_local, datapath, transport_calls):
+    computer = aiida_computer_local()
+    model_path = datapath.absolute() / "simple_icon_run" / "inputs" / "model.namelist"
+    inputs = {"models": {"atm": orm.RemoteData(remote_path=str(model_path), computer=computer)}}
+    transport_calls.clear()
+
+    with accounting.recording() as operations:
+        model_nml = calcutils.collect_model_nml(inputs, download=True)
+
+    assert model_nml["grid_nml"]["dynamics_grid_filename"] == "icon_grid_simple.nc"
+    assert transport_calls["getfile"] == 1
+    assert transport_calls["open"] == 1
+    assert operations.to_dict()["getfile"]["count"] == 1
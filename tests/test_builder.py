@@ -1,3 +1,7 @@
+import f90nml
+import pytest
+from aiida import orm
+
 from aiida_icon import builder, calculations, tools
 
 
@@ -9,3 +13,92 @@ def test_double_uenv(aiida_code_installed, aiida_computer_local):
     ibuilder.code = code
     ibuilder.set_uenv(uenv_name="foo", view="bar", overwrite=False)
     assert ibuilder.metadata.options.custom_scheduler_commands == "#SBATCH --uenv=foo --view=bar"
+
+
+def test_configure_async_io_needs_resources():
+    ibuilder = builder.IconCalculationBuilder(calculations.IconCalculation)
+    ibuilder.model_namelist = orm.SinglefileData.from_string("&output_nml\n/")
+    ibuilder.metadata.options.resources = {"tot_num_mpiprocs": 8}
+    with pytest.raises(ValueError, match="num_machines"):
+        ibuilder.configure_async_io()
+
+
+def test_configure_async_io_model_namelist():
+    ibuilder = builder.IconCalculationBuilder(calculations.IconCalculation)
+    ibuilder.model_namelist = orm.SinglefileData.from_string(
+        "&io_nml\nrestart_write_mode='dedicated procs multifile'\n/\n&output_nml\n/"
+    )
+    ibuilder.metadata.options.resources = {"num_machines": 2, "num_mpiprocs_per_machine": 8}
+    ibuilder.configure_async_io(io_procs_per_stream=2)
+    data = f90nml.reads(ibuilder.model_namelist.get_content(mode="r"))
+    assert dict(data["parallel_nml"]) == {"num_io_procs": 2, "num_restart_procs": 2, "num_prefetch_proc": 0}
+    assert data["output_nml"]["stream_partitions_ml"] == 2
+
+
+def test_configure_async_io_invalid():
+    ibuilder = builder.IconCalculationBuilder(calculations.IconCalculation)
+    ibuilder.model_namelist = orm.SinglefileData.from_string("&output_nml\n/\n&output_nml\n/")
+    ibuilder.metadata.options.resources = {"num_machines": 1, "num_mpiprocs_per_machine": 2}
+    with pytest.raises(ValueError, match="asynchronous I/O"):
+        ibuilder.configure_async_io()
+
+
+def test_file_inputs_reuse_stored_nodes():
+    """Only on request, file inputs with the content of a stored node are replaced by that node."""
+    stored = orm.SinglefileData.from_string("&master_nml\n/", filename="icon_master.namelist").store()
+    ibuilder = builder.IconCalculationBuilder(calculations.IconCalculation)
+    ibuilder.master_namelist = orm.SinglefileData.from_string("&master_nml\n/", filename="icon_master.namelist")
+    ibuilder.models["atm"] = orm.SinglefileData.from_string("&master_nml\n/", filename="icon_master.namelist")
+    ibuilder.setup_env = orm.SinglefileData.from_string("module load icon", filename="setup_env.sh")
+    assert not ibuilder.master_namelist.is_stored
+    ibuilder.deduplicate_inputs()
+    assert ibuilder.master_namelist.uuid == ibuilder.models["atm"].uuid == stored.uuid
+    assert not ibuilder.setup_env.is_stored
+
+
+def test_packed_members_share_file_inputs():
+    """Identical file inputs of several members end up as the same node."""
+    packed = builder.IconPackedCalculationBuilder(calculations.IconPackedCalculation)
+    for name in ["alpha", "beta"]:
+        member = calculations.IconCalculation.get_builder()
+        member.master_namelist = orm.SinglefileData.from_string("&master_nml\n/", filename="ensemble_master.nml")
+        member.models.atm = orm.SinglefileData.from_string(f"&run_nml\n! {name}\n/", filename="atm.nml")
+        packed.add_member(name, member)
+    assert packed.members["alpha"]["master_namelist"] is packed.members["beta"]["master_namelist"]
+    assert packed.members["alpha"]["models"]["atm"] is not packed.members["beta"]["models"]["atm"]
+
+
+def test_packed_members_do_not_query_stored_nodes():
+    stored = orm.SinglefileData.from_string("&master_nml\n/", filename="ensemble_master.nml").store()
+    packed = builder.IconPackedCalculationBuilder(calculations.IconPackedCalculation)
+    member = calculations.IconCalculation.get_builder()
+    member.master_namelist = orm.SinglefileData.from_string("&master_nml\n/", filename="ensemble_master.nml")
+    packed.add_member("alpha", member)
+    assert not packed.members["alpha"]["master_namelist"].is_stored
+    tools.deduplicate_inputs(packed)
+    assert packed.members["alpha"]["master_namelist"].uuid == stored.uuid
+
+
+def test_set_packing_twice():
+    packed = builder.IconPackedCalculationBuilder(calculations.IconPackedCalculation)
+    packed.metadata.options.mpirun_extra_params = ["--cpu-bind=none"]
+    packed.add_member("alpha", calculations.IconCalculation.get_builder())
+    packed.set_packing(mpiprocs_per_member=32, mpiprocs_per_machine=64)
+    packed.set_packing(mpiprocs_per_member=16, mpiprocs_per_machine=64)
+    assert packed.metadata.options.mpirun_extra_params == [
+        "--cpu-bind=none",
+        "--nodes=1",
+        "--ntasks=16",
+        "--exact",
+        "./run_packed.sh",
+    ]
+
+
+def test_packed_uses_code_uenv(aiida_code_installed, aiida_computer_local):
+    code = aiida_code_installed(default_calc_job_plugin="icon.icon", computer=aiida_computer_local())
+    code.store()
+    tools.code_set_uenv(code, uenv=tools.Uenv(name="icon/25.2:v3", view="default"))
+    packed = builder.IconPackedCalculationBuilder(calculations.IconPackedCalculation)
+    packed.code = code
+    packed.code = code
+    assert packed.metadata.options.custom_scheduler_commands == "#SBATCH --uenv=icon/25.2:v3 --view=default"
@@ -1,5 +1,6 @@
 import pathlib
 import re
+import subprocess
 import textwrap
 
 import pytest
@@ -7,8 +8,9 @@ from aiida import engine, orm
 from aiida.common import exceptions as aiidaxc
 from aiida.common import folders
 
-from aiida_icon import builder, calculations, tools
+from aiida_icon import builder, calculations, performance, tools, tracing
 from aiida_icon.iconutils import modelnml
+from aiida_icon.testing import mock_icon, throughput
 
 
 @pytest.fixture
@@ -129,6 +131,187 @@ def test_additional_restart_parsing(case_name, parser_case, icon_result):
     )
 
 
+@pytest.mark.parametrize("case_name", ["singlefile_restarts"])
+def test_singlefile_restart_parsing(case_name, parser_case, icon_result):
+    """Singlefile restarts (sync and async write modes) are named after the grid, with a link per domain."""
+    parser = calculations.IconParser(icon_result)
+    parser.parse()
+    assert pathlib.Path(parser.outputs.latest_restart_file.get_remote_path()).name == "restart_atm_DOM01.nc"
+    assert (
+        pathlib.Path(parser.outputs.all_restart_files["restart_20000101T000030Z"].get_remote_path()).name
+        == "icon_grid_simple_restart_atm_20000101T000030Z.nc"
+    )
+
+
+def test_prepare_restart_files(icon_builder, datapath, tmp_path):
+    """Restart files are linked where each model expects them, according to its restart write mode."""
+    inputs = datapath.absolute() / "singlefile_restarts" / "inputs"
+    icon_builder.master_namelist = orm.SinglefileData.from_string(
+        (inputs / "icon_master.namelist").read_text()
+        + '&master_model_nml\nmodel_name="oce"\nmodel_namelist_filename="oce.namelist"\n/\n'
+    )
+    icon_builder.models.atm = orm.SinglefileData(inputs / "model.namelist")
+    icon_builder.models.oce = orm.SinglefileData.from_string(
+        "&io_nml\nrestart_write_mode='dedicated procs multifile'\n/"
+    )
+    computer = icon_builder.code.computer
+    icon_builder.restart_file = orm.RemoteData("/path/to/restart_atm_DOM01.nc", computer=computer)
+    icon_builder.restart_files.oce = orm.RemoteData("/path/to/multifile_restart_oce.mfr", computer=computer)
+    calc = calculations.IconCalculation(dict(icon_builder))
+    calcinfo = calc.presubmit(folders.SandboxFolder(tmp_path.absolute()))
+
+    links = {triplet[1]: triplet[2] for triplet in calcinfo.remote_symlink_list}
+    assert links["/path/to/restart_atm_DOM01.nc"] == "restart_atm_DOM01.nc"
+    assert links["/path/to/multifile_restart_oce.mfr"] == "multifile_restart_oce.mfr"
+
+
+def test_prepare_staging(datapath, icon_builder, add_input_files, tmp_path):
+    """Staged inputs and output streams are redirected to node-local copies and staged back at the end."""
+    add_input_files(datapath.absolute() / "simple_icon_run" / "inputs", icon_builder)
+    icon_builder.metadata.options.staging = {
+        "directory": str(tmp_path / "node_local"),
+        "inputs": ["rrtmg_sw"],  # the other inputs do not exist in the test data
+        "output_streams": ["simple_icon_run_atm_2d"],
+        "node_launcher": "",
+    }
+    folder = folders.SandboxFolder(tmp_path.absolute())
+    calcinfo = calculations.IconCalculation(dict(icon_builder)).presubmit(folder)
+    workdir = pathlib.Path(folder.abspath)
+    prepend_text = calcinfo.prepend_text
+    assert "./aiida_icon_stage.sh in" in prepend_text
+    assert 'ln -sfn "$AIIDA_ICON_STAGING_DIR"/inputs/0/rrtmg_sw.nc rrtmg_sw.nc' in prepend_text
+    assert "icon_grid_simple.nc" not in prepend_text
+    assert "rmdir simple_icon_run_atm_2d" in prepend_text
+    assert "./aiida_icon_stage.sh out" in calcinfo.append_text
+
+    # emulate the job: links created by AiiDA, then the prepend text, ICON writing output and the append text
+    for _, source, link_name in calcinfo.remote_symlink_list:
+        (workdir / link_name).symlink_to(source)
+    subprocess.run(
+        ["bash", "-c", prepend_text], cwd=workdir, check=True, env={"SLURM_JOB_ID": "1", "PATH": "/usr/bin:/bin"}
+    )
+    local_copy = tmp_path / "node_local" / "aiida-icon-1" / "inputs" / "0" / "rrtmg_sw.nc"
+    assert (workdir / "rrtmg_sw.nc").resolve() == local_copy
+    assert local_copy.read_bytes() == (datapath / "simple_icon_run" / "inputs" / "rrtmg_sw.nc").read_bytes()
+    (workdir / "simple_icon_run_atm_2d" / "out_0001.nc").write_text("output")
+    subprocess.run(
+        ["bash", "-c", f"{prepend_text.splitlines()[0]}\n{calcinfo.append_text}"],
+        cwd=workdir,
+        check=True,
+        env={"SLURM_JOB_ID": "1", "PATH": "/usr/bin:/bin"},
+    )
+    assert not (workdir / "simple_icon_run_atm_2d").is_symlink()
+    assert (workdir / "simple_icon_run_atm_2d" / "out_0001.nc").read_text() == "output"
+    assert not (tmp_path / "node_local" / "aiida-icon-1").exists()
+
+
+def test_staging_unknown_stream(icon_builder, add_input_files, datapath, tmp_path):
+    add_input_files(datapath.absolute() / "simple_icon_run" / "inputs", icon_builder)
+    icon_builder.metadata.options.staging = {"output_streams": ["nowhere"]}
+    with pytest.raises(aiidaxc.InputValidationError, match="Can not stage 'nowhere'"):
+        calculations.IconCalculation(dict(icon_builder)).presubmit(folders.SandboxFolder(tmp_path))
+
+
+def test_staging_option_validation(icon_builder):
+    with pytest.raises(ValueError, match="Can not stage 'master_namelist'"):
+        icon_builder.metadata.options.staging = {"inputs": ["master_namelist"]}
+
+
+def test_check_remote_inputs(icon_builder, tmp_path):
+    """All remote inputs are checked at once, missing paths and empty restart directories are reported."""
+    computer = icon_builder.code.computer
+    (tmp_path / "grid.nc").write_text("grid")
+    (tmp_path / "restart_atm.mfr").mkdir()
+    icon_builder.dynamics_grid_file = orm.RemoteData(remote_path=str(tmp_path / "grid.nc"), computer=computer)
+    icon_builder.ecrad_data = orm.RemoteData(remote_path=str(tmp_path / "ecrad data"), computer=computer)
+    icon_builder.restart_file = orm.RemoteData(remote_path=str(tmp_path / "restart_atm.mfr"), computer=computer)
+    icon_builder.link_paths.extra = orm.RemoteData(remote_path=str(tmp_path / "grid.nc"), computer=computer)
+
+    with pytest.raises(FileNotFoundError) as excinfo:
+        icon_builder.check_remote_inputs()
+    assert str(excinfo.value).splitlines()[1:] == [
+        f"ecrad_data: '{tmp_path / 'ecrad data'}' does not exist on {computer.label}",
+        f"restart_file: '{tmp_path / 'restart_atm.mfr'}' is an empty restart directory on {computer.label}",
+    ]
+
+    (tmp_path / "ecrad data").mkdir()
+    (tmp_path / "restart_atm.mfr" / "attributes.nc").write_text("attributes")
+    icon_builder.check_remote_inputs()
+
+
+def test_check_remote_inputs_before_submission(icon_builder, datapath, add_input_files):
+    """With the option set, a calculation with missing remote inputs fails before the upload."""
+    add_input_files(datapath.absolute() / "simple_icon_run" / "inputs", icon_builder)
+    icon_builder.metadata.options.check_remote_inputs = True
+    _, node = engine.run_get_node(icon_builder)
+    assert node.exit_status == calculations.IconCalculation.exit_codes.ERROR_REMOTE_INPUTS_MISSING.status
+    assert "dynamics_grid_file: " in node.exit_message
+    assert "rrtmg_sw" not in node.exit_message
+    assert "remote_folder" not in node.outputs
+
+
+def test_check_remote_inputs_then_run(tmp_path):
+    """With all remote inputs present, the calculation goes on to upload, run and parse (the awaited CalcJob.run)."""
+    computer = throughput.setup_computer("check-then-run", tmp_path / "work", poll_interval=0)
+    mock_builder = throughput.make_builder(throughput.setup_mock_code(computer), mock_icon.MockSettings())
+    (tmp_path / "grid.nc").write_text("grid")
+    mock_builder.dynamics_grid_file = orm.RemoteData(remote_path=str(tmp_path / "grid.nc"), computer=computer)
+    mock_builder.metadata.options.check_remote_inputs = True
+    _, node = engine.run_get_node(mock_builder)
+    assert node.exit_status == 0, node.exit_message
+    assert "remote_folder" in node.outputs
+
+
+def test_prepare_striping(datapath, icon_builder, add_input_files, tmp_path):
+    """Output stream directories and the work dir are striped by the computer's policy or the option."""
+    add_input_files(datapath.absolute() / "simple_icon_run" / "inputs", icon_builder)
+    tools.computer_set_striping(icon_builder.code.computer, striping={"default_stripe_count": 2})
+    calcinfo = calculations.IconCalculation(dict(icon_builder)).presubmit(folders.SandboxFolder(tmp_path))
+    assert "lfs setstripe --stripe-count 2 --stripe-size 16M simple_icon_run_atm_2d" in calcinfo.prepend_text
+    assert "lfs setstripe --stripe-count 2 --stripe-size 16M ." in calcinfo.prepend_text
+
+    icon_builder.metadata.options.striping = {"expected_file_sizes": {"simple_icon_run_atm_3d_pl": 3 << 30}}
+    icon_builder.metadata.options.staging = {"output_streams": ["simple_icon_run_atm_2d"], "inputs": []}
+    calcinfo = calculations.IconCalculation(dict(icon_builder)).presubmit(folders.SandboxFolder(tmp_path))
+    assert "lfs setstripe --stripe-count 3 --stripe-size 16M simple_icon_run_atm_3d_pl" in calcinfo.prepend_text
+    assert "lfs setstripe --stripe-count 1 --stripe-size 16M ." in calcinfo.prepend_text
+    assert "16M simple_icon_run_atm_2d" not in calcinfo.prepend_text
+
+
+def test_striping_estimates_from_grid(datapath, icon_builder, add_input_files, tmp_path):
+    add_input_files(datapath.absolute() / "simple_icon_run" / "inputs", icon_builder)
+    icon_builder.dynamics_grid_file = orm.RemoteData(
+        remote_path="/grids/icon_grid_0026_R03B07_G.nc", computer=icon_builder.code.computer
+    )
+    icon_builder.metadata.options.striping = {"bytes_per_stripe": 1 << 20}
+    calcinfo = calculations.IconCalculation(dict(icon_builder)).presubmit(folders.SandboxFolder(tmp_path))
+    # one 2d field of the 2949120 cells of R03B07 in single precision is about 11 MiB
+    assert "--stripe-count 12 --stripe-size 16M simple_icon_run_atm_2d" in calcinfo.prepend_text
+
+
+@pytest.mark.parametrize("case_name", ["out_of_memory", "icon_aborted"])
+def test_parser_failure_signatures(case_name, parser_case, icon_result):
+    """Known failures are recognized from the scheduler stderr and the ICON log."""
+    parser = calculations.IconParser(icon_result)
+    exit_code = parser.parse()
+    assert exit_code.status == parser_case.exit_code
+    if case_name == "icon_aborted":
+        assert exit_code.message == "ICON aborted: mo_nh_supervise:check_nh_stability: NaN in vertical wind speed"
+
+
+@pytest.mark.parametrize("case_name", ["restarts_present"])
+def test_timer_report_parsing(case_name, parser_case, icon_result):
+    """The timer report at the end of the scheduler stdout should be parsed into the timer_report output."""
+    parser = calculations.IconParser(icon_result)
+    parser.parse()
+    report = parser.outputs.timer_report.get_dict()
+    assert report["total"]["total_max"] == 19.125
+    assert report["nh_solve_veltend"]["calls"] > 0
+    record = icon_result.base.extras.get(performance.EXTRAS_KEY)
+    assert record["timers"]["total"] == 19.125 / report[performance.STEP_TIMER]["calls"]
+    assert record["fingerprint"]["computer"] == icon_result.computer.label
+
+
 def test_wrapper_script_autouse(icon_calc_with_wrapper, tmp_path):
     prepare_path = tmp_path / "test_wrapper_script"
     prepare_path.mkdir()
@@ -253,6 +436,83 @@ def test_models_required(icon_code, relpath_models_masternml):
         engine.run(ibuilder)
 
 
+def test_prepare_packed(icon_code, datapath, add_input_files, tmp_path):
+    prepare_path = tmp_path / "test_prepare_packed"
+    prepare_path.mkdir()
+    sandbox_folder = folders.SandboxFolder(prepare_path.absolute())
+
+    icon_code.computer.set_mpirun_command(["srun"])
+    packed = calculations.IconPackedCalculation.get_builder()
+    packed.code = icon_code
+    for name in ["alpha", "beta"]:
+        member = icon_code.get_builder()
+        add_input_files(datapath / "simple_icon_run" / "inputs", member)
+        packed.add_member(name, member)
+    packed.set_packing(mpiprocs_per_member=4, mpiprocs_per_machine=8)
+    packed.metadata.options.tracing = {"file": str(tmp_path / "traces.jsonl")}
+    calc = calculations.IconPackedCalculation(dict(packed))
+    calcinfo = calc.presubmit(sandbox_folder)
+
+    testpath = pathlib.Path(sandbox_folder.get_abs_path("."))
+    submit_content = (testpath / "_aiidasubmit.sh").read_text()
+    remote_link_names = [triplet[2] for triplet in calcinfo.remote_symlink_list]
+    local_copy_names = [triplet[2] for triplet in calcinfo.local_copy_list]
+
+    assert calc.inputs.metadata.options.resources == {"num_machines": 1, "num_mpiprocs_per_machine": 8}
+    assert (testpath / "run_packed.sh").exists()
+    for name in ["alpha", "beta"]:
+        assert (testpath / name / "simple_icon_run_atm_2d").is_dir()
+        assert f"{name}/icon_master.namelist" in local_copy_names
+        assert f"{name}/model.namelist" in local_copy_names
+        assert f"{name}/icon_grid_simple.nc" in remote_link_names
+        assert f"{name}/ecrad_data" in remote_link_names
+        assert (f"{name}/finish.status", ".", 2) in calcinfo.retrieve_list
+        assert re.search(rf"'--ntasks=4' .* './run_packed.sh' .* '{name}'\s+> '{name}/icon.log' &", submit_content)
+    assert re.search(r"^wait$", submit_content, re.MULTILINE)
+    spans = calc.node.base.extras.get(tracing.EXTRAS_KEY)
+    assert [span["attributes"]["member"] for span in spans if span["name"] == "prepare_icon_run"] == ["alpha", "beta"]
+
+
+def test_packed_rejects_total_task_count(icon_code, datapath, add_input_files):
+    """The members set their own number of tasks, the mpirun command of the computer must not set one for the job."""
+    icon_code.computer.set_mpirun_command(["srun", "-n", "{tot_num_mpiprocs}"])
+    packed = calculations.IconPackedCalculation.get_builder()
+    packed.code = icon_code
+    member = icon_code.get_builder()
+    add_input_files(datapath / "simple_icon_run" / "inputs", member)
+    packed.add_member("alpha", member)
+    packed.set_packing(mpiprocs_per_member=4, mpiprocs_per_machine=8)
+    with pytest.raises(ValueError, match=r"plain 'srun'"):
+        calculations.IconPackedCalculation(dict(packed))
+
+
+def test_packed_requires_packing(icon_code, datapath, add_input_files):
+    packed = calculations.IconPackedCalculation.get_builder()
+    packed.code = icon_code
+    member = icon_code.get_builder()
+    add_input_files(datapath / "simple_icon_run" / "inputs", member)
+    packed.add_member("alpha", member)
+    packed.metadata.options.resources = {"num_machines": 1, "num_mpiprocs_per_machine": 8}
+    with pytest.raises(ValueError, match=r"set_packing"):
+        calculations.IconPackedCalculation(dict(packed))
+
+
+def test_parser_packed(packed_icon_result):
+    parser = calculations.IconPackedParser(packed_icon_result)
+    exit_code = parser.parse()
+    members = parser.outputs.members
+
+    assert exit_code.status == 304
+    assert members["alpha"]["finish_status"].value == "RESTART"
+    assert pathlib.Path(members["alpha"]["latest_restart_file"].get_remote_path()).parts[-2:] == (
+        "alpha",
+        "multifile_restart_atm.mfr",
+    )
+    assert "restart_20000101T030000Z" in members["alpha"]["all_restart_files"]
+    assert "latest_restart_file" not in members["beta"]
+    assert set(members["beta"]["output_streams"]) == {"simple_icon_atm_2d", "simple_icon_atm_3d_pl"}
+
+
 @pytest.mark.parametrize(
     ("output_filename", "stream_index", "expected_key", "test_id"),
     [
@@ -0,0 +1,74 @@
+import pytest
+
+from aiida_icon import calculations, efficiency
+
+SACCT_FIELDS = "JobID|State|NNodes|NTasks|AllocCPUS|ElapsedRaw|TotalCPU|CPUTimeRAW|TimelimitRaw|ReqMem|MaxRSS|"
+SACCT_OUTPUT = "\n".join(
+    [
+        SACCT_FIELDS,
+        "123|COMPLETED|2||256|1800|5-16:00:00|460800|240|64G||",
+        "123.batch|COMPLETED|1|1|128|1800|00:01.500|230400||64G|20480K|",
+        "123.0|COMPLETED|2|64|256|1790|5-15:59:58|458240||64G|1048576K|",
+    ]
+)
+
+
+@pytest.fixture
+def accounted_result(icon_result):
+    icon_result.set_detailed_job_info({"retval": 0, "stdout": SACCT_OUTPUT, "stderr": ""})
+    return icon_result
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_read_efficiency(case_name, parser_case, accounted_result):
+    report = efficiency.read_efficiency(accounted_result)
+
+    assert report.state == "COMPLETED"
+    assert report.num_machines == 2
+    assert report.elapsed_seconds == 1800
+    assert report.requested_walltime_seconds == 4 * 3600
+    assert report.walltime_efficiency == 0.125
+    assert report.cpu_efficiency == pytest.approx(136 * 3600 / 460800)
+    assert report.max_rss_kb == 1 << 20
+    assert report.memory_per_machine_kb == 32 << 20
+    assert report.memory_efficiency == 0.5
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_without_accounting(case_name, parser_case, icon_result):
+    assert efficiency.read_efficiency(icon_result) is None
+    parser = calculations.IconParser(icon_result)
+    parser.parse()
+    assert "efficiency_report" not in parser.outputs
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_parser_efficiency_report(case_name, parser_case, accounted_result):
+    parser = calculations.IconParser(accounted_result)
+    parser.parse()
+
+    report = efficiency.EfficiencyReport.from_dict(parser.outputs.efficiency_report.get_dict())
+    assert report == efficiency.read_efficiency(accounted_result)
+    assert parser.outputs.efficiency_report["walltime_efficiency"] == 0.125
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_propose_resources(case_name, parser_case, accounted_result, icon_builder):
+    icon_builder.metadata.options.resources = {"num_machines": 2, "num_mpiprocs_per_machine": 32}
+
+    proposal = efficiency.propose_resources([efficiency.read_efficiency(accounted_result)])
+    proposal.apply(icon_builder)
+
+    assert icon_builder.metadata.options.max_wallclock_seconds == 2100
+    assert icon_builder.metadata.options.max_memory_kb == pytest.approx(1.2 * (32 << 20), rel=1e-3)
+    assert icon_builder.metadata.options.resources == {"num_machines": 2, "num_mpiprocs_per_machine": 32}
+
+
+def test_propose_from_failed_runs_only():
+    """Unfinished runs tell nothing about the wall time needed, out of memory runs still about the memory."""
+    timed_out = efficiency.EfficiencyReport(state="TIMEOUT", num_machines=1, elapsed_seconds=3600)
+    out_of_memory = efficiency.EfficiencyReport(
+        state="OUT_OF_MEMORY", num_machines=1, elapsed_seconds=60, memory_per_machine_kb=1 << 20
+    )
+    assert efficiency.propose_resources([timed_out, out_of_memory]) == efficiency.ResourceProposal(None, 1258496, None)
+    assert efficiency.propose_resources([]) == efficiency.ResourceProposal(None, None, None)
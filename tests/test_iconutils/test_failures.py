@@ -0,0 +1,52 @@
+import pytest
+
+from aiida_icon.iconutils import failures
+
+
+@pytest.mark.parametrize(
+    ("stderr", "stdout", "expected"),
+    [
+        (["slurmstepd: error: Detected 2 oom_kill events in StepId=1.0."], [], "ERROR_SCHEDULER_OUT_OF_MEMORY"),
+        (
+            ["slurmstepd: error: *** JOB 1 ON nid0001 CANCELLED AT 2000-01-01T00:00:00 DUE TO TIME LIMIT ***"],
+            [],
+            "ERROR_SCHEDULER_OUT_OF_WALLTIME",
+        ),
+        (
+            ["slurmstepd: error: *** JOB 1 ON nid0001 CANCELLED AT 2000-01-01T00:00:00 DUE TO NODE FAILURE ***"],
+            [],
+            "ERROR_SCHEDULER_NODE_FAILURE",
+        ),
+        ([], [" FINISH called from PE:     0"], "ERROR_ICON_ABORTED"),
+        (["srun: error: nid0001: task 3: Exited with exit code 1"], ["Time step: 1"], None),
+    ],
+)
+def test_detect_failure(stderr, stdout, expected):
+    detected = failures.detect_failure(stderr=stderr, stdout=stdout)
+    assert (detected.signature.exit_code_label if detected else None) == expected
+
+
+def test_time_limit_in_stdout_ignored():
+    """Scheduler messages are only expected in stderr, ICON may print similar words in its log."""
+    assert failures.detect_failure(stderr=[], stdout=["time limit exceeded for radiation"]) is None
+
+
+@pytest.mark.parametrize(
+    ("line", "expected"),
+    [
+        (" nh_stepping: max |vn| = NaN in block 12", "ERROR_ICON_DIVERGED"),
+        (" MAXABS VN, W                     NaN                     NaN", "ERROR_ICON_DIVERGED"),
+        ("mo_nh_supervise:supervise_total_integrals_nh: Total mass = NaN", "ERROR_ICON_DIVERGED"),
+        ("mo_velocity_advection: CFL criterion violated, maximum vertical CFL = 2.1", "ERROR_ICON_DIVERGED"),
+        (" FINISH called from PE:     0", "ERROR_ICON_ABORTED"),
+        ("mo_exception: ABORT: model state inconsistent", "ERROR_ICON_ABORTED"),
+        (" Time step:      2 model time: 2000-01-01T00:00:04.000", None),
+        (" reading nan_filler.nc", None),
+        ("  missval = NaN", None),  # echoed namelist
+        (" &output_nml missval = nan, output_filename = 'nan_check' /", None),
+        (" maximum CFL number: 0.8", None),
+    ],
+)
+def test_divergence_signatures(line, expected):
+    detected = failures.detect_failure(stderr=[], stdout=[line], signatures=failures.DIVERGENCE_SIGNATURES)
+    assert (detected.signature.exit_code_label if detected else None) == expected
@@ -125,3 +125,47 @@ def test_create_stream_key(icon_parser, output_filename, stream_index, expected_
 
     result = icon_parser._create_stream_key(stream_info)  # noqa: SLF001  # testing private member
     assert result == expected_key
+
+
+@pytest.mark.parametrize(
+    ("restart_write_mode", "num_streams", "expected"),
+    [
+        (
+            "joint procs multifile",
+            3,
+            modelnml.ParallelOptions(num_io_procs=3, num_restart_procs=0, num_prefetch_proc=0),
+        ),
+        (
+            "dedicated procs multifile",
+            0,
+            modelnml.ParallelOptions(num_io_procs=0, num_restart_procs=4, num_prefetch_proc=0),
+        ),
+        ("async", 1, modelnml.ParallelOptions(num_io_procs=1, num_restart_procs=4, num_prefetch_proc=0)),
+    ],
+)
+def test_plan_async_io(restart_write_mode, num_streams, expected):
+    namelist_data = f90nml.reads(
+        f"&io_nml\nrestart_write_mode='{restart_write_mode}'\n/\n" + "&output_nml\n/\n" * num_streams
+    )
+    parallel_options, output_options = modelnml.plan_async_io(namelist_data, num_machines=4)
+    assert parallel_options == expected
+    assert output_options.as_dict() == {}
+    assert modelnml.validate_async_io(namelist_data, parallel_options, output_options, total_mpiprocs=64) == []
+
+
+def test_validate_async_io_too_many():
+    namelist_data = f90nml.reads("&output_nml\n/\n" * 4)
+    parallel_options, output_options = modelnml.plan_async_io(namelist_data, num_machines=1, io_procs_per_stream=2)
+    assert output_options.stream_partitions_ml == 2
+    problems = modelnml.validate_async_io(namelist_data, parallel_options, output_options, total_mpiprocs=16)
+    assert problems == ["8 of 16 MPI processes would be used for asynchronous I/O, it must be less than 50%."]
+
+
+@pytest.mark.parametrize(("total_mpiprocs", "allowed"), [(15, False), (16, False), (17, True)])
+def test_validate_async_io_limit(total_mpiprocs, allowed):
+    """Exactly half of the processes for asynchronous I/O is already too many."""
+    parallel_options = modelnml.ParallelOptions(num_io_procs=8)
+    problems = modelnml.validate_async_io(
+        f90nml.reads("&output_nml\n/\n"), parallel_options, modelnml.OutputOptions(), total_mpiprocs=total_mpiprocs
+    )
+    assert (not problems) is allowed
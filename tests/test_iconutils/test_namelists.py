@@ -0,0 +1,65 @@
+import pytest
+from aiida import orm
+
+from aiida_icon import tools
+from aiida_icon.iconutils import namelists
+
+MODEL_NML = """\
+&run_nml
+    nsteps = 10
+    dtime = 60.0
+    ltestcase = .true.
+/
+&output_nml
+    output_filename = 'atm_2d'
+/
+&output_nml
+    output_filename = 'atm_3d'
+/
+"""
+
+
+@pytest.mark.parametrize(
+    "variant",
+    [
+        pytest.param(
+            "&output_nml\n output_filename='atm_2d'\n/\n&run_nml\n ltestcase=.true., dtime=60., nsteps=10\n/\n"
+            "&output_nml\n output_filename='atm_3d'\n/\n",
+            id="reordered",
+        ),
+        pytest.param(
+            "! experiment setup\n" + MODEL_NML.replace("nsteps = 10", "nsteps = 10  ! one minute steps"),
+            id="commented",
+        ),
+        pytest.param(
+            MODEL_NML.replace("&run_nml", "&RUN_NML").replace("nsteps", "NSteps").replace(".true.", ".TRUE."),
+            id="case-changed",
+        ),
+    ],
+)
+def test_equivalent_namelists_hash_equal(variant):
+    original = namelists.NamelistData.from_string(MODEL_NML, filename="atm.nml")
+    equivalent = namelists.NamelistData.from_string(variant, filename="model.namelist")
+    assert tools.content_hash(equivalent) == tools.content_hash(original)
+    assert tools.content_hash(equivalent.store()) == tools.content_hash(original.store())
+
+
+@pytest.mark.parametrize(
+    "variant",
+    [
+        pytest.param(MODEL_NML.replace("nsteps = 10", "nsteps = 11"), id="value"),
+        pytest.param(MODEL_NML.replace("'atm_2d'", "'ATM_2D'"), id="string-case"),
+        pytest.param(MODEL_NML.replace("'atm_2d'", "'tmp'").replace("'atm_3d'", "'atm_2d'"), id="stream-order"),
+    ],
+)
+def test_different_namelists_hash_different(variant):
+    original = namelists.NamelistData.from_string(MODEL_NML)
+    assert tools.content_hash(namelists.NamelistData.from_string(variant)) != tools.content_hash(original)
+
+
+def test_plain_files_keep_byte_hashing():
+    original = orm.SinglefileData.from_string(MODEL_NML)
+    commented = orm.SinglefileData.from_string("! comment\n" + MODEL_NML)
+    assert tools.content_hash(commented) != tools.content_hash(original)
+    converted = namelists.NamelistData.from_singlefile(commented)
+    assert tools.content_hash(converted) == tools.content_hash(namelists.NamelistData.from_singlefile(original))
@@ -0,0 +1,24 @@
+import pytest
+
+from aiida_icon.iconutils import timers
+
+
+@pytest.fixture
+def scheduler_stdout(datapath):
+    return (datapath / "restarts_present" / "outputs" / "_scheduler-stdout.txt").read_text().splitlines()
+
+
+def test_parse_timer_report(scheduler_stdout):
+    report = timers.parse_timer_report(scheduler_stdout)
+    assert {"total", "integrate_nh", "nh_solve", "nh_solve_veltend", "write_restart"} <= set(report)
+    assert timers.report_total_seconds(report) == 19.125
+    assert all(timing["t_min"] <= timing["t_max"] for timing in report.values())
+
+
+def test_parse_timer_report_keeps_last(scheduler_stdout):
+    report = timers.parse_timer_report([*scheduler_stdout, *scheduler_stdout])
+    assert report == timers.parse_timer_report(scheduler_stdout)
+
+
+def test_parse_timer_report_missing():
+    assert timers.parse_timer_report(["Time step: 1", "Time step: 2"]) == {}
@@ -0,0 +1,78 @@
+import io
+import re
+import shutil
+
+import f90nml
+import pytest
+from click.testing import CliRunner
+
+from aiida_icon.iconutils import modelnml, timers
+from aiida_icon.testing import mock_icon
+
+
+@pytest.fixture
+def work_dir(tmp_path, datapath):
+    run_dir = tmp_path / "run"
+    shutil.copytree(datapath / "simple_icon_run" / "inputs", run_dir)
+    return run_dir
+
+
+def test_mock_run_follows_namelists(work_dir):
+    log = io.StringIO()
+    plan = mock_icon.run(work_dir, mock_icon.MockSettings(restart_patches=3, restart_file_size=10), log=log)
+
+    assert (work_dir / "finish.status").read_text().strip() == "RESTART"
+    restart_pattern = modelnml.read_restart_file_pattern(f90nml.read(work_dir / "model.namelist"))
+    restarts = [path for path in work_dir.iterdir() if re.fullmatch(restart_pattern, path.name)]
+    assert [path.name for path in restarts] == ["multifile_restart_atm_20000101T010000Z.mfr"]
+    assert sorted(path.name for path in restarts[0].iterdir()) == [
+        "attributes.nc",
+        "patch1_1.nc",
+        "patch1_2.nc",
+        "patch1_3.nc",
+    ]
+    assert (restarts[0] / "patch1_1.nc").stat().st_size == 10
+    assert (work_dir / "multifile_restart_atm.mfr").resolve() == restarts[0].resolve()
+    assert len(plan.output_files) == 2
+    assert all((work_dir / output_file.path).is_file() for output_file in plan.output_files)
+    assert len((work_dir / "output_schedule.txt").read_text().splitlines()) == 3
+    report = timers.parse_timer_report(log.getvalue().splitlines())
+    assert report["integrate_nh"]["calls"] == 3
+    assert timers.report_total_seconds(report) is not None
+
+
+def test_mock_run_continues_from_restart(work_dir):
+    mock_icon.run(work_dir, log=io.StringIO())
+    master = work_dir / "icon_master.namelist"
+    master.write_text(master.read_text().replace(".false.", ".true.", 1))
+
+    plan = mock_icon.run(work_dir, log=io.StringIO())
+
+    assert plan.start.hour == 1
+    assert (work_dir / "finish.status").read_text().strip() == "OK"
+    assert (work_dir / "multifile_restart_atm.mfr").resolve().name == "multifile_restart_atm_20000101T020000Z.mfr"
+
+
+def test_mock_output_files_configurable(work_dir):
+    model = work_dir / "model.namelist"
+    model.write_text(
+        model.read_text().replace("steps_per_file              =              1", "output_interval = 'PT20M'")
+    )
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(work_dir)
+        result = CliRunner(env={"MOCK_ICON_OUTPUT_FILE_SIZE": "100"}).invoke(
+            mock_icon.main, ["--files-per-stream", "2", "--ignored-icon-flag"], catch_exceptions=False
+        )
+
+    assert result.exit_code == 0
+    files = sorted((work_dir / "simple_icon_run_atm_2d").iterdir())
+    assert [path.name for path in files] == ["_DOM01_ML_0001.nc", "_DOM01_ML_0002.nc"]
+    assert files[0].stat().st_size == 100
+
+
+def test_mock_needs_master_namelist(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(mock_icon.main, [])
+    assert result.exit_code != 0
+    assert "icon_master.namelist" in result.output
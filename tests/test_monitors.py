@@ -0,0 +1,120 @@
+import datetime
+
+import pytest
+from aiida.plugins import entry_point
+from aiida.schedulers import datastructures
+
+from aiida_icon import calculations, monitors
+
+
+def time_step_lines(steps):
+    return "".join(
+        f" mo_nh_stepping:perform_nh_timeloop: Time step: {step:>6} model time: 2000-01-01T{step // 60:02d}:{step % 60:02d}:00.000\n"
+        for step in steps
+    )
+
+
+@pytest.fixture
+def local_transport(aiida_computer_local):
+    with aiida_computer_local().get_transport() as transport:
+        yield transport
+
+
+def test_read_log_increment(local_transport, tmp_path):
+    log = tmp_path / "icon.log"
+    log.write_text("first\nsecond\npart")
+
+    lines, offset = monitors.read_log_increment(local_transport, str(log), 0, max_bytes=1024)
+    assert (lines, offset) == (["first", "second"], 13)
+
+    with log.open("a") as log_file:
+        log_file.write("ial\n")
+    assert monitors.read_log_increment(local_transport, str(log), offset, max_bytes=1024) == (["partial"], 21)
+
+
+def test_read_log_increment_limit(local_transport, tmp_path):
+    log = tmp_path / "icon.log"
+    log.write_text("x" * 10 + "\nnext\n")
+
+    assert monitors.read_log_increment(local_transport, str(log), 0, max_bytes=4) == (["xxxx"], 4)
+    assert monitors.read_log_increment(local_transport, str(log), 4, max_bytes=8) == (["xxxxxx"], 11)
+
+
+def test_read_missing_log(local_transport, tmp_path):
+    assert monitors.read_log_increment(local_transport, str(tmp_path / "missing"), 0, max_bytes=8) == ([], 0)
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_monitor_progress(case_name, parser_case, icon_result, local_transport, tmp_path, transport_calls):
+    icon_result.set_remote_workdir(str(tmp_path))
+    log = tmp_path / "_scheduler-stdout.txt"
+    log.write_text(time_step_lines(range(1, 31)))
+    monitors.monitor_progress(icon_result, local_transport)
+
+    with log.open("a") as log_file:
+        log_file.write(time_step_lines(range(31, 61)))
+    monitors.monitor_progress(icon_result, local_transport)
+
+    state = icon_result.base.extras.get(monitors.PROGRESS_EXTRAS_KEY)
+    assert state["log_offset"] == log.stat().st_size
+    assert state["step"] == 60
+    assert state["model_date"] == "2000-01-01T01:00:00Z"
+    assert state["fraction"] == 0.5
+    assert state["first"]["step"] == 30
+    assert state["steps_per_second"] > 0
+    assert "eta" in state
+    assert transport_calls["exec_command_wait_bytes"] == 2
+
+
+@pytest.fixture
+def running_result(icon_result, tmp_path):
+    icon_result.set_remote_workdir(str(tmp_path))
+    icon_result.set_scheduler_state(datastructures.JobState.RUNNING)
+    (tmp_path / "_scheduler-stdout.txt").write_text(time_step_lines(range(1, 11)))
+    return icon_result
+
+
+@pytest.mark.parametrize("case_name", ["restarts_present"])
+def test_early_kill_divergence(case_name, parser_case, running_result, local_transport, tmp_path):
+    assert monitors.monitor_early_kill(running_result, local_transport) is None
+    with (tmp_path / "_scheduler-stdout.txt").open("a") as log_file:
+        log_file.write(" nh_stepping: max |vn| = NaN in block 12\n")
+
+    result = monitors.monitor_early_kill(running_result, local_transport)
+
+    assert result.message == "nh_stepping: max |vn| = NaN in block 12"
+    assert not result.override_exit_code
+    parser = calculations.IconParser(running_result)
+    exit_code = parser.parse()
+    assert exit_code.status == calculations.IconCalculation.exit_codes.ERROR_ICON_DIVERGED.status
+    assert "latest_restart_file" in parser.outputs
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_early_kill_stall(case_name, parser_case, running_result, local_transport):
+    assert monitors.monitor_early_kill(running_result, local_transport, stall_timeout=600) is None
+    state = running_result.base.extras.get(monitors.WATCH_EXTRAS_KEY)
+    an_hour_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+    running_result.base.extras.set(monitors.WATCH_EXTRAS_KEY, state | {"last_progress": an_hour_ago.isoformat()})
+
+    assert monitors.monitor_early_kill(running_result, local_transport, stall_timeout=None) is None
+    result = monitors.monitor_early_kill(running_result, local_transport, stall_timeout=600)
+
+    assert "after step 10" in result.message
+    assert running_result.base.extras.get(monitors.STOPPED_EXTRAS_KEY)["exit_code_label"] == "ERROR_ICON_STALLED"
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_no_stall_while_queued(case_name, parser_case, running_result, local_transport):
+    an_hour_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+    running_result.base.extras.set(monitors.WATCH_EXTRAS_KEY, {"last_progress": an_hour_ago.isoformat()})
+    running_result.set_scheduler_state(datastructures.JobState.QUEUED)
+
+    assert monitors.monitor_early_kill(running_result, local_transport, stall_timeout=600) is None
+
+
+@pytest.mark.parametrize(
+    ("name", "monitor"), [("icon.progress", "monitor_progress"), ("icon.early_kill", "monitor_early_kill")]
+)
+def test_entry_points(name, monitor):
+    assert entry_point.load_entry_point("aiida.calculations.monitors", name) is getattr(monitors, monitor)
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+from aiida import orm
+from aiida.common import LinkType
+from click.testing import CliRunner
+
+from aiida_icon import performance, search
+
+
+@pytest.fixture
+def make_run(aiida_profile_clean, aiida_computer_local, aiida_code_installed):  # noqa: ARG001 # only these runs
+    computer = aiida_computer_local()
+    codes = {}
+
+    def make_run(total, *, code_label="icon", uenv="icon/25.2:v3", steps=10, grid="R02B04", recorded=False):
+        if code_label not in codes:
+            codes[code_label] = aiida_code_installed(label=code_label, computer=computer).store()
+        node = orm.CalcJobNode(computer=computer, process_type=search.PROCESS_TYPE)
+        node.set_option("resources", {"num_machines": 1, "num_mpiprocs_per_machine": 4})
+        node.set_option("custom_scheduler_commands", f"#SBATCH --uenv={uenv}")
+        node.base.links.add_incoming(codes[code_label], link_type=LinkType.INPUT_CALC, link_label="code")
+        node.store()
+        node.set_exit_status(0)
+        node.base.extras.set(search.EXTRAS_KEY, {"grid": grid, "num_machines": 1, "num_mpiprocs_per_machine": 4})
+        report = {
+            "total": {"calls": 1, "total_max": total},
+            "integrate_nh": {"calls": steps, "total_max": total * 0.9},
+            "write_restart": {"calls": 1, "total_max": 0.5},
+        }
+        if recorded:  # as by the parser, the timer report itself is not needed then
+            performance.record_performance(node, report)
+            return node
+        report_node = orm.Dict(report)
+        report_node.base.links.add_incoming(node, link_type=LinkType.CREATE, link_label="timer_report")
+        report_node.store()
+        return node
+
+    return make_run
+
+
+def test_load_history(make_run):
+    runs = [make_run(10.0), make_run(40.0, steps=40), make_run(10.0, grid="R02B05")]
+
+    history = performance.load_history()
+
+    assert len(history.groups) == 2
+    (key,) = [key for key in history.groups if key[0] == "R02B04"]
+    assert history.series(key, "total") == [(runs[0].pk, 1.0), (runs[1].pk, 1.0)]
+    record = history.groups[key][0]
+    assert record.fingerprint.code == f"icon@{record.fingerprint.computer}"
+    assert record.fingerprint.uenv == "icon/25.2:v3"
+
+
+def test_load_recorded_history(make_run):
+    """Runs with a performance record and runs parsed before they were recorded end up in the same series."""
+    runs = [make_run(10.0), make_run(20.0, recorded=True), make_run(40.0, steps=40, recorded=True)]
+
+    history = performance.load_history()
+
+    (key,) = history.groups
+    assert history.series(key, "total") == [(runs[0].pk, 1.0), (runs[1].pk, 2.0), (runs[2].pk, 1.0)]
+    assert history.groups[key][1].fingerprint == history.groups[key][0].fingerprint
+
+
+def test_regression_after_stack_change(make_run):
+    for total in (10.0, 10.2, 9.9, 10.1):
+        make_run(total)
+    slow = make_run(13.0, code_label="icon-new", uenv="icon/25.4:v1")
+
+    history = performance.load_history()
+    regressions = performance.detect_regressions(history)
+
+    assert {(regression.record.pk, regression.timer) for regression in regressions} == {
+        (slow.pk, "total"),
+        (slow.pk, "integrate_nh"),
+    }
+    report = performance.format_report(history, regressions)
+    assert f"pk {slow.pk}" in report
+    assert "uenv=icon/25.4:v1" in report
+    # grouped by the software stack as well, the new code has no history to compare to
+    assert not performance.detect_regressions(performance.load_history(group_by=("grid", "code")))
+
+
+def test_regression_command(aiida_profile_clean, make_run):
+    for total in (10.0, 10.2, 9.9, 10.1):
+        make_run(total)
+    runner = CliRunner()
+
+    result = runner.invoke(performance.main, ["--profile", aiida_profile_clean.name])
+    assert result.exit_code == 0, result.output
+    assert "No regressions in 4 runs" in result.output
+
+    slow = make_run(12.0)
+    result = runner.invoke(performance.main, ["--profile", aiida_profile_clean.name, "--json", "--timer", "total"])
+    assert result.exit_code == 1
+    (regression,) = json.loads(result.output)
+    assert regression["pk"] == slow.pk
+    assert regression["ratio"] == pytest.approx(1.2, rel=0.02)
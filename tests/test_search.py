@@ -0,0 +1,98 @@
+import datetime
+
+import pytest
+from aiida import orm
+
+from aiida_icon import calculations, search
+
+
+def experiment_groups(node: orm.Node) -> list:
+    query = orm.QueryBuilder().append(orm.Node, filters={"id": node.pk}, tag="node")
+    return query.append(search.ExperimentGroup, with_node="node").all(flat=True)
+
+
+@pytest.fixture
+def make_calculation(icon_builder, datapath, add_input_files):
+    """Create (but not run) IconCalculations of the simple test run with a given start date and restart flag."""
+    add_input_files(datapath.absolute() / "simple_icon_run" / "inputs", icon_builder)
+    icon_builder.dynamics_grid_file = orm.RemoteData(
+        remote_path="/grids/icon_grid_0013_R02B04_R.nc", computer=icon_builder.code.computer
+    )
+    template = icon_builder.master_namelist.get_content(mode="r")
+
+    def make(start_date: str, *, lrestart: bool = False) -> orm.CalcJobNode:
+        icon_builder.master_namelist = orm.SinglefileData.from_string(
+            template.replace("2000-01-01T00:00:00Z", start_date).replace(".false.", f".{str(lrestart).lower()}.", 1)
+        )
+        return calculations.IconCalculation(dict(icon_builder)).node
+
+    return make
+
+
+def test_metadata_recorded_at_creation(make_calculation):
+    node = make_calculation("2000-01-01T00:00:00Z")
+    metadata = node.base.extras.get(search.EXTRAS_KEY)
+    assert metadata["grid_filename"] == "icon_grid_0013_R02B04_R.nc"
+    assert metadata["grid"] == "R02B04"
+    assert metadata["start_date"] == "2000-01-01T00:00:00Z"
+    assert metadata["stop_date"] == "2000-01-01T02:00:00Z"
+    assert metadata["time_step"] == 1200.0
+    assert metadata["restart"] is False
+    assert metadata["model_names"] == ["atm"]
+    assert metadata["num_output_streams"] == 2
+    assert metadata["total_mpiprocs"] == 10
+
+
+def test_query_experiments(aiida_profile_clean, make_calculation):  # noqa: ARG001 # only the other calculations
+    early = make_calculation("2000-01-01T00:00:00Z")
+    restarted = make_calculation("2000-01-02T00:00:00Z", lrestart=True)
+    late = make_calculation("2000-02-01T00:00:00Z", lrestart=True)
+
+    def found(query: orm.QueryBuilder) -> set[str]:
+        return {row[0].uuid for row in query.all()}
+
+    assert found(search.query_experiments(grid="R02B04")) == {early.uuid, restarted.uuid, late.uuid}
+    assert found(search.query_experiments(grid="R02B05")) == set()
+    assert found(search.query_experiments(restart=True)) == {restarted.uuid, late.uuid}
+    assert found(
+        search.query_experiments(
+            start_from="2000-01-01T12:00:00Z", start_until=datetime.datetime(2000, 1, 31, tzinfo=datetime.timezone.utc)
+        )
+    ) == {restarted.uuid}
+    assert found(search.query_experiments(model_name="atm", filters={"total_mpiprocs": {">": 8}})) == {
+        early.uuid,
+        restarted.uuid,
+        late.uuid,
+    }
+
+
+def test_calculation_added_to_experiment_groups(aiida_profile_clean, make_calculation):  # noqa: ARG001 # fresh groups
+    node = make_calculation("2000-01-01T00:00:00Z")
+    labels = {group.label for group in experiment_groups(node)}
+    assert labels == {
+        "icon/grid/R02B04",
+        "icon/grid_filename/icon_grid_0013_R02B04_R.nc",
+        "icon/restart/false",
+        "icon/model_name/atm",
+    }
+
+
+def test_query_experiments_joins_groups(aiida_profile_clean, make_calculation):  # noqa: ARG001 # fresh groups
+    node = make_calculation("2000-01-01T00:00:00Z")
+    query = search.query_experiments(grid="R02B04", restart=False)
+    assert "json" not in str(query.as_sql()).lower()
+    assert query.all(flat=True) == [node]
+    # only calculations in the groups are found, whatever their extras
+    search.ExperimentGroup.collection.get(label="icon/grid/R02B04").remove_nodes(node)
+    assert search.query_experiments(grid="R02B04").all() == []
+
+
+def test_index_experiments(aiida_profile_clean, make_calculation):  # noqa: ARG001 # fresh groups
+    node = make_calculation("2000-01-01T00:00:00Z")
+    for group in experiment_groups(node):
+        group.remove_nodes(node)
+    assert search.query_experiments(grid="R02B04").all() == []
+    assert search.index_experiments() == 1
+    assert search.query_experiments(grid="R02B04").all(flat=True) == [node]
+    assert search.index_experiments() == 1
+    assert len(search.ExperimentGroup.collection.get(label="icon/grid/R02B04").nodes) == 1
@@ -0,0 +1,45 @@
+import pytest
+
+from aiida_icon.calculations import IconCalculation
+from aiida_icon.site_support import openmp
+from aiida_icon.site_support.cscs import alps, todi
+
+
+def test_setup_openmp_before_wrapper_script():
+    icon_builder = IconCalculation.get_builder()
+    icon_builder.metadata.options.resources = {"num_machines": 1, "num_mpiprocs_per_machine": 8}
+    icon_builder.metadata.options.mpirun_extra_params = ["--cpus-per-task=2", "./run_icon.sh", "--verbose"]
+    with pytest.warns(UserWarning, match="--cpus-per-task=2 contradicts 1 core"):
+        openmp.setup_openmp(icon_builder)
+    assert icon_builder.metadata.options.mpirun_extra_params == ["--cpus-per-task=1", "./run_icon.sh", "--verbose"]
+
+
+def test_alps_setup_derives_threads_from_resources(recwarn):
+    icon_builder = IconCalculation.get_builder()
+    icon_builder.metadata.options.resources = {
+        "num_machines": 1,
+        "num_mpiprocs_per_machine": 32,
+        "num_cores_per_mpiproc": 8,
+    }
+    todi.setup_for_todi_cpu(icon_builder)
+    # repeating the setup is consistent and does not warn
+    alps.common_alps_setup(icon_builder)
+    environment_variables = icon_builder.metadata.options.environment_variables
+    assert environment_variables["OMP_NUM_THREADS"] == environment_variables["ICON_THREADS"] == "8"
+    assert environment_variables["OMP_PLACES"] == "cores"
+    assert environment_variables["OMP_PROC_BIND"] == "close"
+    assert icon_builder.metadata.options.mpirun_extra_params == [
+        "--cpus-per-task=8",
+        "--cpu-bind=none",
+        "./run_icon.sh",
+    ]
+    assert 'CPUS=("0-7" "8-15"' in icon_builder.wrapper_script.get_content(mode="r")
+    assert not recwarn.list
+
+
+def test_user_thread_count_is_replaced():
+    icon_builder = IconCalculation.get_builder()
+    icon_builder.metadata.options.environment_variables = {"OMP_NUM_THREADS": "1"}
+    with pytest.warns(UserWarning, match="OMP_NUM_THREADS=1 contradicts 2 core"):
+        openmp.setup_openmp(icon_builder)
+    assert icon_builder.metadata.options.environment_variables["OMP_NUM_THREADS"] == "2"
@@ -0,0 +1,93 @@
+import textwrap
+
+import pytest
+from aiida.engine import processes
+
+from aiida_icon.calculations import IconCalculation
+from aiida_icon.site_support import profiles
+from aiida_icon.site_support.cscs import alps
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(profiles.PROFILE_PATH_VARIABLE, str(tmp_path))
+    profiles.get_profile.cache_clear()
+    yield tmp_path
+    profiles.get_profile.cache_clear()
+
+
+def test_shipped_profiles_match_alps_setup():
+    assert {"cscs.alps-gh200", "cscs.alps-gh200-cpu", "cscs.alps-gh200-gpu"} <= set(profiles.available_profiles())
+    gpu = profiles.get_profile("cscs.alps-gh200-gpu")
+    assert gpu.topology == alps.GH200_TOPOLOGY
+    assert gpu.resources == alps.GH200_GPU_RESOURCES
+    assert gpu.environment_variables["MPICH_GPU_SUPPORT_ENABLED"] == "1"
+
+
+def test_profile_file_extends_registered_profile(profile_dir):
+    (profile_dir / "mysite.yaml").write_text(
+        textwrap.dedent(
+            """\
+            extends: cscs.alps-gh200-cpu
+            uenv: null
+            environment_variables:
+              FI_MR_CACHE_MONITOR: memhooks
+            resources:
+              num_mpiprocs_per_machine: 72
+              num_cores_per_mpiproc: 4
+            wrapper_template: |
+              #!/bin/bash
+              export MY_THREADS=$num_threads
+              exec "$$@"
+            """
+        )
+    )
+    assert "mysite" in profiles.available_profiles()
+    profile = profiles.get_profile("mysite")
+    assert profile.environment_variables["FI_MR_CACHE_MONITOR"] == "memhooks"
+    assert profile.environment_variables["OMP_SCHEDULE"] == "static,1"
+
+    icon_builder = processes.ProcessBuilder(IconCalculation)
+    profiles.apply_profile(icon_builder, "mysite")
+    options = icon_builder.metadata.options
+    assert options.resources == {"num_machines": 1, "num_mpiprocs_per_machine": 72, "num_cores_per_mpiproc": 4}
+    assert "--uenv" not in options.custom_scheduler_commands
+    assert options.mpirun_extra_params[-2:] == ["--cpus-per-task=4", "./run_icon.sh"]
+    assert icon_builder.wrapper_script.get_content(mode="r") == '#!/bin/bash\nexport MY_THREADS=4\nexec "$@"\n'
+
+
+def test_unknown_profile(profile_dir):
+    with pytest.raises(KeyError, match="Unknown site profile 'nowhere'"):
+        profiles.get_profile("nowhere")
+
+
+def test_unknown_keys(profile_dir):
+    (profile_dir / "typo.yaml").write_text("environment_variable:\n  FOO: bar\n")
+    with pytest.raises(ValueError, match="Unknown keys in site profile 'typo': environment_variable"):
+        profiles.get_profile("typo")
+
+
+def test_apply_gpu_profile():
+    icon_builder = IconCalculation.get_builder()
+    profiles.apply_profile(icon_builder, "cscs.alps-gh200-gpu", resources={"num_machines": 8})
+    options = icon_builder.metadata.options
+    assert options.resources["num_machines"] == 8
+    assert options.custom_scheduler_commands == "#SBATCH --uenv=icon/25.2:v3 --view=default"
+    assert 'GPUS=("0" "1" "2" "3")' in icon_builder.wrapper_script.get_content(mode="r")
+
+
+def test_alps_setup_uses_overridden_profile(profile_dir):
+    (profile_dir / "cscs.alps-gh200.yaml").write_text(
+        "uenv: {name: icon/26.1:v1, view: default}\nenvironment_variables: {FI_MR_CACHE_MONITOR: memhooks}\n"
+    )
+    icon_builder = IconCalculation.get_builder()
+    alps.common_alps_setup(icon_builder)
+    options = icon_builder.metadata.options
+    assert options.environment_variables["FI_MR_CACHE_MONITOR"] == "memhooks"
+    assert options.custom_scheduler_commands == "#SBATCH --uenv=icon/26.1:v1 --view=default"
+
+
+def test_script_dir_deprecated():
+    with pytest.deprecated_call():
+        script_dir = alps.SCRIPT_DIR
+    assert (script_dir / "gh200_cpu.sh").is_file()
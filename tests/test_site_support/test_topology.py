@@ -0,0 +1,120 @@
+import aiida.orm
+import pytest
+from aiida.engine import processes
+
+from aiida_icon.calculations import IconCalculation
+from aiida_icon.site_support import topology
+from aiida_icon.site_support.cscs import alps, santis
+
+
+@pytest.mark.parametrize(
+    ("mpiprocs", "cores", "expected_ranks_per_numa"),
+    [
+        (288, 1, [72, 72, 72, 72]),
+        (4, 72, [1, 1, 1, 1]),
+        (6, 8, [2, 2, 1, 1]),
+        (2, 1, [1, 1, 0, 0]),
+    ],
+)
+def test_plan_binding_spreads_ranks(mpiprocs, cores, expected_ranks_per_numa):
+    bindings = topology.plan_binding(alps.GH200_TOPOLOGY, mpiprocs_per_machine=mpiprocs, cores_per_mpiproc=cores)
+    assert [binding.local_rank for binding in bindings] == list(range(mpiprocs))
+    assert [
+        sum(1 for binding in bindings if binding.numa_domain == domain) for domain in range(4)
+    ] == expected_ranks_per_numa
+
+
+def test_plan_binding_no_overlap():
+    machine = topology.MachineTopology(sockets=2, numa_per_socket=4, cores_per_numa=8, threads_per_core=2)
+    bindings = topology.plan_binding(machine, mpiprocs_per_machine=16, cores_per_mpiproc=4)
+    cpus = []
+    for binding in bindings:
+        for cpu_range in binding.cpus.split(","):
+            first, _, last = cpu_range.partition("-")
+            cpus.extend(range(int(first), int(last or first) + 1))
+    assert sorted(cpus) == list(range(128))
+    assert bindings[2].cpus == "8-11,72-75"
+    assert bindings[2].numa_domain == 1
+
+
+def test_plan_binding_too_many_ranks():
+    with pytest.raises(ValueError, match="do not fit on a machine with 288 cores"):
+        topology.plan_binding(alps.GH200_TOPOLOGY, mpiprocs_per_machine=289)
+
+
+def test_make_wrapper_script():
+    script = topology.make_wrapper_script(
+        alps.GH200_TOPOLOGY, {"num_machines": 2, "num_mpiprocs_per_machine": 8, "num_cores_per_mpiproc": 16}
+    )
+    content = script.get_content(mode="r")
+    assert script.filename == "run_icon.sh"
+    assert 'NUMA_NODES=("0" "0" "1" "1" "2" "2" "3" "3")' in content
+    assert 'CPUS=("0-15" "16-31" "72-87" "88-103" "144-159" "160-175" "216-231" "232-247")' in content
+
+
+@pytest.mark.parametrize("use_icon_builder", [True, False])
+def test_setup_for_santis_cpu(use_icon_builder):
+    icon_builder = IconCalculation.get_builder() if use_icon_builder else processes.ProcessBuilder(IconCalculation)
+    icon_builder.metadata.options.resources = {"num_machines": 1, "num_mpiprocs_per_machine": 4}
+    icon_builder.metadata.options.mpirun_extra_params = ["--distribution=block:block:block"]
+    santis.setup_for_santis_cpu(icon_builder)
+    assert icon_builder.metadata.options.mpirun_extra_params == [
+        "--distribution=block:block:block",
+        "--cpus-per-task=1",
+        "--cpu-bind=none",
+        "./run_icon.sh",
+    ]
+    assert 'CPUS=("0" "72" "144" "216")' in icon_builder.wrapper_script.get_content(mode="r")
+
+
+def test_setup_for_santis_cpu_default_resources():
+    icon_builder = IconCalculation.get_builder()
+    santis.setup_for_santis_cpu(icon_builder)
+    assert icon_builder.metadata.options.resources == {
+        "num_machines": 10,
+        "num_mpiprocs_per_machine": 1,
+        "num_cores_per_mpiproc": 2,
+    }
+    assert 'CPUS=("0-1")' in icon_builder.wrapper_script.get_content(mode="r")
+
+
+def test_make_wrapper_script_binds_gpus():
+    script = topology.make_wrapper_script(alps.GH200_TOPOLOGY, alps.GH200_GPU_RESOURCES, bind_gpus=True)
+    content = script.get_content(mode="r")
+    assert 'GPUS=("0" "1" "2" "3")' in content
+    assert 'export CUDA_VISIBLE_DEVICES="${GPUS[$LOCAL_RANK]}"' in content
+
+
+def test_make_wrapper_script_without_gpus():
+    machine = topology.MachineTopology(sockets=2, numa_per_socket=1, cores_per_numa=64)
+    with pytest.raises(ValueError, match="without GPUs"):
+        topology.make_wrapper_script(machine, {"num_mpiprocs_per_machine": 2}, bind_gpus=True)
+
+
+def test_setup_for_santis_gpu(aiida_computer_local):
+    icon_builder = processes.ProcessBuilder(IconCalculation)
+    icon_builder.model_namelist = aiida.orm.SinglefileData.from_string("&parallel_nml\nnproma=32\nnum_io_procs=1\n/")
+    icon_builder.dynamics_grid_file = aiida.orm.RemoteData(
+        remote_path="/grids/icon_grid_0013_R02B04_R.nc", computer=aiida_computer_local()
+    )
+    santis.setup_for_santis_gpu(icon_builder)
+    assert icon_builder.metadata.options.resources["num_mpiprocs_per_machine"] == 4
+    assert icon_builder.metadata.options.mpirun_extra_params == [
+        "--cpus-per-task=1",
+        "--cpu-bind=none",
+        "./run_icon.sh",
+    ]
+    assert "CUDA_VISIBLE_DEVICES" in icon_builder.wrapper_script.get_content(mode="r")
+    # 3 compute processes share the 20480 cells of R02B04
+    assert "nproma = 7520" in icon_builder.model_namelist.get_content(mode="r")
+
+
+def test_setup_for_santis_gpu_needs_model_namelist():
+    with pytest.raises(ValueError, match="Set the model namelist"):
+        santis.setup_for_santis_gpu(IconCalculation.get_builder(), num_cells=20480)
+
+
+def test_wrapper_script_is_reused():
+    resources = {"num_machines": 1, "num_mpiprocs_per_machine": 4, "num_cores_per_mpiproc": 72}
+    first = topology.make_wrapper_script(alps.GH200_TOPOLOGY, resources).store()
+    assert topology.make_wrapper_script(alps.GH200_TOPOLOGY, resources).uuid == first.uuid
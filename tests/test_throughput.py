@@ -0,0 +1,61 @@
+import json
+import pathlib
+
+from aiida import engine, orm
+from click.testing import CliRunner
+
+from aiida_icon.testing import mock_icon, throughput
+
+
+def test_measure_throughput(tmp_path):
+    computer = throughput.setup_computer("throughput-test", tmp_path, poll_interval=0)
+    code = throughput.setup_mock_code(computer)
+    settings = mock_icon.MockSettings(files_per_stream=5, output_file_size=10)
+
+    report = throughput.measure_throughput(
+        [throughput.make_builder(code, settings, num_streams=3) for _ in range(2)],
+        poll_interval=0.01,
+        submit=lambda builder: engine.run_get_node(builder).node,
+        config={"count": 2},
+    )
+
+    data = report.to_dict()
+    assert data["finished"] == data["submitted"] == 2
+    assert data["failed"] == 0
+    assert data["calculations_per_minute"] > 0
+    assert set(data["stages"]) == set(throughput.STAGES)
+    node = orm.load_node(data["calculations"][0]["pk"])
+    assert len(node.outputs.output_streams) == 3
+    stream_dir = pathlib.Path(node.outputs.output_streams["m0_stream_0"]["out"].get_remote_path())
+    assert len(list(stream_dir.iterdir())) == 5
+    assert json.loads(json.dumps(data)) == data
+
+
+def test_stage_durations_unfinished():
+    assert throughput.CalculationTimeline(pk=1, submitted=0.0).stage_durations() == {}
+
+
+def test_daemon_required(aiida_profile, tmp_path):
+    result = CliRunner().invoke(
+        throughput.main, ["--profile", aiida_profile.name, "--work-dir", str(tmp_path), "--count", "1"]
+    )
+    assert result.exit_code != 0
+    assert "daemon" in result.output
+
+
+def test_workers_of_running_daemon(aiida_profile, tmp_path, monkeypatch):
+    """'--workers' is not silently ignored when the daemon is already running with a different number."""
+
+    class RunningDaemon:
+        is_daemon_running = True
+
+        def get_number_of_workers(self):
+            return 2
+
+    monkeypatch.setattr("aiida.engine.daemon.client.get_daemon_client", RunningDaemon)
+    result = CliRunner().invoke(
+        throughput.main,
+        ["--profile", aiida_profile.name, "--work-dir", str(tmp_path), "--count", "1", "--workers", "4"],
+    )
+    assert result.exit_code != 0
+    assert "already running with 2 worker(s)" in result.output
@@ -0,0 +1,139 @@
+import contextlib
+import datetime
+import json
+import threading
+
+import pytest
+from aiida.common import folders
+from aiida.schedulers import datastructures
+
+from aiida_icon import calculations, tracing
+
+SACCT_OUTPUT = (
+    "JobID|Submit|Start|End|State|\n"
+    "123|2025-03-01T10:00:00|2025-03-01T10:05:00|2025-03-01T11:05:00|COMPLETED|\n"
+    "123.batch|2025-03-01T10:05:00|2025-03-01T10:05:00|2025-03-01T11:05:00|COMPLETED|\n"
+)
+
+
+def read_trace(path):
+    (line,) = path.read_text().splitlines()
+    request = json.loads(line)
+    return request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+
+
+def test_prepare_spans(icon_builder, datapath, add_input_files, tmp_path):
+    add_input_files(datapath.absolute() / "simple_icon_run" / "inputs", icon_builder)
+    icon_builder.metadata.options.tracing = {"file": str(tmp_path / "traces.jsonl")}
+    calc = calculations.IconCalculation(dict(icon_builder))
+
+    calc.presubmit(folders.SandboxFolder(tmp_path))
+
+    spans = {data["name"]: data for data in calc.node.base.extras.get(tracing.EXTRAS_KEY)}
+    assert {"prepare_for_submission", "prepare_icon_run", "collect_model_nml", "add_job_scripts"} <= set(spans)
+    assert spans["prepare_for_submission"]["parent_id"] is None
+    assert spans["prepare_icon_run"]["parent_id"] == spans["prepare_for_submission"]["span_id"]
+    assert spans["collect_model_nml"]["parent_id"] == spans["prepare_icon_run"]["span_id"]
+
+
+def test_prepare_without_tracing(mock_icon_calc, tmp_path):
+    mock_icon_calc.presubmit(folders.SandboxFolder(tmp_path))
+
+    assert tracing.EXTRAS_KEY not in mock_icon_calc.node.base.extras.keys()
+
+
+def test_tracing_option_validation(icon_builder):
+    with pytest.raises(ValueError, match="'file' or an 'endpoint'"):
+        icon_builder.metadata.options.tracing = {"service_name": "icon"}
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_parse_exports_trace(case_name, parser_case, icon_result, tmp_path, monkeypatch):
+    trace_file = tmp_path / "traces" / "traces.jsonl"
+    options = {"tracing": {"file": str(trace_file)}}
+    monkeypatch.setattr(icon_result, "get_option", options.get)
+    submitted = icon_result.ctime.timestamp()
+    icon_result.base.extras.set(
+        tracing.EXTRAS_KEY,
+        [{"name": "prepare_for_submission", "start": submitted, "end": submitted, "span_id": "00f067aa0ba902b7"}],
+    )
+    started = datetime.datetime.fromtimestamp(submitted, tz=datetime.timezone.utc)
+    icon_result.set_last_job_info(
+        datastructures.JobInfo(
+            {"job_id": "123", "submission_time": started, "dispatch_time": started, "wallclock_time_seconds": 0}
+        )
+    )
+
+    calculations.IconParser(icon_result).parse()
+
+    spans = {span["name"]: span for span in read_trace(trace_file)}
+    root = spans.pop("IconCalculation")
+    assert root["traceId"] == icon_result.uuid.replace("-", "")
+    assert "parentSpanId" not in root
+    assert {
+        "prepare_for_submission",
+        "upload",
+        "scheduler.queue",
+        "scheduler.run",
+        "retrieve",
+        "parse",
+        "parse_finish_status",
+        "parse_timer_report",
+        "parse_restart_files",
+        "parse_output_streams",
+    } <= set(spans)
+    assert spans["parse_output_streams"]["parentSpanId"] == spans["parse"]["spanId"]
+    assert spans["upload"]["parentSpanId"] == root["spanId"]
+    assert all(int(span["startTimeUnixNano"]) <= int(span["endTimeUnixNano"]) for span in spans.values())
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_scheduler_times_from_sacct(case_name, parser_case, icon_result):
+    icon_result.set_detailed_job_info({"retval": 0, "stdout": SACCT_OUTPUT, "stderr": ""})
+
+    times = tracing.scheduler_times(icon_result)
+
+    assert times["start"] - times["submit"] == 300
+    assert times["end"] - times["start"] == 3600
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_export_failure_is_logged(case_name, parser_case, icon_result, tmp_path, caplog):
+    config = tracing.TracingConfig(endpoint="http://127.0.0.1:9", timeout=0.5)
+
+    spans = tracing.export_calculation_trace(icon_result, config)
+    tracing.flush()
+
+    assert spans[0].name == "IconCalculation"
+    assert "Could not export the trace" in caplog.text
+
+
+@pytest.mark.parametrize("case_name", ["simple_icon_run"])
+def test_parse_does_not_wait_for_collector(case_name, parser_case, icon_result, tmp_path, monkeypatch):
+    trace_file = tmp_path / "traces.jsonl"
+    options = {"tracing": {"file": str(trace_file), "endpoint": "http://collector:4318"}}
+    monkeypatch.setattr(icon_result, "get_option", options.get)
+    collector_reached = threading.Event()
+    release_collector = threading.Event()
+    sent = []
+
+    def urlopen(request, timeout):
+        collector_reached.set()
+        release_collector.wait(timeout=10)
+        sent.append((request.full_url, timeout, json.loads(request.data)))
+        return contextlib.nullcontext()
+
+    monkeypatch.setattr(tracing.urllib.request, "urlopen", urlopen)
+
+    calculations.IconParser(icon_result).parse()
+
+    # the trace file is written by the parser, the collector is still waiting to respond
+    assert read_trace(trace_file)
+    assert collector_reached.wait(timeout=10)
+    assert not sent
+    release_collector.set()
+    tracing.flush()
+    ((url, timeout, request),) = sent
+    assert url == "http://collector:4318/v1/traces"
+    assert timeout == 5.0
+    assert request["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["traceId"] == icon_result.uuid.replace("-", "")
@@ -0,0 +1,112 @@
+import pytest
+from aiida import orm
+from aiida.common import LinkType
+
+from aiida_icon import search, walltime
+
+
+@pytest.fixture
+def member_builder(icon_builder, datapath, add_input_files):
+    """An IconCalculation builder of the simple test run: R02B04, one hour segments of three time steps."""
+    add_input_files(datapath.absolute() / "simple_icon_run" / "inputs", icon_builder)
+    icon_builder.dynamics_grid_file = orm.RemoteData(
+        remote_path="/grids/icon_grid_0013_R02B04_R.nc", computer=icon_builder.code.computer
+    )
+    icon_builder.metadata.options.resources = {"num_machines": 1, "num_mpiprocs_per_machine": 10}
+    return icon_builder
+
+
+@pytest.fixture
+def make_run(aiida_profile_clean, icon_code):  # noqa: ARG001 # only these runs
+    def make_run(total, *, output=10.0, elapsed=None, steps=6, total_mpiprocs=10, computer=None):
+        node = orm.CalcJobNode(computer=computer or icon_code.computer, process_type=search.PROCESS_TYPE)
+        node.set_option("resources", {"num_machines": 1, "num_mpiprocs_per_machine": total_mpiprocs})
+        node.base.links.add_incoming(icon_code, link_type=LinkType.INPUT_CALC, link_label="code")
+        node.store()
+        node.set_exit_status(0)
+        node.base.extras.set(
+            search.EXTRAS_KEY,
+            {
+                "grid_filename": "icon_grid_0013_R02B04_R.nc",
+                "grid": "R02B04",
+                "time_step": 1200.0,
+                "num_output_streams": 2,
+                "total_mpiprocs": total_mpiprocs,
+            },
+        )
+        outputs = {
+            "timer_report": {
+                "total": {"calls": 1, "total_max": total},
+                "integrate_nh": {"calls": steps, "total_max": total - 5},
+                "write_output": {"calls": steps, "total_max": output},
+            }
+        }
+        if elapsed is not None:
+            outputs["efficiency_report"] = {"state": "COMPLETED", "elapsed_seconds": elapsed}
+        for label, content in outputs.items():
+            report = orm.Dict(content)
+            report.base.links.add_incoming(node, link_type=LinkType.CREATE, link_label=label)
+            report.store()
+        return node
+
+    return make_run
+
+
+def test_load_run_costs(make_run):
+    with_accounting = make_run(130.0, elapsed=150.0)
+    make_run(130.0)
+
+    runs = {run.pk: run for run in walltime.load_run_costs()}
+
+    run = runs[with_accounting.pk]
+    assert run.experiment.simulated_seconds == 7200
+    assert run.experiment.num_cells == 20480
+    assert run.experiment.code == icon_code_label(with_accounting)
+    assert (run.compute_seconds, run.output_seconds, run.overhead_seconds) == (120.0, 10.0, 20.0)
+    assert len(runs) == 2
+
+
+def icon_code_label(node):
+    return node.base.links.get_incoming(link_label_filter="code").one().node.full_label
+
+
+def test_predict_member(make_run, member_builder):
+    make_run(130.0, elapsed=150.0)
+    make_run(100.0, total_mpiprocs=20)  # the same configuration on more processes is less similar
+
+    predictor = walltime.WalltimePredictor.load()
+    prediction = predictor.apply(member_builder)
+
+    # 20 s overhead + 3 of 6 steps of 120 s + half of the 10 s output
+    assert prediction.seconds == 85.0
+    assert member_builder.metadata.options.max_wallclock_seconds == prediction.max_wallclock_seconds == 420
+
+
+def test_predict_scaled(make_run, member_builder):
+    run = make_run(130.0, total_mpiprocs=20)
+    member_builder.metadata.options.resources = {"num_machines": 1, "num_mpiprocs_per_machine": 40}
+
+    prediction = walltime.WalltimePredictor(walltime.load_run_costs(), min_margin_seconds=0).predict(member_builder)
+
+    assert prediction.basis == (run.pk,)
+    assert prediction.seconds == 120.0 / 6 * 3 / 2 + 5.0
+
+
+def test_no_comparable_runs(make_run, member_builder, aiida_computer_local):
+    make_run(130.0, computer=aiida_computer_local(label="elsewhere"))
+
+    assert walltime.WalltimePredictor.load().apply(member_builder) is None
+    assert "max_wallclock_seconds" not in member_builder.metadata.options
+
+
+def test_ensemble_reads_inputs_once(make_run, member_builder, monkeypatch):
+    make_run(130.0)
+    predictor = walltime.WalltimePredictor.load()
+    calls = []
+    read_experiment = walltime.read_experiment
+    monkeypatch.setattr(walltime, "read_experiment", lambda builder: calls.append(builder) or read_experiment(builder))
+
+    predictions = {predictor.predict(member_builder) for _ in range(200)}
+
+    assert len(predictions) == 1
+    assert len(calls) == 1
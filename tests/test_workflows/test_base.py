@@ -0,0 +1,122 @@
+import f90nml
+import pytest
+from aiida import engine, orm
+from aiida.common import LinkType
+from aiida.manage import get_manager
+
+from aiida_icon.calculations import IconCalculation
+from aiida_icon.workflows import base
+
+
+@pytest.fixture
+def make_base_workchain(icon_code, datapath):
+    """Make IconBaseWorkChain instances after setup, to call process handlers on."""
+
+    def make(**inputs):
+        inputs_path = datapath / "restarts_present" / "inputs"
+        icon = IconCalculation.get_builder()
+        icon.code = icon_code
+        icon.master_namelist = orm.SinglefileData(inputs_path / "icon_master.namelist")
+        icon.models.atm = orm.SinglefileData(inputs_path / "model.namelist")
+        icon.metadata.options.resources = {"num_machines": 2, "num_mpiprocs_per_machine": 4}
+        process = engine.utils.instantiate_process(
+            get_manager().get_runner(), base.IconBaseWorkChain, icon=icon, max_num_machines=orm.Int(3), **inputs
+        )
+        process.setup()
+        return process
+
+    return make
+
+
+@pytest.fixture
+def base_workchain(make_base_workchain):
+    """An IconBaseWorkChain instance after setup, to call process handlers on."""
+    return make_base_workchain()
+
+
+def make_failed_calc(exit_code, **outputs):
+    node = orm.CalcJobNode(process_type="aiida.calculations:icon.icon")
+    node.set_process_state(engine.ProcessState.FINISHED)
+    node.set_exit_status(exit_code.status)
+    node.store()
+    for label, output in outputs.items():
+        output.base.links.add_incoming(node, link_type=LinkType.CREATE, link_label=label)
+        output.store()
+    return node
+
+
+def test_handle_out_of_memory(base_workchain):
+    failed = make_failed_calc(IconCalculation.exit_codes.ERROR_SCHEDULER_OUT_OF_MEMORY)
+    report = base_workchain.handle_out_of_memory(failed)
+    assert report.exit_code.status == 0
+    assert base_workchain.ctx.inputs.metadata["options"]["resources"]["num_machines"] == 3
+
+    report = base_workchain.handle_out_of_memory(failed)
+    assert report.exit_code == base.IconBaseWorkChain.exit_codes.ERROR_RESOURCE_LIMIT_REACHED
+
+
+def test_handle_out_of_walltime_resumes(base_workchain, icon_code):
+    restart = orm.RemoteData(remote_path="/scratch/multifile_restart_atm.mfr", computer=icon_code.computer)
+    failed = make_failed_calc(IconCalculation.exit_codes.ERROR_SCHEDULER_OUT_OF_WALLTIME, latest_restart_file=restart)
+    report = base_workchain.handle_out_of_walltime(failed)
+    assert report.exit_code.status == 0
+    assert base_workchain.ctx.inputs.restart_file.uuid == restart.uuid
+    master = f90nml.reads(base_workchain.ctx.inputs.master_namelist.get_content(mode="r"))
+    assert master["master_nml"]["lrestart"] is True
+
+
+def test_handle_out_of_walltime_shortens(base_workchain):
+    failed = make_failed_calc(IconCalculation.exit_codes.ERROR_SCHEDULER_OUT_OF_WALLTIME)
+    report = base_workchain.handle_out_of_walltime(failed)
+    assert report.exit_code.status == 0
+    master = f90nml.reads(base_workchain.ctx.inputs.master_namelist.get_content(mode="r"))
+    assert master["master_time_control_nml"]["restarttimeintval"] == "PT15S"
+
+
+def test_handle_node_failure(base_workchain, icon_code):
+    failed = make_failed_calc(IconCalculation.exit_codes.ERROR_SCHEDULER_NODE_FAILURE)
+    report = base_workchain.handle_node_failure(failed)
+    assert report.exit_code.status == 0
+    assert "restart_file" not in base_workchain.ctx.inputs
+
+    restart = orm.RemoteData(remote_path="/scratch/multifile_restart_atm.mfr", computer=icon_code.computer)
+    failed = make_failed_calc(IconCalculation.exit_codes.ERROR_SCHEDULER_NODE_FAILURE, latest_restart_file=restart)
+    report = base_workchain.handle_node_failure(failed)
+    assert report.exit_code.status == 0
+    assert base_workchain.ctx.inputs.restart_file.uuid == restart.uuid
+
+
+def make_segment(icon_code, finish_status="RESTART"):
+    restart = orm.RemoteData(remote_path="/scratch/multifile_restart_atm.mfr", computer=icon_code.computer)
+    return make_failed_calc(engine.ExitCode(0), finish_status=orm.Str(finish_status), latest_restart_file=restart)
+
+
+def test_handle_restart_segment(base_workchain, icon_code):
+    assert base_workchain.handle_restart_segment(make_segment(icon_code, "OK")) is None
+
+    segment = make_segment(icon_code)
+    report = base_workchain.handle_restart_segment(segment)
+    assert report.exit_code.status == 0
+    assert base_workchain.ctx.inputs.restart_file.uuid == segment.outputs.latest_restart_file.uuid
+    master = f90nml.reads(base_workchain.ctx.inputs.master_namelist.get_content(mode="r"))
+    assert master["master_nml"]["lrestart"] is True
+
+
+def test_segments_do_not_use_up_iterations(base_workchain, icon_code):
+    """An experiment of more segments than 'max_iterations' (5 by default) runs to the end."""
+    for _ in range(8):
+        assert base_workchain.should_run_process()
+        base_workchain.ctx.iteration += 1
+        base_workchain.handle_restart_segment(make_segment(icon_code))
+    assert base_workchain.ctx.segments == 8
+    assert base_workchain.should_run_process()
+
+    base_workchain.ctx.iteration += base_workchain.inputs.max_iterations.value  # runs after failures do count
+    assert not base_workchain.should_run_process()
+
+
+def test_max_segments(make_base_workchain, icon_code):
+    base_workchain = make_base_workchain(max_segments=orm.Int(1))
+    assert base_workchain.handle_restart_segment(make_segment(icon_code)).exit_code.status == 0
+    report = base_workchain.handle_restart_segment(make_segment(icon_code))
+    assert report.exit_code == base.IconBaseWorkChain.exit_codes.ERROR_MAXIMUM_SEGMENTS_EXCEEDED
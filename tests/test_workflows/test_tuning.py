@@ -0,0 +1,203 @@
+import f90nml
+import pytest
+from aiida import engine, orm
+from aiida.common import LinkType
+from aiida.manage import get_manager
+
+from aiida_icon.calculations import IconCalculation
+from aiida_icon.workflows import tuning
+
+
+@pytest.fixture
+def make_tuning_workchain(icon_code, datapath):
+    """Make IconTuningWorkChain instances, to step through the outline by hand."""
+
+    def make(model_namelist=None, **inputs):
+        inputs_path = datapath / "restarts_present" / "inputs"
+        icon = IconCalculation.get_builder()
+        icon.code = icon_code
+        icon.master_namelist = orm.SinglefileData(inputs_path / "icon_master.namelist")
+        icon.models.atm = model_namelist or orm.SinglefileData(inputs_path / "model.namelist")
+        icon.metadata.options.resources = {"num_machines": 1, "num_mpiprocs_per_machine": 4}
+        icon.metadata.options.max_wallclock_seconds = 3600
+        return engine.utils.instantiate_process(
+            get_manager().get_runner(), tuning.IconTuningWorkChain, icon=icon, **inputs
+        )
+
+    return make
+
+
+def make_benchmark(exit_code, **outputs):
+    node = orm.CalcJobNode(process_type="aiida.calculations:icon.icon")
+    node.set_process_state(engine.ProcessState.FINISHED)
+    node.set_exit_status(exit_code.status)
+    node.store()
+    for label, output in outputs.items():
+        output.base.links.add_incoming(node, link_type=LinkType.CREATE, link_label=label)
+        output.store()
+    return node
+
+
+def mock_benchmarks(monkeypatch, workchain, wall_seconds):
+    """
+    Replace submitting benchmarks by finished calculations, taking 'wall_seconds[num_machines]' in total.
+
+    'None' stands for a benchmark killed by the scheduler for running out of wall time. Returns the list
+    the inputs of the submitted benchmarks are appended to.
+    """
+    submitted = []
+
+    def submit(process_class, **inputs):
+        assert process_class is IconCalculation
+        submitted.append(inputs)
+        total = wall_seconds[inputs["metadata"]["options"]["resources"]["num_machines"]]
+        if total is None:
+            return make_benchmark(IconCalculation.exit_codes.ERROR_SCHEDULER_OUT_OF_WALLTIME)
+        return make_benchmark(engine.ExitCode(0), timer_report=orm.Dict({"total": {"calls": 1, "total_max": total}}))
+
+    def to_context(**awaitables):
+        for key, awaitable in awaitables.items():
+            workchain.ctx[key] = [*workchain.ctx.get(key, []), orm.load_node(awaitable.pk)]
+
+    monkeypatch.setattr(workchain, "submit", submit)
+    monkeypatch.setattr(workchain, "to_context", to_context)
+    return submitted
+
+
+def test_tuning_workchain(monkeypatch, make_tuning_workchain):
+    workchain = make_tuning_workchain(
+        search_space=orm.Dict({"num_machines": [1, 2, 4], "nproma": [16]}),
+        benchmark_period=orm.Str("PT6H"),
+        walltime_overhead=orm.Int(10),
+    )
+    submitted = mock_benchmarks(monkeypatch, workchain, {1: 100.0, 2: 60.0, 4: None})
+
+    assert workchain.setup() is None
+    assert workchain.ctx.simulated_seconds == 6 * 3600
+    assert [candidate["resources"]["num_machines"] for candidate in workchain.ctx.pending] == [1, 2, 4]
+
+    while workchain.has_pending_candidates():
+        workchain.run_benchmarks()
+        workchain.inspect_benchmarks()
+    assert len(submitted) == 3
+
+    master = f90nml.reads(submitted[0]["master_namelist"].get_content(mode="r"))
+    assert master["master_time_control_nml"]["experimentstopdate"] == "2000-01-01T06:00:00Z"
+    model = f90nml.reads(submitted[0]["models"]["atm"].get_content(mode="r"))
+    assert model["parallel_nml"]["nproma"] == 16
+
+    # the first benchmark runs with the given wall time, the following ones may take 1.5 times the best one so far
+    assert [inputs["metadata"]["options"]["max_wallclock_seconds"] for inputs in submitted] == [3600, 160, 100]
+    assert workchain.ctx.candidates["benchmark_002"]["stopped_early"] is True
+    assert workchain.ctx.best_score == tuning.score(
+        simulated_seconds=6 * 3600, wall_seconds=60.0, num_machines=2, objective="sypd"
+    )
+
+    assert workchain.results() is None
+    scores = workchain.outputs["scores"].get_dict()
+    assert scores["best"] == "benchmark_001"
+    assert "score" not in scores["benchmarks"]["benchmark_002"]
+    assert workchain.outputs["preset"].get_dict() == {
+        "resources": {"num_machines": 2, "num_mpiprocs_per_machine": 4},
+        "model_name": "atm",
+        "model_options": {"parallel_nml": {"nproma": 16}},
+    }
+
+
+def test_tuning_workchain_concurrent(monkeypatch, make_tuning_workchain):
+    """Benchmarks submitted together share the wall time limit of the previous batch."""
+    workchain = make_tuning_workchain(search_space=orm.Dict({"num_machines": [1, 2, 4]}), max_concurrent=orm.Int(2))
+    submitted = mock_benchmarks(monkeypatch, workchain, {1: 10.0, 2: 8.0, 4: 6.0})
+    workchain.setup()
+    workchain.run_benchmarks()
+    assert len(submitted) == 2
+    workchain.inspect_benchmarks()
+    workchain.run_benchmarks()
+    workchain.inspect_benchmarks()
+    assert not workchain.has_pending_candidates()
+    assert [inputs["metadata"]["options"].get("max_wallclock_seconds") for inputs in submitted] == [3600, 3600, 312]
+    assert workchain.results() is None
+    assert workchain.outputs["scores"]["best"] == "benchmark_002"
+
+
+def test_tuning_workchain_nothing_scored(monkeypatch, make_tuning_workchain):
+    workchain = make_tuning_workchain(search_space=orm.Dict({"num_machines": [1]}))
+    mock_benchmarks(monkeypatch, workchain, {1: None})
+    workchain.setup()
+    workchain.run_benchmarks()
+    workchain.inspect_benchmarks()
+    assert workchain.ctx.candidates["benchmark_000"]["failed"] is True
+    assert workchain.results() == tuning.IconTuningWorkChain.exit_codes.ERROR_NO_SUCCESSFUL_BENCHMARK
+    assert "preset" not in workchain.outputs
+
+
+def test_tuning_workchain_remote_model_namelist(make_tuning_workchain, icon_code):
+    workchain = make_tuning_workchain(
+        search_space=orm.Dict({"nproma": [16, 32]}),
+        model_namelist=orm.RemoteData(remote_path="/model.namelist", computer=icon_code.computer),
+    )
+    assert workchain.setup() == tuning.IconTuningWorkChain.exit_codes.ERROR_MODEL_NAMELIST_NOT_MODIFIABLE
+
+
+def test_validate_search_space():
+    assert tuning.validate_search_space(orm.Dict({"num_machines": [1, 2], "nproma": [32]}), None) is None
+    assert "Unknown" in tuning.validate_search_space(orm.Dict({"nodes": [1]}), None)
+    assert "non-empty" in tuning.validate_search_space(orm.Dict({"nproma": []}), None)
+    assert "positive" in tuning.validate_search_space(orm.Dict({"nproma": [0]}), None)
+
+
+def test_spec_exposes_icon_inputs():
+    spec = tuning.IconTuningWorkChain.spec()
+    assert "master_namelist" in spec.inputs["icon"]
+    assert {"preset", "scores"} <= set(spec.outputs)
+
+
+def test_rank_benchmarks():
+    candidates = {
+        "benchmark_000": {"resources": {"num_machines": 1}, "nproma": 16},
+        "benchmark_001": {"resources": {"num_machines": 2}, "nproma": 16},
+        "benchmark_002": {"resources": {"num_machines": 4}, "nproma": 16, "stopped_early": True},
+    }
+    ranked = tuning.rank_benchmarks(
+        candidates=orm.Dict(candidates),
+        objective=orm.Str("sypd_per_node"),
+        simulated_seconds=orm.Float(86400),
+        model_name=orm.Str("atm"),
+        benchmark_000=orm.Dict({"total": {"calls": 1, "total_max": 100.0}}),
+        benchmark_001=orm.Dict({"total": {"calls": 1, "total_max": 60.0}}),
+    )
+    scores = ranked["scores"].get_dict()
+    assert scores["best"] == "benchmark_000"
+    assert "score" not in scores["benchmarks"]["benchmark_002"]
+    assert ranked["preset"].get_dict() == {
+        "resources": {"num_machines": 1},
+        "model_name": "atm",
+        "model_options": {"parallel_nml": {"nproma": 16}},
+    }
+
+
+def test_rank_benchmarks_none_scored():
+    ranked = tuning.rank_benchmarks(
+        candidates=orm.Dict({"benchmark_000": {"resources": {"num_machines": 1}, "nproma": None}}),
+        objective=orm.Str("sypd"),
+        simulated_seconds=orm.Float(86400),
+        model_name=orm.Str("atm"),
+    )
+    assert "preset" not in ranked
+    assert ranked["scores"]["best"] is None
+
+
+def test_apply_preset_to_models():
+    builder = IconCalculation.get_builder()
+    builder.models["atm"] = orm.SinglefileData.from_string("&parallel_nml\nnproma=8\n/")
+    builder.apply_preset(
+        orm.Dict(
+            {
+                "resources": {"num_machines": 1},
+                "model_name": "atm",
+                "model_options": {"parallel_nml": {"nproma": 16}},
+            }
+        )
+    )
+    assert builder.metadata.options.resources == {"num_machines": 1}
+    assert f90nml.reads(builder.models["atm"].get_content(mode="r"))["parallel_nml"]["nproma"] == 16